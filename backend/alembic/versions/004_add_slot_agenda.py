@@ -0,0 +1,45 @@
+"""add slot_agenda
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Criar tabela de slots materializados da agenda (modo AGENDAMENTO_POR_SLOTS)
+    op.create_table('slot_agenda',
+        sa.Column('id_slot', sa.Integer(), nullable=False),
+        sa.Column('data_hora_inicio', sa.DateTime(), nullable=False),
+        sa.Column('data_hora_fim', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('id_medico_fk', sa.Integer(), nullable=False),
+        sa.Column('id_consulta_fk', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['id_medico_fk'], ['medico.id_medico'], ),
+        sa.ForeignKeyConstraint(['id_consulta_fk'], ['consulta.id_consulta'], ),
+        sa.PrimaryKeyConstraint('id_slot'),
+        sa.UniqueConstraint('id_medico_fk', 'data_hora_inicio', name='uq_slot_agenda_medico_inicio')
+    )
+    op.create_index(op.f('ix_slot_agenda_id_slot'), 'slot_agenda', ['id_slot'], unique=False)
+    op.create_index(op.f('ix_slot_agenda_id_consulta_fk'), 'slot_agenda', ['id_consulta_fk'], unique=False)
+    # Índice que cobre a leitura de disponibilidade e a reserva do slot
+    op.create_index('ix_slot_agenda_medico_status_inicio', 'slot_agenda',
+                    ['id_medico_fk', 'status', 'data_hora_inicio'], unique=False)
+
+
+def downgrade():
+    # Remover tabela slot_agenda
+    op.drop_index('ix_slot_agenda_medico_status_inicio', table_name='slot_agenda')
+    op.drop_index(op.f('ix_slot_agenda_id_consulta_fk'), table_name='slot_agenda')
+    op.drop_index(op.f('ix_slot_agenda_id_slot'), table_name='slot_agenda')
+    op.drop_table('slot_agenda')
@@ -0,0 +1,28 @@
+"""add indices de periodo em consulta
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Índices usados pelos filtros de período [inicio, fim) em data_hora_inicio
+    op.create_index(op.f('ix_consulta_data_hora_inicio'), 'consulta', ['data_hora_inicio'], unique=False)
+    op.create_index('ix_consulta_medico_inicio', 'consulta', ['id_medico_fk', 'data_hora_inicio'], unique=False)
+
+
+def downgrade():
+    # Remover índices de período
+    op.drop_index('ix_consulta_medico_inicio', table_name='consulta')
+    op.drop_index(op.f('ix_consulta_data_hora_inicio'), table_name='consulta')
@@ -0,0 +1,37 @@
+"""add restricao de exclusao contra conflito de consultas
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # RN4 no banco: consultas ativas do mesmo médico não podem se sobrepor.
+    # Falha se já existirem consultas ativas sobrepostas; cancele-as antes.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(
+        "ALTER TABLE consulta ADD CONSTRAINT ex_consulta_medico_sem_sobreposicao "
+        "EXCLUDE USING gist ("
+        "int4range(id_medico_fk, id_medico_fk, '[]') WITH =, "
+        "tsrange(data_hora_inicio, COALESCE(data_hora_fim, data_hora_inicio + interval '30 minutes')) WITH &&"
+        ") WHERE (status IN ('agendada', 'confirmada'))"
+    )
+
+
+def downgrade():
+    # Remover restrição de exclusão
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_constraint('ex_consulta_medico_sem_sobreposicao', 'consulta')
@@ -0,0 +1,48 @@
+"""add contador de faltas consecutivas em paciente
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # RN3: contador mantido ao atualizar o status das consultas
+    op.add_column(
+        'paciente',
+        sa.Column('faltas_consecutivas', sa.Integer(), nullable=False, server_default='0')
+    )
+    # Carga inicial a partir do histórico: para cada consulta passada, soma as
+    # consultas que não foram falta depois dela; as faltas com soma zero são
+    # as consecutivas mais recentes
+    op.execute(
+        "WITH historico AS ("
+        " SELECT id_paciente_fk,"
+        " SUM(CASE WHEN status = 'faltou' THEN 0 ELSE 1 END) OVER ("
+        " PARTITION BY id_paciente_fk ORDER BY data_hora_inicio DESC"
+        " ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW"
+        " ) AS presencas_posteriores"
+        " FROM consulta"
+        " WHERE data_hora_inicio < CURRENT_TIMESTAMP"
+        ") "
+        "UPDATE paciente SET faltas_consecutivas = ("
+        " SELECT COUNT(*) FROM historico"
+        " WHERE historico.id_paciente_fk = paciente.id_paciente"
+        " AND historico.presencas_posteriores = 0"
+        ")"
+    )
+
+
+def downgrade():
+    # Remover contador
+    op.drop_column('paciente', 'faltas_consecutivas')
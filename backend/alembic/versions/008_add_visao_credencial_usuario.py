@@ -0,0 +1,34 @@
+"""add visao credencial_usuario para login unificado
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Login em uma única busca por e-mail nos três tipos de usuário
+    op.execute(
+        "CREATE VIEW credencial_usuario AS "
+        "SELECT 'paciente' AS tipo, id_paciente AS id_usuario, email, senha_hash, "
+        "esta_bloqueado, 1 AS prioridade FROM paciente "
+        "UNION ALL "
+        "SELECT 'medico', id_medico, email, senha_hash, FALSE, 2 FROM medico "
+        "UNION ALL "
+        "SELECT 'administrador', id_admin, email, senha_hash, FALSE, 3 FROM administrador"
+    )
+
+
+def downgrade():
+    # Remover visão
+    op.execute("DROP VIEW IF EXISTS credencial_usuario")
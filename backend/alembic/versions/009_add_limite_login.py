@@ -0,0 +1,35 @@
+"""add limite_login
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Baldes de fichas do limite de login compartilhado entre workers (LOGIN_LIMITE_COMPARTILHADO)
+    op.create_table('limite_login',
+        sa.Column('chave', sa.String(length=320), nullable=False),
+        sa.Column('fichas', sa.Float(), nullable=False),
+        sa.Column('atualizado_em', sa.Float(), nullable=False),
+        sa.Column('permitido', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('chave')
+    )
+    # Índice usado na remoção periódica dos baldes ociosos
+    op.create_index(op.f('ix_limite_login_atualizado_em'), 'limite_login', ['atualizado_em'], unique=False)
+
+
+def downgrade():
+    # Remover tabela limite_login
+    op.drop_index(op.f('ix_limite_login_atualizado_em'), table_name='limite_login')
+    op.drop_table('limite_login')
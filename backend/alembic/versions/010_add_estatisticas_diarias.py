@@ -0,0 +1,79 @@
+"""add estatisticas_diarias mantida por gatilhos em consulta
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Consultas por dia, médico e status lidas pelos painéis
+    op.create_table('estatisticas_diarias',
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('id_medico_fk', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('dia', 'id_medico_fk', 'status')
+    )
+    op.create_index('ix_estatisticas_diarias_medico_dia', 'estatisticas_diarias',
+                    ['id_medico_fk', 'dia'], unique=False)
+    
+    # Gatilhos que mantêm os totais na mesma transação de cada alteração em consulta
+    op.execute(
+        "CREATE OR REPLACE FUNCTION atualizar_estatisticas_diarias() RETURNS trigger AS $$ "
+        "BEGIN "
+        "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+        "UPDATE estatisticas_diarias SET total = total - 1 "
+        "WHERE dia = OLD.data_hora_inicio::date AND id_medico_fk = OLD.id_medico_fk "
+        "AND status = COALESCE(OLD.status, ''); "
+        "END IF; "
+        "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+        "INSERT INTO estatisticas_diarias (dia, id_medico_fk, status, total) "
+        "VALUES (NEW.data_hora_inicio::date, NEW.id_medico_fk, COALESCE(NEW.status, ''), 1) "
+        "ON CONFLICT (dia, id_medico_fk, status) DO UPDATE SET total = estatisticas_diarias.total + 1; "
+        "END IF; "
+        "RETURN NULL; "
+        "END; "
+        "$$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER tg_consulta_estatisticas_inclusao_exclusao "
+        "AFTER INSERT OR DELETE ON consulta "
+        "FOR EACH ROW EXECUTE PROCEDURE atualizar_estatisticas_diarias()"
+    )
+    op.execute(
+        "CREATE TRIGGER tg_consulta_estatisticas_alteracao "
+        "AFTER UPDATE OF data_hora_inicio, id_medico_fk, status ON consulta "
+        "FOR EACH ROW WHEN ("
+        "OLD.data_hora_inicio::date IS DISTINCT FROM NEW.data_hora_inicio::date "
+        "OR OLD.id_medico_fk IS DISTINCT FROM NEW.id_medico_fk "
+        "OR OLD.status IS DISTINCT FROM NEW.status"
+        ") EXECUTE PROCEDURE atualizar_estatisticas_diarias()"
+    )
+    
+    # Carga inicial a partir do histórico (consulta travada até o fim da migração)
+    op.execute("LOCK TABLE consulta IN SHARE MODE")
+    op.execute(
+        "INSERT INTO estatisticas_diarias (dia, id_medico_fk, status, total) "
+        "SELECT data_hora_inicio::date, id_medico_fk, COALESCE(status, ''), COUNT(*) "
+        "FROM consulta GROUP BY 1, 2, 3"
+    )
+
+
+def downgrade():
+    # Remover gatilhos, função e tabela
+    op.execute("DROP TRIGGER IF EXISTS tg_consulta_estatisticas_alteracao ON consulta")
+    op.execute("DROP TRIGGER IF EXISTS tg_consulta_estatisticas_inclusao_exclusao ON consulta")
+    op.execute("DROP FUNCTION IF EXISTS atualizar_estatisticas_diarias()")
+    op.drop_index('ix_estatisticas_diarias_medico_dia', table_name='estatisticas_diarias')
+    op.drop_table('estatisticas_diarias')
@@ -0,0 +1,26 @@
+"""add indice de consulta por paciente e status
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Contagens de consultas por paciente e status na listagem de pacientes
+    op.create_index('ix_consulta_paciente_status', 'consulta', ['id_paciente_fk', 'status'], unique=False)
+
+
+def downgrade():
+    # Remover índice
+    op.drop_index('ix_consulta_paciente_status', table_name='consulta')
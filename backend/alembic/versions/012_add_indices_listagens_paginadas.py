@@ -0,0 +1,33 @@
+"""add indices das listagens paginadas
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Paginação por cursor: cada página começa pelo índice na ordem da listagem
+    op.create_index('ix_consulta_paciente_inicio', 'consulta', ['id_paciente_fk', 'data_hora_inicio'], unique=False)
+    op.create_index('ix_paciente_nome', 'paciente', ['nome', 'id_paciente'], unique=False)
+    op.create_index('ix_medico_nome', 'medico', ['nome', 'id_medico'], unique=False)
+    op.create_index('ix_bloqueio_horario_medico_data', 'bloqueio_horario',
+                    ['id_medico_fk', 'data', 'hora_inicio'], unique=False)
+
+
+def downgrade():
+    # Remover índices
+    op.drop_index('ix_bloqueio_horario_medico_data', table_name='bloqueio_horario')
+    op.drop_index('ix_medico_nome', table_name='medico')
+    op.drop_index('ix_paciente_nome', table_name='paciente')
+    op.drop_index('ix_consulta_paciente_inicio', table_name='consulta')
@@ -0,0 +1,39 @@
+"""add colunas da geração de relatórios em segundo plano
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Relatórios já gravados (se houver) ficam como concluídos em JSON
+    op.add_column('relatorio', sa.Column('formato', sa.String(length=10), nullable=False, server_default='json'))
+    op.add_column('relatorio', sa.Column('parametros', sa.Text(), nullable=True))
+    op.add_column('relatorio', sa.Column('status', sa.String(length=20), nullable=False, server_default='concluido'))
+    op.add_column('relatorio', sa.Column('mensagem_erro', sa.Text(), nullable=True))
+    op.add_column('relatorio', sa.Column('data_conclusao', sa.DateTime(), nullable=True))
+    op.add_column('relatorio', sa.Column('conteudo', sa.LargeBinary(), nullable=True))
+    # Listagem das tarefas de cada administrador, mais recentes primeiro
+    op.create_index('ix_relatorio_admin_geracao', 'relatorio',
+                    ['id_admin_fk', 'data_geracao', 'id_relatorio'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_relatorio_admin_geracao', table_name='relatorio')
+    op.drop_column('relatorio', 'conteudo')
+    op.drop_column('relatorio', 'data_conclusao')
+    op.drop_column('relatorio', 'mensagem_erro')
+    op.drop_column('relatorio', 'status')
+    op.drop_column('relatorio', 'parametros')
+    op.drop_column('relatorio', 'formato')
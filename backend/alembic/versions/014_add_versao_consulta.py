@@ -0,0 +1,45 @@
+"""add versao em consulta (marca de dados do cache de relatórios)
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Consultas existentes ficam com versao 0: toda alteração posterior recebe
+    # um número maior, o que basta para a marca mudar (sem reescrever a tabela)
+    op.add_column('consulta', sa.Column('versao', sa.BigInteger(), nullable=False, server_default='0'))
+    op.execute("CREATE SEQUENCE IF NOT EXISTS consulta_versao_seq")
+    op.execute(
+        "CREATE OR REPLACE FUNCTION atualizar_versao_consulta() RETURNS trigger AS $$ "
+        "BEGIN "
+        "NEW.versao := nextval('consulta_versao_seq'); "
+        "RETURN NEW; "
+        "END; "
+        "$$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER tg_consulta_versao BEFORE INSERT OR UPDATE ON consulta "
+        "FOR EACH ROW EXECUTE PROCEDURE atualizar_versao_consulta()"
+    )
+    # Contagem e soma das versões por período sem ler a tabela
+    op.create_index('ix_consulta_inicio_versao', 'consulta', ['data_hora_inicio', 'versao'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_consulta_inicio_versao', table_name='consulta')
+    op.execute("DROP TRIGGER IF EXISTS tg_consulta_versao ON consulta")
+    op.execute("DROP FUNCTION IF EXISTS atualizar_versao_consulta()")
+    op.execute("DROP SEQUENCE IF EXISTS consulta_versao_seq")
+    op.drop_column('consulta', 'versao')
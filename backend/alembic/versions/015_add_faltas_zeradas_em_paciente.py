@@ -0,0 +1,27 @@
+"""add faltas_zeradas_em em paciente (desbloqueio respeitado pelo recálculo)
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # RN3: consultas até o desbloqueio pelo administrador não contam no
+    # recálculo. Os contadores atuais ficam como estão: recarregar pelo
+    # histórico devolveria as faltas de quem já foi desbloqueado
+    op.add_column('paciente', sa.Column('faltas_zeradas_em', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('paciente', 'faltas_zeradas_em')
@@ -0,0 +1,33 @@
+"""arquivo do relatório em disco (caminho_arquivo no lugar de conteudo)
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '016'
+down_revision = '015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # O arquivo passa a ser gravado em RELATORIOS_DIRETORIO, em pedaços
+    op.add_column('relatorio', sa.Column('caminho_arquivo', sa.String(255), nullable=True))
+    # Tarefas concluídas antes da mudança não têm arquivo em disco
+    op.execute(
+        "UPDATE relatorio SET status = 'erro',"
+        " mensagem_erro = 'Arquivo não migrado; peça o relatório novamente'"
+        " WHERE status = 'concluido'"
+    )
+    op.drop_column('relatorio', 'conteudo')
+
+
+def downgrade():
+    op.add_column('relatorio', sa.Column('conteudo', sa.LargeBinary(), nullable=True))
+    op.drop_column('relatorio', 'caminho_arquivo')
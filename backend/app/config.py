@@ -17,11 +17,70 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "sua-chave-secreta-super-segura-mude-em-producao-12345"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Verificação de tokens: "jose" ou "nativo" (HMAC da biblioteca padrão, só HS*)
+    JWT_DECODIFICADOR: str = "jose"
+    # Tokens verificados mantidos em cache por processo (0 = sem cache)
+    TOKENS_CACHE_CAPACIDADE: int = 10000
     
     APP_ENV: str = "production" # 'production' ou 'test'
     
     # Pode ser sobrescrito pela variável de ambiente
     DATABASE_URL: str | None = None
+    
+    # Cache de disponibilidade em memória compartilhada entre workers
+    # (desativado quando nenhum arquivo é informado)
+    CACHE_DISPONIBILIDADE_ARQUIVO: str | None = None
+    CACHE_DISPONIBILIDADE_MAX_MEDICOS: int = 1024
+    CACHE_DISPONIBILIDADE_DIAS: int = 120
+    
+    # Agendamento por slots materializados (tabela slot_agenda)
+    AGENDAMENTO_POR_SLOTS: bool = False
+    SLOTS_SEMANAS_MATERIALIZADAS: int = 8
+    
+    # Pool de processos para bcrypt (0 = executa na própria thread)
+    SENHAS_PROCESSOS: int = 2
+    SENHAS_FILA_MAXIMA: int = 16
+    SENHAS_ESPERA_MAXIMA_SEGUNDOS: float = 5.0
+    
+    # Custo do bcrypt: calibrado no deploy (benchmarks/custo_bcrypt.py) para o
+    # tempo alvo e fixado em BCRYPT_CUSTO; None = BCRYPT_CUSTO_MINIMO
+    BCRYPT_CUSTO: int | None = None
+    BCRYPT_TEMPO_ALVO_MS: float = 250.0
+    BCRYPT_CUSTO_MINIMO: int = 12
+    BCRYPT_CUSTO_MAXIMO: int = 16
+    
+    # Listagens paginadas por cursor: itens por página (padrão e máximo)
+    PAGINACAO_LIMITE_PADRAO: int = 100
+    PAGINACAO_LIMITE_MAXIMO: int = 500
+    
+    # Exportações em fluxo: linhas lidas do cursor do banco por pedaço da resposta
+    EXPORTACAO_LOTE: int = 1000
+    
+    # Relatórios gerados em segundo plano, em processos (0 trabalhadores = executa na própria thread)
+    RELATORIOS_TRABALHADORES: int = 2
+    RELATORIOS_FILA_MAXIMA: int = 16
+    # Pendentes/processando há mais que isso na inicialização: abandonadas, marcadas com erro
+    RELATORIOS_TEMPO_MAXIMO_SEGUNDOS: float = 1800.0
+    # Arquivos de relatório já gerados, reaproveitados enquanto as consultas não mudam (0 = sem cache)
+    RELATORIOS_CACHE_MB: float = 64.0
+    # Arquivos das tarefas de relatório (um por tarefa); com vários servidores, um volume compartilhado
+    RELATORIOS_DIRETORIO: str = "relatorios_gerados"
+    
+    # Dashboard administrativo em cache por alguns segundos (0 = sem cache)
+    DASHBOARD_CACHE_SEGUNDOS: float = 5.0
+    
+    # Limite de tentativas de login (baldes de fichas por IP e por conta)
+    LOGIN_LIMITE_ATIVO: bool = True
+    LOGIN_LIMITE_IP_TENTATIVAS: int = 20
+    LOGIN_LIMITE_IP_POR_MINUTO: float = 10.0
+    LOGIN_LIMITE_CONTA_TENTATIVAS: int = 5
+    LOGIN_LIMITE_CONTA_POR_MINUTO: float = 1.0
+    LOGIN_LIMITE_LIMPEZA_SEGUNDOS: float = 60.0
+    # Baldes na tabela limite_login, compartilhados entre workers
+    LOGIN_LIMITE_COMPARTILHADO: bool = False
+    # Atrás de proxy reverso: IP do cliente vem de X-Forwarded-For (ligado nos
+    # arquivos de deploy; desligado só para o uvicorn exposto diretamente)
+    LOGIN_LIMITE_CONFIAR_PROXY: bool = False
 
     @property
     def TESTING(self) -> bool:
@@ -1,7 +1,13 @@
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import engine, Base
 from app.routers import auth, pacientes, medicos, admin, consultas, populate
+from app.utils.metricas import metricas
+from app.utils.senhas import encerrar_pool_senhas
+from app.services.fila_relatorios import encerrar_fila_relatorios, recuperar_relatorios_interrompidos
+from sqlalchemy.exc import SQLAlchemyError
 
 # Criar tabelas
 Base.metadata.create_all(bind=engine)
@@ -42,3 +48,22 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/metricas")
+def obter_metricas():
+    """Métricas deste processo (pool de senhas, caches, fila de relatórios)"""
+    return metricas.instantaneo()
+
+@app.on_event("startup")
+def recuperar_relatorios():
+    # Tarefas órfãs de uma execução anterior (queda, deploy) não ficam pendentes para sempre;
+    # a limpeza não impede a API de subir
+    try:
+        recuperar_relatorios_interrompidos()
+    except SQLAlchemyError:
+        logging.getLogger(__name__).exception("Falha ao marcar relatórios interrompidos")
+
+@app.on_event("shutdown")
+def encerrar_recursos():
+    encerrar_pool_senhas()
+    encerrar_fila_relatorios()
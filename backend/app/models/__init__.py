@@ -9,6 +9,10 @@ from app.models.models import (
     Consulta,
     Observacao,
     BloqueioHorario,
+    SlotAgenda,
+    LimiteLogin,
+    EstatisticaDiaria,
+    credencial_usuario,
     TipoUsuario
 )
 
@@ -23,5 +27,9 @@ __all__ = [
     "Consulta",
     "Observacao",
     "BloqueioHorario",
+    "SlotAgenda",
+    "LimiteLogin",
+    "EstatisticaDiaria",
+    "credencial_usuario",
     "TipoUsuario"
 ]
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, Text, Date, Time, Numeric
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, Text, Date, Time, Numeric, Float, Index, UniqueConstraint, DDL, event, Table, MetaData, func, select, text
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import enum
 from app.database import Base
@@ -81,6 +81,10 @@ class Medico(Base):
     - id_especialidade_fk (FK)
     """
     __tablename__ = "medico"
+    __table_args__ = (
+        # Listagem paginada por nome
+        Index("ix_medico_nome", "nome", "id_medico"),
+    )
     
     id_medico = Column(Integer, primary_key=True, index=True)
     nome = Column(String(255), nullable=False)
@@ -108,9 +112,15 @@ class Paciente(Base):
     - telefone
     - data_nascimento
     - esta_bloqueado
+    - faltas_consecutivas
+    - faltas_zeradas_em
     - id_plano_saude_fk (FK, Nullable)
     """
     __tablename__ = "paciente"
+    __table_args__ = (
+        # Listagem paginada por nome
+        Index("ix_paciente_nome", "nome", "id_paciente"),
+    )
     
     id_paciente = Column(Integer, primary_key=True, index=True)
     nome = Column(String(255), nullable=False)
@@ -120,6 +130,10 @@ class Paciente(Base):
     telefone = Column(String(20))
     data_nascimento = Column(Date, nullable=False)
     esta_bloqueado = Column(Boolean, default=False)
+    # RN3: faltas seguidas desde a última consulta realizada, mantido por atualizar_status_consulta
+    faltas_consecutivas = Column(Integer, nullable=False, default=0, server_default="0")
+    # Desbloqueio pelo administrador: consultas até este instante não contam no recálculo
+    faltas_zeradas_em = Column(DateTime, nullable=True)
     id_plano_saude_fk = Column(Integer, ForeignKey("plano_saude.id_plano_saude"), nullable=True)
     
     # Relacionamentos
@@ -134,14 +148,29 @@ class Relatorio(Base):
     - data_geracao
     - dados_resultado
     - id_admin_fk (FK)
+
+    Também é a tarefa de geração em segundo plano: status vai de pendente
+    a processando e termina em concluido (arquivo em RELATORIOS_DIRETORIO,
+    com o nome em caminho_arquivo) ou erro.
     """
     __tablename__ = "relatorio"
     
     id_relatorio = Column(Integer, primary_key=True, index=True)
     tipo = Column(String(100), nullable=False)
     data_geracao = Column(DateTime, default=datetime.utcnow)
-    dados_resultado = Column(Text)
+    dados_resultado = deferred(Column(Text))
     id_admin_fk = Column(Integer, ForeignKey("administrador.id_admin"), nullable=False)
+    formato = Column(String(10), nullable=False, default="json")
+    parametros = Column(Text)  # filtros em JSON
+    status = Column(String(20), nullable=False, default="pendente")
+    mensagem_erro = Column(Text)
+    data_conclusao = Column(DateTime)
+    # Arquivo renderizado, gravado em disco (lido em pedaços no download)
+    caminho_arquivo = Column(String(255))
+    
+    __table_args__ = (
+        Index("ix_relatorio_admin_geracao", "id_admin_fk", "data_geracao", "id_relatorio"),
+    )
     
     # Relacionamentos
     administrador = relationship("Administrador", back_populates="relatorios")
@@ -177,19 +206,50 @@ class Consulta(Base):
     - id_medico_fk (FK)
     """
     __tablename__ = "consulta"
+    __table_args__ = (
+        # Agenda do médico e verificação de conflitos filtram por médico + período
+        Index("ix_consulta_medico_inicio", "id_medico_fk", "data_hora_inicio"),
+        # Contagens por paciente e status (listagem de pacientes, RN2)
+        Index("ix_consulta_paciente_status", "id_paciente_fk", "status"),
+        # Consultas do paciente por data (listagem paginada)
+        Index("ix_consulta_paciente_inicio", "id_paciente_fk", "data_hora_inicio"),
+        # Marca de dados dos relatórios: contagem e soma de versao por período
+        Index("ix_consulta_inicio_versao", "data_hora_inicio", "versao"),
+    )
     
     id_consulta = Column(Integer, primary_key=True, index=True)
-    data_hora_inicio = Column(DateTime, nullable=False)
+    data_hora_inicio = Column(DateTime, nullable=False, index=True)
     data_hora_fim = Column(DateTime, nullable=True)
     status = Column(String(50), default="Agendada")
     id_paciente_fk = Column(Integer, ForeignKey("paciente.id_paciente"), nullable=False)
     id_medico_fk = Column(Integer, ForeignKey("medico.id_medico"), nullable=False)
+    # Preenchida pelos gatilhos a cada inclusão/alteração (valor sempre maior que os anteriores)
+    versao = Column(BigInteger, nullable=False, server_default="0")
     
     # Relacionamentos
     paciente = relationship("Paciente", back_populates="consultas")
     medico = relationship("Medico", back_populates="consultas")
     observacao = relationship("Observacao", back_populates="consulta", uselist=False)
 
+# RN4 garantida pelo banco (PostgreSQL): consultas ativas do mesmo médico não
+# podem se sobrepor, mesmo quando duas requisições passam pela validação ao
+# mesmo tempo. Consultas sem data_hora_fim ocupam 30 minutos. O médico entra
+# como int4range de um único valor para usar só operadores GiST nativos
+# (dispensa a extensão btree_gist).
+EXCLUSAO_CONFLITO_CONSULTA = "ex_consulta_medico_sem_sobreposicao"
+
+event.listen(
+    Consulta.__table__,
+    "after_create",
+    DDL(
+        f"ALTER TABLE consulta ADD CONSTRAINT {EXCLUSAO_CONFLITO_CONSULTA} "
+        "EXCLUDE USING gist ("
+        "int4range(id_medico_fk, id_medico_fk, '[]') WITH =, "
+        "tsrange(data_hora_inicio, COALESCE(data_hora_fim, data_hora_inicio + interval '30 minutes')) WITH &&"
+        ") WHERE (status IN ('agendada', 'confirmada'))"
+    ).execute_if(dialect="postgresql")
+)
+
 class Observacao(Base):
     """
     Entidade: OBSERVACAO
@@ -219,6 +279,10 @@ class BloqueioHorario(Base):
     - id_medico_fk (FK)
     """
     __tablename__ = "bloqueio_horario"
+    __table_args__ = (
+        # Bloqueios do médico por data (listagem paginada, estatísticas)
+        Index("ix_bloqueio_horario_medico_data", "id_medico_fk", "data", "hora_inicio"),
+    )
     
     id_bloqueio = Column(Integer, primary_key=True, index=True)
     data = Column(Date, nullable=False)
@@ -229,3 +293,248 @@ class BloqueioHorario(Base):
     
     # Relacionamentos
     medico = relationship("Medico", back_populates="bloqueios")
+
+class SlotAgenda(Base):
+    """
+    Slot materializado da agenda (modo AGENDAMENTO_POR_SLOTS)
+    - id_slot (PK)
+    - data_hora_inicio
+    - data_hora_fim
+    - status: 'livre', 'ocupado' (consulta) ou 'bloqueado' (bloqueio de horário)
+    - id_medico_fk (FK)
+    - id_consulta_fk (FK, preenchido quando ocupado por consulta)
+    """
+    __tablename__ = "slot_agenda"
+    __table_args__ = (
+        UniqueConstraint("id_medico_fk", "data_hora_inicio", name="uq_slot_agenda_medico_inicio"),
+        Index("ix_slot_agenda_medico_status_inicio", "id_medico_fk", "status", "data_hora_inicio"),
+    )
+    
+    id_slot = Column(Integer, primary_key=True, index=True)
+    data_hora_inicio = Column(DateTime, nullable=False)
+    data_hora_fim = Column(DateTime, nullable=False)
+    status = Column(String(20), nullable=False, default="livre")
+    id_medico_fk = Column(Integer, ForeignKey("medico.id_medico"), nullable=False)
+    id_consulta_fk = Column(Integer, ForeignKey("consulta.id_consulta"), nullable=True, index=True)
+
+class LimiteLogin(Base):
+    """
+    Balde de fichas do limite de tentativas de login (modo LOGIN_LIMITE_COMPARTILHADO)
+    - chave (PK): 'ip:<endereço>' ou 'conta:<email ou crm:<crm>>' (valores longos
+      trocados por 'sha256:<hex>', ver limite_login.chave_balde)
+    - fichas: tentativas disponíveis em atualizado_em
+    - atualizado_em: última tentativa (segundos desde a época)
+    - permitido: resultado da última tentativa
+    """
+    __tablename__ = "limite_login"
+
+    chave = Column(String(320), primary_key=True)
+    fichas = Column(Float, nullable=False)
+    atualizado_em = Column(Float, nullable=False, index=True)
+    permitido = Column(Boolean, nullable=False, default=True)
+
+# ============ Credenciais (login) ============
+# Visão que reúne e-mail e senha dos três tipos de usuário: o login faz uma
+# única busca por e-mail (cada ramo usa o índice único de e-mail da sua
+# tabela). Por ser uma visão, acompanha cadastros, alterações e exclusões
+# feitos por qualquer caminho (API, scripts de carga, SQL direto).
+# prioridade preserva a ordem antiga do login: paciente, médico, administrador.
+VISAO_CREDENCIAL_USUARIO = (
+    "SELECT 'paciente' AS tipo, id_paciente AS id_usuario, email, senha_hash, "
+    "esta_bloqueado, 1 AS prioridade FROM paciente "
+    "UNION ALL "
+    "SELECT 'medico', id_medico, email, senha_hash, FALSE, 2 FROM medico "
+    "UNION ALL "
+    "SELECT 'administrador', id_admin, email, senha_hash, FALSE, 3 FROM administrador"
+)
+
+# Mapeada fora de Base.metadata para que create_all não a crie como tabela
+credencial_usuario = Table(
+    "credencial_usuario", MetaData(),
+    Column("tipo", String(20)),
+    Column("id_usuario", Integer),
+    Column("email", String(255)),
+    Column("senha_hash", String(255)),
+    Column("esta_bloqueado", Boolean),
+    Column("prioridade", Integer),
+)
+
+event.listen(
+    Base.metadata, "after_create",
+    DDL(f"CREATE OR REPLACE VIEW credencial_usuario AS {VISAO_CREDENCIAL_USUARIO}").execute_if(dialect="postgresql")
+)
+event.listen(
+    Base.metadata, "after_create",
+    DDL(f"CREATE VIEW IF NOT EXISTS credencial_usuario AS {VISAO_CREDENCIAL_USUARIO}").execute_if(dialect="sqlite")
+)
+event.listen(Base.metadata, "before_drop", DDL("DROP VIEW IF EXISTS credencial_usuario"))
+
+# ============ Estatísticas diárias ============
+class EstatisticaDiaria(Base):
+    """
+    Consultas por dia, médico e status, mantidas por gatilhos em consulta
+    - dia (PK): data de data_hora_inicio
+    - id_medico_fk (PK)
+    - status (PK): status da consulta ('' quando nulo)
+    - total
+    
+    Sem chave estrangeira: é derivada de consulta (linhas zeradas não
+    impedem a exclusão do médico) e pode ser refeita por
+    reconciliar_estatisticas.py. Criada por create_all, já nasce com os
+    totais das consultas existentes.
+    """
+    __tablename__ = "estatisticas_diarias"
+    __table_args__ = (
+        Index("ix_estatisticas_diarias_medico_dia", "id_medico_fk", "dia"),
+    )
+    
+    dia = Column(Date, primary_key=True)
+    id_medico_fk = Column(Integer, primary_key=True)
+    status = Column(String(50), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+# Gatilhos: inclusão, exclusão e mudança de dia, médico ou status de uma
+# consulta ajustam o total na mesma transação, qualquer que seja o caminho
+# (ORM, INSERT em lote, scripts, SQL direto). Os painéis leem poucas linhas
+# por dia em vez de recontar consulta.
+FUNCAO_ESTATISTICAS_DIARIAS = (
+    "CREATE OR REPLACE FUNCTION atualizar_estatisticas_diarias() RETURNS trigger AS $$ "
+    "BEGIN "
+    "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+    "UPDATE estatisticas_diarias SET total = total - 1 "
+    "WHERE dia = OLD.data_hora_inicio::date AND id_medico_fk = OLD.id_medico_fk "
+    "AND status = COALESCE(OLD.status, ''); "
+    "END IF; "
+    "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+    "INSERT INTO estatisticas_diarias (dia, id_medico_fk, status, total) "
+    "VALUES (NEW.data_hora_inicio::date, NEW.id_medico_fk, COALESCE(NEW.status, ''), 1) "
+    "ON CONFLICT (dia, id_medico_fk, status) DO UPDATE SET total = estatisticas_diarias.total + 1; "
+    "END IF; "
+    "RETURN NULL; "
+    "END; "
+    "$$ LANGUAGE plpgsql"
+)
+GATILHOS_ESTATISTICAS_DIARIAS = {
+    "tg_consulta_estatisticas_inclusao_exclusao": (
+        "AFTER INSERT OR DELETE ON consulta "
+        "FOR EACH ROW EXECUTE PROCEDURE atualizar_estatisticas_diarias()"
+    ),
+    "tg_consulta_estatisticas_alteracao": (
+        "AFTER UPDATE OF data_hora_inicio, id_medico_fk, status ON consulta "
+        "FOR EACH ROW WHEN ("
+        "OLD.data_hora_inicio::date IS DISTINCT FROM NEW.data_hora_inicio::date "
+        "OR OLD.id_medico_fk IS DISTINCT FROM NEW.id_medico_fk "
+        "OR OLD.status IS DISTINCT FROM NEW.status"
+        ") EXECUTE PROCEDURE atualizar_estatisticas_diarias()"
+    ),
+}
+# create_all roda a cada inicialização: cria só os gatilhos ausentes (recriar
+# travaria consulta com ACCESS EXCLUSIVE a cada início de worker)
+GATILHOS_ESTATISTICAS_DIARIAS_POSTGRESQL = [
+    "DO $$ BEGIN "
+    f"IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = '{nome}' AND tgrelid = 'consulta'::regclass) THEN "
+    f"CREATE TRIGGER {nome} {definicao}; "
+    "END IF; "
+    "END $$"
+    for nome, definicao in GATILHOS_ESTATISTICAS_DIARIAS.items()
+]
+_SQLITE_SOMAR_NOVA = (
+    "INSERT INTO estatisticas_diarias (dia, id_medico_fk, status, total) "
+    "VALUES (date(NEW.data_hora_inicio), NEW.id_medico_fk, COALESCE(NEW.status, ''), 1) "
+    "ON CONFLICT (dia, id_medico_fk, status) DO UPDATE SET total = total + 1;"
+)
+_SQLITE_SUBTRAIR_ANTIGA = (
+    "UPDATE estatisticas_diarias SET total = total - 1 "
+    "WHERE dia = date(OLD.data_hora_inicio) AND id_medico_fk = OLD.id_medico_fk "
+    "AND status = COALESCE(OLD.status, '');"
+)
+GATILHOS_ESTATISTICAS_DIARIAS_SQLITE = [
+    "CREATE TRIGGER IF NOT EXISTS tg_consulta_estatisticas_inclusao "
+    f"AFTER INSERT ON consulta BEGIN {_SQLITE_SOMAR_NOVA} END",
+    "CREATE TRIGGER IF NOT EXISTS tg_consulta_estatisticas_exclusao "
+    f"AFTER DELETE ON consulta BEGIN {_SQLITE_SUBTRAIR_ANTIGA} END",
+    "CREATE TRIGGER IF NOT EXISTS tg_consulta_estatisticas_alteracao "
+    "AFTER UPDATE OF data_hora_inicio, id_medico_fk, status ON consulta "
+    "WHEN date(OLD.data_hora_inicio) IS NOT date(NEW.data_hora_inicio) "
+    "OR OLD.id_medico_fk IS NOT NEW.id_medico_fk OR OLD.status IS NOT NEW.status "
+    f"BEGIN {_SQLITE_SUBTRAIR_ANTIGA} {_SQLITE_SOMAR_NOVA} END",
+]
+
+# create_all num banco que já tem consultas (sem a migração 010, que faz a
+# carga inicial): a tabela nova recebe os totais de consulta antes de os
+# gatilhos existirem. No PostgreSQL o create_all é uma transação só, e a trava
+# em consulta vale até os gatilhos serem criados: nenhuma escrita fica de fora.
+EstatisticaDiaria.__table__.add_is_dependent_on(Consulta.__table__)
+
+
+@event.listens_for(EstatisticaDiaria.__table__, "after_create")
+def carregar_estatisticas_diarias(tabela, conexao, **kw):
+    if conexao.dialect.name == "postgresql":
+        conexao.execute(text("LOCK TABLE consulta IN SHARE MODE"))
+    dia, status = func.date(Consulta.data_hora_inicio), func.coalesce(Consulta.status, "")
+    conexao.execute(tabela.insert().from_select(
+        ["dia", "id_medico_fk", "status", "total"],
+        select(dia, Consulta.id_medico_fk, status, func.count()).group_by(dia, Consulta.id_medico_fk, status)
+    ))
+
+
+event.listen(Base.metadata, "after_create", DDL(FUNCAO_ESTATISTICAS_DIARIAS).execute_if(dialect="postgresql"))
+for _gatilho in GATILHOS_ESTATISTICAS_DIARIAS_POSTGRESQL:
+    event.listen(Base.metadata, "after_create", DDL(_gatilho).execute_if(dialect="postgresql"))
+for _gatilho in GATILHOS_ESTATISTICAS_DIARIAS_SQLITE:
+    event.listen(Base.metadata, "after_create", DDL(_gatilho).execute_if(dialect="sqlite"))
+event.listen(
+    Base.metadata, "before_drop",
+    DDL("DROP FUNCTION IF EXISTS atualizar_estatisticas_diarias() CASCADE").execute_if(dialect="postgresql")
+)
+
+# Versão de cada consulta para a marca de dados dos relatórios em cache: toda
+# inclusão ou alteração recebe um número maior que todos os anteriores, então
+# contagem + soma das versões de um período muda a cada inclusão, alteração ou
+# exclusão nesse período (app/services/relatorios.py).
+FUNCAO_VERSAO_CONSULTA = (
+    "CREATE OR REPLACE FUNCTION atualizar_versao_consulta() RETURNS trigger AS $$ "
+    "BEGIN "
+    "NEW.versao := nextval('consulta_versao_seq'); "
+    "RETURN NEW; "
+    "END; "
+    "$$ LANGUAGE plpgsql"
+)
+GATILHO_VERSAO_CONSULTA_POSTGRESQL = (
+    "DO $$ BEGIN "
+    "IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'tg_consulta_versao' "
+    "AND tgrelid = 'consulta'::regclass) THEN "
+    "CREATE TRIGGER tg_consulta_versao BEFORE INSERT OR UPDATE ON consulta "
+    "FOR EACH ROW EXECUTE PROCEDURE atualizar_versao_consulta(); "
+    "END IF; "
+    "END $$"
+)
+_SQLITE_NOVA_VERSAO = (
+    "UPDATE consulta SET versao = (SELECT MAX(versao) + 1 FROM consulta) "
+    "WHERE id_consulta = NEW.id_consulta;"
+)
+GATILHOS_VERSAO_CONSULTA_SQLITE = [
+    "CREATE TRIGGER IF NOT EXISTS tg_consulta_versao_inclusao "
+    f"AFTER INSERT ON consulta BEGIN {_SQLITE_NOVA_VERSAO} END",
+    # versao fora da lista de colunas: o próprio UPDATE do gatilho não o dispara de novo
+    "CREATE TRIGGER IF NOT EXISTS tg_consulta_versao_alteracao "
+    "AFTER UPDATE OF data_hora_inicio, data_hora_fim, status, id_paciente_fk, id_medico_fk ON consulta "
+    f"BEGIN {_SQLITE_NOVA_VERSAO} END",
+]
+
+event.listen(
+    Base.metadata, "after_create",
+    DDL("CREATE SEQUENCE IF NOT EXISTS consulta_versao_seq").execute_if(dialect="postgresql")
+)
+event.listen(Base.metadata, "after_create", DDL(FUNCAO_VERSAO_CONSULTA).execute_if(dialect="postgresql"))
+event.listen(Base.metadata, "after_create", DDL(GATILHO_VERSAO_CONSULTA_POSTGRESQL).execute_if(dialect="postgresql"))
+for _gatilho in GATILHOS_VERSAO_CONSULTA_SQLITE:
+    event.listen(Base.metadata, "after_create", DDL(_gatilho).execute_if(dialect="sqlite"))
+event.listen(
+    Base.metadata, "before_drop",
+    DDL("DROP FUNCTION IF EXISTS atualizar_versao_consulta() CASCADE").execute_if(dialect="postgresql")
+)
+event.listen(
+    Base.metadata, "before_drop",
+    DDL("DROP SEQUENCE IF EXISTS consulta_versao_seq").execute_if(dialect="postgresql")
+)
@@ -4,28 +4,31 @@ Implementa todos os casos de uso do módulo Administrativo conforme CasosDeUso.t
 Atualizado para modelo conforme MER
 REFATORADO PARA JWT AUTHENTICATION
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, desc, case
+from sqlalchemy import func, and_, select
 from sqlalchemy.exc import IntegrityError
-from typing import List
+from typing import List, Optional
 from datetime import date, datetime, timedelta
 from app.database import get_db
 from app.utils.auth import get_current_user, get_password_hash
+from app.utils.periodo import filtro_periodo
+from app.utils.paginacao import Pagina, fechar_pagina, filtro_cursor, paginar
 from app.models.models import (
     Administrador, Medico, Paciente, Consulta, PlanoSaude, Especialidade,
-    Relatorio, Observacao
+    Relatorio, Observacao, SlotAgenda
 )
 from app.schemas.schemas import (
     AdministradorCreate, AdministradorResponse,
     MedicoCreate, MedicoUpdate, MedicoResponse,
-    PacienteResponse,
+    PacienteResponse, PacienteAdminResponse,
     PlanoSaudeCreate, PlanoSaudeUpdate, PlanoSaudeResponse,
     EspecialidadeCreate, EspecialidadeResponse,
     EstatisticasDashboard,
     ConsultaResponse,
-    RelatorioResponse,
+    RelatorioCreate, RelatorioResponse,
     RelatorioConsultasPorMedico,
     RelatorioConsultasPorEspecialidade,
     RelatorioCancelamentos,
@@ -33,6 +36,14 @@ from app.schemas.schemas import (
     ObservacaoResponse
 )
 from app.services.regras_negocio import RegraPaciente
+from app.services.cache_disponibilidade import invalidar_disponibilidade
+from app.services.slot_agenda import RegraSlotAgenda
+from app.services.credenciais import RegraCredencial
+from app.services.estatisticas import RegraEstatisticas
+from app.services.exportacao import RegraExportacao, TIPOS_DE_CONTEUDO
+from app.services.relatorios import RELATORIOS, RegraRelatorios, RelatorioEmCache
+from app.services.fila_relatorios import FilaRelatoriosCheia, ler_arquivo, obter_fila_relatorios
+from app.utils.relatorios import RENDERIZADORES
 
 router = APIRouter(prefix="/admin", tags=["Administração"])
 
@@ -55,72 +66,55 @@ def get_dashboard(
 ):
     """
     Retorna estatísticas gerais para o dashboard administrativo
+    Uma única instrução agregada, em cache por DASHBOARD_CACHE_SEGUNDOS
     """
     verificar_admin(current_user)
     
-    hoje = date.today()
-    inicio_semana = hoje - timedelta(days=hoje.weekday())
-    inicio_mes = date(hoje.year, hoje.month, 1)
-    
-    # Estatísticas gerais
-    total_pacientes = db.query(Paciente).count()
-    total_medicos = db.query(Medico).count()
-    total_consultas = db.query(Consulta).count()
-    
-    # Consultas por período
-    consultas_hoje = db.query(Consulta).filter(
-        func.date(Consulta.data_hora_inicio) == hoje
-    ).count()
-    
-    consultas_semana = db.query(Consulta).filter(
-        func.date(Consulta.data_hora_inicio) >= inicio_semana,
-        func.date(Consulta.data_hora_inicio) <= hoje
-    ).count()
-    
-    consultas_mes = db.query(Consulta).filter(
-        func.extract('year', Consulta.data_hora_inicio) == hoje.year,
-        func.extract('month', Consulta.data_hora_inicio) == hoje.month
-    ).count()
-    
-    # Consultas por status
-    consultas_agendadas = db.query(Consulta).filter(
-        Consulta.status == "agendada"
-    ).count()
-    
-    consultas_realizadas = db.query(Consulta).filter(
-        Consulta.status == "realizada"
-    ).count()
-    
-    return {
-        "total_pacientes": total_pacientes,
-        "total_medicos": total_medicos,
-        "total_consultas": total_consultas,
-        "consultas_hoje": consultas_hoje,
-        "consultas_semana": consultas_semana,
-        "consultas_mes": consultas_mes,
-        "consultas_agendadas": consultas_agendadas,
-        "consultas_realizadas": consultas_realizadas
-    }
+    return RegraEstatisticas.obter_dashboard(db)
 
 
 # ============ Gerenciamento de Médicos ============
 
 @router.get("/medicos", response_model=List[MedicoResponse])
 def listar_medicos(
+    id_especialidade: Optional[int] = None,
+    pagina: Pagina = Depends(),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Caso de Uso: Gerenciar Cadastro de Médicos (listar)
-    Lista todos os médicos cadastrados
+    Lista os médicos cadastrados, por nome, em páginas (cursor em X-Proximo-Cursor)
     """
     verificar_admin(current_user)
     
-    medicos = db.query(Medico).options(
+    query = db.query(Medico).options(
         joinedload(Medico.especialidade)
-    ).all()
+    )
+    if id_especialidade is not None:
+        query = query.filter(Medico.id_especialidade_fk == id_especialidade)
+    
+    return paginar(query, [Medico.nome, Medico.id_medico], pagina)
+
+
+@router.get("/medicos/estatisticas")
+def listar_estatisticas_medicos(
+    id_medico: Optional[List[int]] = Query(None),
+    id_especialidade: Optional[int] = None,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Consultas de hoje e da semana e horários bloqueados de cada médico
+    (os mesmos números de /medicos/estatisticas/{medico_id}), em uma consulta
+    
+    Filtros: id_medico (repetível) e id_especialidade; sem filtros, todos.
+    """
+    verificar_admin(current_user)
     
-    return medicos
+    return RegraEstatisticas.estatisticas_medicos(
+        db, date.today(), medico_ids=id_medico, id_especialidade=id_especialidade
+    )
 
 
 @router.get("/medicos/{medico_id}", response_model=MedicoResponse)
@@ -159,9 +153,8 @@ def criar_medico(
     """
     verificar_admin(current_user)
     
-    # Verificar se email já existe
-    email_existe = db.query(Medico).filter(Medico.email == medico_data.email).first()
-    if email_existe:
+    # E-mail único entre pacientes, médicos e administradores (login unificado)
+    if RegraCredencial.email_em_uso(db, medico_data.email):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Email já cadastrado no sistema"
@@ -262,14 +255,10 @@ def atualizar_medico(
     
     # Atualizar Email (verificar se já existe)
     if medico_data.email is not None:
-        email_existe = db.query(Medico).filter(
-            Medico.email == medico_data.email,
-            Medico.id_medico != medico_id
-        ).first()
-        if email_existe:
+        if RegraCredencial.email_em_uso(db, medico_data.email, "medico", medico_id):
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail="Email já cadastrado para outro médico"
+                detail="Email já cadastrado para outro usuário"
             )
         medico.email = medico_data.email
     
@@ -347,71 +336,142 @@ def excluir_medico(
             detail="Não é possível excluir médico com consultas cadastradas"
         )
     
+    db.query(SlotAgenda).filter(SlotAgenda.id_medico_fk == medico_id).delete(synchronize_session=False)
     db.delete(medico)
     db.commit()
     
+    invalidar_disponibilidade(medico_id)
+    
     return {
         "sucesso": True,
         "mensagem": "Médico excluído com sucesso"
     }
 
 
+@router.post("/agenda/materializar")
+def materializar_agenda(
+    medico_id: int = None,
+    semanas: int = Query(None, ge=1, le=52),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Gera os slots da agenda (tabela slot_agenda) a partir dos horários de trabalho
+    Usado pelo modo AGENDAMENTO_POR_SLOTS; deve ser executado periodicamente
+    para estender o horizonte de semanas materializadas
+    """
+    verificar_admin(current_user)
+    
+    if medico_id is not None:
+        medico = db.query(Medico).filter(Medico.id_medico == medico_id).first()
+        if not medico:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Médico não encontrado"
+            )
+    
+    hoje = date.today()
+    data_fim = hoje + timedelta(weeks=semanas, days=-1) if semanas else None
+    slots_criados = RegraSlotAgenda.materializar(
+        db, [medico_id] if medico_id is not None else None, hoje, data_fim
+    )
+    db.commit()
+    
+    return {
+        "sucesso": True,
+        "slots_criados": slots_criados,
+        "agendamento_por_slots": RegraSlotAgenda.ativo()
+    }
+
+
 # ============ Gerenciamento de Pacientes ============
 
-@router.get("/pacientes", response_model=List[dict])
+@router.get("/pacientes", response_model=List[PacienteAdminResponse])
 def listar_pacientes(
+    bloqueado: Optional[bool] = None,
+    id_plano_saude: Optional[int] = None,
+    nome: Optional[str] = Query(None, min_length=1, max_length=100),
+    pagina: Pagina = Depends(),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Lista todos os pacientes cadastrados com estatísticas de consultas
+    Lista os pacientes cadastrados com estatísticas de consultas
+    
+    Filtros: bloqueado, id_plano_saude e início do nome (sem diferenciar
+    maiúsculas). Ordenado por nome, em páginas (cursor em X-Proximo-Cursor);
+    na primeira página, o total filtrado vem no cabeçalho X-Total-Count.
+    
+    Uma instrução por página, qualquer que seja o número de pacientes: a
+    página com as contagens (agregadas só para os pacientes da página),
+    mais o total na primeira.
     """
     verificar_admin(current_user)
     
-    pacientes = db.query(Paciente).options(
+    filtros = []
+    if bloqueado is not None:
+        filtros.append(Paciente.esta_bloqueado == bloqueado)
+    if id_plano_saude is not None:
+        filtros.append(Paciente.id_plano_saude_fk == id_plano_saude)
+    if nome:
+        prefixo = nome.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        filtros.append(func.lower(Paciente.nome).like(f"{prefixo}%", escape="\\"))
+    
+    ordem = [Paciente.nome, Paciente.id_paciente]
+    pagina_atual = (
+        select(Paciente.id_paciente)
+        .where(*filtros, *filtro_cursor(ordem, pagina))
+        .order_by(*ordem)
+        .limit(pagina.limite + 1)
+        .cte("pagina_atual")
+    )
+    contagens = (
+        select(
+            Consulta.id_paciente_fk,
+            func.count().filter(Consulta.status == 'realizada').label("total_consultas"),
+            func.count().filter(Consulta.status == 'agendada').label("consultas_agendadas")
+        )
+        .where(Consulta.id_paciente_fk.in_(select(pagina_atual.c.id_paciente)))
+        .group_by(Consulta.id_paciente_fk)
+        .subquery()
+    )
+    linhas = db.query(
+        Paciente,
+        func.coalesce(contagens.c.total_consultas, 0),
+        func.coalesce(contagens.c.consultas_agendadas, 0)
+    ).join(
+        pagina_atual, pagina_atual.c.id_paciente == Paciente.id_paciente
+    ).outerjoin(
+        contagens, contagens.c.id_paciente_fk == Paciente.id_paciente
+    ).options(
         joinedload(Paciente.plano_saude)
-    ).all()
-    
-    # Adicionar estatísticas de consultas para cada paciente
-    resultado = []
-    for paciente in pacientes:
-        # Contar total de consultas realizadas
-        total_consultas = db.query(Consulta).filter(
-            Consulta.id_paciente_fk == paciente.id_paciente,
-            Consulta.status == 'realizada'
-        ).count()
-        
-        # Contar consultas agendadas (futuras)
-        consultas_agendadas = db.query(Consulta).filter(
-            Consulta.id_paciente_fk == paciente.id_paciente,
-            Consulta.status == 'agendada'
-        ).count()
-        
-        # Serializar plano_saude se existir
-        plano_saude_dict = None
-        if paciente.plano_saude:
-            plano_saude_dict = {
-                'id_plano_saude': paciente.plano_saude.id_plano_saude,
-                'nome': paciente.plano_saude.nome,
-                'cobertura_info': paciente.plano_saude.cobertura_info
-            }
-        
-        paciente_dict = {
+    ).order_by(*ordem).all()
+    linhas = fechar_pagina(
+        linhas, ordem, pagina, chave=lambda linha: (linha[0].nome, linha[0].id_paciente)
+    )
+    
+    if pagina.cursor is None:
+        pagina.response.headers["X-Total-Count"] = str(
+            db.query(func.count(Paciente.id_paciente)).filter(*filtros).scalar()
+        )
+    
+    return [
+        {
             'id_paciente': paciente.id_paciente,
             'nome': paciente.nome,
             'cpf': paciente.cpf,
             'email': paciente.email,
             'telefone': paciente.telefone,
-            'data_nascimento': paciente.data_nascimento.isoformat(),
+            'data_nascimento': paciente.data_nascimento,
             'esta_bloqueado': paciente.esta_bloqueado,
             'id_plano_saude_fk': paciente.id_plano_saude_fk,
-            'plano_saude': plano_saude_dict,
+            'plano_saude': paciente.plano_saude,
+            # Consultas realizadas e agendadas
             'total_consultas': total_consultas,
             'consultas_agendadas': consultas_agendadas
         }
-        resultado.append(paciente_dict)
-    
-    return resultado
+        for paciente, total_consultas, consultas_agendadas in linhas
+    ]
 
 
 @router.get("/pacientes/{paciente_id}", response_model=PacienteResponse)
@@ -484,6 +544,7 @@ def desbloquear_paciente(
     
     paciente.esta_bloqueado = False
     paciente.faltas_consecutivas = 0
+    paciente.faltas_zeradas_em = datetime.now()
     db.commit()
     db.refresh(paciente)
     
@@ -494,20 +555,102 @@ def desbloquear_paciente(
 
 @router.get("/consultas", response_model=List[ConsultaResponse])
 def listar_consultas(
+    status_consulta: Optional[str] = Query(None, alias="status"),
+    id_medico: Optional[int] = None,
+    id_paciente: Optional[int] = None,
+    data_inicio: date = None,
+    data_fim: date = None,
+    descendente: bool = Query(False, description="Mais recentes primeiro"),
+    pagina: Pagina = Depends(),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Lista todas as consultas do sistema
+    Lista as consultas do sistema por data/hora, em páginas (cursor em X-Proximo-Cursor)
+    
+    Filtros: status, médico, paciente e período (data_inicio a data_fim).
+    Com descendente=true, das mais recentes para as mais antigas (o cursor
+    vale só para o mesmo sentido).
     """
     verificar_admin(current_user)
     
-    consultas = db.query(Consulta).options(
+    query = db.query(Consulta).options(
         joinedload(Consulta.paciente),
         joinedload(Consulta.medico).joinedload(Medico.especialidade)
-    ).all()
+    ).filter(*filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim))
+    if status_consulta is not None:
+        query = query.filter(Consulta.status == status_consulta)
+    if id_medico is not None:
+        query = query.filter(Consulta.id_medico_fk == id_medico)
+    if id_paciente is not None:
+        query = query.filter(Consulta.id_paciente_fk == id_paciente)
+    
+    return paginar(query, [Consulta.data_hora_inicio, Consulta.id_consulta], pagina, descendente=descendente)
+
+
+# ============ Exportações (NDJSON/CSV em fluxo) ============
+
+FORMATO_EXPORTACAO = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson ou csv")
+
+
+def responder_exportacao(db: Session, instrucao, formato: str, nome: str) -> StreamingResponse:
+    """Resposta enviada em pedaços à medida que as linhas chegam do banco"""
+    return StreamingResponse(
+        RegraExportacao.gerar(db, instrucao, formato),
+        media_type=TIPOS_DE_CONTEUDO[formato],
+        headers={"Content-Disposition": f"attachment; filename={nome}.{formato}"}
+    )
+
+
+@router.get("/exportar/consultas")
+def exportar_consultas(
+    formato: str = FORMATO_EXPORTACAO,
+    data_inicio: date = None,
+    data_fim: date = None,
+    status_consulta: Optional[str] = Query(None, alias="status"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Exporta as consultas (com nomes de paciente, médico e especialidade),
+    opcionalmente filtradas por período e status, sem limite de linhas
+    """
+    verificar_admin(current_user)
+    
+    return responder_exportacao(
+        db, RegraExportacao.consultas(data_inicio, data_fim, status_consulta), formato, "consultas"
+    )
+
+
+@router.get("/exportar/pacientes")
+def exportar_pacientes(
+    formato: str = FORMATO_EXPORTACAO,
+    bloqueado: Optional[bool] = None,
+    id_plano_saude: Optional[int] = None,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Exporta os pacientes (sem senha), com o nome do plano de saúde
+    """
+    verificar_admin(current_user)
+    
+    return responder_exportacao(db, RegraExportacao.pacientes(bloqueado, id_plano_saude), formato, "pacientes")
+
+
+@router.get("/exportar/medicos")
+def exportar_medicos(
+    formato: str = FORMATO_EXPORTACAO,
+    id_especialidade: Optional[int] = None,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Exporta os médicos (sem senha), com o nome da especialidade
+    """
+    verificar_admin(current_user)
     
-    return consultas
+    return responder_exportacao(db, RegraExportacao.medicos(id_especialidade), formato, "medicos")
 
 
 # ============ Gerenciamento de Planos de Saúde ============
@@ -529,50 +672,21 @@ def listar_planos_saude(
 
 @router.get("/planos-saude/estatisticas")
 def listar_planos_saude_com_estatisticas(
+    data_inicio: date = None,
+    data_fim: date = None,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Caso de Uso: Gerenciar Planos de Saúde (listar com estatísticas)
     Lista todos os planos de saúde com estatísticas de pacientes e consultas
+    
+    consultas_mes conta as consultas de data_inicio a data_fim; sem
+    nenhuma das datas, as do mês atual.
     """
     verificar_admin(current_user)
     
-    planos = db.query(PlanoSaude).all()
-    
-    resultado = []
-    total_pacientes = db.query(Paciente).count()
-    
-    for plano in planos:
-        # Contar pacientes cadastrados neste plano
-        qtd_pacientes = db.query(Paciente).filter(
-            Paciente.id_plano_saude_fk == plano.id_plano_saude
-        ).count()
-        
-        # Contar consultas do mês atual para pacientes deste plano
-        from datetime import datetime
-        primeiro_dia_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        consultas_mes = db.query(Consulta).join(
-            Paciente, Paciente.id_paciente == Consulta.id_paciente_fk
-        ).filter(
-            Paciente.id_plano_saude_fk == plano.id_plano_saude,
-            Consulta.data_hora_inicio >= primeiro_dia_mes
-        ).count()
-        
-        # Calcular percentual de pacientes
-        percentual = (qtd_pacientes / total_pacientes * 100) if total_pacientes > 0 else 0
-        
-        resultado.append({
-            "id_plano_saude": plano.id_plano_saude,
-            "nome": plano.nome,
-            "cobertura_info": plano.cobertura_info,
-            "qtd_pacientes": qtd_pacientes,
-            "percentual_pacientes": round(percentual, 1),
-            "consultas_mes": consultas_mes
-        })
-    
-    return resultado
+    return RegraEstatisticas.estatisticas_planos(db, data_inicio, data_fim)
 
 
 @router.post("/planos-saude", response_model=PlanoSaudeResponse, status_code=status.HTTP_201_CREATED)
@@ -758,12 +872,98 @@ def visualizar_observacao(
 
 # ============ Relatórios ============
 
+FORMATO_RELATORIO = Query(
+    "json", pattern="^(json|pdf|csv|xlsx)$",
+    description="json (padrão), csv ou xlsx; pdf é gerado em segundo plano (202 com a tarefa)"
+)
+
+
+def _etag_confere(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match (lista, W/ ou *) já contém o ETag atual"""
+    if not if_none_match:
+        return False
+    valores = [valor.strip() for valor in if_none_match.split(",")]
+    return "*" in valores or any(valor.removeprefix("W/") == etag for valor in valores)
+
+
+def enfileirar_relatorio(db: Session, id_admin: int, tipo: str, formato: str, parametros: str) -> Relatorio:
+    """
+    Grava o Relatorio pendente e o entrega à fila de geração
+
+    Raises:
+        HTTPException 503: fila cheia (a tarefa fica registrada com erro)
+    """
+    relatorio = Relatorio(
+        tipo=tipo, formato=formato, parametros=parametros, status="pendente", id_admin_fk=id_admin
+    )
+    db.add(relatorio)
+    db.commit()
+    
+    try:
+        obter_fila_relatorios().enviar(relatorio.id_relatorio)
+    except FilaRelatoriosCheia:
+        relatorio.status = "erro"
+        relatorio.mensagem_erro = "Fila de relatórios cheia"
+        relatorio.data_conclusao = datetime.utcnow()
+        db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+            headers={"Retry-After": "5"},
+        )
+    
+    db.refresh(relatorio)
+    return relatorio
+
+
+def responder_relatorio(
+    db: Session, nome: str, formato: str, if_none_match: Optional[str], current_user: dict, **filtros
+) -> Response:
+    """
+    Relatório renderizado no formato pedido; CSV/XLSX são baixados
+
+    O ETag identifica os filtros e a marca de dados: o navegador revalida
+    (no-cache) e recebe 304 sem corpo enquanto as consultas do período não
+    mudarem; um ETag novo é servido do cache de arquivos quando possível.
+    
+    O PDF (reportlab, Python puro) não é montado na thread da requisição:
+    vira uma tarefa em segundo plano, com resposta 202, a tarefa no corpo e
+    o endereço dela em Location (arquivo em Location + /arquivo).
+    """
+    if formato == "pdf":
+        relatorio = enfileirar_relatorio(
+            db, current_user["id"], nome, formato,
+            RegraRelatorios.filtros_para_json(nome, filtros)
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=jsonable_encoder(RelatorioResponse.model_validate(relatorio)),
+            headers={"Location": f"{router.prefix}/relatorios/tarefas/{relatorio.id_relatorio}"}
+        )
+    
+    renderizador = RENDERIZADORES[formato]
+    relatorio = RelatorioEmCache(db, nome, **filtros)
+    etag = relatorio.etag(formato)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_confere(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if renderizador.disposicao:
+        arquivo = f"{RELATORIOS[nome].arquivo}.{renderizador.extensao}"
+        headers["Content-Disposition"] = f"{renderizador.disposicao}; filename={arquivo}"
+    return Response(
+        content=relatorio.arquivo(formato),
+        media_type=renderizador.tipo_conteudo,
+        headers=headers
+    )
+
+
 @router.get("/relatorios/consultas-por-medico")
 def relatorio_consultas_por_medico(
     medico_id: int = None,
     data_inicio: date = None,
     data_fim: date = None,
-    formato: str = None,
+    formato: str = FORMATO_RELATORIO,
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -772,110 +972,10 @@ def relatorio_consultas_por_medico(
     Relatório: Quantidade de consultas por médico
     """
     verificar_admin(current_user)
-    
-    query = db.query(
-        Medico.nome.label("medico_nome"),
-        Especialidade.nome.label("especialidade"),
-        func.count(Consulta.id_consulta).label("total_consultas"),
-        func.sum(case((Consulta.status == "realizada", 1), else_=0)).label("consultas_realizadas"),
-        func.sum(case((Consulta.status == "cancelada", 1), else_=0)).label("consultas_canceladas")
-    ).join(
-        Consulta, Consulta.id_medico_fk == Medico.id_medico
-    ).join(
-        Especialidade, Especialidade.id_especialidade == Medico.id_especialidade_fk
+    return responder_relatorio(
+        db, "consultas-por-medico", formato, if_none_match, current_user,
+        medico_id=medico_id, data_inicio=data_inicio, data_fim=data_fim
     )
-    
-    # Filtro por médico específico
-    if medico_id:
-        query = query.filter(Medico.id_medico == medico_id)
-    
-    if data_inicio:
-        query = query.filter(func.date(Consulta.data_hora_inicio) >= data_inicio)
-    if data_fim:
-        query = query.filter(func.date(Consulta.data_hora_inicio) <= data_fim)
-    
-    resultados = query.group_by(
-        Medico.id_medico, Medico.nome, Especialidade.nome
-    ).all()
-    
-    dados = [
-        {
-            "medico_nome": r.medico_nome,
-            "especialidade": r.especialidade,
-            "total_consultas": r.total_consultas,
-            "consultas_realizadas": r.consultas_realizadas or 0,
-            "consultas_canceladas": r.consultas_canceladas or 0
-        }
-        for r in resultados
-    ]
-    
-    # Se solicitado PDF, gera e retorna
-    if formato == "pdf":
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib import colors
-        from reportlab.lib.units import cm
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
-        from io import BytesIO
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Título
-        titulo = Paragraph("<b>Relatório de Consultas por Médico</b>", styles['Title'])
-        elements.append(titulo)
-        elements.append(Spacer(1, 0.5*cm))
-        
-        # Período
-        periodo_texto = "Período: "
-        if data_inicio and data_fim:
-            periodo_texto += f"{data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
-        elif data_inicio:
-            periodo_texto += f"A partir de {data_inicio.strftime('%d/%m/%Y')}"
-        elif data_fim:
-            periodo_texto += f"Até {data_fim.strftime('%d/%m/%Y')}"
-        else:
-            periodo_texto += "Todos os registros"
-        
-        elements.append(Paragraph(periodo_texto, styles['Normal']))
-        elements.append(Spacer(1, 0.5*cm))
-        
-        # Tabela
-        table_data = [['Médico', 'Especialidade', 'Total', 'Realizadas', 'Canceladas']]
-        for d in dados:
-            table_data.append([
-                d['medico_nome'],
-                d['especialidade'],
-                str(d['total_consultas']),
-                str(d['consultas_realizadas']),
-                str(d['consultas_canceladas'])
-            ])
-        
-        table = Table(table_data, colWidths=[6*cm, 4*cm, 2*cm, 2*cm, 2*cm])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(table)
-        doc.build(elements)
-        
-        buffer.seek(0)
-        return StreamingResponse(
-            buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": "inline; filename=relatorio_consultas_medico.pdf"}
-        )
-    
-    return dados
 
 
 @router.get("/relatorios/consultas-por-especialidade")
@@ -883,7 +983,8 @@ def relatorio_consultas_por_especialidade(
     especialidade_id: int = None,
     data_inicio: date = None,
     data_fim: date = None,
-    formato: str = None,
+    formato: str = FORMATO_RELATORIO,
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -892,109 +993,18 @@ def relatorio_consultas_por_especialidade(
     Relatório: Quantidade de consultas por especialidade
     """
     verificar_admin(current_user)
-    
-    query = db.query(
-        Especialidade.nome.label("especialidade"),
-        func.count(Consulta.id_consulta).label("total_consultas"),
-        func.count(func.distinct(Medico.id_medico)).label("total_medicos")
-    ).join(
-        Medico, Medico.id_especialidade_fk == Especialidade.id_especialidade
-    ).join(
-        Consulta, Consulta.id_medico_fk == Medico.id_medico
+    return responder_relatorio(
+        db, "consultas-por-especialidade", formato, if_none_match, current_user,
+        especialidade_id=especialidade_id, data_inicio=data_inicio, data_fim=data_fim
     )
-    
-    # Filtro por especialidade específica
-    if especialidade_id:
-        query = query.filter(Especialidade.id_especialidade == especialidade_id)
-    
-    if data_inicio:
-        query = query.filter(func.date(Consulta.data_hora_inicio) >= data_inicio)
-    if data_fim:
-        query = query.filter(func.date(Consulta.data_hora_inicio) <= data_fim)
-    
-    resultados = query.group_by(Especialidade.id_especialidade, Especialidade.nome).all()
-    
-    dados = [
-        {
-            "especialidade": r.especialidade,
-            "total_consultas": r.total_consultas,
-            "total_medicos": r.total_medicos
-        }
-        for r in resultados
-    ]
-    
-    # Se solicitado PDF, gera e retorna
-    if formato == "pdf":
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib import colors
-        from reportlab.lib.units import cm
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
-        from io import BytesIO
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Título
-        titulo = Paragraph("<b>Relatório de Consultas por Especialidade</b>", styles['Title'])
-        elements.append(titulo)
-        elements.append(Spacer(1, 0.5*cm))
-        
-        # Período
-        periodo_texto = "Período: "
-        if data_inicio and data_fim:
-            periodo_texto += f"{data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
-        elif data_inicio:
-            periodo_texto += f"A partir de {data_inicio.strftime('%d/%m/%Y')}"
-        elif data_fim:
-            periodo_texto += f"Até {data_fim.strftime('%d/%m/%Y')}"
-        else:
-            periodo_texto += "Todos os registros"
-        
-        elements.append(Paragraph(periodo_texto, styles['Normal']))
-        elements.append(Spacer(1, 0.5*cm))
-        
-        # Tabela
-        table_data = [['Especialidade', 'Total de Consultas', 'Médicos Atuantes']]
-        for d in dados:
-            table_data.append([
-                d['especialidade'],
-                str(d['total_consultas']),
-                str(d['total_medicos'])
-            ])
-        
-        table = Table(table_data, colWidths=[8*cm, 4*cm, 4*cm])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(table)
-        doc.build(elements)
-        
-        buffer.seek(0)
-        return StreamingResponse(
-            buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": "inline; filename=relatorio_consultas_especialidade.pdf"}
-        )
-    
-    return dados
 
 
 @router.get("/relatorios/cancelamentos")
 def relatorio_cancelamentos(
     data_inicio: date = None,
     data_fim: date = None,
-    formato: str = None,
+    formato: str = FORMATO_RELATORIO,
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -1003,89 +1013,9 @@ def relatorio_cancelamentos(
     Relatório: Taxa de cancelamentos e remarcações
     """
     verificar_admin(current_user)
-    
-    query = db.query(Consulta)
-    
-    if data_inicio:
-        query = query.filter(func.date(Consulta.data_hora_inicio) >= data_inicio)
-    if data_fim:
-        query = query.filter(func.date(Consulta.data_hora_inicio) <= data_fim)
-    
-    total_consultas = query.count()
-    total_cancelamentos = query.filter(Consulta.status == "cancelada").count()
-    
-    taxa_cancelamento = (total_cancelamentos / total_consultas * 100) if total_consultas > 0 else 0
-    
-    dados = {
-        "total_consultas": total_consultas,
-        "total_cancelamentos": total_cancelamentos,
-        "taxa_cancelamento": round(taxa_cancelamento, 2)
-    }
-    
-    # Se solicitado PDF, gera e retorna
-    if formato == "pdf":
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib import colors
-        from reportlab.lib.units import cm
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
-        from io import BytesIO
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Título
-        titulo = Paragraph("<b>Relatório de Taxa de Cancelamentos</b>", styles['Title'])
-        elements.append(titulo)
-        elements.append(Spacer(1, 0.5*cm))
-        
-        # Período
-        periodo_texto = "Período: "
-        if data_inicio and data_fim:
-            periodo_texto += f"{data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
-        elif data_inicio:
-            periodo_texto += f"A partir de {data_inicio.strftime('%d/%m/%Y')}"
-        elif data_fim:
-            periodo_texto += f"Até {data_fim.strftime('%d/%m/%Y')}"
-        else:
-            periodo_texto += "Todos os registros"
-        
-        elements.append(Paragraph(periodo_texto, styles['Normal']))
-        elements.append(Spacer(1, 0.5*cm))
-        
-        # Tabela
-        table_data = [
-            ['Métrica', 'Valor'],
-            ['Total de Consultas', str(dados['total_consultas'])],
-            ['Total de Cancelamentos', str(dados['total_cancelamentos'])],
-            ['Taxa de Cancelamento', f"{dados['taxa_cancelamento']}%"]
-        ]
-        
-        table = Table(table_data, colWidths=[8*cm, 4*cm])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(table)
-        doc.build(elements)
-        
-        buffer.seek(0)
-        return StreamingResponse(
-            buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": "inline; filename=relatorio_cancelamentos.pdf"}
-        )
-    
-    return dados
+    return responder_relatorio(
+        db, "cancelamentos", formato, if_none_match, current_user, data_inicio=data_inicio, data_fim=data_fim
+    )
 
 
 @router.get("/relatorios/pacientes-frequentes")
@@ -1093,7 +1023,8 @@ def relatorio_pacientes_frequentes(
     data_inicio: date = None,
     data_fim: date = None,
     limite: int = 10,
-    formato: str = None,
+    formato: str = FORMATO_RELATORIO,
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -1102,104 +1033,141 @@ def relatorio_pacientes_frequentes(
     Relatório: Pacientes que mais consultaram no período
     """
     verificar_admin(current_user)
-    
-    query = db.query(
-        Paciente.nome.label("paciente_nome"),
-        Paciente.cpf,
-        func.count(Consulta.id_consulta).label("total_consultas"),
-        func.max(Consulta.data_hora_inicio).label("ultima_consulta")
-    ).join(
-        Consulta, Consulta.id_paciente_fk == Paciente.id_paciente
+    return responder_relatorio(
+        db, "pacientes-frequentes", formato, if_none_match, current_user,
+        data_inicio=data_inicio, data_fim=data_fim, limite=limite
     )
+
+
+# ============ Relatórios em segundo plano ============
+
+def _obter_tarefa(db: Session, relatorio_id: int) -> Relatorio:
+    relatorio = db.query(Relatorio).filter(Relatorio.id_relatorio == relatorio_id).first()
+    if not relatorio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Relatório não encontrado"
+        )
+    if relatorio.status != "concluido":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A geração do relatório falhou" if relatorio.status == "erro"
+            else "Relatório ainda em geração"
+        )
+    return relatorio
+
+
+def _responder_arquivo(relatorio: Relatorio, tipo_conteudo: str, headers: Optional[dict] = None) -> StreamingResponse:
+    """Arquivo da tarefa lido do disco em pedaços; 410 se não existir mais"""
+    try:
+        tamanho, pedacos = ler_arquivo(relatorio.caminho_arquivo)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Arquivo do relatório não está mais disponível"
+        )
+    return StreamingResponse(
+        pedacos, media_type=tipo_conteudo, headers={**(headers or {}), "Content-Length": str(tamanho)}
+    )
+
+
+@router.post("/relatorios/tarefas", response_model=RelatorioResponse, status_code=status.HTTP_202_ACCEPTED)
+def solicitar_relatorio(
+    pedido: RelatorioCreate,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Caso de Uso: Gerar Relatórios em PDF (em segundo plano)
+    Registra o pedido e responde na hora; acompanhe em GET /relatorios/tarefas/{id}
+    e baixe o arquivo em /relatorios/tarefas/{id}/arquivo quando estiver concluido
+    """
+    verificar_admin(current_user)
     
-    if data_inicio:
-        query = query.filter(func.date(Consulta.data_hora_inicio) >= data_inicio)
-    if data_fim:
-        query = query.filter(func.date(Consulta.data_hora_inicio) <= data_fim)
-    
-    resultados = query.group_by(
-        Paciente.id_paciente, Paciente.nome, Paciente.cpf
-    ).order_by(
-        desc(func.count(Consulta.id_consulta))
-    ).limit(limite).all()
+    return enfileirar_relatorio(
+        db, current_user["id"], pedido.tipo, pedido.formato,
+        RegraRelatorios.filtros_para_json(pedido.tipo, pedido.model_dump())
+    )
+
+
+@router.get("/relatorios/tarefas", response_model=List[RelatorioResponse])
+def listar_relatorios(
+    pagina: Pagina = Depends(),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Relatórios pedidos pelo administrador, mais recentes primeiro (cursor em X-Proximo-Cursor)"""
+    verificar_admin(current_user)
     
-    dados = [
-        {
-            "paciente_nome": r.paciente_nome,
-            "cpf": r.cpf,
-            "total_consultas": r.total_consultas,
-            "ultima_consulta": r.ultima_consulta.strftime('%d/%m/%Y') if r.ultima_consulta else 'N/A'
-        }
-        for r in resultados
-    ]
+    query = db.query(Relatorio).filter(Relatorio.id_admin_fk == current_user["id"])
+    return paginar(query, [Relatorio.data_geracao, Relatorio.id_relatorio], pagina, descendente=True)
+
+
+@router.get("/relatorios/tarefas/{relatorio_id}", response_model=RelatorioResponse)
+def consultar_relatorio(
+    relatorio_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Status da geração (pendente, processando, concluido ou erro)"""
+    verificar_admin(current_user)
     
-    # Se solicitado PDF, gera e retorna
-    if formato == "pdf":
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib import colors
-        from reportlab.lib.units import cm
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
-        from io import BytesIO
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Título
-        titulo = Paragraph(f"<b>Relatório de Pacientes Mais Frequentes (Top {limite})</b>", styles['Title'])
-        elements.append(titulo)
-        elements.append(Spacer(1, 0.5*cm))
-        
-        # Período
-        periodo_texto = "Período: "
-        if data_inicio and data_fim:
-            periodo_texto += f"{data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
-        elif data_inicio:
-            periodo_texto += f"A partir de {data_inicio.strftime('%d/%m/%Y')}"
-        elif data_fim:
-            periodo_texto += f"Até {data_fim.strftime('%d/%m/%Y')}"
-        else:
-            periodo_texto += "Todos os registros"
-        
-        elements.append(Paragraph(periodo_texto, styles['Normal']))
-        elements.append(Spacer(1, 0.5*cm))
-        
-        # Tabela
-        table_data = [['Posição', 'Paciente', 'CPF', 'Total de Consultas', 'Última Consulta']]
-        for idx, d in enumerate(dados, 1):
-            table_data.append([
-                str(idx),
-                d['paciente_nome'],
-                d['cpf'],
-                str(d['total_consultas']),
-                d['ultima_consulta']
-            ])
-        
-        table = Table(table_data, colWidths=[1.5*cm, 5*cm, 3*cm, 3*cm, 3*cm])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(table)
-        doc.build(elements)
-        
-        buffer.seek(0)
-        return StreamingResponse(
-            buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": "inline; filename=relatorio_pacientes_frequentes.pdf"}
+    relatorio = db.query(Relatorio).filter(Relatorio.id_relatorio == relatorio_id).first()
+    if not relatorio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Relatório não encontrado"
         )
+    return relatorio
+
+
+@router.get("/relatorios/tarefas/{relatorio_id}/arquivo")
+def baixar_relatorio(
+    relatorio_id: int,
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Arquivo gerado, no formato pedido; 409 enquanto não estiver concluido
+
+    O arquivo de uma tarefa concluída não muda: com If-None-Match igual ao
+    ETag a resposta é 304, sem abrir o arquivo. O corpo é lido do disco em
+    pedaços; 410 se o arquivo não existir mais.
+    """
+    verificar_admin(current_user)
     
-    return dados
+    relatorio = _obter_tarefa(db, relatorio_id)
+    etag = f'"relatorio-{relatorio.id_relatorio}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_confere(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    renderizador = RENDERIZADORES[relatorio.formato]
+    arquivo = f"{RELATORIOS[relatorio.tipo].arquivo}_{relatorio.id_relatorio}.{renderizador.extensao}"
+    headers["Content-Disposition"] = f"{renderizador.disposicao or 'attachment'}; filename={arquivo}"
+    return _responder_arquivo(relatorio, renderizador.tipo_conteudo, headers)
+
+
+@router.get("/relatorios/tarefas/{relatorio_id}/dados")
+def dados_relatorio(
+    relatorio_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Resultado em JSON, qualquer que seja o formato do arquivo
+
+    A tarefa grava só o formato pedido: em JSON é o próprio arquivo; nos
+    demais formatos o JSON é montado agora, com os filtros da tarefa (dados
+    atuais, pelo cache de relatórios).
+    """
+    verificar_admin(current_user)
+    
+    relatorio = _obter_tarefa(db, relatorio_id)
+    if relatorio.formato == "json":
+        return _responder_arquivo(relatorio, "application/json")
+    gerado = RelatorioEmCache(db, relatorio.tipo, **RegraRelatorios.filtros_de_json(relatorio.parametros))
+    return Response(content=gerado.arquivo("json"), media_type="application/json")
 
 
 @router.get("/relatorios/estatisticas-gerais")
@@ -1212,11 +1180,12 @@ def get_estatisticas_gerais(
     """
     verificar_admin(current_user)
     
-    # Total de consultas por status
-    total_consultas = db.query(Consulta).count()
-    realizadas = db.query(Consulta).filter(Consulta.status == 'realizada').count()
-    agendadas = db.query(Consulta).filter(Consulta.status == 'agendada').count()
-    canceladas = db.query(Consulta).filter(Consulta.status == 'cancelada').count()
+    # Total de consultas por status (estatisticas_diarias, sem recontar consulta)
+    totais = RegraEstatisticas.totais_por_status(db, "realizada", "agendada", "cancelada")
+    total_consultas = totais["total"]
+    realizadas = totais["realizada"]
+    agendadas = totais["agendada"]
+    canceladas = totais["cancelada"]
     
     # Percentuais
     perc_realizadas = (realizadas / total_consultas * 100) if total_consultas > 0 else 0
@@ -1224,23 +1193,7 @@ def get_estatisticas_gerais(
     perc_canceladas = (canceladas / total_consultas * 100) if total_consultas > 0 else 0
     
     # Especialidades mais procuradas
-    especialidades_query = db.query(
-        Especialidade.nome,
-        func.count(Consulta.id_consulta).label('total')
-    ).join(
-        Medico, Medico.id_especialidade_fk == Especialidade.id_especialidade
-    ).join(
-        Consulta, Consulta.id_medico_fk == Medico.id_medico
-    ).group_by(
-        Especialidade.nome
-    ).order_by(
-        desc('total')
-    ).limit(3).all()
-    
-    especialidades_top = [
-        {"nome": esp.nome, "total": esp.total}
-        for esp in especialidades_query
-    ]
+    especialidades_top = RegraEstatisticas.especialidades_mais_procuradas(db, limite=3)
     
     return {
         "total_consultas": total_consultas,
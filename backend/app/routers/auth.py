@@ -3,14 +3,17 @@ Router de Autenticação - Sistema Clínica Saúde+
 Atualizado para trabalhar com modelo conforme MER
 Suporta login para Paciente, Médico e Administrador
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from app.database import get_db
 from app.models.models import Paciente, Medico, Administrador
 from app.schemas.schemas import Token, LoginRequest, AlterarSenhaRequest
 from app.utils.auth import verify_password, create_access_token, get_password_hash
+from app.utils.senhas import precisa_rehash
+from app.utils.limite_login import verificar_limite_login
 from app.config import settings
+from app.services.credenciais import RegraCredencial
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/auth", tags=["Autenticação"])
@@ -23,35 +26,47 @@ class LoginCRMRequest(BaseModel):
 
 def autenticar_usuario(email: str, senha: str, db: Session) -> tuple:
     """
-    Tenta autenticar usuário em todas as tabelas (Paciente, Medico, Administrador)
+    Autentica o usuário de qualquer tipo (Paciente, Medico, Administrador)
+    
+    Uma única busca na visão credencial_usuario e no máximo uma verificação
+    bcrypt por tentativa, qualquer que seja o tipo do usuário.
     
     Returns:
-        tuple: (user_object, user_type: str) ou (None, None)
+        tuple: (credencial, user_type: str) ou (None, None); a credencial
+        traz id_usuario, email e esta_bloqueado
     """
-    # Tentar autenticar como Paciente
-    paciente = db.query(Paciente).filter(Paciente.email == email).first()
-    if paciente and verify_password(senha, paciente.senha_hash):
-        return paciente, "paciente"
-    
-    # Tentar autenticar como Médico
-    medico = db.query(Medico).filter(Medico.email == email).first()
-    if medico and verify_password(senha, medico.senha_hash):
-        return medico, "medico"
-    
-    # Tentar autenticar como Administrador
-    admin = db.query(Administrador).filter(Administrador.email == email).first()
-    if admin and verify_password(senha, admin.senha_hash):
-        return admin, "administrador"
+    credencial = RegraCredencial.buscar(db, email)
+    if credencial and verify_password(senha, credencial.senha_hash):
+        atualizar_custo_do_hash(db, credencial.tipo, credencial.id_usuario, senha, credencial.senha_hash)
+        return credencial, credencial.tipo
     
     return None, None
 
 
+def atualizar_custo_do_hash(db: Session, tipo: str, id_usuario: int, senha: str, senha_hash: str):
+    """
+    Refaz o hash com o custo atual quando o gravado usa custo menor
+    (precisa_rehash; senha conhecida só no login). Com o pool de senhas saturado o login
+    segue normalmente e o hash é refeito em um próximo login.
+    """
+    if not precisa_rehash(senha_hash):
+        return
+    try:
+        novo_hash = get_password_hash(senha)
+    except HTTPException:
+        return
+    RegraCredencial.atualizar_hash(db, tipo, id_usuario, novo_hash)
+    db.commit()
+
+
 @router.post("/login", response_model=Token)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+def login(login_data: LoginRequest, request: Request, db: Session = Depends(get_db)):
     """
     Login unificado para todos os tipos de usuários (Paciente, Médico, Administrador)
     Conforme requisito: Login com e-mail e senha alfanumérica (8 a 20 caracteres)
+    Tentativas além do limite por IP ou por conta recebem 429 sem consultar o banco
     """
+    verificar_limite_login(request, login_data.email)
     usuario, tipo_usuario = autenticar_usuario(login_data.email, login_data.senha, db)
     
     if not usuario:
@@ -71,13 +86,7 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     # Criar token JWT
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    # Definir user_id baseado no tipo
-    if tipo_usuario == "paciente":
-        user_id = usuario.id_paciente
-    elif tipo_usuario == "medico":
-        user_id = usuario.id_medico
-    else:  # administrador
-        user_id = usuario.id_admin
+    user_id = usuario.id_usuario
     
     access_token = create_access_token(
         data={
@@ -97,10 +106,11 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/login/crm", response_model=Token)
-def login_medico_por_crm(login_data: LoginCRMRequest, db: Session = Depends(get_db)):
+def login_medico_por_crm(login_data: LoginCRMRequest, request: Request, db: Session = Depends(get_db)):
     """
     Login alternativo para médicos usando CRM ao invés de email
     """
+    verificar_limite_login(request, f"crm:{login_data.crm}")
     medico = db.query(Medico).filter(Medico.crm == login_data.crm).first()
     
     if not medico or not verify_password(login_data.senha, medico.senha_hash):
@@ -109,6 +119,7 @@ def login_medico_por_crm(login_data: LoginCRMRequest, db: Session = Depends(get_
             detail="CRM ou senha incorretos",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    atualizar_custo_do_hash(db, "medico", medico.id_medico, login_data.senha, medico.senha_hash)
     
     # Criar token JWT
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -3,11 +3,12 @@ Router de Médicos - Sistema Clínica Saúde+
 Implementa todos os casos de uso do módulo Médico conforme CasosDeUso.txt
 Atualizado para modelo conforme MER
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_, func
-from typing import List
-from datetime import date, datetime, time
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
+from datetime import date
 from app.database import get_db
 from app.models.models import (
     Medico, Consulta, HorarioTrabalho, Observacao,
@@ -20,6 +21,12 @@ from app.schemas.schemas import (
     ObservacaoCreate, ObservacaoUpdate, ObservacaoResponse,
     BloqueioHorarioCreate, BloqueioHorarioResponse
 )
+from app.services.cache_disponibilidade import atualizar_disponibilidade, invalidar_disponibilidade
+from app.services.regras_negocio import RegraConsulta, RegraPaciente
+from app.services.slot_agenda import RegraSlotAgenda
+from app.services.estatisticas import RegraEstatisticas
+from app.utils.periodo import filtro_periodo
+from app.utils.paginacao import Pagina, paginar
 
 router = APIRouter(prefix="/medicos", tags=["Médicos"])
 
@@ -145,10 +152,15 @@ def cadastrar_horarios(
         db.add(novo_horario)
         horarios_criados.append(novo_horario)
     
+    if RegraSlotAgenda.ativo():
+        RegraSlotAgenda.materializar(db, [medico_id])
+    
     db.commit()
     for horario in horarios_criados:
         db.refresh(horario)
     
+    invalidar_disponibilidade(medico_id)
+    
     return horarios_criados
 
 
@@ -196,8 +208,12 @@ def excluir_horario(
         )
     
     db.delete(horario)
+    if RegraSlotAgenda.ativo():
+        RegraSlotAgenda.materializar(db, [medico_id])
     db.commit()
     
+    invalidar_disponibilidade(medico_id)
+    
     return {
         "sucesso": True,
         "mensagem": "Horário excluído com sucesso"
@@ -209,11 +225,14 @@ def listar_consultas(
     medico_id: int,
     data_inicio: date = None,
     data_fim: date = None,
+    status_consulta: Optional[str] = Query(None, alias="status"),
+    pagina: Pagina = Depends(),
     db: Session = Depends(get_db)
 ):
     """
     Caso de Uso: Visualizar Consultas Agendadas
-    Lista consultas do médico, opcionalmente filtradas por período
+    Lista consultas do médico, opcionalmente filtradas por período e status,
+    por data/hora, em páginas (cursor em X-Proximo-Cursor)
     """
     # Verificar se médico existe
     medico = db.query(Medico).filter(Medico.id_medico == medico_id).first()
@@ -228,27 +247,21 @@ def listar_consultas(
         joinedload(Consulta.medico)
     ).filter(Consulta.id_medico_fk == medico_id)
     
-    if data_inicio:
-        data_inicio_dt = datetime.combine(data_inicio, time.min)
-        query = query.filter(Consulta.data_hora_inicio >= data_inicio_dt)
-    
-    if data_fim:
-        data_fim_dt = datetime.combine(data_fim, time.max)
-        query = query.filter(Consulta.data_hora_inicio <= data_fim_dt)
-    
-    consultas = query.order_by(Consulta.data_hora_inicio).all()
+    query = query.filter(*filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim))
+    if status_consulta is not None:
+        query = query.filter(Consulta.status == status_consulta)
     
-    return consultas
+    return paginar(query, [Consulta.data_hora_inicio, Consulta.id_consulta], pagina)
 
 
 @router.get("/consultas/hoje/{medico_id}", response_model=List[ConsultaResponse])
-def consultas_hoje(medico_id: int, db: Session = Depends(get_db)):
+def consultas_hoje(medico_id: int, pagina: Pagina = Depends(), db: Session = Depends(get_db)):
     """
     Lista consultas do dia atual do médico
     Caso de Uso: Visualizar Consultas Agendadas (por data)
     """
     hoje = date.today()
-    return listar_consultas(medico_id, data_inicio=hoje, data_fim=hoje, db=db)
+    return listar_consultas(medico_id, data_inicio=hoje, data_fim=hoje, status_consulta=None, pagina=pagina, db=db)
 
 
 @router.put("/consultas/{consulta_id}/status", response_model=ConsultaResponse)
@@ -262,7 +275,8 @@ def atualizar_status_consulta(
     Atualiza status da consulta (agendada, confirmada, realizada, faltou)
     Caso de Uso: Visualizar Consultas Agendadas (marcar como realizada)
     
-    RN3: Se marcar como 'faltou', incrementa contador de faltas do paciente
+    RN3: 'faltou' soma uma falta ao contador do paciente e 'realizada' zera;
+    corrigir um desses status recalcula o contador pelo histórico
     """
     # Buscar consulta
     consulta = db.query(Consulta).filter(
@@ -287,19 +301,42 @@ def atualizar_status_consulta(
         )
     
     status_antigo = consulta.status
+    por_slots = RegraSlotAgenda.ativo()
+    
+    # Reativação: o slot devolvido no cancelamento é reservado de novo antes
+    # de qualquer escrita (a reserva recusada não altera nada)
+    if por_slots and status_antigo == 'cancelada' and novo_status != 'cancelada':
+        if RegraSlotAgenda.reservar(db, medico_id, consulta.data_hora_inicio, consulta.id_consulta) is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Horário indisponível. O médico já possui outra consulta ativa neste horário."
+            )
+    
     consulta.status = novo_status
     
-    # RN3: Aplicar regra de faltas consecutivas
-    if novo_status == 'faltou' and status_antigo != 'faltou':
-        # Não precisa fazer nada aqui, a verificação é feita ao tentar agendar
-        pass
-    elif novo_status == 'realizada' and status_antigo != 'realizada':
-        # Quando consulta é realizada, não há falta (útil para histórico)
-        pass
+    # RN3: contador de faltas consecutivas atualizado na mesma transação
+    # (o bloqueio é aplicado na próxima tentativa de agendamento)
+    RegraPaciente.registrar_mudanca_status(db, consulta.id_paciente_fk, status_antigo, novo_status)
     
-    db.commit()
+    if por_slots and novo_status == 'cancelada' and status_antigo != 'cancelada':
+        RegraSlotAgenda.liberar(db, consulta.id_consulta)
+    
+    try:
+        db.commit()
+    except IntegrityError as e:
+        # Reativar uma consulta cancelada cujo horário já foi ocupado (RN4)
+        db.rollback()
+        if RegraConsulta.violou_conflito_horario(e):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Horário indisponível. O médico já possui outra consulta ativa neste horário."
+            )
+        raise
     db.refresh(consulta)
     
+    if novo_status != status_antigo:
+        atualizar_disponibilidade(db, medico_id, consulta.data_hora_inicio.date())
+    
     return consulta
 
 
@@ -431,47 +468,15 @@ def obter_estatisticas(medico_id: int, db: Session = Depends(get_db)):
     - Consultas esta semana
     - Horários bloqueados
     """
-    from datetime import timedelta
-    
-    # Verificar se médico existe
-    medico = db.query(Medico).filter(Medico.id_medico == medico_id).first()
-    if not medico:
+    # Consultas hoje e esta semana (estatisticas_diarias) e bloqueios, em uma instrução
+    estatisticas = RegraEstatisticas.estatisticas_medicos(db, date.today(), medico_ids=[medico_id])
+    if not estatisticas:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Médico não encontrado"
         )
     
-    hoje = date.today()
-    inicio_semana = hoje - timedelta(days=hoje.weekday())
-    fim_semana = inicio_semana + timedelta(days=6)
-    
-    # Consultas hoje
-    consultas_hoje = db.query(Consulta).filter(
-        Consulta.id_medico_fk == medico_id,
-        func.date(Consulta.data_hora_inicio) == hoje,
-        Consulta.status.in_(['agendada', 'realizada'])
-    ).count()
-    
-    # Consultas esta semana
-    consultas_semana = db.query(Consulta).filter(
-        Consulta.id_medico_fk == medico_id,
-        func.date(Consulta.data_hora_inicio) >= inicio_semana,
-        func.date(Consulta.data_hora_inicio) <= fim_semana,
-        Consulta.status.in_(['agendada', 'realizada'])
-    ).count()
-    
-    # Horários bloqueados (considerando horários de trabalho ativos)
-    # Contando bloqueios ativos (data >= hoje)
-    horarios_bloqueados = db.query(BloqueioHorario).filter(
-        BloqueioHorario.id_medico_fk == medico_id,
-        BloqueioHorario.data >= hoje
-    ).count()
-    
-    return {
-        "consultas_hoje": consultas_hoje,
-        "consultas_semana": consultas_semana,
-        "horarios_bloqueados": horarios_bloqueados
-    }
+    return estatisticas[0]
 
 
 # ============ Endpoints de Bloqueio de Horários ============
@@ -535,9 +540,13 @@ def criar_bloqueio(
     )
     
     db.add(novo_bloqueio)
+    if RegraSlotAgenda.ativo():
+        RegraSlotAgenda.materializar(db, [medico_id], novo_bloqueio.data, novo_bloqueio.data)
     db.commit()
     db.refresh(novo_bloqueio)
     
+    atualizar_disponibilidade(db, medico_id, novo_bloqueio.data)
+    
     return novo_bloqueio
 
 
@@ -545,11 +554,13 @@ def criar_bloqueio(
 def listar_bloqueios(
     medico_id: int,
     data_inicio: date = None,
+    data_fim: date = None,
+    pagina: Pagina = Depends(),
     db: Session = Depends(get_db)
 ):
     """
-    Lista bloqueios de horário do médico
-    Opcionalmente filtra por data_inicio (bloqueios >= data_inicio)
+    Lista bloqueios de horário do médico, em páginas (cursor em X-Proximo-Cursor)
+    Opcionalmente filtra por período (bloqueios de data_inicio a data_fim)
     """
     query = db.query(BloqueioHorario).filter(
         BloqueioHorario.id_medico_fk == medico_id
@@ -557,10 +568,12 @@ def listar_bloqueios(
     
     if data_inicio:
         query = query.filter(BloqueioHorario.data >= data_inicio)
+    if data_fim:
+        query = query.filter(BloqueioHorario.data <= data_fim)
     
-    bloqueios = query.order_by(BloqueioHorario.data, BloqueioHorario.hora_inicio).all()
-    
-    return bloqueios
+    return paginar(
+        query, [BloqueioHorario.data, BloqueioHorario.hora_inicio, BloqueioHorario.id_bloqueio], pagina
+    )
 
 
 @router.delete("/bloqueios/{bloqueio_id}", status_code=status.HTTP_200_OK)
@@ -585,7 +598,12 @@ def excluir_bloqueio(
             detail="Bloqueio não encontrado"
         )
     
+    data_bloqueio = bloqueio.data
     db.delete(bloqueio)
+    if RegraSlotAgenda.ativo():
+        RegraSlotAgenda.materializar(db, [medico_id], data_bloqueio, data_bloqueio)
     db.commit()
     
+    atualizar_disponibilidade(db, medico_id, data_bloqueio)
+    
     return {"mensagem": "Bloqueio excluído com sucesso"}
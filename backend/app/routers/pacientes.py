@@ -3,10 +3,12 @@ Router de Pacientes - Sistema Clínica Saúde+
 Implementa todos os casos de uso do módulo Paciente conforme CasosDeUso.txt
 Atualizado para modelo conforme MER
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import defaultdict
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import insert
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta, date
 from app.database import get_db
 from app.models.models import Paciente, Medico, Consulta, Especialidade, PlanoSaude, HorarioTrabalho
@@ -14,7 +16,8 @@ from app.schemas.schemas import (
     PacienteCreate, PacienteUpdate, PacienteAlterarSenha, PacienteResponse,
     ConsultaCreate, ConsultaResponse, ConsultaCancelar, ConsultaReagendar,
     MedicoResponse, EspecialidadeResponse, PlanoSaudeResponse,
-    HorariosDisponiveisResponse
+    HorariosDisponiveisResponse, AgendaPeriodoResponse, PrimeiroHorarioResponse,
+    AgendamentoLoteCreate, AgendamentoLoteItemResultado, AgendamentoLoteResponse
 )
 from app.utils.auth import get_password_hash, verify_password
 from app.services.regras_negocio import (
@@ -23,9 +26,36 @@ from app.services.regras_negocio import (
     RegraPaciente,
     RegraHorarioDisponivel
 )
+from app.services.cache_disponibilidade import obter_cache, atualizar_disponibilidade, horarios_livres
+from app.services.slot_agenda import RegraSlotAgenda
+from app.services.credenciais import RegraCredencial
+from app.utils.paginacao import Pagina, paginar
+from app.utils.periodo import filtro_periodo
 
 router = APIRouter(prefix="/pacientes", tags=["Pacientes"])
 
+# Maior período aceito pela agenda de um médico (cerca de um trimestre)
+MAX_DIAS_AGENDA = 92
+
+MENSAGEM_SLOT_INDISPONIVEL = "Horário indisponível. Escolha outro horário livre na agenda do médico."
+MENSAGEM_CONFLITO_CONCORRENTE = "Horário indisponível. Outra consulta acabou de ser agendada neste horário."
+
+
+def erro_slot_indisponivel(db: Session, medico_id: int, data_hora: datetime) -> HTTPException:
+    """
+    Reserva de slot recusada: 409 se o slot já tem dono (como a violação da
+    exclusão no modo por intervalos), 400 se o horário não está na agenda
+    """
+    if RegraSlotAgenda.ocupado(db, medico_id, data_hora):
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=MENSAGEM_CONFLITO_CONCORRENTE
+        )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=MENSAGEM_SLOT_INDISPONIVEL
+    )
+
 
 @router.post("/cadastro", response_model=PacienteResponse, status_code=status.HTTP_201_CREATED)
 def cadastrar_paciente(paciente_data: PacienteCreate, db: Session = Depends(get_db)):
@@ -33,9 +63,8 @@ def cadastrar_paciente(paciente_data: PacienteCreate, db: Session = Depends(get_
     Caso de Uso: Cadastrar Paciente
     Cadastro com CPF, nome completo, telefone, e-mail e plano de saúde (opcional)
     """
-    # Verificar se email já existe
-    email_existe = db.query(Paciente).filter(Paciente.email == paciente_data.email).first()
-    if email_existe:
+    # E-mail único entre pacientes, médicos e administradores (login unificado)
+    if RegraCredencial.email_em_uso(db, paciente_data.email):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Email já cadastrado no sistema"
@@ -210,22 +239,6 @@ def agendar_consulta(
     - RN4: Evitar conflitos de horário
     - RN: Validar horário de trabalho do médico
     """
-    # Verificar se paciente existe
-    paciente = db.query(Paciente).filter(Paciente.id_paciente == paciente_id).first()
-    if not paciente:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Paciente não encontrado"
-        )
-    
-    # Verificar se médico existe
-    medico = db.query(Medico).filter(Medico.id_medico == consulta_data.id_medico).first()
-    if not medico:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Médico não encontrado"
-        )
-    
     # Obter data_hora do schema (pode vir como data_hora ou data_hora_inicio)
     data_hora = getattr(consulta_data, 'data_hora', None) or getattr(consulta_data, 'data_hora_inicio', None)
     
@@ -237,10 +250,28 @@ def agendar_consulta(
     
     data_hora_fim = data_hora + timedelta(minutes=30)
     
+    # Existência de paciente/médico e dados de todas as regras em uma única consulta
+    situacao = ValidadorAgendamento.consultar_status_agendamento(
+        db, paciente_id, consulta_data.id_medico, data_hora, data_hora_fim
+    )
+    
+    if not situacao["paciente_existe"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Paciente não encontrado"
+        )
+    
+    if not situacao["medico_existe"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Médico não encontrado"
+        )
+    
     # Validar todas as regras de negócio
-    pode_agendar, mensagem = ValidadorAgendamento.validar_novo_agendamento(
-        db, paciente_id, consulta_data.id_medico,
-        data_hora, data_hora_fim
+    por_slots = RegraSlotAgenda.ativo()
+    pode_agendar, mensagem = ValidadorAgendamento.avaliar_status_agendamento(
+        db, paciente_id, situacao, data_hora,
+        verificar_agenda_medico=not por_slots
     )
     
     if not pode_agendar:
@@ -249,6 +280,13 @@ def agendar_consulta(
             detail=mensagem
         )
     
+    # Modo slots: a reserva atômica substitui as verificações de expediente e conflito
+    slot_id = None
+    if por_slots:
+        slot_id = RegraSlotAgenda.reservar(db, consulta_data.id_medico, data_hora)
+        if slot_id is None:
+            raise erro_slot_indisponivel(db, consulta_data.id_medico, data_hora)
+    
     # Criar consulta
     nova_consulta = Consulta(
         data_hora_inicio=data_hora,
@@ -259,17 +297,148 @@ def agendar_consulta(
     )
     
     db.add(nova_consulta)
-    db.commit()
+    
+    try:
+        if slot_id is not None:
+            db.flush()
+            RegraSlotAgenda.vincular_consulta(db, slot_id, nova_consulta.id_consulta)
+        
+        db.commit()
+    except IntegrityError as e:
+        # Outra requisição reservou o mesmo horário entre a validação e o commit
+        db.rollback()
+        if RegraConsulta.violou_conflito_horario(e):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=MENSAGEM_CONFLITO_CONCORRENTE
+            )
+        raise
     db.refresh(nova_consulta)
     
+    atualizar_disponibilidade(db, consulta_data.id_medico, data_hora.date())
+    
     return nova_consulta
 
 
+@router.post("/consultas/lote", response_model=AgendamentoLoteResponse)
+def agendar_consultas_em_lote(
+    lote: AgendamentoLoteCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Caso de Uso: Agendar Consulta (recepção, vários agendamentos de uma vez)
+    
+    Valida o lote inteiro de uma vez (mesmas regras de POST /pacientes/consultas,
+    mais conflitos entre os próprios itens) e insere todas as consultas aceitas
+    com um único INSERT, em uma transação. Cada item recebe seu resultado; com
+    atomico=True nenhum item é agendado se algum for recusado.
+    """
+    pedidos = [(item.id_paciente, item.id_medico, item.data_hora) for item in lote.consultas]
+    por_slots = RegraSlotAgenda.ativo()
+    
+    mensagens, pacientes_a_bloquear = ValidadorAgendamento.validar_lote(
+        db, pedidos, verificar_agenda_medico=not por_slots
+    )
+    aceitos = [indice for indice, mensagem in enumerate(mensagens) if mensagem is None]
+    
+    # Modo slots: os slots de todos os itens aceitos são reservados em um único UPDATE
+    slots = {}
+    if por_slots and aceitos and not (lote.atomico and len(aceitos) < len(pedidos)):
+        slots = RegraSlotAgenda.reservar_lote(db, list({pedidos[i][1:] for i in aceitos}))
+        for indice in aceitos:
+            if pedidos[indice][1:] not in slots:
+                mensagens[indice] = MENSAGEM_SLOT_INDISPONIVEL
+        aceitos = [indice for indice in aceitos if mensagens[indice] is None]
+    
+    if lote.atomico and len(aceitos) < len(pedidos):
+        if slots:
+            db.rollback()
+        for indice in aceitos:
+            mensagens[indice] = "Não agendada: outro item do lote foi recusado."
+        aceitos = []
+    
+    ids_consultas = {}
+    if aceitos:
+        # Itens aceitos nunca repetem (médico, início): a varredura recusa sobreposições.
+        # Inseridos na ordem (médico, início) para que os gatilhos de
+        # estatisticas_diarias travem as linhas sempre na mesma ordem
+        linhas = db.execute(
+            insert(Consulta).returning(
+                Consulta.id_medico_fk, Consulta.data_hora_inicio, Consulta.id_consulta
+            ),
+            [
+                {
+                    "data_hora_inicio": pedidos[indice][2],
+                    "data_hora_fim": pedidos[indice][2] + timedelta(minutes=30),
+                    "status": "agendada",
+                    "id_paciente_fk": pedidos[indice][0],
+                    "id_medico_fk": pedidos[indice][1]
+                }
+                for indice in sorted(aceitos, key=lambda indice: pedidos[indice][1:])
+            ]
+        ).all()
+        criadas = {(id_medico, inicio): id_consulta for id_medico, inicio, id_consulta in linhas}
+        ids_consultas = {indice: criadas[pedidos[indice][1:]] for indice in aceitos}
+        RegraSlotAgenda.vincular_consultas(db, {
+            slots[pedidos[indice][1:]]: id_consulta
+            for indice, id_consulta in ids_consultas.items() if pedidos[indice][1:] in slots
+        })
+    
+    # RN3: bloqueio automático de quem atingiu 3 faltas consecutivas
+    if pacientes_a_bloquear:
+        db.query(Paciente).filter(Paciente.id_paciente.in_(pacientes_a_bloquear)).update(
+            {Paciente.esta_bloqueado: True}, synchronize_session=False
+        )
+    
+    try:
+        db.commit()
+    except IntegrityError as e:
+        # Outra requisição ocupou um dos horários entre a validação e o commit
+        db.rollback()
+        if RegraConsulta.violou_conflito_horario(e):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=MENSAGEM_CONFLITO_CONCORRENTE
+            )
+        raise
+    
+    datas_afetadas = defaultdict(set)
+    for indice in ids_consultas:
+        datas_afetadas[pedidos[indice][1]].add(pedidos[indice][2].date())
+    for medico_id, datas in datas_afetadas.items():
+        atualizar_disponibilidade(db, medico_id, *datas)
+    
+    resultados = [
+        AgendamentoLoteItemResultado(
+            indice=indice,
+            sucesso=mensagem is None,
+            mensagem=mensagem or "Consulta agendada com sucesso",
+            id_consulta=ids_consultas.get(indice)
+        )
+        for indice, mensagem in enumerate(mensagens)
+    ]
+    return AgendamentoLoteResponse(
+        total=len(pedidos),
+        agendadas=len(ids_consultas),
+        recusadas=len(pedidos) - len(ids_consultas),
+        resultados=resultados
+    )
+
+
 @router.get("/consultas/{paciente_id}", response_model=List[ConsultaResponse])
-def listar_consultas(paciente_id: int, db: Session = Depends(get_db)):
+def listar_consultas(
+    paciente_id: int,
+    data_inicio: date = None,
+    data_fim: date = None,
+    status_consulta: Optional[str] = Query(None, alias="status"),
+    pagina: Pagina = Depends(),
+    db: Session = Depends(get_db)
+):
     """
     Caso de Uso: Visualizar Consultas
-    Lista todas as consultas do paciente (futuras e passadas)
+    Lista as consultas do paciente (futuras e passadas), das mais recentes
+    para as mais antigas, em páginas (cursor em X-Proximo-Cursor)
+    Opcionalmente filtra por período e status
     """
     # Verificar se paciente existe
     paciente = db.query(Paciente).filter(Paciente.id_paciente == paciente_id).first()
@@ -280,14 +449,17 @@ def listar_consultas(paciente_id: int, db: Session = Depends(get_db)):
         )
     
     # Buscar consultas com informações de médico e paciente
-    consultas = db.query(Consulta).options(
+    query = db.query(Consulta).options(
         joinedload(Consulta.medico).joinedload(Medico.especialidade),
         joinedload(Consulta.paciente)
     ).filter(
-        Consulta.id_paciente_fk == paciente_id
-    ).order_by(Consulta.data_hora_inicio.desc()).all()
+        Consulta.id_paciente_fk == paciente_id,
+        *filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim)
+    )
+    if status_consulta is not None:
+        query = query.filter(Consulta.status == status_consulta)
     
-    return consultas
+    return paginar(query, [Consulta.data_hora_inicio, Consulta.id_consulta], pagina, descendente=True)
 
 
 @router.delete("/consultas/{consulta_id}", status_code=status.HTTP_200_OK)
@@ -337,8 +509,12 @@ def cancelar_consulta(
     
     # Cancelar consulta
     consulta.status = "cancelada"
+    if RegraSlotAgenda.ativo():
+        RegraSlotAgenda.liberar(db, consulta.id_consulta)
     db.commit()
     
+    atualizar_disponibilidade(db, consulta.id_medico_fk, consulta.data_hora_inicio.date())
+    
     return {
         "sucesso": True,
         "mensagem": "Consulta cancelada com sucesso"
@@ -401,33 +577,52 @@ def reagendar_consulta(
     
     nova_data_hora_fim = nova_data_hora + timedelta(minutes=30)
     
-    # Validar horário de trabalho
-    no_horario, msg_horario = RegraConsulta.validar_horario_trabalho_medico(
-        db, consulta.id_medico_fk, nova_data_hora
-    )
-    if not no_horario:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=msg_horario
+    if RegraSlotAgenda.ativo():
+        # Reserva o novo slot e só então libera o atual, na mesma transação
+        slot_id = RegraSlotAgenda.reservar(db, consulta.id_medico_fk, nova_data_hora, consulta.id_consulta)
+        if slot_id is None:
+            raise erro_slot_indisponivel(db, consulta.id_medico_fk, nova_data_hora)
+        RegraSlotAgenda.liberar(db, consulta.id_consulta, exceto_slot_id=slot_id)
+    else:
+        # Validar horário de trabalho
+        no_horario, msg_horario = RegraConsulta.validar_horario_trabalho_medico(
+            db, consulta.id_medico_fk, nova_data_hora
         )
-    
-    # Validar conflito (ignorando a própria consulta)
-    sem_conflito, msg_conflito = RegraConsulta.validar_conflito_horario_medico(
-        db, consulta.id_medico_fk, nova_data_hora, nova_data_hora_fim,
-        consulta_id_ignorar=consulta_id
-    )
-    if not sem_conflito:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=msg_conflito
+        if not no_horario:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=msg_horario
+            )
+        
+        # Validar conflito (ignorando a própria consulta)
+        sem_conflito, msg_conflito = RegraConsulta.validar_conflito_horario_medico(
+            db, consulta.id_medico_fk, nova_data_hora, nova_data_hora_fim,
+            consulta_id_ignorar=consulta_id
         )
+        if not sem_conflito:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=msg_conflito
+            )
     
     # Reagendar consulta
+    data_anterior = consulta.data_hora_inicio.date()
     consulta.data_hora_inicio = nova_data_hora
     consulta.data_hora_fim = nova_data_hora_fim
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if RegraConsulta.violou_conflito_horario(e):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=MENSAGEM_CONFLITO_CONCORRENTE
+            )
+        raise
     db.refresh(consulta)
     
+    atualizar_disponibilidade(db, consulta.id_medico_fk, data_anterior, nova_data_hora.date())
+    
     return consulta
 
 
@@ -457,8 +652,19 @@ def get_horarios_disponiveis(
 ):
     """
     Retorna horários disponíveis de um médico para uma data específica
-    Considera horários de trabalho e consultas já agendadas
+    Considera horários de trabalho, bloqueios e consultas já agendadas
+    Quando o cache compartilhado está ativo, a leitura não acessa o banco
     """
+    cache = obter_cache()
+    sequencia = None
+    if cache is not None:
+        horarios, sequencia = cache.consultar(medico_id, data)
+        if horarios is not None:
+            return {
+                "data": data.isoformat(),
+                "horarios_disponiveis": horarios
+            }
+    
     # Verificar se médico existe
     medico = db.query(Medico).filter(Medico.id_medico == medico_id).first()
     if not medico:
@@ -467,10 +673,11 @@ def get_horarios_disponiveis(
             detail="Médico não encontrado"
         )
     
-    # Listar horários disponíveis usando serviço de regras de negócio
-    horarios = RegraHorarioDisponivel.listar_horarios_disponiveis(
-        db, medico_id, data, duracao_consulta_minutos=30
-    )
+    # Mesma fonte da atualização do cache (slots ou agenda calculada)
+    horarios = horarios_livres(db, medico_id, data)
+    
+    if cache is not None:
+        cache.gravar(medico_id, data, horarios, sequencia_esperada=sequencia)
     
     return {
         "data": data.isoformat(),
@@ -478,6 +685,98 @@ def get_horarios_disponiveis(
     }
 
 
+@router.get("/medicos/{medico_id}/agenda", response_model=AgendaPeriodoResponse)
+def get_agenda_medico(
+    medico_id: int,
+    de: date,
+    ate: date,
+    db: Session = Depends(get_db)
+):
+    """
+    Retorna os horários disponíveis de um médico para um período de datas
+    Substitui uma chamada a horarios-disponiveis por dia ao navegar pelo calendário
+    """
+    if ate < de:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A data final deve ser igual ou posterior à data inicial"
+        )
+    
+    if (ate - de).days + 1 > MAX_DIAS_AGENDA:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Período máximo permitido: {MAX_DIAS_AGENDA} dias"
+        )
+    
+    # Verificar se médico existe
+    medico = db.query(Medico).filter(Medico.id_medico == medico_id).first()
+    if not medico:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Médico não encontrado"
+        )
+    
+    if RegraSlotAgenda.ativo():
+        dias = RegraSlotAgenda.listar_livres(db, medico_id, de, ate)
+    else:
+        dias = RegraHorarioDisponivel.listar_agenda_periodo(
+            db, medico_id, de, ate, duracao_consulta_minutos=30
+        )
+    
+    return {
+        "id_medico": medico_id,
+        "de": de,
+        "ate": ate,
+        "duracao_minutos": 30,
+        "dias": dias
+    }
+
+
+@router.get("/primeiros-horarios", response_model=List[PrimeiroHorarioResponse])
+def buscar_primeiros_horarios(
+    especialidade_id: int,
+    de: date = None,
+    ate: date = None,
+    limite: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca os primeiros horários livres de uma especialidade entre todos os seus médicos
+    Ex.: "a consulta de Cardiologia mais próxima"
+    Janela padrão: de hoje até 30 dias à frente
+    """
+    de = de or date.today()
+    ate = ate or de + timedelta(days=30)
+    
+    if ate < de:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A data final deve ser igual ou posterior à data inicial"
+        )
+    
+    if (ate - de).days + 1 > MAX_DIAS_AGENDA:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Período máximo permitido: {MAX_DIAS_AGENDA} dias"
+        )
+    
+    especialidade = db.query(Especialidade).filter(
+        Especialidade.id_especialidade == especialidade_id
+    ).first()
+    if not especialidade:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Especialidade não encontrada"
+        )
+    
+    if RegraSlotAgenda.ativo():
+        return RegraSlotAgenda.buscar_primeiros(db, especialidade_id, de, ate, limite=limite)
+    
+    return RegraHorarioDisponivel.buscar_primeiros_horarios(
+        db, especialidade_id, de, ate, limite=limite, duracao_consulta_minutos=30
+    )
+
+
 @router.get("/especialidades", response_model=List[EspecialidadeResponse])
 def listar_especialidades(db: Session = Depends(get_db)):
     """Lista todas as especialidades médicas disponíveis"""
@@ -7,13 +7,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, time, date
-import bcrypt
 
 from app.database import get_db
 from app.models.models import (
     Administrador, Paciente, Medico, PlanoSaude, Especialidade,
     HorarioTrabalho, Consulta
 )
+from app.utils.auth import get_password_hash
 
 router = APIRouter()
 
@@ -71,11 +71,11 @@ def popular_dados_teste(db: Session = Depends(get_db)):
         db.flush()
         
         # 3. Criar Administrador
-        senha_hash_admin = bcrypt.hashpw("admin123".encode('utf-8'), bcrypt.gensalt())
+        senha_hash_admin = get_password_hash("admin123")
         admin = Administrador(
             nome="Administrador do Sistema",
             email="admin@clinica.com",
-            senha_hash=senha_hash_admin.decode('utf-8'),
+            senha_hash=senha_hash_admin,
             papel="Super Admin"
         )
         db.add(admin)
@@ -109,7 +109,7 @@ def popular_dados_teste(db: Session = Depends(get_db)):
             }
         ]
         
-        senha_hash_medico = bcrypt.hashpw("medico123".encode('utf-8'), bcrypt.gensalt())
+        senha_hash_medico = get_password_hash("medico123")
         
         medicos = []
         for med_data in medicos_data:
@@ -118,7 +118,7 @@ def popular_dados_teste(db: Session = Depends(get_db)):
                 cpf=med_data["cpf"],
                 crm=med_data["crm"],
                 email=med_data["email"],
-                senha_hash=senha_hash_medico.decode('utf-8'),
+                senha_hash=senha_hash_medico,
                 telefone=med_data["telefone"],
                 id_especialidade_fk=med_data["id_especialidade_fk"]
             )
@@ -188,14 +188,14 @@ def popular_dados_teste(db: Session = Depends(get_db)):
             }
         ]
         
-        senha_hash_paciente = bcrypt.hashpw("paciente123".encode('utf-8'), bcrypt.gensalt())
+        senha_hash_paciente = get_password_hash("paciente123")
         
         for pac_data in pacientes_data:
             paciente = Paciente(
                 nome=pac_data["nome"],
                 cpf=pac_data["cpf"],
                 email=pac_data["email"],
-                senha_hash=senha_hash_paciente.decode('utf-8'),
+                senha_hash=senha_hash_paciente,
                 telefone=pac_data["telefone"],
                 data_nascimento=datetime.strptime(pac_data["data_nascimento"], "%Y-%m-%d").date(),
                 esta_bloqueado=False,
@@ -411,11 +411,11 @@ def popular_banco_secreto(token: str, db: Session = Depends(get_db)):
         db.flush()
         
         # 3. Criar Administrador
-        senha_hash_admin = bcrypt.hashpw("admin123".encode('utf-8'), bcrypt.gensalt())
+        senha_hash_admin = get_password_hash("admin123")
         admin = Administrador(
             nome="Administrador do Sistema",
             email="admin@clinica.com",
-            senha_hash=senha_hash_admin.decode('utf-8'),
+            senha_hash=senha_hash_admin,
             papel="Super Admin"
         )
         db.add(admin)
@@ -449,7 +449,7 @@ def popular_banco_secreto(token: str, db: Session = Depends(get_db)):
             }
         ]
         
-        senha_hash_medico = bcrypt.hashpw("medico123".encode('utf-8'), bcrypt.gensalt())
+        senha_hash_medico = get_password_hash("medico123")
         
         medicos = []
         for med_data in medicos_data:
@@ -458,7 +458,7 @@ def popular_banco_secreto(token: str, db: Session = Depends(get_db)):
                 cpf=med_data["cpf"],
                 crm=med_data["crm"],
                 email=med_data["email"],
-                senha_hash=senha_hash_medico.decode('utf-8'),
+                senha_hash=senha_hash_medico,
                 telefone=med_data["telefone"],
                 id_especialidade_fk=med_data["id_especialidade_fk"]
             )
@@ -525,14 +525,14 @@ def popular_banco_secreto(token: str, db: Session = Depends(get_db)):
             }
         ]
         
-        senha_hash_paciente = bcrypt.hashpw("paciente123".encode('utf-8'), bcrypt.gensalt())
+        senha_hash_paciente = get_password_hash("paciente123")
         
         for pac_data in pacientes_data:
             paciente = Paciente(
                 nome=pac_data["nome"],
                 cpf=pac_data["cpf"],
                 email=pac_data["email"],
-                senha_hash=senha_hash_paciente.decode('utf-8'),
+                senha_hash=senha_hash_paciente,
                 telefone=pac_data["telefone"],
                 data_nascimento=datetime.strptime(pac_data["data_nascimento"], "%Y-%m-%d").date(),
                 esta_bloqueado=False,
@@ -2,9 +2,10 @@
 Schemas Pydantic para validação de entrada/saída da API
 Atualizado para refletir o modelo de dados conforme MER_Estrutura.txt
 """
+import json
 from pydantic import BaseModel, EmailStr, Field, validator
 from datetime import datetime, date, time
-from typing import Optional, List
+from typing import Optional, List, Dict
 from enum import Enum
 
 class StatusConsulta(str, Enum):
@@ -312,6 +313,29 @@ class ConsultaResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AgendamentoLoteItem(BaseModel):
+    """Um agendamento do lote (paciente, médico e horário)"""
+    id_paciente: int
+    id_medico: int
+    data_hora: datetime
+
+class AgendamentoLoteCreate(BaseModel):
+    """Lote de agendamentos feito pela recepção (família, plano de tratamento)"""
+    consultas: List[AgendamentoLoteItem] = Field(..., min_length=1, max_length=50)
+    atomico: bool = False  # True: nada é agendado se algum item for recusado
+
+class AgendamentoLoteItemResultado(BaseModel):
+    indice: int
+    sucesso: bool
+    mensagem: str
+    id_consulta: Optional[int] = None
+
+class AgendamentoLoteResponse(BaseModel):
+    total: int
+    agendadas: int
+    recusadas: int
+    resultados: List[AgendamentoLoteItemResultado]
+
 # ============ Observacao Schemas ============
 class ObservacaoBase(BaseModel):
     descricao: str
@@ -332,17 +356,31 @@ class ObservacaoResponse(ObservacaoBase):
 
 # ============ Relatorio Schemas ============
 class RelatorioBase(BaseModel):
-    tipo: str
+    tipo: str = Field(..., pattern="^(consultas-por-medico|consultas-por-especialidade|cancelamentos|pacientes-frequentes)$")
+    formato: str = Field("pdf", pattern="^(json|pdf|csv|xlsx)$")
 
 class RelatorioCreate(RelatorioBase):
-    pass
+    """Pedido de geração em segundo plano; filtros não usados pelo relatório são ignorados"""
+    medico_id: Optional[int] = None
+    especialidade_id: Optional[int] = None
+    data_inicio: Optional[date] = None
+    data_fim: Optional[date] = None
+    limite: Optional[int] = Field(None, ge=1)
 
 class RelatorioResponse(RelatorioBase):
     id_relatorio: int
+    status: str
+    parametros: Optional[Dict] = None
     data_geracao: datetime
-    dados_resultado: Optional[str] = None
+    data_conclusao: Optional[datetime] = None
+    mensagem_erro: Optional[str] = None
     id_admin_fk: int
     
+    @validator('parametros', pre=True)
+    def carregar_parametros(cls, v):
+        """Filtros gravados como texto JSON"""
+        return json.loads(v) if isinstance(v, str) else v
+    
     class Config:
         from_attributes = True
 
@@ -379,6 +417,8 @@ class EstatisticasDashboard(BaseModel):
     consultas_mes: int
     consultas_agendadas: int
     consultas_realizadas: int
+    consultas_canceladas: int
+    pacientes_bloqueados: int
 
 # ============ Bloqueio Horario Schemas ============
 class BloqueioHorarioBase(BaseModel):
@@ -402,6 +442,20 @@ class HorariosDisponiveisResponse(BaseModel):
     data: date
     horarios_disponiveis: List[str]
 
+class AgendaPeriodoResponse(BaseModel):
+    """Horários livres de um médico em um período, agrupados por dia"""
+    id_medico: int
+    de: date
+    ate: date
+    duracao_minutos: int
+    dias: Dict[str, List[str]]  # "YYYY-MM-DD" -> ["HH:MM", ...]
+
+class PrimeiroHorarioResponse(BaseModel):
+    """Horário livre encontrado na busca por especialidade"""
+    id_medico: int
+    medico_nome: str
+    data_hora: datetime
+
 class MensagemResponse(BaseModel):
     mensagem: str
 
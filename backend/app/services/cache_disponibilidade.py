@@ -0,0 +1,277 @@
+"""
+Cache de Disponibilidade Compartilhado - Clínica Saúde+
+Mapa de bits dos slots de 30 minutos de cada médico/dia, mantido em um
+arquivo mapeado em memória (mmap) que todos os workers do uvicorn leem
+sem cópia e sem acessar o banco.
+
+Layout do arquivo:
+    cabeçalho (16 bytes): assinatura, versão, max_medicos, dias
+    registros (16 bytes cada), um por (id_medico, dia % dias):
+        sequencia (uint32) - seqlock; ímpar enquanto o registro é escrito
+        ordinal (int32)    - date.toordinal() do dia armazenado
+                             (0 = vazio, negativo = dia não cacheável)
+        bitmap (uint64)    - bit i ligado = slot i*30min livre
+
+Leitores nunca bloqueiam: releem o registro se a sequência mudou durante
+a leitura. Escritores são serializados por um lock de arquivo (entre
+processos) e um lock de thread (dentro do processo).
+"""
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.services.regras_negocio import RegraHorarioDisponivel
+from app.services.slot_agenda import RegraSlotAgenda
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+MINUTOS_POR_SLOT = 30
+SLOTS_POR_DIA = 24 * 60 // MINUTOS_POR_SLOT
+
+_ASSINATURA = b"CSDP"
+_VERSAO = 1
+_CABECALHO = struct.Struct("<4sIII")
+_REGISTRO = struct.Struct("<IiQ")
+_TENTATIVAS_LEITURA = 8
+
+
+def _horarios_para_bitmap(horarios: List[str]) -> Optional[int]:
+    """Converte ["HH:MM", ...] em bitmap; None se algum horário não cai na grade de 30 min"""
+    bitmap = 0
+    for horario in horarios:
+        hora, minuto = int(horario[:2]), int(horario[3:5])
+        if minuto % MINUTOS_POR_SLOT:
+            return None
+        bitmap |= 1 << ((hora * 60 + minuto) // MINUTOS_POR_SLOT)
+    return bitmap
+
+
+def _bitmap_para_horarios(bitmap: int) -> List[str]:
+    """Converte o bitmap de volta em ["HH:MM", ...] em ordem crescente"""
+    horarios = []
+    for slot in range(SLOTS_POR_DIA):
+        if bitmap >> slot & 1:
+            minutos = slot * MINUTOS_POR_SLOT
+            horarios.append(f"{minutos // 60:02d}:{minutos % 60:02d}")
+    return horarios
+
+
+class CacheDisponibilidade:
+    """
+    Armazena a disponibilidade de médicos por dia em memória compartilhada
+    """
+
+    def __init__(self, caminho: str, max_medicos: int = 1024, dias: int = 120):
+        self.caminho = caminho
+        self.max_medicos = max_medicos
+        self.dias = dias
+        self._lock_thread = threading.Lock()
+
+        tamanho = _CABECALHO.size + max_medicos * dias * _REGISTRO.size
+        cabecalho = _CABECALHO.pack(_ASSINATURA, _VERSAO, max_medicos, dias)
+
+        self._arquivo = os.fdopen(os.open(caminho, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+        with self._lock_escrita():
+            self._arquivo.seek(0)
+            atual = self._arquivo.read(_CABECALHO.size)
+            if atual != cabecalho or os.path.getsize(caminho) != tamanho:
+                # Arquivo novo ou criado com outra configuração: recomeça zerado
+                self._arquivo.truncate(0)
+                self._arquivo.truncate(tamanho)
+                self._arquivo.seek(0)
+                self._arquivo.write(cabecalho)
+                self._arquivo.flush()
+
+        self._mapa = mmap.mmap(self._arquivo.fileno(), tamanho)
+
+    @contextmanager
+    def _lock_escrita(self):
+        """Lock exclusivo para escritores (thread + arquivo)"""
+        with self._lock_thread:
+            if fcntl:
+                fcntl.lockf(self._arquivo, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.lockf(self._arquivo, fcntl.LOCK_UN)
+
+    def _posicao(self, medico_id: int, data: date) -> Optional[int]:
+        if not 0 <= medico_id < self.max_medicos:
+            return None
+        indice = medico_id * self.dias + data.toordinal() % self.dias
+        return _CABECALHO.size + indice * _REGISTRO.size
+
+    def _escrever(self, posicao: int, sequencia: int, ordinal: int, bitmap: int):
+        """Escreve um registro sob o seqlock (chamar com _lock_escrita adquirido)"""
+        escrevendo = (sequencia + 1) & 0xFFFFFFFF
+        struct.pack_into("<I", self._mapa, posicao, escrevendo)
+        _REGISTRO.pack_into(self._mapa, posicao, escrevendo, ordinal, bitmap)
+        struct.pack_into("<I", self._mapa, posicao, (sequencia + 2) & 0xFFFFFFFF)
+
+    def consultar(self, medico_id: int, data: date) -> tuple[Optional[List[str]], int]:
+        """
+        Lê a disponibilidade de um médico em uma data
+
+        Returns:
+            tuple: (horarios ou None se não estiver em cache, sequência lida)
+            A sequência deve ser repassada a gravar() para evitar sobrescrever
+            uma atualização concorrente com dados lidos antes dela.
+        """
+        posicao = self._posicao(medico_id, data)
+        if posicao is None:
+            return None, 0
+
+        for _ in range(_TENTATIVAS_LEITURA):
+            sequencia, ordinal, bitmap = _REGISTRO.unpack_from(self._mapa, posicao)
+            if sequencia % 2:
+                continue
+            if _REGISTRO.unpack_from(self._mapa, posicao)[0] != sequencia:
+                continue
+            if ordinal != data.toordinal():
+                return None, sequencia
+            return _bitmap_para_horarios(bitmap), sequencia
+
+        return None, -1
+
+    def gravar(
+        self,
+        medico_id: int,
+        data: date,
+        horarios: List[str],
+        sequencia_esperada: Optional[int] = None
+    ) -> bool:
+        """
+        Grava a disponibilidade de um médico em uma data
+
+        Se sequencia_esperada for informada, só grava se o registro não foi
+        alterado desde a leitura (usado ao preencher o cache após um miss).
+        Dias com horários fora da grade de 30 minutos ficam marcados como
+        não cacheáveis e continuam sendo calculados pelo banco.
+
+        Returns:
+            bool: True se o registro foi gravado
+        """
+        posicao = self._posicao(medico_id, data)
+        if posicao is None or sequencia_esperada == -1:
+            return False
+
+        bitmap = _horarios_para_bitmap(horarios)
+        ordinal = data.toordinal() if bitmap is not None else -data.toordinal()
+
+        with self._lock_escrita():
+            sequencia = _REGISTRO.unpack_from(self._mapa, posicao)[0]
+            if sequencia_esperada is not None and sequencia != sequencia_esperada:
+                return False
+            self._escrever(posicao, sequencia, ordinal, bitmap or 0)
+        return True
+
+    def invalidar(self, medico_id: int, data: Optional[date] = None) -> Optional[int]:
+        """
+        Remove do cache um dia do médico, ou todos os dias se data não for informada
+
+        Returns:
+            Com data: a sequência do registro após a invalidação, para uma
+            gravação condicional do dia recalculado (None fora da capacidade)
+        """
+        if not 0 <= medico_id < self.max_medicos:
+            return None
+
+        if data is not None:
+            posicoes = [self._posicao(medico_id, data)]
+        else:
+            inicio = _CABECALHO.size + medico_id * self.dias * _REGISTRO.size
+            posicoes = range(inicio, inicio + self.dias * _REGISTRO.size, _REGISTRO.size)
+
+        with self._lock_escrita():
+            for posicao in posicoes:
+                sequencia = _REGISTRO.unpack_from(self._mapa, posicao)[0]
+                self._escrever(posicao, sequencia, 0, 0)
+        return (sequencia + 2) & 0xFFFFFFFF if data is not None else None
+
+    def fechar(self):
+        self._mapa.close()
+        self._arquivo.close()
+
+
+_cache: Optional[CacheDisponibilidade] = None
+_cache_pid: Optional[int] = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache() -> Optional[CacheDisponibilidade]:
+    """
+    Retorna o cache do processo atual (aberto sob demanda, inclusive após fork)
+    ou None se CACHE_DISPONIBILIDADE_ARQUIVO não estiver configurado
+    """
+    global _cache, _cache_pid
+
+    if not settings.CACHE_DISPONIBILIDADE_ARQUIVO:
+        return None
+
+    if _cache is None or _cache_pid != os.getpid():
+        with _cache_lock:
+            if _cache is None or _cache_pid != os.getpid():
+                _cache = CacheDisponibilidade(
+                    settings.CACHE_DISPONIBILIDADE_ARQUIVO,
+                    max_medicos=settings.CACHE_DISPONIBILIDADE_MAX_MEDICOS,
+                    dias=settings.CACHE_DISPONIBILIDADE_DIAS
+                )
+                _cache_pid = os.getpid()
+    return _cache
+
+
+def horarios_livres(db: Session, medico_id: int, data: date) -> List[str]:
+    """
+    Horários livres do médico no dia, da mesma fonte do agendamento: slot_agenda
+    com AGENDAMENTO_POR_SLOTS, senão a agenda calculada. A leitura e a
+    atualização do cache usam esta função para que o cache nunca divirja
+    da fonte em uso.
+    """
+    if RegraSlotAgenda.ativo():
+        return RegraSlotAgenda.listar_livres(db, medico_id, data, data).get(data.isoformat(), [])
+    return RegraHorarioDisponivel.listar_horarios_disponiveis(
+        db, medico_id, data, duracao_consulta_minutos=MINUTOS_POR_SLOT
+    )
+
+
+def atualizar_disponibilidade(db: Session, medico_id: int, *datas: date):
+    """
+    Recalcula no cache os dias afetados por uma alteração já commitada
+    (agendamento, cancelamento, reagendamento, bloqueio)
+
+    O dia é invalidado antes do recálculo e gravado só se ninguém o
+    invalidou depois: de duas alterações simultâneas, a que leu o banco
+    antes do commit da outra perde a gravação (e o dia fica fora do cache ou
+    com o cálculo mais recente), nunca o inverso.
+    """
+    cache = obter_cache()
+    if cache is None:
+        return
+
+    for data in set(datas):
+        sequencia = cache.invalidar(medico_id, data)
+        if sequencia is None:
+            continue
+        horarios = horarios_livres(db, medico_id, data)
+        cache.gravar(medico_id, data, horarios, sequencia_esperada=sequencia)
+
+
+def invalidar_disponibilidade(medico_id: int):
+    """
+    Descarta todos os dias em cache do médico
+    Usado quando o horário de trabalho semanal muda e afeta datas indeterminadas
+    """
+    cache = obter_cache()
+    if cache is not None:
+        cache.invalidar(medico_id)
@@ -0,0 +1,75 @@
+"""
+Credenciais de Login - Clínica Saúde+
+Busca de e-mail/senha sobre a visão credencial_usuario, que une paciente,
+médico e administrador em uma única consulta.
+"""
+from typing import Optional
+
+from sqlalchemy import and_, exists, not_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.models import Administrador, Medico, Paciente, credencial_usuario
+
+# tipo da credencial -> (tabela, chave primária)
+TABELAS_POR_TIPO = {
+    "paciente": (Paciente, Paciente.id_paciente),
+    "medico": (Medico, Medico.id_medico),
+    "administrador": (Administrador, Administrador.id_admin),
+}
+
+
+class RegraCredencial:
+    """
+    Consulta às credenciais dos três tipos de usuário
+    """
+    
+    @staticmethod
+    def buscar(db: Session, email: str):
+        """
+        Credencial do e-mail em uma única ida ao banco
+        
+        Se o mesmo e-mail existir em mais de um tipo (dados anteriores à
+        verificação de e-mail entre tipos), vale a ordem antiga do login:
+        paciente, médico, administrador.
+        
+        Returns:
+            Row com tipo, id_usuario, email, senha_hash e esta_bloqueado, ou None
+        """
+        return db.execute(
+            select(credencial_usuario)
+            .where(credencial_usuario.c.email == email)
+            .order_by(credencial_usuario.c.prioridade)
+            .limit(1)
+        ).first()
+    
+    @staticmethod
+    def email_em_uso(
+        db: Session,
+        email: str,
+        exceto_tipo: Optional[str] = None,
+        exceto_id: Optional[int] = None
+    ) -> bool:
+        """
+        Verifica se o e-mail já pertence a qualquer usuário, de qualquer tipo
+        
+        Args:
+            exceto_tipo, exceto_id: Ignora o próprio usuário (ao alterar o e-mail)
+        """
+        condicoes = [credencial_usuario.c.email == email]
+        if exceto_tipo is not None:
+            condicoes.append(not_(and_(
+                credencial_usuario.c.tipo == exceto_tipo,
+                credencial_usuario.c.id_usuario == exceto_id
+            )))
+        return db.execute(select(exists().where(*condicoes))).scalar()
+    
+    @staticmethod
+    def atualizar_hash(db: Session, tipo: str, id_usuario: int, senha_hash: str) -> None:
+        """Grava um novo hash de senha na tabela do tipo de usuário. Não faz commit."""
+        modelo, chave = TABELAS_POR_TIPO[tipo]
+        db.execute(
+            update(modelo)
+            .where(chave == id_usuario)
+            .values(senha_hash=senha_hash)
+            .execution_options(synchronize_session=False)
+        )
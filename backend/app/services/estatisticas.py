@@ -0,0 +1,310 @@
+"""
+Estatísticas administrativas - Clínica Saúde+
+Os painéis leem estatisticas_diarias (consultas por dia, médico e status,
+mantida por gatilhos em consulta) em vez de recontar consulta: poucas linhas
+por dia, qualquer que seja o tamanho do histórico.
+
+O dashboard é uma única instrução: agregados filtrados (SUM(...) FILTER
+(WHERE ...)) sobre estatisticas_diarias e os totais de pacientes e médicos
+como subconsultas escalares.
+"""
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import desc, func, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import (
+    BloqueioHorario, Consulta, EstatisticaDiaria, Especialidade, Medico, Paciente, PlanoSaude
+)
+from app.utils.cache_ttl import CacheTTL
+from app.utils.periodo import filtro_mes, filtro_periodo
+
+ChaveDiaria = Tuple[date, int, str]
+
+
+def _somar(*condicoes):
+    """Soma de total nas linhas que atendem às condições (0 se nenhuma)"""
+    soma = func.sum(EstatisticaDiaria.total)
+    return func.coalesce(soma.filter(*condicoes) if condicoes else soma, 0)
+
+
+class RegraEstatisticas:
+    """
+    Consultas agregadas para os painéis do administrador e do médico
+    """
+
+    @staticmethod
+    def calcular_dashboard(db: Session, hoje: date) -> dict:
+        """
+        Totais gerais (e pacientes bloqueados), consultas de hoje/da semana/do
+        mês e por status
+
+        Semana: de segunda-feira até hoje; mês: o mês inteiro de hoje.
+        """
+        inicio_semana = hoje - timedelta(days=hoje.weekday())
+        inicio_mes = hoje.replace(day=1)
+        proximo_mes = (inicio_mes + timedelta(days=32)).replace(day=1)
+        dia = EstatisticaDiaria.dia
+
+        linha = db.execute(
+            select(
+                select(func.count()).select_from(Paciente).scalar_subquery().label("total_pacientes"),
+                select(func.count()).select_from(Medico).scalar_subquery().label("total_medicos"),
+                select(func.count()).select_from(Paciente).where(Paciente.esta_bloqueado.is_(True))
+                .scalar_subquery().label("pacientes_bloqueados"),
+                _somar().label("total_consultas"),
+                _somar(dia == hoje).label("consultas_hoje"),
+                _somar(dia >= inicio_semana, dia <= hoje).label("consultas_semana"),
+                _somar(dia >= inicio_mes, dia < proximo_mes).label("consultas_mes"),
+                _somar(EstatisticaDiaria.status == "agendada").label("consultas_agendadas"),
+                _somar(EstatisticaDiaria.status == "realizada").label("consultas_realizadas"),
+                _somar(EstatisticaDiaria.status == "cancelada").label("consultas_canceladas"),
+            ).select_from(EstatisticaDiaria)
+        ).one()
+        return dict(linha._mapping)
+
+    @staticmethod
+    def obter_dashboard(db: Session, hoje: Optional[date] = None) -> dict:
+        """
+        Dashboard servido pelo cache de DASHBOARD_CACHE_SEGUNDOS (0 = sem cache)
+
+        Com o cache vencido, só uma requisição recalcula; as simultâneas
+        esperam e recebem o mesmo resultado.
+        """
+        hoje = hoje or date.today()
+        cache = obter_cache_dashboard()
+        if cache is None:
+            return RegraEstatisticas.calcular_dashboard(db, hoje)
+        return cache.obter(hoje, lambda: RegraEstatisticas.calcular_dashboard(db, hoje))
+
+    @staticmethod
+    def totais_por_status(db: Session, *status: str) -> Dict[str, int]:
+        """Total de consultas (todas as datas) e de cada status pedido"""
+        linha = db.execute(
+            select(
+                _somar().label("total"),
+                *(_somar(EstatisticaDiaria.status == s).label(s) for s in status)
+            ).select_from(EstatisticaDiaria)
+        ).one()
+        return dict(linha._mapping)
+
+    @staticmethod
+    def especialidades_mais_procuradas(db: Session, limite: int = 3) -> List[dict]:
+        """Especialidades com mais consultas (qualquer status)"""
+        total = func.sum(EstatisticaDiaria.total).label("total")
+        linhas = db.execute(
+            select(Especialidade.nome, total)
+            .join(Medico, Medico.id_especialidade_fk == Especialidade.id_especialidade)
+            .join(EstatisticaDiaria, EstatisticaDiaria.id_medico_fk == Medico.id_medico)
+            .group_by(Especialidade.nome)
+            .having(func.sum(EstatisticaDiaria.total) > 0)
+            .order_by(desc("total"))
+            .limit(limite)
+        ).all()
+        return [{"nome": nome, "total": total} for nome, total in linhas]
+
+    @staticmethod
+    def estatisticas_medicos(
+        db: Session, hoje: date, medico_ids: Optional[List[int]] = None,
+        id_especialidade: Optional[int] = None
+    ) -> List[dict]:
+        """
+        Consultas agendadas/realizadas de hoje e da semana (segunda a domingo)
+        e bloqueios de hoje em diante de cada médico, em uma instrução
+
+        Filtros opcionais: ids dos médicos e especialidade. Médicos sem
+        consultas ou bloqueios aparecem com zero; ordenado por id_medico.
+        """
+        inicio_semana = hoje - timedelta(days=hoje.weekday())
+        fim_semana = inicio_semana + timedelta(days=6)
+        dia = EstatisticaDiaria.dia
+
+        filtros = []
+        if medico_ids is not None:
+            filtros.append(Medico.id_medico.in_(medico_ids))
+        if id_especialidade is not None:
+            filtros.append(Medico.id_especialidade_fk == id_especialidade)
+        # Agrega só os médicos selecionados
+        selecionados = select(Medico.id_medico).where(*filtros)
+
+        consultas = (
+            select(
+                EstatisticaDiaria.id_medico_fk,
+                _somar(dia == hoje).label("hoje"),
+                _somar().label("semana"),
+            )
+            .where(
+                EstatisticaDiaria.id_medico_fk.in_(selecionados),
+                EstatisticaDiaria.status.in_(["agendada", "realizada"]),
+                dia >= inicio_semana, dia <= fim_semana,
+            )
+            .group_by(EstatisticaDiaria.id_medico_fk)
+            .subquery()
+        )
+        bloqueios = (
+            select(BloqueioHorario.id_medico_fk, func.count().label("total"))
+            .where(BloqueioHorario.id_medico_fk.in_(selecionados), BloqueioHorario.data >= hoje)
+            .group_by(BloqueioHorario.id_medico_fk)
+            .subquery()
+        )
+        linhas = db.execute(
+            select(
+                Medico.id_medico,
+                func.coalesce(consultas.c.hoje, 0),
+                func.coalesce(consultas.c.semana, 0),
+                func.coalesce(bloqueios.c.total, 0),
+            )
+            .outerjoin(consultas, consultas.c.id_medico_fk == Medico.id_medico)
+            .outerjoin(bloqueios, bloqueios.c.id_medico_fk == Medico.id_medico)
+            .where(*filtros)
+            .order_by(Medico.id_medico)
+        ).all()
+        return [
+            {
+                "id_medico": id_medico,
+                "consultas_hoje": consultas_hoje,
+                "consultas_semana": consultas_semana,
+                "horarios_bloqueados": horarios_bloqueados,
+            }
+            for id_medico, consultas_hoje, consultas_semana, horarios_bloqueados in linhas
+        ]
+
+    @staticmethod
+    def estatisticas_planos(
+        db: Session, data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+        hoje: Optional[date] = None
+    ) -> List[dict]:
+        """
+        Pacientes (quantidade e percentual do total) e consultas no período
+        de cada plano de saúde, em uma instrução
+
+        O período é de data_inicio a data_fim (inclusive, limites None não
+        filtram); sem nenhum dos dois, o mês de hoje. Planos sem pacientes
+        ou sem consultas aparecem com zero.
+        """
+        if data_inicio is None and data_fim is None:
+            periodo = filtro_mes(Consulta.data_hora_inicio, hoje or date.today())
+        else:
+            periodo = filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim)
+        
+        pacientes = (
+            select(Paciente.id_plano_saude_fk, func.count().label("total"))
+            .group_by(Paciente.id_plano_saude_fk)
+            .subquery()
+        )
+        consultas = (
+            select(Paciente.id_plano_saude_fk, func.count().label("total"))
+            .join(Consulta, Consulta.id_paciente_fk == Paciente.id_paciente)
+            .where(*periodo)
+            .group_by(Paciente.id_plano_saude_fk)
+            .subquery()
+        )
+        linhas = db.execute(
+            select(
+                PlanoSaude.id_plano_saude, PlanoSaude.nome, PlanoSaude.cobertura_info,
+                func.coalesce(pacientes.c.total, 0),
+                func.coalesce(consultas.c.total, 0),
+                select(func.count()).select_from(Paciente).scalar_subquery(),
+            )
+            .outerjoin(pacientes, pacientes.c.id_plano_saude_fk == PlanoSaude.id_plano_saude)
+            .outerjoin(consultas, consultas.c.id_plano_saude_fk == PlanoSaude.id_plano_saude)
+            .order_by(PlanoSaude.id_plano_saude)
+        ).all()
+        return [
+            {
+                "id_plano_saude": id_plano_saude,
+                "nome": nome,
+                "cobertura_info": cobertura_info,
+                "qtd_pacientes": qtd_pacientes,
+                "percentual_pacientes": round(qtd_pacientes / total_pacientes * 100, 1) if total_pacientes else 0,
+                "consultas_mes": consultas_periodo,
+            }
+            for id_plano_saude, nome, cobertura_info, qtd_pacientes, consultas_periodo, total_pacientes in linhas
+        ]
+
+    # ----- Reconciliação -----
+
+    @staticmethod
+    def _contagem_de_consulta():
+        """(dia, médico, status, total) calculados direto de consulta"""
+        return select(
+            func.date(Consulta.data_hora_inicio).label("dia"),
+            Consulta.id_medico_fk,
+            func.coalesce(Consulta.status, "").label("status"),
+            func.count().label("total"),
+        ).group_by(
+            func.date(Consulta.data_hora_inicio), Consulta.id_medico_fk, func.coalesce(Consulta.status, "")
+        )
+
+    @staticmethod
+    def reconstruir_diarias(db: Session) -> int:
+        """
+        Refaz estatisticas_diarias a partir de consulta (sem commit)
+
+        No PostgreSQL trava consulta contra escrita até o commit, para que
+        nenhuma alteração fique de fora da contagem.
+
+        Returns:
+            int: linhas gravadas
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("LOCK TABLE consulta IN SHARE MODE"))
+        db.query(EstatisticaDiaria).delete(synchronize_session=False)
+        resultado = db.execute(
+            EstatisticaDiaria.__table__.insert().from_select(
+                ["dia", "id_medico_fk", "status", "total"], RegraEstatisticas._contagem_de_consulta()
+            )
+        )
+        return resultado.rowcount
+
+    @staticmethod
+    def divergencias_diarias(db: Session) -> List[dict]:
+        """
+        Diferenças entre estatisticas_diarias e a contagem direta em consulta
+        (linhas zeradas equivalem a linhas ausentes)
+
+        Returns:
+            list: {"dia", "id_medico", "status", "esperado", "registrado"}, vazia se conferem
+        """
+        esperado: Dict[ChaveDiaria, int] = {
+            (_como_data(dia), medico, status): total
+            for dia, medico, status, total in db.execute(RegraEstatisticas._contagem_de_consulta())
+        }
+        registrado: Dict[ChaveDiaria, int] = {
+            (dia, medico, status): total
+            for dia, medico, status, total in db.execute(
+                select(
+                    EstatisticaDiaria.dia, EstatisticaDiaria.id_medico_fk,
+                    EstatisticaDiaria.status, EstatisticaDiaria.total
+                ).where(EstatisticaDiaria.total != 0)
+            )
+        }
+        return [
+            {
+                "dia": chave[0], "id_medico": chave[1], "status": chave[2],
+                "esperado": esperado.get(chave, 0), "registrado": registrado.get(chave, 0)
+            }
+            for chave in sorted(esperado.keys() | registrado.keys())
+            if esperado.get(chave, 0) != registrado.get(chave, 0)
+        ]
+
+
+def _como_data(valor) -> date:
+    """func.date devolve texto no SQLite e date no PostgreSQL"""
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+_cache_dashboard: Optional[CacheTTL] = None
+_trava = threading.Lock()
+
+
+def obter_cache_dashboard() -> Optional[CacheTTL]:
+    """Cache do processo; None se DASHBOARD_CACHE_SEGUNDOS = 0"""
+    global _cache_dashboard
+    with _trava:
+        if _cache_dashboard is None and settings.DASHBOARD_CACHE_SEGUNDOS > 0:
+            _cache_dashboard = CacheTTL("dashboard", settings.DASHBOARD_CACHE_SEGUNDOS)
+        return _cache_dashboard
@@ -0,0 +1,145 @@
+"""
+Exportação em fluxo (NDJSON/CSV) - Clínica Saúde+
+Para cargas completas (BI, planilhas): as linhas saem do banco por cursor do
+servidor (yield_per, que liga stream_results) em lotes de EXPORTACAO_LOTE e
+cada lote vira um pedaço da resposta assim que chega. Nenhum objeto do ORM
+nem schema do Pydantic é criado: só tuplas com as colunas exportadas, já com
+os nomes de paciente, médico e especialidade vindos do JOIN. A memória
+ocupada é a de um lote, qualquer que seja o tamanho da tabela.
+
+Formatos:
+- ndjson: um objeto JSON por linha (datas em ISO 8601)
+- csv: cabeçalho com os nomes das colunas e uma linha por registro
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from typing import Iterator, Optional
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import Consulta, Especialidade, Medico, Paciente, PlanoSaude
+from app.utils.periodo import filtro_periodo
+
+TIPOS_DE_CONTEUDO = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _valor_json(valor):
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não exportável: {type(valor).__name__}")
+
+
+class RegraExportacao:
+    """
+    Instruções das exportações (colunas planas, em ordem de id) e a geração
+    dos pedaços da resposta
+    """
+
+    @staticmethod
+    def consultas(
+        data_inicio: Optional[date] = None, data_fim: Optional[date] = None, status: Optional[str] = None
+    ) -> Select:
+        instrucao = (
+            select(
+                Consulta.id_consulta,
+                Consulta.data_hora_inicio,
+                Consulta.data_hora_fim,
+                Consulta.status,
+                Consulta.id_paciente_fk.label("id_paciente"),
+                Paciente.nome.label("paciente"),
+                Consulta.id_medico_fk.label("id_medico"),
+                Medico.nome.label("medico"),
+                Especialidade.nome.label("especialidade"),
+            )
+            .join(Paciente, Paciente.id_paciente == Consulta.id_paciente_fk)
+            .join(Medico, Medico.id_medico == Consulta.id_medico_fk)
+            .join(Especialidade, Especialidade.id_especialidade == Medico.id_especialidade_fk)
+            .where(*filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim))
+            .order_by(Consulta.id_consulta)
+        )
+        if status is not None:
+            instrucao = instrucao.where(Consulta.status == status)
+        return instrucao
+
+    @staticmethod
+    def pacientes(bloqueado: Optional[bool] = None, id_plano_saude: Optional[int] = None) -> Select:
+        instrucao = (
+            select(
+                Paciente.id_paciente,
+                Paciente.nome,
+                Paciente.cpf,
+                Paciente.email,
+                Paciente.telefone,
+                Paciente.data_nascimento,
+                Paciente.esta_bloqueado,
+                Paciente.faltas_consecutivas,
+                Paciente.id_plano_saude_fk.label("id_plano_saude"),
+                PlanoSaude.nome.label("plano_saude"),
+            )
+            .outerjoin(PlanoSaude, PlanoSaude.id_plano_saude == Paciente.id_plano_saude_fk)
+            .order_by(Paciente.id_paciente)
+        )
+        if bloqueado is not None:
+            instrucao = instrucao.where(Paciente.esta_bloqueado == bloqueado)
+        if id_plano_saude is not None:
+            instrucao = instrucao.where(Paciente.id_plano_saude_fk == id_plano_saude)
+        return instrucao
+
+    @staticmethod
+    def medicos(id_especialidade: Optional[int] = None) -> Select:
+        instrucao = (
+            select(
+                Medico.id_medico,
+                Medico.nome,
+                Medico.crm,
+                Medico.cpf,
+                Medico.email,
+                Medico.telefone,
+                Medico.id_especialidade_fk.label("id_especialidade"),
+                Especialidade.nome.label("especialidade"),
+            )
+            .join(Especialidade, Especialidade.id_especialidade == Medico.id_especialidade_fk)
+            .order_by(Medico.id_medico)
+        )
+        if id_especialidade is not None:
+            instrucao = instrucao.where(Medico.id_especialidade_fk == id_especialidade)
+        return instrucao
+
+    @staticmethod
+    def gerar(db: Session, instrucao: Select, formato: str, lote: Optional[int] = None) -> Iterator[str]:
+        """
+        Pedaços da exportação, um por lote de linhas lidas do cursor
+
+        O cursor fica aberto enquanto a resposta é enviada e é fechado ao
+        fim ou se o cliente desconectar.
+        """
+        lote = lote or settings.EXPORTACAO_LOTE
+        resultado = db.execute(instrucao.execution_options(yield_per=lote))
+        try:
+            colunas = list(resultado.keys())
+            if formato == "csv":
+                buffer = io.StringIO()
+                escritor = csv.writer(buffer)
+                escritor.writerow(colunas)
+                for linhas in resultado.partitions():
+                    escritor.writerows(linhas)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                if buffer.tell():
+                    yield buffer.getvalue()
+            else:
+                for linhas in resultado.partitions():
+                    yield "".join(
+                        json.dumps(dict(zip(colunas, linha)), default=_valor_json, ensure_ascii=False) + "\n"
+                        for linha in linhas
+                    )
+        finally:
+            resultado.close()
@@ -0,0 +1,328 @@
+"""
+Geração de relatórios em segundo plano - Clínica Saúde+
+O pedido grava um Relatorio pendente e é entregue a um pool de processos de
+tamanho fixo; a requisição responde na hora (202) e o administrador consulta
+o status ou baixa o arquivo depois. O reportlab é Python puro e segura o GIL
+enquanto monta o PDF: fora do processo da API, a geração não disputa a CPU
+com as threads que atendem as requisições.
+
+Cada tarefa abre a própria sessão (no processo filho, com o engine dele),
+renderiza o relatório só no formato pedido e copia o arquivo em pedaços
+para RELATORIOS_DIRETORIO (o nome fica em Relatorio.caminho_arquivo; o
+download também lê em pedaços). O PDF lê as linhas do cursor enquanto monta as
+páginas, num arquivo temporário: a memória não cresce com o relatório. Os
+demais formatos encerram a transação antes da renderização e os arquivos já
+gerados para os mesmos filtros e dados vêm do cache de relatórios do
+processo filho (sem consulta nem renderização).
+
+A admissão é limitada a RELATORIOS_TRABALHADORES + RELATORIOS_FILA_MAXIMA
+tarefas em andamento; além disso o pedido falha na hora
+(FilaRelatoriosCheia -> 503) e a linha fica registrada com status erro.
+
+Tarefas que ficaram com um processo que não existe mais (queda, falta de
+memória, novo deploy) passam a erro na inicialização seguinte, se pedidas há
+mais de RELATORIOS_TEMPO_MAXIMO_SEGUNDOS (recuperar_relatorios_interrompidos).
+
+Métricas: relatorios_espera_ms (fila), relatorios_geracao_ms,
+relatorios_em_andamento, relatorios_rejeitados, relatorios_erros,
+relatorios_interrompidos.
+"""
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Callable, Dict, IO, Iterator, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.models import Relatorio
+from app.services.relatorios import RegraRelatorios, RelatorioEmCache
+from app.utils.metricas import metricas
+
+
+class FilaRelatoriosCheia(Exception):
+    """Nenhuma vaga para novas tarefas de relatório"""
+
+
+# Tamanho dos pedaços na cópia para o disco e no download
+_PEDACO_BYTES = 64 * 1024
+
+
+def caminho_arquivo(nome: str) -> str:
+    return os.path.join(settings.RELATORIOS_DIRETORIO, nome)
+
+
+def gravar_arquivo(origem: IO[bytes], nome: str):
+    """Copia origem em pedaços para RELATORIOS_DIRETORIO; o nome só aparece com o arquivo completo"""
+    os.makedirs(settings.RELATORIOS_DIRETORIO, exist_ok=True)
+    destino = caminho_arquivo(nome)
+    parcial = f"{destino}.parcial"
+    try:
+        with open(parcial, "wb") as arquivo:
+            shutil.copyfileobj(origem, arquivo, _PEDACO_BYTES)
+    except BaseException:
+        os.remove(parcial)
+        raise
+    os.replace(parcial, destino)
+
+
+def ler_arquivo(nome: str) -> Tuple[int, Iterator[bytes]]:
+    """
+    Tamanho e pedaços do arquivo gravado (fechado ao fim da leitura)
+
+    Raises:
+        FileNotFoundError: arquivo removido do diretório
+    """
+    arquivo = open(caminho_arquivo(nome), "rb")
+
+    def pedacos() -> Iterator[bytes]:
+        with arquivo:
+            while pedaco := arquivo.read(_PEDACO_BYTES):
+                yield pedaco
+
+    return os.fstat(arquivo.fileno()).st_size, pedacos()
+
+
+def gerar_relatorio(fabrica_sessao: Callable[[], Session], id_relatorio: int) -> Optional[Tuple[float, float, bool]]:
+    """
+    Executa a tarefa pendente id_relatorio e grava o resultado (concluido ou erro)
+
+    Returns:
+        (início em segundos desde a época, duração em s, sucesso) para as
+        métricas de quem enviou; None se a tarefa não estava pendente
+    """
+    db = fabrica_sessao()
+    try:
+        relatorio = db.get(Relatorio, id_relatorio)
+        if relatorio is None or relatorio.status != "pendente":
+            return None
+        relatorio.status = "processando"
+        tipo, formato, filtros = relatorio.tipo, relatorio.formato, relatorio.parametros
+        db.commit()
+
+        inicio = time.time()
+        cronometro = time.perf_counter()
+        sucesso = True
+        try:
+            gerado = RelatorioEmCache(db, tipo, **RegraRelatorios.filtros_de_json(filtros))
+            nome = f"{id_relatorio}.{formato}"
+            with gerado.abrir(formato) as origem:
+                gravar_arquivo(origem, nome)
+            relatorio.caminho_arquivo = nome
+            relatorio.status = "concluido"
+        except Exception as erro:
+            db.rollback()
+            sucesso = False
+            relatorio.status = "erro"
+            relatorio.mensagem_erro = f"{type(erro).__name__}: {erro}"[:1000]
+        relatorio.data_conclusao = datetime.utcnow()
+        db.commit()
+        return inicio, time.perf_counter() - cronometro, sucesso
+    finally:
+        db.close()
+
+
+def _gerar_no_processo(id_relatorio: int) -> Optional[Tuple[float, float, bool]]:
+    """Executa no processo do pool, com as sessões do próprio processo"""
+    return gerar_relatorio(SessionLocal, id_relatorio)
+
+
+class FilaRelatorios:
+    """
+    Pool de processos com admissão limitada
+
+    trabalhadores=0 executa a tarefa na própria thread (testes,
+    desenvolvimento), mantendo o limite de admissão e as métricas.
+    em_processos=False usa um pool de threads com fabrica_sessao (testes que
+    compartilham a conexão do banco em memória).
+    """
+
+    def __init__(
+        self, trabalhadores: int, fila_maxima: int, fabrica_sessao: Callable[[], Session],
+        em_processos: bool = True
+    ):
+        self.trabalhadores = trabalhadores
+        self.fabrica_sessao = fabrica_sessao
+        self.em_processos = em_processos
+        self._vagas = threading.BoundedSemaphore(max(trabalhadores, 1) + fila_maxima)
+        self._executor: Optional[Executor] = None
+        self._tarefas: Dict[int, Future] = {}
+        self._trava = threading.Lock()
+
+    def _obter_executor(self) -> Executor:
+        with self._trava:
+            if self._executor is None:
+                if self.em_processos:
+                    # spawn: o processo da API tem threads; fork poderia herdar travas presas
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.trabalhadores,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.trabalhadores, thread_name_prefix="relatorios"
+                    )
+            return self._executor
+
+    def _descartar_executor(self, executor: Executor):
+        """Pool quebrado (processo morto): o próximo pedido cria outro"""
+        with self._trava:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _liberar_vaga(self, id_relatorio: int):
+        with self._trava:
+            self._tarefas.pop(id_relatorio, None)
+        metricas.incrementar("relatorios_em_andamento", -1)
+        self._vagas.release()
+
+    def _registrar(self, enviado: float, resultado: Optional[Tuple[float, float, bool]]):
+        if resultado is None:
+            return
+        inicio, duracao, sucesso = resultado
+        metricas.observar("relatorios_espera_ms", max(inicio - enviado, 0.0) * 1000)
+        metricas.observar("relatorios_geracao_ms", duracao * 1000)
+        if not sucesso:
+            metricas.incrementar("relatorios_erros")
+
+    def _concluir(self, id_relatorio: int, enviado: float, executor: Executor, futuro: Future):
+        try:
+            if not futuro.cancelled():
+                self._registrar(enviado, futuro.result())
+        except Exception as erro:
+            # Processo morto no meio da tarefa (memória, sinal) ou banco fora
+            # do ar antes do resultado: a linha não fica pendente/processando
+            metricas.incrementar("relatorios_erros")
+            if isinstance(erro, BrokenProcessPool):
+                self._descartar_executor(executor)
+            marcar_interrompidos(
+                self.fabrica_sessao, [id_relatorio], f"Geração interrompida ({type(erro).__name__})"
+            )
+        finally:
+            self._liberar_vaga(id_relatorio)
+
+    def enviar(self, id_relatorio: int):
+        """
+        Agenda a geração do Relatorio pendente id_relatorio
+
+        Raises:
+            FilaRelatoriosCheia: sem vaga ou pool já encerrado
+        """
+        if not self._vagas.acquire(blocking=False):
+            metricas.incrementar("relatorios_rejeitados")
+            raise FilaRelatoriosCheia()
+        metricas.incrementar("relatorios_em_andamento")
+        enviado = time.time()
+
+        if self.trabalhadores == 0:
+            try:
+                self._registrar(enviado, gerar_relatorio(self.fabrica_sessao, id_relatorio))
+            finally:
+                self._liberar_vaga(id_relatorio)
+            return
+
+        executor = self._obter_executor()
+        try:
+            if self.em_processos:
+                futuro = executor.submit(_gerar_no_processo, id_relatorio)
+            else:
+                futuro = executor.submit(gerar_relatorio, self.fabrica_sessao, id_relatorio)
+        except RuntimeError as erro:
+            self._liberar_vaga(id_relatorio)
+            if isinstance(erro, BrokenProcessPool):
+                self._descartar_executor(executor)
+            raise FilaRelatoriosCheia()
+        with self._trava:
+            self._tarefas[id_relatorio] = futuro
+        futuro.add_done_callback(lambda futuro: self._concluir(id_relatorio, enviado, executor, futuro))
+
+    def encerrar(self):
+        """
+        Para de aceitar tarefas; as que ainda não começaram são canceladas e
+        marcadas com erro (as em execução terminam normalmente)
+        """
+        with self._trava:
+            executor, self._executor = self._executor, None
+            tarefas = dict(self._tarefas)
+        if executor is None:
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+        canceladas = [id_relatorio for id_relatorio, futuro in tarefas.items() if futuro.cancelled()]
+        if canceladas:
+            marcar_interrompidos(self.fabrica_sessao, canceladas)
+
+
+def _marcar_erro(fabrica_sessao: Callable[[], Session], condicao, mensagem: str) -> int:
+    """Tarefas ainda pendentes ou processando que atendem à condição passam a erro"""
+    db = fabrica_sessao()
+    try:
+        marcadas = db.execute(
+            update(Relatorio)
+            .where(condicao, Relatorio.status.in_(("pendente", "processando")))
+            .values(status="erro", mensagem_erro=mensagem, data_conclusao=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        return marcadas
+    finally:
+        db.close()
+
+
+def marcar_interrompidos(
+    fabrica_sessao: Callable[[], Session], ids_relatorios, mensagem: str = "Geração interrompida"
+):
+    _marcar_erro(fabrica_sessao, Relatorio.id_relatorio.in_(ids_relatorios), mensagem)
+
+
+def recuperar_relatorios_interrompidos(
+    fabrica_sessao: Callable[[], Session] = SessionLocal, tempo_maximo_segundos: Optional[float] = None
+) -> int:
+    """
+    Marca com erro as tarefas pendentes ou processando pedidas há mais de
+    tempo_maximo_segundos (RELATORIOS_TEMPO_MAXIMO_SEGUNDOS)
+
+    Chamado na inicialização: nenhum processo vivo vai concluí-las. O prazo
+    preserva as tarefas recentes, que podem estar em outro worker.
+
+    Returns:
+        Quantidade de tarefas marcadas
+    """
+    if tempo_maximo_segundos is None:
+        tempo_maximo_segundos = settings.RELATORIOS_TEMPO_MAXIMO_SEGUNDOS
+    limite = datetime.utcnow() - timedelta(seconds=tempo_maximo_segundos)
+    marcadas = _marcar_erro(
+        fabrica_sessao, Relatorio.data_geracao < limite, "Geração interrompida (servidor reiniciado)"
+    )
+    metricas.incrementar("relatorios_interrompidos", marcadas)
+    return marcadas
+
+
+_fila: Optional[FilaRelatorios] = None
+_fila_trava = threading.Lock()
+
+
+def obter_fila_relatorios() -> FilaRelatorios:
+    """Fila do processo atual, criada no primeiro pedido"""
+    global _fila
+    with _fila_trava:
+        if _fila is None:
+            _fila = FilaRelatorios(
+                settings.RELATORIOS_TRABALHADORES, settings.RELATORIOS_FILA_MAXIMA, SessionLocal
+            )
+        return _fila
+
+
+def encerrar_fila_relatorios():
+    """Encerra o pool de processos (desligamento da aplicação)"""
+    global _fila
+    with _fila_trava:
+        fila, _fila = _fila, None
+    if fila is not None:
+        fila.encerrar()
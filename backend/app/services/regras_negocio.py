@@ -2,11 +2,20 @@
 Serviços de Regras de Negócio - Clínica Saúde+
 Implementa todas as regras de negócio especificadas no EstudoDeCaso.txt
 """
-from datetime import datetime, timedelta, date
+import heapq
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import islice
+from datetime import datetime, timedelta, date, time
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
-from app.models.models import Consulta, Paciente, Medico, HorarioTrabalho
-from typing import List, Optional
+from sqlalchemy import and_, case, exists, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app.models.models import (
+    Consulta, Paciente, Medico, HorarioTrabalho, BloqueioHorario,
+    EXCLUSAO_CONFLITO_CONSULTA
+)
+from app.utils.periodo import filtro_periodo
+from typing import Dict, List, Optional
 
 
 class RegraConsulta:
@@ -115,6 +124,17 @@ class RegraConsulta:
         
         return True, "Horário disponível"
     
+    @staticmethod
+    def violou_conflito_horario(erro: IntegrityError) -> bool:
+        """
+        RN4 no banco: indica se o IntegrityError veio da restrição de exclusão
+        que impede consultas sobrepostas do mesmo médico (PostgreSQL, 23P01)
+        """
+        return (
+            getattr(erro.orig, "pgcode", None) == "23P01"
+            or EXCLUSAO_CONFLITO_CONSULTA in str(erro.orig)
+        )
+    
     @staticmethod
     def validar_horario_trabalho_medico(
         db: Session,
@@ -159,7 +179,10 @@ class RegraPaciente:
     @staticmethod
     def contar_faltas_consecutivas(db: Session, paciente_id: int) -> int:
         """
-        Conta quantas faltas consecutivas o paciente teve (status='faltou')
+        Retorna quantas faltas consecutivas o paciente teve (status='faltou')
+        
+        Lê o contador Paciente.faltas_consecutivas, mantido por
+        registrar_mudanca_status sempre que o médico atualiza uma consulta
         
         Args:
             db: Sessão do banco de dados
@@ -168,23 +191,93 @@ class RegraPaciente:
         Returns:
             int: Número de faltas consecutivas
         """
-        # Buscar consultas passadas ordenadas por data decrescente
-        consultas = db.query(Consulta).filter(
-            and_(
-                Consulta.id_paciente_fk == paciente_id,
-                Consulta.data_hora_inicio < datetime.now()
+        faltas = db.query(Paciente.faltas_consecutivas).filter(
+            Paciente.id_paciente == paciente_id
+        ).scalar()
+        return faltas or 0
+    
+    @staticmethod
+    def registrar_mudanca_status(db: Session, paciente_id: int, status_antigo: str, novo_status: str):
+        """
+        Atualiza o contador de faltas consecutivas na mesma transação da
+        mudança de status: 'faltou' soma uma falta e 'realizada' zera
+        
+        Corrigir uma consulta que já era 'faltou' ou 'realizada' não tem
+        incremento equivalente: nesse caso o paciente é recalculado pelo
+        histórico (recalcular_faltas_consecutivas), com a linha travada para
+        serializar mudanças simultâneas do mesmo paciente. O incremento
+        pressupõe status registrados em ordem cronológica; fora disso, vale
+        o recálculo
+        """
+        if novo_status == status_antigo:
+            return
+        
+        if status_antigo in ('faltou', 'realizada'):
+            db.flush()
+            db.query(Paciente.id_paciente).filter(
+                Paciente.id_paciente == paciente_id
+            ).with_for_update().scalar()
+            RegraPaciente.recalcular_faltas_consecutivas(db, paciente_id)
+        elif novo_status == 'faltou':
+            db.query(Paciente).filter(Paciente.id_paciente == paciente_id).update(
+                {Paciente.faltas_consecutivas: Paciente.faltas_consecutivas + 1},
+                synchronize_session=False
+            )
+        elif novo_status == 'realizada':
+            db.query(Paciente).filter(Paciente.id_paciente == paciente_id).update(
+                {Paciente.faltas_consecutivas: 0},
+                synchronize_session=False
             )
-        ).order_by(Consulta.data_hora_inicio.desc()).all()
+    
+    @staticmethod
+    def recalcular_faltas_consecutivas(db: Session, paciente_id: Optional[int] = None) -> int:
+        """
+        Recalcula o contador a partir do histórico, com uma função de janela
+        sobre as consultas 'faltou' e 'realizada': para cada uma, soma quantas
+        realizadas vêm depois dela; as faltas com soma zero são as
+        consecutivas mais recentes (mesma regra do incremento)
         
-        faltas_consecutivas = 0
-        for consulta in consultas:
-            if consulta.status == 'faltou':
-                faltas_consecutivas += 1
-            else:
-                # Se encontrou uma consulta que não foi falta, para a contagem
-                break
+        Consultas até Paciente.faltas_zeradas_em (desbloqueio pelo
+        administrador) não contam. Usado nas correções de status
+        (registrar_mudanca_status), na carga inicial (migrações 007 e 015) e
+        para corrigir dados alterados fora da API. Não faz commit.
         
-        return faltas_consecutivas
+        Args:
+            db: Sessão do banco de dados
+            paciente_id: Recalcula só este paciente (None = todos)
+            
+        Returns:
+            int: Número de pacientes atualizados
+        """
+        presencas_posteriores = func.sum(
+            case((Consulta.status == 'faltou', 0), else_=1)
+        ).over(
+            partition_by=Consulta.id_paciente_fk,
+            order_by=Consulta.data_hora_inicio.desc(),
+            rows=(None, 0)
+        )
+        historico = select(
+            Consulta.id_paciente_fk.label("paciente_id"),
+            Consulta.data_hora_inicio.label("data_hora_inicio"),
+            presencas_posteriores.label("presencas_posteriores")
+        ).where(Consulta.status.in_(('faltou', 'realizada')))
+        if paciente_id is not None:
+            historico = historico.where(Consulta.id_paciente_fk == paciente_id)
+        historico = historico.cte("historico")
+        
+        faltas = select(func.count()).select_from(historico).where(
+            historico.c.paciente_id == Paciente.id_paciente,
+            historico.c.presencas_posteriores == 0,
+            or_(
+                Paciente.faltas_zeradas_em.is_(None),
+                historico.c.data_hora_inicio > Paciente.faltas_zeradas_em
+            )
+        ).scalar_subquery()
+        
+        atualizacao = update(Paciente).values(faltas_consecutivas=faltas)
+        if paciente_id is not None:
+            atualizacao = atualizacao.where(Paciente.id_paciente == paciente_id)
+        return db.execute(atualizacao.execution_options(synchronize_session=False)).rowcount
     
     @staticmethod
     def verificar_bloqueio_por_faltas(db: Session, paciente_id: int) -> tuple[bool, str]:
@@ -240,85 +333,330 @@ class RegraPaciente:
             return False, "Paciente não está bloqueado"
         
         paciente.esta_bloqueado = False
+        paciente.faltas_consecutivas = 0
+        paciente.faltas_zeradas_em = datetime.now()
         db.commit()
         
         return True, "Paciente desbloqueado com sucesso"
 
 
+def _mesclar_intervalos(intervalos) -> List[list]:
+    """
+    Ordena e funde intervalos [inicio, fim) sobrepostos ou adjacentes
+    
+    Returns:
+        List[list]: Intervalos disjuntos em ordem crescente
+    """
+    mesclados = []
+    for inicio, fim in sorted(intervalos):
+        if mesclados and inicio <= mesclados[-1][1]:
+            if fim > mesclados[-1][1]:
+                mesclados[-1][1] = fim
+        else:
+            mesclados.append([inicio, fim])
+    return mesclados
+
+
+def _primeira_sobreposicao(intervalos, posicao: int, inicio: datetime, fim: datetime) -> tuple:
+    """
+    Primeiro intervalo (lista em ordem de início) que se sobrepõe a [inicio, fim)
+    
+    Pula a partir de posicao os que terminam até inicio; consultado com
+    inícios crescentes, o ponteiro só avança.
+    
+    Returns:
+        tuple: (nova posição, (inicio, fim) do intervalo ou None)
+    """
+    while posicao < len(intervalos) and intervalos[posicao][1] <= inicio:
+        posicao += 1
+    if posicao < len(intervalos) and intervalos[posicao][0] < fim:
+        return posicao, intervalos[posicao]
+    return posicao, None
+
+
+def _slots_livres(expedientes, ocupados, duracao_consulta_minutos: int) -> List[datetime]:
+    """
+    Subtrai os intervalos ocupados (já mesclados) dos intervalos de expediente
+    de um dia e retorna o início de cada slot livre, em ordem crescente
+    
+    O ponteiro sobre os ocupados só avança, então cada expediente custa
+    O(slots + ocupados) em vez de O(slots × ocupados).
+    """
+    passo = timedelta(minutes=duracao_consulta_minutos)
+    fins_ocupados = [fim for _, fim in ocupados]
+    livres = []
+    
+    for inicio_expediente, fim_expediente in expedientes:
+        i = bisect_right(fins_ocupados, inicio_expediente)
+        slot = inicio_expediente
+        while slot < fim_expediente:
+            fim_slot = slot + passo
+            while i < len(ocupados) and ocupados[i][1] <= slot:
+                i += 1
+            if i == len(ocupados) or ocupados[i][0] >= fim_slot:
+                livres.append(slot)
+            slot = fim_slot
+    
+    return sorted(set(livres))
+
+
 class RegraHorarioDisponivel:
     """
     Regras para validação de horários disponíveis
     """
     
     @staticmethod
-    def listar_horarios_disponiveis(
+    def carregar_ocupacoes(
+        db: Session,
+        medicos_ids: List[int],
+        data_inicio: date,
+        data_fim: date,
+        incluir_consultas: bool = True
+    ) -> tuple[dict, dict, dict]:
+        """
+        Carrega em três consultas tudo o que define a disponibilidade de um
+        conjunto de médicos no período: horários de trabalho, bloqueios e
+        consultas ativas
+        
+        Returns:
+            tuple: (expedientes, bloqueios, consultas)
+                expedientes[id_medico][dia_semana] -> [(hora_inicio, hora_fim), ...]
+                bloqueios[(id_medico, data)] e consultas[(id_medico, data)] ->
+                [(inicio, fim), ...] em ordem de início, sem mesclar (consultas
+                vazio com incluir_consultas=False)
+        """
+        expedientes = defaultdict(lambda: defaultdict(list))
+        horarios = db.query(
+            HorarioTrabalho.id_medico_fk,
+            HorarioTrabalho.dia_semana,
+            HorarioTrabalho.hora_inicio,
+            HorarioTrabalho.hora_fim
+        ).filter(
+            HorarioTrabalho.id_medico_fk.in_(medicos_ids)
+        ).all()
+        for id_medico, dia_semana, hora_inicio, hora_fim in horarios:
+            expedientes[id_medico][dia_semana].append((hora_inicio, hora_fim))
+        
+        bloqueios = defaultdict(list)
+        linhas = db.query(
+            BloqueioHorario.id_medico_fk,
+            BloqueioHorario.data,
+            BloqueioHorario.hora_inicio,
+            BloqueioHorario.hora_fim
+        ).filter(
+            and_(
+                BloqueioHorario.id_medico_fk.in_(medicos_ids),
+                BloqueioHorario.data >= data_inicio,
+                BloqueioHorario.data <= data_fim
+            )
+        ).all()
+        for id_medico, data, hora_inicio, hora_fim in linhas:
+            bloqueios[(id_medico, data)].append(
+                (datetime.combine(data, hora_inicio), datetime.combine(data, hora_fim))
+            )
+        
+        consultas = defaultdict(list)
+        linhas = db.query(
+            Consulta.id_medico_fk,
+            Consulta.data_hora_inicio,
+            Consulta.data_hora_fim
+        ).filter(
+            and_(
+                Consulta.id_medico_fk.in_(medicos_ids),
+                *filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim),
+                Consulta.status.in_(['agendada', 'confirmada'])
+            )
+        ).all() if incluir_consultas else []
+        for id_medico, inicio, fim in linhas:
+            consultas[(id_medico, inicio.date())].append(
+                (inicio, fim or inicio + timedelta(minutes=30))
+            )
+        
+        for intervalos in (*bloqueios.values(), *consultas.values()):
+            intervalos.sort()
+        
+        return expedientes, bloqueios, consultas
+    
+    @staticmethod
+    def carregar_agenda(
         db: Session,
+        medicos_ids: List[int],
+        data_inicio: date,
+        data_fim: date,
+        incluir_consultas: bool = True
+    ) -> tuple[dict, dict]:
+        """
+        Agenda de carregar_ocupacoes com bloqueios e consultas juntos
+        (só bloqueios com incluir_consultas=False)
+        
+        Returns:
+            tuple: (expedientes, ocupados)
+                expedientes[id_medico][dia_semana] -> [(hora_inicio, hora_fim), ...]
+                ocupados[(id_medico, data)] -> [[inicio, fim], ...] mesclados
+        """
+        expedientes, bloqueios, consultas = RegraHorarioDisponivel.carregar_ocupacoes(
+            db, medicos_ids, data_inicio, data_fim, incluir_consultas
+        )
+        ocupados = defaultdict(list)
+        for chave in bloqueios.keys() | consultas.keys():
+            ocupados[chave] = _mesclar_intervalos(bloqueios.get(chave, []) + consultas.get(chave, []))
+        
+        return expedientes, ocupados
+    
+    @staticmethod
+    def slots_livres_no_dia(
+        expedientes: dict,
+        ocupados: dict,
         medico_id: int,
         data: date,
         duracao_consulta_minutos: int = 30
-    ) -> List[str]:
+    ) -> List[datetime]:
         """
-        Lista os horários disponíveis de um médico para uma data específica
-        considerando seu horário de trabalho e consultas já agendadas
+        Calcula os slots livres de um médico em uma data a partir da agenda
+        já carregada por carregar_agenda (sem acessar o banco)
+        """
+        expediente_dia = sorted(
+            (datetime.combine(data, hora_inicio), datetime.combine(data, hora_fim))
+            for hora_inicio, hora_fim in expedientes.get(medico_id, {}).get(data.weekday(), [])
+        )
+        if not expediente_dia:
+            return []
+        
+        return _slots_livres(
+            expediente_dia,
+            ocupados.get((medico_id, data), []),
+            duracao_consulta_minutos
+        )
+    
+    @staticmethod
+    def listar_agenda_periodo(
+        db: Session,
+        medico_id: int,
+        data_inicio: date,
+        data_fim: date,
+        duracao_consulta_minutos: int = 30
+    ) -> Dict[str, List[str]]:
+        """
+        Lista os horários disponíveis de um médico em um período de datas
+        
+        Carrega horários de trabalho, bloqueios e consultas do período inteiro
+        em três consultas e subtrai os intervalos ocupados dos intervalos de
+        expediente dia a dia.
         
         Args:
             db: Sessão do banco de dados
             medico_id: ID do médico
-            data: Data para verificar disponibilidade
+            data_inicio: Primeira data do período (inclusive)
+            data_fim: Última data do período (inclusive)
             duracao_consulta_minutos: Duração padrão da consulta em minutos
             
         Returns:
-            List[str]: Lista de horários disponíveis no formato "HH:MM"
+            Dict[str, List[str]]: Mapa "YYYY-MM-DD" -> horários "HH:MM";
+            dias sem nenhum horário livre são omitidos
         """
-        dia_semana = data.weekday()
+        expedientes, ocupados = RegraHorarioDisponivel.carregar_agenda(
+            db, [medico_id], data_inicio, data_fim
+        )
         
-        # Buscar horários de trabalho do médico neste dia da semana
-        horarios_trabalho = db.query(HorarioTrabalho).filter(
-            and_(
-                HorarioTrabalho.id_medico_fk == medico_id,
-                HorarioTrabalho.dia_semana == dia_semana
+        agenda = {}
+        data = data_inicio
+        while data <= data_fim:
+            slots = RegraHorarioDisponivel.slots_livres_no_dia(
+                expedientes, ocupados, medico_id, data, duracao_consulta_minutos
             )
-        ).all()
+            if slots:
+                agenda[data.isoformat()] = [slot.strftime("%H:%M") for slot in slots]
+            data += timedelta(days=1)
         
-        if not horarios_trabalho:
+        return agenda
+    
+    @staticmethod
+    def buscar_primeiros_horarios(
+        db: Session,
+        especialidade_id: int,
+        data_inicio: date,
+        data_fim: date,
+        limite: int = 10,
+        duracao_consulta_minutos: int = 30
+    ) -> List[dict]:
+        """
+        Busca os primeiros horários livres entre todos os médicos de uma especialidade
+        
+        Carrega médicos, horários de trabalho, bloqueios e consultas com uma
+        consulta por tabela e intercala os slots de cada médico com um heap,
+        parando assim que o limite é atingido.
+        
+        Args:
+            db: Sessão do banco de dados
+            especialidade_id: ID da especialidade
+            data_inicio: Primeira data da janela de busca (inclusive)
+            data_fim: Última data da janela de busca (inclusive)
+            limite: Quantidade máxima de horários retornados
+            duracao_consulta_minutos: Duração padrão da consulta em minutos
+            
+        Returns:
+            List[dict]: Horários em ordem cronológica com id_medico, medico_nome e data_hora
+        """
+        medicos = dict(
+            db.query(Medico.id_medico, Medico.nome).filter(
+                Medico.id_especialidade_fk == especialidade_id
+            ).all()
+        )
+        if not medicos:
             return []
         
-        # Buscar consultas já agendadas nesta data
-        consultas_agendadas = db.query(Consulta).filter(
-            and_(
-                Consulta.id_medico_fk == medico_id,
-                func.date(Consulta.data_hora_inicio) == data,
-                Consulta.status.in_(['agendada', 'confirmada'])
-            )
-        ).all()
+        expedientes, ocupados = RegraHorarioDisponivel.carregar_agenda(
+            db, list(medicos), data_inicio, data_fim
+        )
+        agora = datetime.now()
         
-        horarios_disponiveis = []
+        def slots_do_medico(medico_id: int):
+            data = data_inicio
+            while data <= data_fim:
+                for slot in RegraHorarioDisponivel.slots_livres_no_dia(
+                    expedientes, ocupados, medico_id, data, duracao_consulta_minutos
+                ):
+                    if slot > agora:
+                        yield slot, medico_id
+                data += timedelta(days=1)
+        
+        primeiros = heapq.merge(*(
+            slots_do_medico(medico_id) for medico_id in expedientes
+        ))
+        
+        return [
+            {
+                "id_medico": medico_id,
+                "medico_nome": medicos[medico_id],
+                "data_hora": slot
+            }
+            for slot, medico_id in islice(primeiros, limite)
+        ]
+    
+    @staticmethod
+    def listar_horarios_disponiveis(
+        db: Session,
+        medico_id: int,
+        data: date,
+        duracao_consulta_minutos: int = 30
+    ) -> List[str]:
+        """
+        Lista os horários disponíveis de um médico para uma data específica
+        considerando seu horário de trabalho, bloqueios e consultas já agendadas
         
-        for horario_trabalho in horarios_trabalho:
-            hora_atual = horario_trabalho.hora_inicio
-            hora_fim = horario_trabalho.hora_fim
+        Args:
+            db: Sessão do banco de dados
+            medico_id: ID do médico
+            data: Data para verificar disponibilidade
+            duracao_consulta_minutos: Duração padrão da consulta em minutos
             
-            while hora_atual < hora_fim:
-                # Criar datetime para verificar conflito
-                data_hora = datetime.combine(data, hora_atual)
-                data_hora_fim = data_hora + timedelta(minutes=duracao_consulta_minutos)
-                
-                # Verificar se este horário tem conflito com alguma consulta
-                tem_conflito = False
-                for consulta in consultas_agendadas:
-                    if (data_hora < consulta.data_hora_fim and 
-                        data_hora_fim > consulta.data_hora_inicio):
-                        tem_conflito = True
-                        break
-                
-                if not tem_conflito:
-                    horarios_disponiveis.append(hora_atual.strftime("%H:%M"))
-                
-                # Avançar para o próximo slot
-                hora_atual = (datetime.combine(date.today(), hora_atual) + 
-                             timedelta(minutes=duracao_consulta_minutos)).time()
-        
-        return sorted(horarios_disponiveis)
+        Returns:
+            List[str]: Lista de horários disponíveis no formato "HH:MM"
+        """
+        agenda = RegraHorarioDisponivel.listar_agenda_periodo(
+            db, medico_id, data, data, duracao_consulta_minutos
+        )
+        return agenda.get(data.isoformat(), [])
 
 
 class ValidadorAgendamento:
@@ -327,41 +665,308 @@ class ValidadorAgendamento:
     """
     
     @staticmethod
-    def validar_novo_agendamento(
+    def consultar_status_agendamento(
         db: Session,
         paciente_id: int,
         medico_id: int,
         data_hora_inicio: datetime,
         data_hora_fim: datetime
-    ) -> tuple[bool, str]:
+    ) -> dict:
         """
-        Valida todas as regras de negócio antes de criar um novo agendamento
+        Reúne em uma única instrução SQL tudo o que as regras de agendamento
+        precisam: existência de paciente e médico, bloqueio e faltas
+        consecutivas (RN3), consultas futuras (RN2), expediente e primeiro
+        bloqueio de agenda do médico e primeira consulta conflitante (RN4)
         
         Returns:
-            tuple: (pode_agendar: bool, mensagem: str)
+            dict: paciente_existe, esta_bloqueado, faltas_consecutivas,
+            consultas_futuras, medico_existe, no_expediente,
+            bloqueio_inicio, bloqueio_fim, conflito_inicio, conflito_fim
         """
-        # Validar se paciente está bloqueado
-        bloqueado, msg_bloqueio = RegraPaciente.verificar_bloqueio_por_faltas(db, paciente_id)
-        if bloqueado:
-            return False, msg_bloqueio
+        agora = datetime.now()
         
-        # Validar limite de consultas futuras
-        pode_agendar, msg_limite = RegraConsulta.validar_limite_consultas_futuras(db, paciente_id)
-        if not pode_agendar:
-            return False, msg_limite
+        consultas_paciente = select(
+            Consulta.data_hora_inicio.label("inicio"),
+            func.coalesce(Consulta.status, "").label("status")
+        ).where(
+            Consulta.id_paciente_fk == paciente_id
+        ).cte("consultas_paciente")
+        
+        consultas_futuras = select(func.count()).select_from(consultas_paciente).where(
+            consultas_paciente.c.inicio > agora,
+            consultas_paciente.c.status.in_(['agendada', 'confirmada'])
+        ).scalar_subquery()
+        
+        paciente = select(Paciente.esta_bloqueado).where(
+            Paciente.id_paciente == paciente_id
+        ).scalar_subquery()
+        # RN3: contador mantido por RegraPaciente.registrar_mudanca_status
+        faltas_consecutivas = select(Paciente.faltas_consecutivas).where(
+            Paciente.id_paciente == paciente_id
+        ).scalar_subquery()
         
-        # Validar se está no horário de trabalho do médico
-        no_horario, msg_horario = RegraConsulta.validar_horario_trabalho_medico(
-            db, medico_id, data_hora_inicio
+        hora = data_hora_inicio.time()
+        no_expediente = exists().where(
+            HorarioTrabalho.id_medico_fk == medico_id,
+            HorarioTrabalho.dia_semana == data_hora_inicio.weekday(),
+            HorarioTrabalho.hora_inicio <= hora,
+            HorarioTrabalho.hora_fim > hora
         )
-        if not no_horario:
-            return False, msg_horario
         
-        # Validar conflito de horário
-        sem_conflito, msg_conflito = RegraConsulta.validar_conflito_horario_medico(
-            db, medico_id, data_hora_inicio, data_hora_fim
+        # Bloqueios são do dia: um intervalo que passa da meia-noite vai até o fim do dia
+        fim_no_dia = data_hora_fim.time() if data_hora_fim.date() == data_hora_inicio.date() else time.max
+        bloqueio = select(BloqueioHorario.hora_inicio, BloqueioHorario.hora_fim).where(
+            BloqueioHorario.id_medico_fk == medico_id,
+            BloqueioHorario.data == data_hora_inicio.date(),
+            BloqueioHorario.hora_inicio < fim_no_dia,
+            BloqueioHorario.hora_fim > hora
+        ).order_by(BloqueioHorario.hora_inicio).limit(1).subquery("bloqueio")
+        
+        conflito = select(Consulta.data_hora_inicio, Consulta.data_hora_fim).where(
+            Consulta.id_medico_fk == medico_id,
+            Consulta.status.in_(['agendada', 'confirmada']),
+            Consulta.data_hora_inicio < data_hora_fim,
+            Consulta.data_hora_fim > data_hora_inicio
+        ).order_by(Consulta.data_hora_inicio).limit(1).subquery("conflito")
+        
+        linha = db.execute(select(
+            exists().where(Paciente.id_paciente == paciente_id).label("paciente_existe"),
+            paciente.label("esta_bloqueado"),
+            func.coalesce(faltas_consecutivas, 0).label("faltas_consecutivas"),
+            consultas_futuras.label("consultas_futuras"),
+            exists().where(Medico.id_medico == medico_id).label("medico_existe"),
+            no_expediente.label("no_expediente"),
+            select(bloqueio.c.hora_inicio).scalar_subquery().label("bloqueio_inicio"),
+            select(bloqueio.c.hora_fim).scalar_subquery().label("bloqueio_fim"),
+            select(conflito.c.data_hora_inicio).scalar_subquery().label("conflito_inicio"),
+            select(conflito.c.data_hora_fim).scalar_subquery().label("conflito_fim")
+        )).one()
+        
+        return dict(linha._mapping)
+    
+    @staticmethod
+    def aplicar_regras(
+        situacao: dict,
+        data_hora_inicio: datetime,
+        verificar_agenda_medico: bool = True
+    ) -> tuple[Optional[str], bool]:
+        """
+        Regras de agendamento de um pedido, na ordem em que são verificadas,
+        sobre as chaves de consultar_status_agendamento; o agendamento
+        individual e o lote (validar_lote) passam por aqui
+        
+        Ordem: paciente e médico existem, RN3 (bloqueio e faltas), RN2
+        (consultas futuras) e, com verificar_agenda_medico, expediente,
+        bloqueio de agenda e RN4 (conflito com consulta ativa)
+        
+        Returns:
+            tuple: (mensagem da primeira regra violada ou None,
+            bloquear_paciente: atingiu 3 faltas consecutivas e ainda não
+            está bloqueado)
+        """
+        if not situacao["paciente_existe"]:
+            return "Paciente não encontrado", False
+        if not situacao["medico_existe"]:
+            return "Médico não encontrado", False
+        
+        # RN3: paciente bloqueado ou que atingiu 3 faltas consecutivas
+        faltas = situacao["faltas_consecutivas"]
+        if situacao["esta_bloqueado"]:
+            return f"Paciente bloqueado por {faltas} faltas consecutivas. Entre em contato com a administração.", False
+        if faltas >= 3:
+            return f"Paciente bloqueado automaticamente por {faltas} faltas consecutivas. Entre em contato com a administração.", True
+        
+        # RN2: limite de consultas futuras
+        consultas_futuras = situacao["consultas_futuras"]
+        if consultas_futuras >= 2:
+            return f"Limite de consultas futuras atingido. Você já possui {consultas_futuras} consultas agendadas. Máximo permitido: 2.", False
+        
+        if not verificar_agenda_medico:
+            return None, False
+        
+        # Horário de trabalho do médico
+        if not situacao["no_expediente"]:
+            dias = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+            return f"Médico não atende neste horário. Verifique os horários disponíveis para {dias[data_hora_inicio.weekday()]}.", False
+        
+        # Agenda bloqueada pelo médico
+        if situacao["bloqueio_inicio"] is not None:
+            return f"Horário indisponível. O médico bloqueou a agenda das {situacao['bloqueio_inicio'].strftime('%H:%M')} às {situacao['bloqueio_fim'].strftime('%H:%M')}.", False
+        
+        # RN4: conflito de horário
+        if situacao["conflito_inicio"] is not None:
+            return f"Horário indisponível. O médico já possui consulta agendada das {situacao['conflito_inicio'].strftime('%H:%M')} às {situacao['conflito_fim'].strftime('%H:%M')}.", False
+        
+        return None, False
+    
+    @staticmethod
+    def avaliar_status_agendamento(
+        db: Session,
+        paciente_id: int,
+        situacao: dict,
+        data_hora_inicio: datetime,
+        verificar_agenda_medico: bool = True
+    ) -> tuple[bool, str]:
+        """
+        Aplica as regras de negócio ao resultado de consultar_status_agendamento
+        (aplicar_regras) e bloqueia o paciente que atingiu 3 faltas consecutivas
+        
+        Returns:
+            tuple: (pode_agendar: bool, mensagem: str)
+        """
+        mensagem, bloquear_paciente = ValidadorAgendamento.aplicar_regras(
+            situacao, data_hora_inicio, verificar_agenda_medico
         )
-        if not sem_conflito:
-            return False, msg_conflito
+        if bloquear_paciente:
+            db.query(Paciente).filter(Paciente.id_paciente == paciente_id).update(
+                {Paciente.esta_bloqueado: True}, synchronize_session=False
+            )
+            db.commit()
         
+        if mensagem is not None:
+            return False, mensagem
         return True, "Agendamento válido"
+    
+    @staticmethod
+    def validar_novo_agendamento(
+        db: Session,
+        paciente_id: int,
+        medico_id: int,
+        data_hora_inicio: datetime,
+        data_hora_fim: datetime,
+        verificar_agenda_medico: bool = True
+    ) -> tuple[bool, str]:
+        """
+        Valida todas as regras de negócio antes de criar um novo agendamento
+        com uma única ida ao banco
+        
+        Args:
+            verificar_agenda_medico: False quando a reserva do slot materializado
+                já garante expediente e ausência de conflito (AGENDAMENTO_POR_SLOTS)
+        
+        Returns:
+            tuple: (pode_agendar: bool, mensagem: str)
+        """
+        situacao = ValidadorAgendamento.consultar_status_agendamento(
+            db, paciente_id, medico_id, data_hora_inicio, data_hora_fim
+        )
+        return ValidadorAgendamento.avaliar_status_agendamento(
+            db, paciente_id, situacao, data_hora_inicio, verificar_agenda_medico
+        )
+    
+    @staticmethod
+    def validar_lote(
+        db: Session,
+        pedidos: List[tuple],
+        verificar_agenda_medico: bool = True,
+        duracao_consulta_minutos: int = 30
+    ) -> tuple[List[Optional[str]], set]:
+        """
+        Valida um lote de agendamentos de uma vez, com as mesmas regras, na
+        mesma ordem e com as mesmas mensagens de validar_novo_agendamento
+        (aplicar_regras), mais o conflito entre os próprios itens do lote
+        
+        Pacientes, consultas futuras, médicos e a agenda dos médicos (horários
+        de trabalho, bloqueios e consultas ativas) são carregados com uma
+        consulta por tabela. Os pedidos são avaliados em uma única varredura
+        em ordem cronológica: em cada (médico, dia) um ponteiro por lista
+        (bloqueios e consultas) só avança. Entre dois pedidos conflitantes
+        vence o mais cedo (empate: o que vem antes no lote), e as consultas
+        futuras aceitas no lote contam para o RN2 dos pedidos seguintes.
+        
+        Args:
+            db: Sessão do banco de dados
+            pedidos: [(paciente_id, medico_id, data_hora_inicio), ...]
+            verificar_agenda_medico: False quando a reserva dos slots
+                materializados já garante expediente e ausência de conflito
+                com o banco (AGENDAMENTO_POR_SLOTS)
+            duracao_consulta_minutos: Duração de cada consulta
+            
+        Returns:
+            tuple: (mensagens, pacientes_a_bloquear) - mensagens[i] é None
+            quando o pedido i pode ser agendado; pacientes_a_bloquear são os
+            que atingiram 3 faltas consecutivas (RN3)
+        """
+        agora = datetime.now()
+        duracao = timedelta(minutes=duracao_consulta_minutos)
+        mensagens: List[Optional[str]] = [None] * len(pedidos)
+        pacientes_a_bloquear = set()
+        if not pedidos:
+            return mensagens, pacientes_a_bloquear
+        
+        pacientes_ids = {paciente_id for paciente_id, _, _ in pedidos}
+        medicos_ids = {medico_id for _, medico_id, _ in pedidos}
+        
+        pacientes = {
+            id_paciente: (esta_bloqueado, faltas or 0)
+            for id_paciente, esta_bloqueado, faltas in db.query(
+                Paciente.id_paciente, Paciente.esta_bloqueado, Paciente.faltas_consecutivas
+            ).filter(Paciente.id_paciente.in_(pacientes_ids)).all()
+        }
+        futuras = defaultdict(int, db.query(
+            Consulta.id_paciente_fk, func.count()
+        ).filter(
+            Consulta.id_paciente_fk.in_(pacientes_ids),
+            Consulta.data_hora_inicio > agora,
+            Consulta.status.in_(['agendada', 'confirmada'])
+        ).group_by(Consulta.id_paciente_fk).all())
+        medicos_existentes = {
+            id_medico for (id_medico,) in db.query(Medico.id_medico).filter(
+                Medico.id_medico.in_(medicos_ids)
+            ).all()
+        }
+        
+        expedientes, bloqueios, consultas = {}, {}, {}
+        if verificar_agenda_medico:
+            datas = [inicio.date() for _, _, inicio in pedidos]
+            expedientes, bloqueios, consultas = RegraHorarioDisponivel.carregar_ocupacoes(
+                db, list(medicos_ids), min(datas), max(datas)
+            )
+        
+        ponteiros = defaultdict(int)
+        aceitos = {}
+        for indice, (paciente_id, medico_id, inicio) in sorted(
+            enumerate(pedidos), key=lambda item: (item[1][2], item[0])
+        ):
+            fim = inicio + duracao
+            esta_bloqueado, faltas = pacientes.get(paciente_id, (None, 0))
+            situacao = {
+                "paciente_existe": paciente_id in pacientes,
+                "medico_existe": medico_id in medicos_existentes,
+                "esta_bloqueado": esta_bloqueado,
+                "faltas_consecutivas": faltas,
+                "consultas_futuras": futuras[paciente_id],
+            }
+            if verificar_agenda_medico:
+                hora = inicio.time()
+                situacao["no_expediente"] = any(
+                    hora_inicio <= hora < hora_fim
+                    for hora_inicio, hora_fim in expedientes.get(medico_id, {}).get(inicio.weekday(), [])
+                )
+                for nome, ocupacoes in (("bloqueio", bloqueios), ("conflito", consultas)):
+                    chave = (nome, medico_id, inicio.date())
+                    ponteiros[chave], intervalo = _primeira_sobreposicao(
+                        ocupacoes.get(chave[1:], []), ponteiros[chave], inicio, fim
+                    )
+                    situacao[f"{nome}_inicio"], situacao[f"{nome}_fim"] = intervalo or (None, None)
+            
+            mensagem, bloquear_paciente = ValidadorAgendamento.aplicar_regras(
+                situacao, inicio, verificar_agenda_medico
+            )
+            if bloquear_paciente:
+                pacientes_a_bloquear.add(paciente_id)
+            
+            # RN4 entre os itens do lote: o último aceito do médico é o único que pode sobrepor
+            anterior = aceitos.get(medico_id)
+            if mensagem is None and anterior is not None and pedidos[anterior][2] + duracao > inicio:
+                mensagem = f"Horário indisponível. Conflita com o item {anterior + 1} do lote."
+            
+            if mensagem is not None:
+                mensagens[indice] = mensagem
+                continue
+            
+            if inicio > agora:
+                futuras[paciente_id] += 1
+            aceitos[medico_id] = indice
+        
+        return mensagens, pacientes_a_bloquear
@@ -0,0 +1,334 @@
+"""
+Relatórios administrativos - Clínica Saúde+
+Cada relatório declara uma vez a consulta, as colunas e o título; o formato
+(json, pdf, csv, xlsx) escolhe o renderizador em app/utils/relatorios.py.
+
+Arquivos gerados ficam num cache LRU (RELATORIOS_CACHE_MB) sob a chave
+(tipo, formato, filtros, marca de dados). A marca resume as consultas do
+período (quantidade e soma de Consulta.versao, mantida por gatilhos): muda a
+cada inclusão, alteração ou exclusão no período, e só então o relatório é
+gerado de novo. A mesma chave é o ETag das respostas (GET condicional).
+"""
+import hashlib
+import inspect
+import io
+import json
+import threading
+from datetime import date
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import case, desc, func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import Consulta, Especialidade, Medico, Paciente
+from app.utils.cache_lru import CacheLRU
+from app.utils.periodo import filtro_periodo
+from app.utils.relatorios import RENDERIZADORES, Coluna, Tabela, texto_periodo
+
+
+class DefinicaoRelatorio:
+    """
+    titulo pode usar os filtros do relatório (str.format); consultar recebe a
+    sessão e os filtros e devolve as linhas como dicionários (lista ou
+    gerador lido do cursor). Os filtros aceitos (e seus padrões) são os
+    parâmetros de consultar depois da sessão.
+    """
+
+    def __init__(
+        self, titulo: str, arquivo: str, colunas: Sequence[Coluna],
+        consultar: Callable[..., List[Dict[str, Any]]], fonte_cabecalho: int = 12, resumo: bool = False
+    ):
+        self.titulo = titulo
+        self.arquivo = arquivo
+        self.colunas = colunas
+        self.consultar = consultar
+        self.filtros = {
+            nome: parametro.default for nome, parametro in list(inspect.signature(consultar).parameters.items())[1:]
+        }
+        self.fonte_cabecalho = fonte_cabecalho
+        self.resumo = resumo
+
+
+# ============ Consultas dos relatórios ============
+
+def _consultas_por_medico(
+    db: Session, medico_id: Optional[int] = None, data_inicio: Optional[date] = None, data_fim: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    query = db.query(
+        Medico.nome.label("medico_nome"),
+        Especialidade.nome.label("especialidade"),
+        func.count(Consulta.id_consulta).label("total_consultas"),
+        func.sum(case((Consulta.status == "realizada", 1), else_=0)).label("consultas_realizadas"),
+        func.sum(case((Consulta.status == "cancelada", 1), else_=0)).label("consultas_canceladas")
+    ).join(
+        Consulta, Consulta.id_medico_fk == Medico.id_medico
+    ).join(
+        Especialidade, Especialidade.id_especialidade == Medico.id_especialidade_fk
+    )
+
+    if medico_id:
+        query = query.filter(Medico.id_medico == medico_id)
+
+    query = query.filter(*filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim))
+
+    return [
+        {
+            "medico_nome": r.medico_nome,
+            "especialidade": r.especialidade,
+            "total_consultas": r.total_consultas,
+            "consultas_realizadas": r.consultas_realizadas or 0,
+            "consultas_canceladas": r.consultas_canceladas or 0
+        }
+        for r in query.group_by(Medico.id_medico, Medico.nome, Especialidade.nome)
+    ]
+
+
+def _consultas_por_especialidade(
+    db: Session, especialidade_id: Optional[int] = None,
+    data_inicio: Optional[date] = None, data_fim: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    query = db.query(
+        Especialidade.nome.label("especialidade"),
+        func.count(Consulta.id_consulta).label("total_consultas"),
+        func.count(func.distinct(Medico.id_medico)).label("total_medicos")
+    ).join(
+        Medico, Medico.id_especialidade_fk == Especialidade.id_especialidade
+    ).join(
+        Consulta, Consulta.id_medico_fk == Medico.id_medico
+    )
+
+    if especialidade_id:
+        query = query.filter(Especialidade.id_especialidade == especialidade_id)
+
+    query = query.filter(*filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim))
+
+    return [
+        {
+            "especialidade": r.especialidade,
+            "total_consultas": r.total_consultas,
+            "total_medicos": r.total_medicos
+        }
+        for r in query.group_by(Especialidade.id_especialidade, Especialidade.nome)
+    ]
+
+
+def _cancelamentos(
+    db: Session, data_inicio: Optional[date] = None, data_fim: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    total_consultas, total_cancelamentos = db.query(
+        func.count(Consulta.id_consulta),
+        func.count(Consulta.id_consulta).filter(Consulta.status == "cancelada")
+    ).filter(*filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim)).one()
+
+    taxa_cancelamento = (total_cancelamentos / total_consultas * 100) if total_consultas > 0 else 0
+
+    return [{
+        "total_consultas": total_consultas,
+        "total_cancelamentos": total_cancelamentos,
+        "taxa_cancelamento": round(taxa_cancelamento, 2)
+    }]
+
+
+def _pacientes_frequentes(
+    db: Session, data_inicio: Optional[date] = None, data_fim: Optional[date] = None, limite: int = 10
+) -> Iterator[Dict[str, Any]]:
+    """Com limite alto pode ter centenas de milhares de linhas: lidas do cursor em lotes"""
+    query = db.query(
+        Paciente.nome.label("paciente_nome"),
+        Paciente.cpf,
+        func.count(Consulta.id_consulta).label("total_consultas"),
+        func.max(Consulta.data_hora_inicio).label("ultima_consulta")
+    ).join(
+        Consulta, Consulta.id_paciente_fk == Paciente.id_paciente
+    )
+
+    query = query.filter(*filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim))
+
+    resultados = query.group_by(
+        Paciente.id_paciente, Paciente.nome, Paciente.cpf
+    ).order_by(
+        desc(func.count(Consulta.id_consulta))
+    ).limit(limite).yield_per(settings.EXPORTACAO_LOTE)
+
+    for posicao, r in enumerate(resultados, 1):
+        yield {
+            "posicao": posicao,
+            "paciente_nome": r.paciente_nome,
+            "cpf": r.cpf,
+            "total_consultas": r.total_consultas,
+            "ultima_consulta": r.ultima_consulta.strftime('%d/%m/%Y') if r.ultima_consulta else 'N/A'
+        }
+
+
+RELATORIOS = {
+    "consultas-por-medico": DefinicaoRelatorio(
+        titulo="Relatório de Consultas por Médico",
+        arquivo="relatorio_consultas_medico",
+        colunas=[
+            Coluna("medico_nome", "Médico", 6),
+            Coluna("especialidade", "Especialidade", 4),
+            Coluna("total_consultas", "Total", 2),
+            Coluna("consultas_realizadas", "Realizadas", 2),
+            Coluna("consultas_canceladas", "Canceladas", 2),
+        ],
+        consultar=_consultas_por_medico,
+    ),
+    "consultas-por-especialidade": DefinicaoRelatorio(
+        titulo="Relatório de Consultas por Especialidade",
+        arquivo="relatorio_consultas_especialidade",
+        colunas=[
+            Coluna("especialidade", "Especialidade", 8),
+            Coluna("total_consultas", "Total de Consultas", 4),
+            Coluna("total_medicos", "Médicos Atuantes", 4),
+        ],
+        consultar=_consultas_por_especialidade,
+    ),
+    "cancelamentos": DefinicaoRelatorio(
+        titulo="Relatório de Taxa de Cancelamentos",
+        arquivo="relatorio_cancelamentos",
+        colunas=[
+            Coluna("total_consultas", "Total de Consultas"),
+            Coluna("total_cancelamentos", "Total de Cancelamentos"),
+            Coluna("taxa_cancelamento", "Taxa de Cancelamento", formatar=lambda taxa: f"{taxa}%"),
+        ],
+        consultar=_cancelamentos,
+        resumo=True,
+    ),
+    "pacientes-frequentes": DefinicaoRelatorio(
+        titulo="Relatório de Pacientes Mais Frequentes (Top {limite})",
+        arquivo="relatorio_pacientes_frequentes",
+        colunas=[
+            Coluna("posicao", "Posição", 1.5),
+            Coluna("paciente_nome", "Paciente", 5),
+            Coluna("cpf", "CPF", 3),
+            Coluna("total_consultas", "Total de Consultas", 3),
+            Coluna("ultima_consulta", "Última Consulta", 3),
+        ],
+        consultar=_pacientes_frequentes,
+        fonte_cabecalho=10,
+    ),
+}
+
+
+class RegraRelatorios:
+    """Execução dos relatórios e montagem da tabela a renderizar"""
+
+    @staticmethod
+    def tabela(db: Session, nome: str, em_fluxo: bool = False, **filtros) -> Tabela:
+        """
+        Tabela do relatório, com as linhas já lidas (a transação pode ser encerrada)
+
+        Com em_fluxo=True as linhas ficam como vieram de consultar (gerador
+        lido do cursor): a tabela serve para uma única renderização, feita
+        com a transação ainda aberta.
+        """
+        definicao = RELATORIOS[nome]
+        linhas = definicao.consultar(db, **filtros)
+        return Tabela(
+            titulo=definicao.titulo.format(**{**definicao.filtros, **filtros}),
+            subtitulo=texto_periodo(filtros.get("data_inicio"), filtros.get("data_fim")),
+            colunas=definicao.colunas,
+            linhas=linhas if em_fluxo else list(linhas),
+            fonte_cabecalho=definicao.fonte_cabecalho,
+            resumo=definicao.resumo,
+        )
+
+    @staticmethod
+    def filtros_para_json(nome: str, valores: Dict[str, Any]) -> str:
+        """Filtros aceitos pelo relatório que foram informados, como texto JSON (datas em ISO)"""
+        return json.dumps({
+            filtro: valores[filtro].isoformat() if isinstance(valores[filtro], date) else valores[filtro]
+            for filtro in RELATORIOS[nome].filtros
+            if valores.get(filtro) is not None
+        })
+
+    @staticmethod
+    def filtros_de_json(texto: Optional[str]) -> Dict[str, Any]:
+        filtros = json.loads(texto or "{}")
+        for filtro in ("data_inicio", "data_fim"):
+            if filtro in filtros:
+                filtros[filtro] = date.fromisoformat(filtros[filtro])
+        return filtros
+
+    @staticmethod
+    def gerar(db: Session, nome: str, formato: str, **filtros) -> bytes:
+        """Arquivo do relatório no formato pedido"""
+        return RENDERIZADORES[formato].renderizar(RegraRelatorios.tabela(db, nome, **filtros))
+
+    @staticmethod
+    def marca_dados(db: Session, data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> str:
+        """
+        Quantidade e soma das versões das consultas do período
+
+        Nomes de médicos, pacientes e especialidades não entram na marca: uma
+        correção de nome aparece nos relatórios quando alguma consulta do
+        período mudar (ou com o cache limpo).
+        """
+        total, soma = db.query(
+            func.count(), func.coalesce(func.sum(Consulta.versao), 0)
+        ).filter(*filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim)).one()
+        return f"{total}:{soma}"
+
+
+class RelatorioEmCache:
+    """
+    Um relatório com filtros fixos, servido pelo cache de arquivos
+
+    A marca de dados é lida na criação. A tabela só é consultada se algum
+    formato pedido não estiver em cache, uma única vez, e a transação é
+    encerrada antes de renderizar (a conexão volta ao pool).
+    """
+
+    def __init__(self, db: Session, nome: str, **filtros):
+        self.db = db
+        self.nome = nome
+        self.filtros = filtros
+        self.marca = RegraRelatorios.marca_dados(db, filtros.get("data_inicio"), filtros.get("data_fim"))
+        self._tabela: Optional[Tabela] = None
+
+    def etag(self, formato: str) -> str:
+        """Chave do arquivo no cache, já entre aspas para o cabeçalho ETag"""
+        parametros = RegraRelatorios.filtros_para_json(self.nome, {**RELATORIOS[self.nome].filtros, **self.filtros})
+        chave = json.dumps([self.nome, formato, parametros, self.marca])
+        return f'"{hashlib.sha256(chave.encode()).hexdigest()}"'
+
+    def tabela(self) -> Tabela:
+        if self._tabela is None:
+            self._tabela = RegraRelatorios.tabela(self.db, self.nome, **self.filtros)
+            self.db.commit()
+        return self._tabela
+
+    def arquivo(self, formato: str) -> bytes:
+        cache = obter_cache_relatorios()
+        renderizar = lambda: RENDERIZADORES[formato].renderizar(self.tabela())
+        if cache is None:
+            return renderizar()
+        return cache.obter(self.etag(formato), renderizar)
+
+    def abrir(self, formato: str) -> IO[bytes]:
+        """
+        Arquivo do formato, para ser copiado em pedaços (quem recebe fecha)
+
+        O PDF é montado num arquivo temporário com as linhas lidas do cursor
+        durante a renderização, sem passar pelo cache: a memória não cresce
+        com o relatório, mas a transação só termina depois da renderização.
+        Os demais formatos vêm de arquivo().
+        """
+        if formato == "pdf":
+            tabela = RegraRelatorios.tabela(self.db, self.nome, em_fluxo=True, **self.filtros)
+            return RENDERIZADORES[formato].renderizar_em_arquivo(tabela)
+        return io.BytesIO(self.arquivo(formato))
+
+
+_cache_relatorios: Optional[CacheLRU] = None
+_trava = threading.Lock()
+
+
+def obter_cache_relatorios() -> Optional[CacheLRU]:
+    """Cache do processo; None se RELATORIOS_CACHE_MB = 0"""
+    global _cache_relatorios
+    with _trava:
+        if _cache_relatorios is None and settings.RELATORIOS_CACHE_MB > 0:
+            _cache_relatorios = CacheLRU("relatorios", int(settings.RELATORIOS_CACHE_MB * 1024 * 1024))
+        return _cache_relatorios
@@ -0,0 +1,317 @@
+"""
+Agenda Materializada em Slots - Clínica Saúde+
+Modo opcional (AGENDAMENTO_POR_SLOTS) em que os slots das próximas semanas
+são gerados a partir de HorarioTrabalho na tabela slot_agenda.
+
+O agendamento deixa de ser "verificar e depois inserir": a reserva é um
+único UPDATE condicional (status = 'livre') com RETURNING, de modo que duas
+requisições concorrentes pelo mesmo horário disputam apenas uma linha e só
+uma delas recebe o slot.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, bindparam, or_, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import Consulta, Medico, SlotAgenda
+from app.services.regras_negocio import RegraHorarioDisponivel
+from app.utils.periodo import filtro_periodo, fim_do_dia, inicio_do_dia
+
+DURACAO_SLOT_MINUTOS = 30
+
+
+class RegraSlotAgenda:
+    """
+    Materialização, reserva e consulta dos slots da agenda
+    """
+    
+    @staticmethod
+    def ativo() -> bool:
+        return settings.AGENDAMENTO_POR_SLOTS
+    
+    @staticmethod
+    def materializar(
+        db: Session,
+        medicos_ids: Optional[List[int]] = None,
+        data_inicio: Optional[date] = None,
+        data_fim: Optional[date] = None
+    ) -> int:
+        """
+        Gera (ou regenera) os slots dos médicos no período
+        
+        Slots sem consulta ativa vinculada são recriados a partir do horário
+        de trabalho, bloqueios e consultas ativas; slots ocupados por
+        consulta ativa são preservados. Não faz commit.
+        
+        Args:
+            db: Sessão do banco de dados
+            medicos_ids: Médicos a materializar (todos se None)
+            data_inicio: Primeira data (padrão: hoje)
+            data_fim: Última data (padrão: SLOTS_SEMANAS_MATERIALIZADAS semanas)
+            
+        Returns:
+            int: Quantidade de slots inseridos
+        """
+        # Sessões usam autoflush=False: horários/bloqueios pendentes precisam ir ao banco
+        db.flush()
+        
+        data_inicio = data_inicio or date.today()
+        data_fim = data_fim or data_inicio + timedelta(
+            weeks=settings.SLOTS_SEMANAS_MATERIALIZADAS, days=-1
+        )
+        if medicos_ids is None:
+            medicos_ids = [id_medico for (id_medico,) in db.query(Medico.id_medico).all()]
+        if not medicos_ids:
+            return 0
+        
+        slots_do_periodo = and_(
+            SlotAgenda.id_medico_fk.in_(medicos_ids),
+            *filtro_periodo(SlotAgenda.data_hora_inicio, data_inicio, data_fim)
+        )
+        
+        consultas_ativas = db.query(Consulta.id_consulta).filter(
+            Consulta.status.in_(['agendada', 'confirmada'])
+        )
+        db.query(SlotAgenda).filter(
+            slots_do_periodo,
+            or_(
+                SlotAgenda.id_consulta_fk.is_(None),
+                SlotAgenda.id_consulta_fk.not_in(consultas_ativas)
+            )
+        ).delete(synchronize_session=False)
+        
+        preservados = defaultdict(set)
+        for id_medico, inicio in db.query(
+            SlotAgenda.id_medico_fk, SlotAgenda.data_hora_inicio
+        ).filter(slots_do_periodo).all():
+            preservados[id_medico].add(inicio)
+        
+        expedientes, ocupados = RegraHorarioDisponivel.carregar_agenda(
+            db, medicos_ids, data_inicio, data_fim
+        )
+        consulta_no_horario = {
+            (id_medico, inicio): id_consulta
+            for id_consulta, id_medico, inicio in db.query(
+                Consulta.id_consulta, Consulta.id_medico_fk, Consulta.data_hora_inicio
+            ).filter(
+                Consulta.id_medico_fk.in_(medicos_ids),
+                *filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim),
+                Consulta.status.in_(['agendada', 'confirmada'])
+            ).all()
+        }
+        duracao = timedelta(minutes=DURACAO_SLOT_MINUTOS)
+        
+        novos = []
+        for id_medico in expedientes:
+            data = data_inicio
+            while data <= data_fim:
+                todos = RegraHorarioDisponivel.slots_livres_no_dia(
+                    expedientes, {}, id_medico, data, DURACAO_SLOT_MINUTOS
+                )
+                if todos:
+                    livres = set(RegraHorarioDisponivel.slots_livres_no_dia(
+                        expedientes, ocupados, id_medico, data, DURACAO_SLOT_MINUTOS
+                    ))
+                    for inicio in todos:
+                        if inicio in preservados[id_medico]:
+                            continue
+                        consulta_id = consulta_no_horario.get((id_medico, inicio))
+                        if inicio in livres:
+                            status = "livre"
+                        elif consulta_id:
+                            status = "ocupado"
+                        else:
+                            status = "bloqueado"
+                        novos.append({
+                            "id_medico_fk": id_medico,
+                            "data_hora_inicio": inicio,
+                            "data_hora_fim": inicio + duracao,
+                            "status": status,
+                            "id_consulta_fk": consulta_id if status == "ocupado" else None,
+                        })
+                data += timedelta(days=1)
+        
+        if novos:
+            db.bulk_insert_mappings(SlotAgenda, novos)
+        return len(novos)
+    
+    @staticmethod
+    def reservar(
+        db: Session,
+        medico_id: int,
+        data_hora_inicio: datetime,
+        consulta_id: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Reserva atomicamente o slot (UPDATE ... WHERE status = 'livre' RETURNING)
+        
+        Como nada é alterado quando a reserva falha, pode ser chamada antes
+        de qualquer outra escrita da requisição; a consulta pode ser
+        vinculada depois com vincular_consulta().
+        
+        Returns:
+            Optional[int]: id do slot reservado, ou None se o horário não
+            existe na agenda ou já foi tomado
+        """
+        return db.execute(
+            update(SlotAgenda)
+            .where(
+                SlotAgenda.id_medico_fk == medico_id,
+                SlotAgenda.data_hora_inicio == data_hora_inicio,
+                SlotAgenda.status == "livre"
+            )
+            .values(status="ocupado", id_consulta_fk=consulta_id)
+            .returning(SlotAgenda.id_slot)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+    
+    @staticmethod
+    def ocupado(db: Session, medico_id: int, data_hora_inicio: datetime) -> bool:
+        """Se o slot do horário existe e está ocupado (reserva recusada por já ter dono)"""
+        return db.query(SlotAgenda.id_slot).filter(
+            SlotAgenda.id_medico_fk == medico_id,
+            SlotAgenda.data_hora_inicio == data_hora_inicio,
+            SlotAgenda.status == "ocupado"
+        ).first() is not None
+    
+    @staticmethod
+    def vincular_consulta(db: Session, slot_id: int, consulta_id: int) -> None:
+        """Associa ao slot reservado a consulta criada na mesma transação"""
+        db.execute(
+            update(SlotAgenda)
+            .where(SlotAgenda.id_slot == slot_id)
+            .values(id_consulta_fk=consulta_id)
+            .execution_options(synchronize_session=False)
+        )
+    
+    @staticmethod
+    def reservar_lote(db: Session, horarios: List[tuple]) -> Dict[tuple, int]:
+        """
+        Reserva de uma vez vários slots (medico_id, data_hora_inicio) com um
+        único UPDATE condicional, como reservar()
+        
+        Returns:
+            Dict[tuple, int]: (medico_id, data_hora_inicio) -> id do slot, só
+            para os horários efetivamente reservados
+        """
+        if not horarios:
+            return {}
+        reservados = db.execute(
+            update(SlotAgenda)
+            .where(
+                tuple_(SlotAgenda.id_medico_fk, SlotAgenda.data_hora_inicio).in_(horarios),
+                SlotAgenda.status == "livre"
+            )
+            .values(status="ocupado")
+            .returning(SlotAgenda.id_slot, SlotAgenda.id_medico_fk, SlotAgenda.data_hora_inicio)
+            .execution_options(synchronize_session=False)
+        ).all()
+        return {(id_medico, inicio): id_slot for id_slot, id_medico, inicio in reservados}
+    
+    @staticmethod
+    def vincular_consultas(db: Session, vinculos: Dict[int, int]) -> None:
+        """Como vincular_consulta, para vários slots (id_slot -> id_consulta) em lote"""
+        if not vinculos:
+            return
+        db.connection().execute(
+            update(SlotAgenda.__table__)
+            .where(SlotAgenda.__table__.c.id_slot == bindparam("slot"))
+            .values(id_consulta_fk=bindparam("consulta")),
+            [{"slot": slot_id, "consulta": consulta_id} for slot_id, consulta_id in vinculos.items()]
+        )
+    
+    @staticmethod
+    def liberar(db: Session, consulta_id: int, exceto_slot_id: Optional[int] = None) -> None:
+        """
+        Devolve à agenda o slot ocupado pela consulta (cancelamento/reagendamento)
+        
+        O slot volta como materializar() o geraria agora: livre, bloqueado
+        (bloqueio criado enquanto estava ocupado) ou removido (horário que
+        saiu do horário de trabalho). Só expediente e bloqueios decidem: a
+        própria consulta pode ainda não ter mudado no banco, e outra consulta
+        ativa no mesmo horário é impedida pela reserva do slot. Não faz commit.
+        """
+        db.flush()
+        condicoes = [SlotAgenda.id_consulta_fk == consulta_id]
+        if exceto_slot_id is not None:
+            condicoes.append(SlotAgenda.id_slot != exceto_slot_id)
+        slots = db.query(
+            SlotAgenda.id_slot, SlotAgenda.id_medico_fk, SlotAgenda.data_hora_inicio
+        ).filter(*condicoes).all()
+        
+        for id_slot, id_medico, inicio in slots:
+            dia = inicio.date()
+            expedientes, bloqueios = RegraHorarioDisponivel.carregar_agenda(
+                db, [id_medico], dia, dia, incluir_consultas=False
+            )
+            todos = RegraHorarioDisponivel.slots_livres_no_dia(
+                expedientes, {}, id_medico, dia, DURACAO_SLOT_MINUTOS
+            )
+            livres = RegraHorarioDisponivel.slots_livres_no_dia(
+                expedientes, bloqueios, id_medico, dia, DURACAO_SLOT_MINUTOS
+            )
+            slot = db.query(SlotAgenda).filter(SlotAgenda.id_slot == id_slot)
+            if inicio not in todos:
+                slot.delete(synchronize_session=False)
+            else:
+                slot.update(
+                    {"status": "livre" if inicio in livres else "bloqueado", "id_consulta_fk": None},
+                    synchronize_session=False
+                )
+    
+    @staticmethod
+    def listar_livres(
+        db: Session,
+        medico_id: int,
+        data_inicio: date,
+        data_fim: date
+    ) -> Dict[str, List[str]]:
+        """
+        Lista os slots livres do médico no período, no mesmo formato de
+        RegraHorarioDisponivel.listar_agenda_periodo (coberto pelo índice
+        id_medico_fk, status, data_hora_inicio)
+        """
+        inicios = db.query(SlotAgenda.data_hora_inicio).filter(
+            SlotAgenda.id_medico_fk == medico_id,
+            SlotAgenda.status == "livre",
+            *filtro_periodo(SlotAgenda.data_hora_inicio, data_inicio, data_fim)
+        ).order_by(SlotAgenda.data_hora_inicio).all()
+        
+        agenda = defaultdict(list)
+        for (inicio,) in inicios:
+            agenda[inicio.date().isoformat()].append(inicio.strftime("%H:%M"))
+        return dict(agenda)
+    
+    @staticmethod
+    def buscar_primeiros(
+        db: Session,
+        especialidade_id: int,
+        data_inicio: date,
+        data_fim: date,
+        limite: int = 10
+    ) -> List[dict]:
+        """
+        Primeiros slots livres entre os médicos de uma especialidade, no
+        mesmo formato de RegraHorarioDisponivel.buscar_primeiros_horarios
+        """
+        inicio_periodo = max(inicio_do_dia(data_inicio), datetime.now())
+        resultados = db.query(
+            SlotAgenda.id_medico_fk, Medico.nome, SlotAgenda.data_hora_inicio
+        ).join(
+            Medico, Medico.id_medico == SlotAgenda.id_medico_fk
+        ).filter(
+            Medico.id_especialidade_fk == especialidade_id,
+            SlotAgenda.status == "livre",
+            SlotAgenda.data_hora_inicio > inicio_periodo,
+            SlotAgenda.data_hora_inicio < fim_do_dia(data_fim)
+        ).order_by(
+            SlotAgenda.data_hora_inicio, SlotAgenda.id_medico_fk
+        ).limit(limite).all()
+        
+        return [
+            {"id_medico": id_medico, "medico_nome": nome, "data_hora": inicio}
+            for id_medico, nome, inicio in resultados
+        ]
@@ -1,24 +1,37 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-import bcrypt
+from jose import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.config import settings
+from app.utils.tokens import CacheTokens, obter_cache_tokens, obter_decodificador
+from app.utils.senhas import (
+    PoolSenhasSaturado, custo_bcrypt, gerar_bcrypt, obter_pool_senhas, verificar_bcrypt
+)
 
 security = HTTPBearer(auto_error=False)
 
+def _executar_no_pool_senhas(operacao: str, funcao, *args):
+    """Executa a operação bcrypt no pool de processos; 503 se estiver saturado"""
+    try:
+        return obter_pool_senhas().executar(operacao, funcao, *args)
+    except PoolSenhasSaturado:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+            headers={"Retry-After": "1"},
+        )
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica se a senha em texto corresponde ao hash"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return _executar_no_pool_senhas(
+        "verificacao", verificar_bcrypt,
+        plain_password.encode('utf-8'), hashed_password.encode('utf-8')
+    )
 
 def get_password_hash(password: str) -> str:
-    """Gera o hash da senha de forma mais rápida para testes"""
-    # Usar um cost factor menor para acelerar os testes
-    # Em produção, o padrão (12) é mais seguro
-    cost_factor = 4 if settings.TESTING else 12
-    salt = bcrypt.gensalt(rounds=cost_factor)
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    """Gera o hash da senha com o custo calibrado (4 em testes)"""
+    hashed = _executar_no_pool_senhas("hash", gerar_bcrypt, password.encode('utf-8'), custo_bcrypt())
     return hashed.decode('utf-8')
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -34,12 +47,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 def decode_access_token(token: str) -> Optional[dict]:
-    """Decodifica um token JWT e retorna os dados do payload"""
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except JWTError:
-        return None
+    """Decodifica um token JWT e retorna os dados do payload (None se inválido)"""
+    return obter_decodificador()(token)
 
 def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> dict:
     """
@@ -57,6 +66,14 @@ def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depen
     
     token = credentials.credentials
     
+    # Token já verificado e ainda não expirado: sem decodificar de novo
+    cache = obter_cache_tokens()
+    if cache is not None:
+        chave = CacheTokens.chave(token)
+        usuario = cache.obter(chave)
+        if usuario is not None:
+            return dict(usuario)
+    
     payload = decode_access_token(token)
     if payload is None:
         raise credentials_exception
@@ -68,8 +85,11 @@ def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depen
     if user_email is None or user_id is None or user_type is None:
         raise credentials_exception
     
-    return {
+    usuario = {
         "id": user_id,
         "email": user_email,
         "tipo": user_type
     }
+    if cache is not None and isinstance(payload.get("exp"), (int, float)):
+        cache.guardar(chave, usuario, payload["exp"])
+    return dict(usuario)
@@ -0,0 +1,86 @@
+"""
+Cache LRU limitado em bytes, com carga única - Clínica Saúde+
+Para resultados grandes e caros de produzir (arquivos de relatório): cada
+chave identifica o conteúdo (quem muda os dados muda a chave), então não há
+validade; quando o total passa de limite_bytes, saem as entradas usadas há
+mais tempo. Pedidos simultâneos da mesma chave esperam a carga em andamento.
+
+Métricas: <nome>_cache_acertos, <nome>_cache_cargas, <nome>_cache_esperas,
+<nome>_cache_descartes e o medidor <nome>_cache_bytes.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+from app.utils.metricas import metricas
+
+
+class CacheLRU:
+    """
+    Valores bytes por chave, até limite_bytes no total (thread-safe)
+
+    Um valor maior que o limite é devolvido mas não guardado. Se a carga
+    falhar, a exceção chega a quem carregou e a próxima espera assume a carga.
+    """
+
+    def __init__(self, nome: str, limite_bytes: int):
+        self.nome = nome
+        self.limite_bytes = limite_bytes
+        self.tamanho_bytes = 0
+        self._entradas: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._cargas: Dict[Hashable, threading.Event] = {}
+        self._trava = threading.Lock()
+
+    def obter(self, chave: Hashable, carregar: Callable[[], bytes]) -> bytes:
+        """Valor em cache da chave ou o resultado de carregar() (uma carga por vez)"""
+        while True:
+            with self._trava:
+                valor = self._entradas.get(chave)
+                if valor is not None:
+                    self._entradas.move_to_end(chave)
+                    metricas.incrementar(f"{self.nome}_cache_acertos")
+                    return valor
+                carga = self._cargas.get(chave)
+                if carga is None:
+                    carga = self._cargas[chave] = threading.Event()
+                    break
+            metricas.incrementar(f"{self.nome}_cache_esperas")
+            carga.wait()
+
+        metricas.incrementar(f"{self.nome}_cache_cargas")
+        try:
+            valor = carregar()
+            if len(valor) <= self.limite_bytes:
+                self._guardar(chave, valor)
+            return valor
+        finally:
+            with self._trava:
+                del self._cargas[chave]
+            carga.set()
+
+    def _guardar(self, chave: Hashable, valor: bytes):
+        with self._trava:
+            self._entradas[chave] = valor
+            self.tamanho_bytes += len(valor)
+            descartes = 0
+            while self.tamanho_bytes > self.limite_bytes:
+                _, antigo = self._entradas.popitem(last=False)
+                self.tamanho_bytes -= len(antigo)
+                descartes += 1
+            tamanho = self.tamanho_bytes
+        if descartes:
+            metricas.incrementar(f"{self.nome}_cache_descartes", descartes)
+        metricas.definir(f"{self.nome}_cache_bytes", tamanho)
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+            self.tamanho_bytes = 0
+        metricas.definir(f"{self.nome}_cache_bytes", 0)
+
+    def __contains__(self, chave: Hashable) -> bool:
+        with self._trava:
+            return chave in self._entradas
+
+    def __len__(self):
+        return len(self._entradas)
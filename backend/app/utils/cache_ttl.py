@@ -0,0 +1,66 @@
+"""
+Cache com validade curta e carga única - Clínica Saúde+
+Para leituras caras e repetidas (dashboards, estatísticas): o valor vale por
+alguns segundos e, quando vence, só uma requisição recalcula; as demais que
+chegarem durante a carga esperam por ela e recebem o mesmo resultado. N
+administradores atualizando a tela ao mesmo tempo custam uma consulta.
+
+Métricas: <nome>_cache_acertos, <nome>_cache_cargas, <nome>_cache_esperas.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from app.utils.metricas import metricas
+
+
+class CacheTTL:
+    """
+    Valores por chave, válidos por `segundos` (thread-safe)
+
+    Se a carga falhar, a exceção chega a quem carregou e a próxima espera
+    assume a carga (nenhum valor é guardado).
+    """
+
+    def __init__(self, nome: str, segundos: float):
+        self.nome = nome
+        self.segundos = segundos
+        self._entradas: Dict[Hashable, Tuple[Any, float]] = {}
+        self._cargas: Dict[Hashable, threading.Event] = {}
+        self._trava = threading.Lock()
+
+    def obter(self, chave: Hashable, carregar: Callable[[], Any]) -> Any:
+        """Valor em cache da chave ou o resultado de carregar() (uma carga por vez)"""
+        while True:
+            with self._trava:
+                entrada = self._entradas.get(chave)
+                if entrada is not None and entrada[1] > time.monotonic():
+                    metricas.incrementar(f"{self.nome}_cache_acertos")
+                    return entrada[0]
+                carga = self._cargas.get(chave)
+                if carga is None:
+                    carga = self._cargas[chave] = threading.Event()
+                    break
+            metricas.incrementar(f"{self.nome}_cache_esperas")
+            carga.wait()
+
+        metricas.incrementar(f"{self.nome}_cache_cargas")
+        try:
+            valor = carregar()
+            with self._trava:
+                agora = time.monotonic()
+                for vencida in [c for c, (_, expira_em) in self._entradas.items() if expira_em <= agora]:
+                    del self._entradas[vencida]
+                self._entradas[chave] = (valor, agora + self.segundos)
+            return valor
+        finally:
+            with self._trava:
+                del self._cargas[chave]
+            carga.set()
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
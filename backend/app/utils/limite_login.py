@@ -0,0 +1,245 @@
+"""
+Limite de tentativas de login - Clínica Saúde+
+Baldes de fichas (token bucket) por IP e por conta (e-mail ou CRM): cada
+tentativa consome uma ficha e as fichas voltam continuamente à taxa
+configurada, até a capacidade. É a janela deslizante sem guardar o horário
+de cada tentativa: duas floats por chave.
+
+A verificação roda antes de qualquer busca de usuário ou bcrypt: um ataque
+de força bruta recebe 429 sem consumir o pool de senhas.
+
+Armazenamento:
+- BaldesMemoria (padrão): dicionário do processo; cada worker limita por si
+- BaldesBanco (LOGIN_LIMITE_COMPARTILHADO): tabela limite_login, uma
+  instrução atômica (INSERT ... ON CONFLICT DO UPDATE ... RETURNING) por chave,
+  compartilhada entre workers e servidores
+
+Os baldes parados há mais tempo do que o necessário para encher de novo são
+removidos periodicamente (a cada LOGIN_LIMITE_LIMPEZA_SEGUNDOS), sem mudar
+o resultado: um balde ausente equivale a um balde cheio.
+
+Métricas: login_limite_recusados_ip, login_limite_recusados_conta,
+login_limite_baldes_removidos.
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import text
+
+from app.config import settings
+from app.utils.metricas import metricas
+
+
+class RegraLimite:
+    """Capacidade (rajada) e reposição de um tipo de chave"""
+
+    def __init__(self, capacidade: float, por_minuto: float):
+        self.capacidade = float(capacidade)
+        self.por_segundo = por_minuto / 60.0
+
+    @property
+    def segundos_para_encher(self) -> float:
+        return self.capacidade / self.por_segundo
+
+
+class BaldesMemoria:
+    """Baldes no próprio processo: chave -> (fichas, atualizado_em)"""
+
+    def __init__(self):
+        self._baldes: Dict[str, Tuple[float, float]] = {}
+        self._trava = threading.Lock()
+
+    def consumir(self, chave: str, regra: RegraLimite, agora: float) -> float:
+        """Consome uma ficha; devolve 0 se permitido ou os segundos até a próxima ficha"""
+        with self._trava:
+            fichas, atualizado_em = self._baldes.get(chave, (regra.capacidade, agora))
+            fichas = min(regra.capacidade, fichas + (agora - atualizado_em) * regra.por_segundo)
+            if fichas >= 1:
+                self._baldes[chave] = (fichas - 1, agora)
+                return 0.0
+            self._baldes[chave] = (fichas, agora)
+        return (1 - fichas) / regra.por_segundo
+
+    def remover_ociosos(self, limite: float) -> int:
+        """Remove os baldes sem tentativas desde `limite` (já cheios de novo)"""
+        with self._trava:
+            ociosos = [chave for chave, (_, atualizado_em) in self._baldes.items() if atualizado_em < limite]
+            for chave in ociosos:
+                del self._baldes[chave]
+        return len(ociosos)
+
+    def limpar(self):
+        with self._trava:
+            self._baldes.clear()
+
+    def __len__(self):
+        return len(self._baldes)
+
+
+# Fichas após a reposição desde a última tentativa, limitadas à capacidade
+_RECARGA = (
+    "CASE WHEN limite_login.fichas + (:agora - limite_login.atualizado_em) * :por_segundo > :capacidade"
+    " THEN :capacidade"
+    " ELSE limite_login.fichas + (:agora - limite_login.atualizado_em) * :por_segundo END"
+)
+
+_CONSUMIR_FICHA = text(
+    "INSERT INTO limite_login (chave, fichas, atualizado_em, permitido)"
+    " VALUES (:chave, :capacidade - 1, :agora, :capacidade >= 1)"
+    " ON CONFLICT (chave) DO UPDATE SET"
+    f" fichas = CASE WHEN {_RECARGA} >= 1 THEN {_RECARGA} - 1 ELSE {_RECARGA} END,"
+    f" permitido = {_RECARGA} >= 1,"
+    " atualizado_em = :agora"
+    " RETURNING fichas, permitido"
+)
+
+
+class BaldesBanco:
+    """
+    Baldes na tabela limite_login, compartilhados entre workers
+
+    Cada tentativa é um único INSERT ... ON CONFLICT DO UPDATE em transação
+    própria: a linha fica travada só durante a instrução e tentativas
+    simultâneas da mesma chave são serializadas pelo banco.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def consumir(self, chave: str, regra: RegraLimite, agora: float) -> float:
+        with self.engine.begin() as conexao:
+            fichas, permitido = conexao.execute(_CONSUMIR_FICHA, {
+                "chave": chave, "agora": agora,
+                "capacidade": regra.capacidade, "por_segundo": regra.por_segundo,
+            }).one()
+        if permitido:
+            return 0.0
+        return (1 - fichas) / regra.por_segundo
+
+    def remover_ociosos(self, limite: float) -> int:
+        with self.engine.begin() as conexao:
+            return conexao.execute(
+                text("DELETE FROM limite_login WHERE atualizado_em < :limite"), {"limite": limite}
+            ).rowcount
+
+    def limpar(self):
+        with self.engine.begin() as conexao:
+            conexao.execute(text("DELETE FROM limite_login"))
+
+
+# Valores maiores (e-mail/CRM digitados ou X-Forwarded-For forjados) viram o
+# seu sha256: a chave cabe em limite_login.chave e não cresce com a entrada
+_VALOR_MAXIMO = 64
+
+
+def chave_balde(tipo: str, valor: str) -> str:
+    """Chave do balde de um tipo e valor, com no máximo len(tipo) + 72 caracteres"""
+    if len(valor) > _VALOR_MAXIMO:
+        valor = "sha256:" + hashlib.sha256(valor.encode("utf-8")).hexdigest()
+    return f"{tipo}:{valor}"
+
+
+class LimitadorLogin:
+    """
+    Aplica as regras por IP e por conta, nessa ordem
+
+    Uma tentativa recusada pelo IP não consome ficha da conta: quem tenta
+    de um único endereço não esgota o limite da conta de outra pessoa.
+    """
+
+    def __init__(self, baldes, regras: Dict[str, RegraLimite], intervalo_limpeza: float):
+        self.baldes = baldes
+        self.regras = regras
+        self.intervalo_limpeza = intervalo_limpeza
+        self._proxima_limpeza = 0.0
+        self._ociosidade = max(regra.segundos_para_encher for regra in regras.values())
+
+    def verificar(self, chaves: List[Tuple[str, str]], agora: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """
+        Consome uma ficha de cada chave ((tipo, valor), com tipo em self.regras)
+
+        Returns:
+            None se permitido; senão (tipo recusado, segundos até nova tentativa)
+        """
+        agora = time.time() if agora is None else agora
+        if agora >= self._proxima_limpeza:
+            self._proxima_limpeza = agora + self.intervalo_limpeza
+            removidos = self.baldes.remover_ociosos(agora - self._ociosidade)
+            metricas.incrementar("login_limite_baldes_removidos", removidos)
+        for tipo, valor in chaves:
+            espera = self.baldes.consumir(chave_balde(tipo, valor), self.regras[tipo], agora)
+            if espera > 0:
+                metricas.incrementar(f"login_limite_recusados_{tipo}")
+                return tipo, espera
+        return None
+
+    def limpar(self):
+        self.baldes.limpar()
+        self._proxima_limpeza = 0.0
+
+
+def endereco_cliente(request: Request) -> str:
+    """
+    IP do cliente; com LOGIN_LIMITE_CONFIAR_PROXY, o último de X-Forwarded-For
+    (o acrescentado pelo proxy; os anteriores vêm do próprio cliente)
+
+    Os deploys publicados (nginx do docker-compose, Render, Railway, Fly)
+    ligam a opção: sem ela, todo cliente teria o IP do proxy e dividiria um
+    único balde.
+    """
+    if settings.LOGIN_LIMITE_CONFIAR_PROXY:
+        encaminhado = request.headers.get("x-forwarded-for")
+        if encaminhado:
+            return encaminhado.split(",")[-1].strip()
+    return request.client.host if request.client else "desconhecido"
+
+
+_limitador: Optional[LimitadorLogin] = None
+_trava = threading.Lock()
+
+
+def obter_limitador_login() -> LimitadorLogin:
+    """Limitador do processo, criado na primeira tentativa de login"""
+    global _limitador
+    with _trava:
+        if _limitador is None:
+            if settings.LOGIN_LIMITE_COMPARTILHADO:
+                from app.database import engine
+                baldes = BaldesBanco(engine)
+            else:
+                baldes = BaldesMemoria()
+            _limitador = LimitadorLogin(
+                baldes,
+                {
+                    "ip": RegraLimite(settings.LOGIN_LIMITE_IP_TENTATIVAS, settings.LOGIN_LIMITE_IP_POR_MINUTO),
+                    "conta": RegraLimite(settings.LOGIN_LIMITE_CONTA_TENTATIVAS, settings.LOGIN_LIMITE_CONTA_POR_MINUTO),
+                },
+                settings.LOGIN_LIMITE_LIMPEZA_SEGUNDOS
+            )
+        return _limitador
+
+
+def verificar_limite_login(request: Request, conta: str):
+    """
+    Recusa a tentativa (429 com Retry-After) se o IP ou a conta passou do limite
+
+    Chamado no início das rotas de login, antes de qualquer acesso ao
+    cadastro de usuários.
+    """
+    if not settings.LOGIN_LIMITE_ATIVO:
+        return
+    recusa = obter_limitador_login().verificar([
+        ("ip", endereco_cliente(request)),
+        ("conta", conta.strip().lower()),
+    ])
+    if recusa is not None:
+        _, espera = recusa
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas tentativas de login. Tente novamente mais tarde.",
+            headers={"Retry-After": str(max(1, math.ceil(espera)))}
+        )
@@ -0,0 +1,88 @@
+"""
+Métricas em memória - Clínica Saúde+
+Contadores e distribuições de tempo por processo, expostas em GET /metricas.
+Cada worker do uvicorn mantém as suas.
+"""
+import threading
+from collections import defaultdict, deque
+from typing import Dict
+
+
+class Distribuicao:
+    """Totais de uma medida e as últimas amostras, para percentis"""
+
+    def __init__(self, amostras: int):
+        self.contagem = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+        self.amostras = deque(maxlen=amostras)
+
+    def observar(self, valor: float):
+        self.contagem += 1
+        self.soma += valor
+        self.maximo = max(self.maximo, valor)
+        self.amostras.append(valor)
+
+    def resumo(self) -> Dict[str, float]:
+        ordenadas = sorted(self.amostras)
+
+        def percentil(p):
+            if not ordenadas:
+                return 0.0
+            return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p / 100))]
+
+        return {
+            "contagem": self.contagem,
+            "media": round(self.soma / self.contagem, 3) if self.contagem else 0.0,
+            "maximo": round(self.maximo, 3),
+            "p50": round(percentil(50), 3),
+            "p95": round(percentil(95), 3),
+            "p99": round(percentil(99), 3),
+        }
+
+
+class Metricas:
+    """
+    Registro de métricas seguro entre threads
+
+    - incrementar: contadores e medidores (valor negativo decrementa)
+    - definir: medidores com valor absoluto (ex.: taxa de acerto)
+    - observar: distribuições (ex.: duração em ms), com percentis sobre
+      as últimas `amostras` observações
+    """
+
+    def __init__(self, amostras: int = 1024):
+        self._amostras = amostras
+        self._trava = threading.Lock()
+        self._contadores = defaultdict(float)
+        self._distribuicoes: Dict[str, Distribuicao] = {}
+
+    def incrementar(self, nome: str, valor: float = 1):
+        with self._trava:
+            self._contadores[nome] += valor
+
+    def definir(self, nome: str, valor: float):
+        with self._trava:
+            self._contadores[nome] = valor
+
+    def observar(self, nome: str, valor: float):
+        with self._trava:
+            distribuicao = self._distribuicoes.get(nome)
+            if distribuicao is None:
+                distribuicao = self._distribuicoes[nome] = Distribuicao(self._amostras)
+            distribuicao.observar(valor)
+
+    def instantaneo(self) -> dict:
+        with self._trava:
+            return {
+                "contadores": dict(self._contadores),
+                "distribuicoes": {nome: d.resumo() for nome, d in self._distribuicoes.items()},
+            }
+
+    def zerar(self):
+        with self._trava:
+            self._contadores.clear()
+            self._distribuicoes.clear()
+
+
+metricas = Metricas()
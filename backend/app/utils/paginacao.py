@@ -0,0 +1,139 @@
+"""
+Paginação por cursor (keyset) - Clínica Saúde+
+As listagens devolvem no máximo `limite` linhas, em ordem estável por colunas
+que identificam a linha (ex.: data_hora_inicio, id_consulta). A próxima página
+começa depois da última linha entregue: WHERE (inicio, id) > (:inicio, :id),
+que o banco resolve pelo índice sem contar nem pular as linhas anteriores
+(diferente de OFFSET, cujo custo cresce com o número da página).
+
+O cursor da próxima página vem no cabeçalho X-Proximo-Cursor (ausente na
+última página) e deve ser repassado sem alteração no parâmetro `cursor`. É
+opaco para o cliente: base64 dos valores das colunas de ordenação.
+
+Uso:
+    @router.get("/itens")
+    def listar(pagina: Pagina = Depends(), db: Session = Depends(get_db)):
+        return paginar(db.query(Item), [Item.criado_em, Item.id], pagina)
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from typing import Any, Callable, List, Optional, Sequence
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import tuple_
+
+from app.config import settings
+
+CABECALHO_PROXIMO_CURSOR = "X-Proximo-Cursor"
+
+
+class Pagina:
+    """
+    Parâmetros de paginação (cursor e limite), como dependência das rotas
+
+    Guarda a resposta para publicar o cursor da próxima página.
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        cursor: Optional[str] = Query(None, description="Valor de X-Proximo-Cursor da página anterior"),
+        limite: int = Query(
+            settings.PAGINACAO_LIMITE_PADRAO, ge=1, le=settings.PAGINACAO_LIMITE_MAXIMO,
+            description="Itens por página"
+        ),
+    ):
+        self.response = response
+        self.cursor = cursor
+        self.limite = limite
+
+
+def _assinatura(ordem: Sequence, descendente: bool) -> str:
+    """Identifica a ordenação: um cursor só vale para a listagem que o gerou"""
+    return ("-" if descendente else "+") + ",".join(str(coluna) for coluna in ordem)
+
+
+def _para_json(valor: Any) -> Any:
+    return valor.isoformat() if isinstance(valor, (date, datetime, time)) else valor
+
+
+def _de_json(coluna, valor: Any) -> Any:
+    tipo = coluna.type.python_type
+    if tipo in (date, datetime, time):
+        return tipo.fromisoformat(valor)
+    if not isinstance(valor, tipo):
+        raise ValueError(valor)
+    return valor
+
+
+def codificar_cursor(ordem: Sequence, valores: Sequence, descendente: bool = False) -> str:
+    conteudo = json.dumps(
+        {"o": _assinatura(ordem, descendente), "v": [_para_json(v) for v in valores]},
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(conteudo.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(ordem: Sequence, cursor: str, descendente: bool = False) -> List:
+    """Valores das colunas de ordenação no cursor; 400 se inválido ou de outra listagem"""
+    try:
+        conteudo = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if conteudo["o"] != _assinatura(ordem, descendente) or len(conteudo["v"]) != len(ordem):
+            raise ValueError(conteudo["o"])
+        return [_de_json(coluna, valor) for coluna, valor in zip(ordem, conteudo["v"])]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginação inválido"
+        )
+
+
+def filtro_cursor(ordem: Sequence, pagina: Pagina, descendente: bool = False) -> List:
+    """Predicado que começa a página depois do cursor (lista vazia na primeira página)"""
+    if pagina.cursor is None:
+        return []
+    valores = decodificar_cursor(ordem, pagina.cursor, descendente)
+    colunas, limites = tuple_(*ordem), tuple_(*valores)
+    return [colunas < limites if descendente else colunas > limites]
+
+
+def ordenacao(ordem: Sequence, descendente: bool = False) -> List:
+    return [coluna.desc() for coluna in ordem] if descendente else list(ordem)
+
+
+def fechar_pagina(
+    linhas: List, ordem: Sequence, pagina: Pagina, descendente: bool = False,
+    chave: Optional[Callable[[Any], Sequence]] = None
+) -> List:
+    """
+    Recebe até limite + 1 linhas: entrega `limite` e, se sobrou uma, publica
+    o cursor da próxima página (valores de ordenação da última entregue)
+
+    chave: valores de ordenação de uma linha; padrão, os atributos de mesmo
+    nome das colunas.
+    """
+    if len(linhas) <= pagina.limite:
+        return linhas
+    linhas = linhas[:pagina.limite]
+    chave = chave or (lambda linha: [getattr(linha, coluna.key) for coluna in ordem])
+    pagina.response.headers[CABECALHO_PROXIMO_CURSOR] = codificar_cursor(ordem, chave(linhas[-1]), descendente)
+    return linhas
+
+
+def paginar(
+    query, ordem: Sequence, pagina: Pagina, descendente: bool = False,
+    chave: Optional[Callable[[Any], Sequence]] = None
+) -> List:
+    """
+    Uma página da query do ORM, ordenada por `ordem` (colunas que, juntas,
+    identificam a linha, todas não nulas e no mesmo sentido)
+    """
+    linhas = (
+        query.filter(*filtro_cursor(ordem, pagina, descendente))
+        .order_by(*ordenacao(ordem, descendente))
+        .limit(pagina.limite + 1)
+        .all()
+    )
+    return fechar_pagina(linhas, ordem, pagina, descendente, chave)
@@ -0,0 +1,57 @@
+"""
+Filtros de período sobre colunas de data/hora
+Convertem datas em intervalos semiabertos [inicio, fim) de timestamps, de
+modo que o banco compare a coluna diretamente e possa usar seu índice
+(func.date(coluna) == dia e extract(...) obrigam a varrer a tabela inteira).
+"""
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+
+def inicio_do_dia(dia: date) -> datetime:
+    """00:00 do dia (limite inclusivo)"""
+    return datetime.combine(dia, time.min)
+
+
+def fim_do_dia(dia: date) -> datetime:
+    """00:00 do dia seguinte (limite exclusivo)"""
+    return datetime.combine(dia + timedelta(days=1), time.min)
+
+
+def limites_periodo(data_inicio: date, data_fim: date) -> Tuple[datetime, datetime]:
+    """Timestamps [inicio, fim) que cobrem as datas de data_inicio a data_fim, inclusive"""
+    return inicio_do_dia(data_inicio), fim_do_dia(data_fim)
+
+
+def limites_mes(referencia: date) -> Tuple[datetime, datetime]:
+    """Timestamps [inicio, fim) do mês da data de referência"""
+    inicio = date(referencia.year, referencia.month, 1)
+    proximo = date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+    return inicio_do_dia(inicio), inicio_do_dia(proximo)
+
+
+def filtro_periodo(coluna, data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> List:
+    """
+    Predicados que restringem a coluna às datas de data_inicio a data_fim
+    (inclusive); limites None não filtram
+
+    Uso:
+        query.filter(*filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim))
+    """
+    condicoes = []
+    if data_inicio is not None:
+        condicoes.append(coluna >= inicio_do_dia(data_inicio))
+    if data_fim is not None:
+        condicoes.append(coluna < fim_do_dia(data_fim))
+    return condicoes
+
+
+def filtro_dia(coluna, dia: date) -> List:
+    """Predicados equivalentes a func.date(coluna) == dia"""
+    return filtro_periodo(coluna, dia, dia)
+
+
+def filtro_mes(coluna, referencia: date) -> List:
+    """Predicados equivalentes a extract('year'/'month', coluna) do mês de referência"""
+    inicio, fim = limites_mes(referencia)
+    return [coluna >= inicio, coluna < fim]
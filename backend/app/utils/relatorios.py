@@ -1,358 +1,412 @@
-from datetime import datetime, date, timedelta
-from typing import List, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, case
-from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT
-
-from app.models import (
-    Consulta, Medico, Paciente, Especialidade, 
-    StatusConsulta, Usuario
-)
-
-
-def gerar_relatorio_consultas_por_medico(
-    db: Session,
-    data_inicio: date = None,
-    data_fim: date = None
-) -> Dict[str, Any]:
+"""
+Renderizadores de relatórios (PDF, CSV, XLSX, JSON) - Clínica Saúde+
+Cada relatório é uma tabela: título, subtítulo (período), colunas e linhas
+(dicionários). O renderizador é escolhido pelo formato pedido e devolve os
+bytes do arquivo; a consulta ao banco fica em app/services/relatorios.py.
+
+Estilos do PDF (folha de estilos, TableStyle do cabeçalho) são montados uma
+vez por processo e reutilizados em todas as requisições. O XLSX é escrito
+direto em SpreadsheetML (zip + XML da biblioteca padrão), sem dependências.
+"""
+import csv
+import io
+import itertools
+import json
+import tempfile
+import zipfile
+from datetime import date, datetime
+from functools import lru_cache
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+from xml.sax.saxutils import escape
+
+
+class Coluna:
+    """Coluna do relatório: chave na linha, título, largura no PDF (cm) e formatação do texto"""
+
+    def __init__(
+        self, chave: str, titulo: str, largura_cm: Optional[float] = None,
+        formatar: Optional[Callable[[Any], str]] = None
+    ):
+        self.chave = chave
+        self.titulo = titulo
+        self.largura_cm = largura_cm
+        self.formatar = formatar or (lambda valor: "" if valor is None else str(valor))
+
+
+class Tabela:
     """
-    Gera relatório de quantidade de consultas por médico
-    Caso de Uso: Gerar Relatórios em PDF - Quantidade de consultas por médico
+    Conteúdo pronto para renderizar
+
+    Com resumo=True a tabela tem uma única linha e é apresentada transposta
+    (Métrica/Valor); no JSON ela sai como um objeto em vez de lista.
+
+    linhas pode ser um iterador (lido do cursor do banco): nesse caso a
+    tabela serve para uma única renderização.
     """
-    if not data_inicio:
-        data_inicio = date.today() - timedelta(days=30)
-    if not data_fim:
-        data_fim = date.today()
-    
-    resultados = db.query(
-        Medico.id,
-        Usuario.nome.label('medico_nome'),
-        Especialidade.nome.label('especialidade'),
-        func.count(Consulta.id).label('total_consultas'),
-        func.sum(
-            case(
-                (Consulta.status == StatusConsulta.REALIZADA, 1),
-                else_=0
-            )
-        ).label('consultas_realizadas'),
-        func.sum(
-            case(
-                (Consulta.status == StatusConsulta.CANCELADA, 1),
-                else_=0
+
+    LARGURAS_RESUMO = (8, 4)
+
+    def __init__(
+        self, titulo: str, subtitulo: str, colunas: Sequence[Coluna], linhas: Iterable[Dict[str, Any]],
+        fonte_cabecalho: int = 12, resumo: bool = False
+    ):
+        self.titulo = titulo
+        self.subtitulo = subtitulo
+        self.colunas = colunas
+        self.linhas = linhas
+        self.fonte_cabecalho = fonte_cabecalho
+        self.resumo = resumo
+
+    def cabecalho(self) -> List[str]:
+        if self.resumo:
+            return ["Métrica", "Valor"]
+        return [c.titulo for c in self.colunas]
+
+    def larguras_cm(self) -> List[Optional[float]]:
+        if self.resumo:
+            return list(self.LARGURAS_RESUMO)
+        return [c.largura_cm for c in self.colunas]
+
+    def valores(self, formatados: bool = False) -> Iterator[List[Any]]:
+        """Linhas do corpo, com os valores originais ou já formatados como texto"""
+        def valor(coluna: Coluna, linha: Dict[str, Any]):
+            bruto = linha.get(coluna.chave)
+            return coluna.formatar(bruto) if formatados else bruto
+
+        if self.resumo:
+            for linha in itertools.islice(self.linhas, 1):
+                for coluna in self.colunas:
+                    yield [coluna.titulo, valor(coluna, linha)]
+            return
+        for linha in self.linhas:
+            yield [valor(coluna, linha) for coluna in self.colunas]
+
+    def textos(self) -> List[List[str]]:
+        """Cabeçalho e corpo formatados como texto"""
+        return [self.cabecalho()] + list(self.valores(formatados=True))
+
+
+def texto_periodo(data_inicio: Optional[date], data_fim: Optional[date]) -> str:
+    periodo = "Período: "
+    if data_inicio and data_fim:
+        return periodo + f"{data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
+    if data_inicio:
+        return periodo + f"A partir de {data_inicio.strftime('%d/%m/%Y')}"
+    if data_fim:
+        return periodo + f"Até {data_fim.strftime('%d/%m/%Y')}"
+    return periodo + "Todos os registros"
+
+
+# ============ PDF ============
+
+@lru_cache(maxsize=None)
+def _estilos_pdf():
+    from reportlab.lib.styles import getSampleStyleSheet
+    return getSampleStyleSheet()
+
+
+# Fonte do corpo e espaçamentos das células (padrões do reportlab, exceto o
+# espaço abaixo do cabeçalho); usados também para calcular a altura das linhas
+_FONTE_CORPO = 10
+_ESPACO_CELULA = 3
+_ESPACO_CABECALHO = 12
+
+
+@lru_cache(maxsize=None)
+def _estilo_tabela(fonte_cabecalho: int):
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), fonte_cabecalho),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), _ESPACO_CABECALHO),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+
+def _altura_linha(textos: List[str], tamanho_fonte: int, espaco_inferior: float) -> float:
+    linhas = max(texto.count("\n") + 1 for texto in textos)
+    return linhas * tamanho_fonte * 1.2 + _ESPACO_CELULA + espaco_inferior
+
+
+# Ocupa na fila de flowables o lugar das linhas ainda não paginadas
+_PROXIMAS_LINHAS = object()
+
+
+@lru_cache(maxsize=None)
+def _canvas_comprimido():
+    import zlib
+    from reportlab.pdfbase.pdfdoc import PDFArray, PDFDictionary, PDFName, PDFStream
+    from reportlab.pdfgen.canvas import Canvas
+
+    class CanvasComprimido(Canvas):
+        """
+        Comprime o conteúdo de cada página ao fechá-la (FlateDecode); o
+        reportlab guardaria o texto de todas as páginas até o save
+        """
+
+        def showPage(self):
+            super().showPage()
+            pagina = self._doc.Pages.pages[-1]
+            pagina.Contents = PDFStream(
+                PDFDictionary({"Filter": PDFArray([PDFName("FlateDecode")])}),
+                zlib.compress(pagina.stream.encode("utf-8"))
             )
-        ).label('consultas_canceladas')
-    ).join(
-        Usuario, Medico.usuario_id == Usuario.id
-    ).join(
-        Especialidade, Medico.especialidade_id == Especialidade.id
-    ).outerjoin(
-        Consulta, Medico.id == Consulta.medico_id
-    ).filter(
-        and_(
-            Consulta.data >= data_inicio,
-            Consulta.data <= data_fim
-        )
-    ).group_by(
-        Medico.id, Usuario.nome, Especialidade.nome
-    ).all()
-    
-    dados = []
-    for r in resultados:
-        dados.append({
-            'medico_nome': r.medico_nome,
-            'especialidade': r.especialidade,
-            'total_consultas': r.total_consultas or 0,
-            'consultas_realizadas': r.consultas_realizadas or 0,
-            'consultas_canceladas': r.consultas_canceladas or 0
-        })
-    
-    return {
-        'tipo': 'consultas_por_medico',
-        'data_inicio': data_inicio.isoformat(),
-        'data_fim': data_fim.isoformat(),
-        'dados': dados
-    }
-
-
-def gerar_relatorio_consultas_por_especialidade(
-    db: Session,
-    data_inicio: date = None,
-    data_fim: date = None
-) -> Dict[str, Any]:
-    """
-    Gera relatório de quantidade de consultas por especialidade
-    Caso de Uso: Gerar Relatórios em PDF - Quantidade de consultas por especialidade
-    """
-    if not data_inicio:
-        data_inicio = date.today() - timedelta(days=30)
-    if not data_fim:
-        data_fim = date.today()
-    
-    resultados = db.query(
-        Especialidade.nome.label('especialidade'),
-        func.count(Consulta.id).label('total_consultas'),
-        func.count(func.distinct(Medico.id)).label('total_medicos')
-    ).join(
-        Medico, Especialidade.id == Medico.especialidade_id
-    ).outerjoin(
-        Consulta, Medico.id == Consulta.medico_id
-    ).filter(
-        and_(
-            Consulta.data >= data_inicio,
-            Consulta.data <= data_fim
-        )
-    ).group_by(
-        Especialidade.nome
-    ).all()
-    
-    dados = []
-    for r in resultados:
-        dados.append({
-            'especialidade': r.especialidade,
-            'total_consultas': r.total_consultas or 0,
-            'total_medicos': r.total_medicos or 0
-        })
-    
-    return {
-        'tipo': 'consultas_por_especialidade',
-        'data_inicio': data_inicio.isoformat(),
-        'data_fim': data_fim.isoformat(),
-        'dados': dados
-    }
-
-
-def gerar_relatorio_cancelamentos(
-    db: Session,
-    data_inicio: date = None,
-    data_fim: date = None
-) -> Dict[str, Any]:
+            pagina.stream = None
+
+    return CanvasComprimido
+
+
+@lru_cache(maxsize=None)
+def _documento_paginado():
+    from reportlab.platypus import PageBreak, SimpleDocTemplate, Table
+
+    class DocumentoPaginado(SimpleDocTemplate):
+        """
+        Recebe as linhas sob demanda: quando _PROXIMAS_LINHAS chega à frente
+        da fila, vira uma Table com o cabeçalho e só as linhas que cabem no
+        espaço restante do quadro (alturas já conhecidas, sem divisão pelo
+        reportlab), seguida de _PROXIMAS_LINHAS outra vez
+        """
+
+        def __init__(self, arquivo, tabela: Tabela, larguras, **opcoes):
+            super().__init__(arquivo, **opcoes)
+            self._cabecalho = tabela.cabecalho()
+            self._altura_cabecalho = _altura_linha(self._cabecalho, tabela.fonte_cabecalho, _ESPACO_CABECALHO)
+            self._estilo = _estilo_tabela(tabela.fonte_cabecalho)
+            self._larguras = larguras
+            self._linhas = tabela.valores(formatados=True)
+            self._pendente: Optional[List[str]] = None
+            self._paginas = 0
+
+        def _proxima_tabela(self):
+            disponivel = self.frame._y - self.frame._y1p
+            linhas, alturas = [self._cabecalho], [self._altura_cabecalho]
+            ocupado = self._altura_cabecalho
+            while True:
+                linha = self._pendente if self._pendente is not None else next(self._linhas, None)
+                self._pendente = None
+                if linha is None:
+                    break
+                altura = _altura_linha(linha, _FONTE_CORPO, _ESPACO_CELULA)
+                # No topo de uma página vazia entra ao menos uma linha (como na Table inteira)
+                if ocupado + altura > disponivel and (len(linhas) > 1 or not self.frame._atTop):
+                    self._pendente = linha
+                    break
+                linhas.append(linha)
+                alturas.append(altura)
+                ocupado += altura
+            if len(linhas) == 1:
+                if self._pendente is not None:
+                    return PageBreak()
+                # Fim das linhas; relatório vazio ainda sai com a tabela só com o cabeçalho
+                if self._paginas:
+                    return None
+            self._paginas += 1
+            conteudo = Table(linhas, colWidths=self._larguras, rowHeights=alturas)
+            conteudo.setStyle(self._estilo)
+            return conteudo
+
+        def handle_flowable(self, flowables):
+            if flowables[0] is _PROXIMAS_LINHAS:
+                del flowables[0]
+                proximo = self._proxima_tabela()
+                if proximo is None:
+                    return
+                flowables[0:0] = [proximo, _PROXIMAS_LINHAS]
+            super().handle_flowable(flowables)
+
+    return DocumentoPaginado
+
+
+# Acima disso o PDF vai do arquivo temporário para o disco
+_PDF_EM_MEMORIA_BYTES = 8 * 1024 * 1024
+
+
+class RenderizadorPDF:
     """
-    Gera relatório de taxa de cancelamentos e remarcações
-    Caso de Uso: Gerar Relatórios em PDF - Taxa de cancelamentos e remarcações
+    Página a página: as linhas são lidas da tabela à medida que as páginas
+    são montadas, cada página é uma Table pequena (cabeçalho + linhas que
+    cabem) e o documento é gravado num SpooledTemporaryFile, e o reportlab
+    não remede as linhas restantes a cada quebra de página como faria com
+    uma Table única.
+
+    Com linhas num iterador e renderizar_em_arquivo (tarefas em segundo
+    plano, copiadas para o disco em pedaços), a memória não cresce com o
+    número de linhas: só o conteúdo comprimido das páginas fica com o
+    reportlab até o fim. renderizar devolve o arquivo inteiro em bytes.
     """
-    if not data_inicio:
-        data_inicio = date.today() - timedelta(days=30)
-    if not data_fim:
-        data_fim = date.today()
-    
-    total_consultas = db.query(func.count(Consulta.id)).filter(
-        and_(
-            Consulta.data >= data_inicio,
-            Consulta.data <= data_fim
-        )
-    ).scalar() or 0
-    
-    total_cancelamentos = db.query(func.count(Consulta.id)).filter(
-        and_(
-            Consulta.data >= data_inicio,
-            Consulta.data <= data_fim,
-            Consulta.status == StatusConsulta.CANCELADA
-        )
-    ).scalar() or 0
-    
-    # Para remarcações, consideramos cancelamentos com motivo que menciona reagendamento
-    total_remarcacoes = db.query(func.count(Consulta.id)).filter(
-        and_(
-            Consulta.data >= data_inicio,
-            Consulta.data <= data_fim,
-            Consulta.status == StatusConsulta.CANCELADA,
-            Consulta.motivo_cancelamento.ilike('%reagend%')
+    extensao = "pdf"
+    tipo_conteudo = "application/pdf"
+    disposicao = "inline"
+
+    def renderizar_em_arquivo(self, tabela: Tabela) -> IO[bytes]:
+        """PDF num arquivo temporário, posicionado no início (quem recebe fecha)"""
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.units import cm
+        from reportlab.platypus import Paragraph, Spacer
+
+        estilos = _estilos_pdf()
+        larguras = [largura * cm if largura else None for largura in tabela.larguras_cm()]
+        arquivo = tempfile.SpooledTemporaryFile(max_size=_PDF_EM_MEMORIA_BYTES)
+        try:
+            documento = _documento_paginado()(arquivo, tabela, larguras, pagesize=A4)
+            documento.build([
+                Paragraph(f"<b>{escape(tabela.titulo)}</b>", estilos['Title']),
+                Spacer(1, 0.5 * cm),
+                Paragraph(escape(tabela.subtitulo), estilos['Normal']),
+                Spacer(1, 0.5 * cm),
+                _PROXIMAS_LINHAS,
+            ], canvasmaker=_canvas_comprimido())
+        except BaseException:
+            arquivo.close()
+            raise
+        arquivo.seek(0)
+        return arquivo
+
+    def renderizar(self, tabela: Tabela) -> bytes:
+        with self.renderizar_em_arquivo(tabela) as arquivo:
+            return arquivo.read()
+
+
+# ============ CSV ============
+
+class RenderizadorCSV:
+    extensao = "csv"
+    tipo_conteudo = "text/csv; charset=utf-8"
+    disposicao = "attachment"
+
+    def renderizar(self, tabela: Tabela) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(tabela.textos())
+        return buffer.getvalue().encode("utf-8")
+
+
+# ============ XLSX ============
+
+_XLSX_FIXOS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    # Estilo 1: negrito (cabeçalho)
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+# Caracteres de controle não são aceitos em XML
+_CONTROLE = {c: None for c in range(32) if c not in (9, 10, 13)}
+
+
+def _coluna_xlsx(indice: int) -> str:
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celula_xlsx(referencia: str, valor: Any, estilo: int = 0) -> str:
+    atributo_estilo = f' s="{estilo}"' if estilo else ""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c r="{referencia}"{atributo_estilo}><v>{valor}</v></c>'
+    if isinstance(valor, (date, datetime)):
+        valor = valor.isoformat()
+    texto = escape(("" if valor is None else str(valor)).translate(_CONTROLE))
+    return f'<c r="{referencia}"{atributo_estilo} t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+class RenderizadorXLSX:
+    """Planilha única; números ficam numéricos, o restante como texto"""
+    extensao = "xlsx"
+    tipo_conteudo = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    disposicao = "attachment"
+
+    def renderizar(self, tabela: Tabela) -> bytes:
+        letras = [_coluna_xlsx(i) for i in range(len(tabela.cabecalho()))]
+        linhas = ['<row r="1">' + "".join(
+            _celula_xlsx(f"{letra}1", titulo, estilo=1) for letra, titulo in zip(letras, tabela.cabecalho())
+        ) + '</row>']
+        for numero, valores in enumerate(tabela.valores(), start=2):
+            linhas.append(f'<row r="{numero}">' + "".join(
+                _celula_xlsx(f"{letra}{numero}", valor) for letra, valor in zip(letras, valores)
+            ) + '</row>')
+        planilha = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f'<sheetData>{"".join(linhas)}</sheetData></worksheet>'
         )
-    ).scalar() or 0
-    
-    taxa_cancelamento = (total_cancelamentos / total_consultas * 100) if total_consultas > 0 else 0
-    
-    return {
-        'tipo': 'cancelamentos_remarcacoes',
-        'data_inicio': data_inicio.isoformat(),
-        'data_fim': data_fim.isoformat(),
-        'dados': {
-            'total_consultas': total_consultas,
-            'total_cancelamentos': total_cancelamentos,
-            'total_remarcacoes': total_remarcacoes,
-            'taxa_cancelamento': round(taxa_cancelamento, 2)
-        }
-    }
-
-
-def gerar_relatorio_pacientes_frequentes(
-    db: Session,
-    data_inicio: date = None,
-    data_fim: date = None,
-    limite: int = 20
-) -> Dict[str, Any]:
-    """
-    Gera relatório de pacientes que mais consultaram no período
-    Caso de Uso: Gerar Relatórios em PDF - Pacientes que mais consultaram no período
-    """
-    if not data_inicio:
-        data_inicio = date.today() - timedelta(days=30)
-    if not data_fim:
-        data_fim = date.today()
-    
-    resultados = db.query(
-        Paciente.id,
-        Usuario.nome.label('paciente_nome'),
-        Paciente.cpf,
-        func.count(Consulta.id).label('total_consultas'),
-        func.max(Consulta.data).label('ultima_consulta')
-    ).join(
-        Usuario, Paciente.usuario_id == Usuario.id
-    ).join(
-        Consulta, Paciente.id == Consulta.paciente_id
-    ).filter(
-        and_(
-            Consulta.data >= data_inicio,
-            Consulta.data <= data_fim
+        nome_planilha = escape(tabela.titulo[:31].translate(_CONTROLE).translate(str.maketrans("[]:*?/\\", "_______")))
+        livro = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{nome_planilha}" sheetId="1" r:id="rId1"/></sheets></workbook>'
         )
-    ).group_by(
-        Paciente.id, Usuario.nome, Paciente.cpf
-    ).order_by(
-        func.count(Consulta.id).desc()
-    ).limit(limite).all()
-    
-    dados = []
-    for r in resultados:
-        dados.append({
-            'paciente_nome': r.paciente_nome,
-            'cpf': r.cpf,
-            'total_consultas': r.total_consultas or 0,
-            'ultima_consulta': r.ultima_consulta.isoformat() if r.ultima_consulta else None
-        })
-    
-    return {
-        'tipo': 'pacientes_frequentes',
-        'data_inicio': data_inicio.isoformat(),
-        'data_fim': data_fim.isoformat(),
-        'dados': dados
-    }
-
-
-def criar_pdf_relatorio(dados_relatorio: Dict[str, Any]) -> BytesIO:
-    """
-    Cria um PDF a partir dos dados do relatório
-    """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elementos = []
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    titulo_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#1a5490'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    subtitulo_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=12,
-        textColor=colors.grey,
-        spaceAfter=12,
-        alignment=TA_CENTER
-    )
-    
-    # Título
-    elementos.append(Paragraph("Clínica Saúde+", titulo_style))
-    elementos.append(Paragraph("Sistema de Agendamento de Consultas", subtitulo_style))
-    elementos.append(Spacer(1, 0.3*inch))
-    
-    tipo = dados_relatorio.get('tipo', '')
-    data_inicio = dados_relatorio.get('data_inicio', '')
-    data_fim = dados_relatorio.get('data_fim', '')
-    
-    # Cabeçalho do relatório
-    if tipo == 'consultas_por_medico':
-        elementos.append(Paragraph("Relatório de Consultas por Médico", styles['Heading2']))
-    elif tipo == 'consultas_por_especialidade':
-        elementos.append(Paragraph("Relatório de Consultas por Especialidade", styles['Heading2']))
-    elif tipo == 'cancelamentos_remarcacoes':
-        elementos.append(Paragraph("Relatório de Cancelamentos e Remarcações", styles['Heading2']))
-    elif tipo == 'pacientes_frequentes':
-        elementos.append(Paragraph("Relatório de Pacientes Frequentes", styles['Heading2']))
-    
-    elementos.append(Paragraph(f"Período: {data_inicio} a {data_fim}", subtitulo_style))
-    elementos.append(Spacer(1, 0.3*inch))
-    
-    # Dados do relatório
-    dados = dados_relatorio.get('dados', [])
-    
-    if tipo == 'consultas_por_medico':
-        tabela_dados = [['Médico', 'Especialidade', 'Total', 'Realizadas', 'Canceladas']]
-        for item in dados:
-            tabela_dados.append([
-                item['medico_nome'],
-                item['especialidade'],
-                str(item['total_consultas']),
-                str(item['consultas_realizadas']),
-                str(item['consultas_canceladas'])
-            ])
-    
-    elif tipo == 'consultas_por_especialidade':
-        tabela_dados = [['Especialidade', 'Total Consultas', 'Total Médicos']]
-        for item in dados:
-            tabela_dados.append([
-                item['especialidade'],
-                str(item['total_consultas']),
-                str(item['total_medicos'])
-            ])
-    
-    elif tipo == 'cancelamentos_remarcacoes':
-        tabela_dados = [['Métrica', 'Valor']]
-        tabela_dados.append(['Total de Consultas', str(dados['total_consultas'])])
-        tabela_dados.append(['Total de Cancelamentos', str(dados['total_cancelamentos'])])
-        tabela_dados.append(['Total de Remarcações', str(dados['total_remarcacoes'])])
-        tabela_dados.append(['Taxa de Cancelamento (%)', f"{dados['taxa_cancelamento']}%"])
-    
-    elif tipo == 'pacientes_frequentes':
-        tabela_dados = [['Paciente', 'CPF', 'Total Consultas', 'Última Consulta']]
-        for item in dados:
-            tabela_dados.append([
-                item['paciente_nome'],
-                item['cpf'],
-                str(item['total_consultas']),
-                item['ultima_consulta'] or 'N/A'
-            ])
-    
-    # Criar tabela
-    tabela = Table(tabela_dados)
-    tabela.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a5490')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-    ]))
-    
-    elementos.append(tabela)
-    elementos.append(Spacer(1, 0.5*inch))
-    
-    # Rodapé
-    data_geracao = datetime.now().strftime('%d/%m/%Y %H:%M')
-    rodape = Paragraph(
-        f"Relatório gerado em: {data_geracao}",
-        ParagraphStyle('Rodape', parent=styles['Normal'], fontSize=8, alignment=TA_RIGHT)
-    )
-    elementos.append(rodape)
-    
-    # Construir PDF
-    doc.build(elementos)
-    buffer.seek(0)
-    
-    return buffer
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as arquivo:
+            for nome, conteudo in _XLSX_FIXOS.items():
+                arquivo.writestr(nome, conteudo)
+            arquivo.writestr("xl/workbook.xml", livro)
+            arquivo.writestr("xl/worksheets/sheet1.xml", planilha)
+        return buffer.getvalue()
+
+
+# ============ JSON ============
+
+class RenderizadorJSON:
+    """As linhas como lista de objetos, valores sem formatação (a resposta padrão da API)"""
+    extensao = "json"
+    tipo_conteudo = "application/json"
+    disposicao = None
+
+    def renderizar(self, tabela: Tabela) -> bytes:
+        dados = next(iter(tabela.linhas)) if tabela.resumo else list(tabela.linhas)
+        return json.dumps(dados, default=str, ensure_ascii=False).encode("utf-8")
+
+
+RENDERIZADORES = {
+    renderizador.extensao: renderizador
+    for renderizador in (RenderizadorPDF(), RenderizadorCSV(), RenderizadorXLSX(), RenderizadorJSON())
+}
@@ -0,0 +1,212 @@
+"""
+Pool de processos para bcrypt - Clínica Saúde+
+Hash e verificação de senha (bcrypt) rodam em um pool de processos
+dedicado e de tamanho fixo, fora do threadpool compartilhado do FastAPI.
+
+A admissão é limitada a SENHAS_PROCESSOS + SENHAS_FILA_MAXIMA operações em
+andamento: além disso a chamada falha na hora (PoolSenhasSaturado -> 503),
+de modo que um pico de logins prende no máximo esse número de threads e
+nunca esgota o threadpool que atende o restante da API.
+
+Métricas: senhas_espera_ms (fila do pool), senhas_<operacao>_ms (bcrypt no
+processo filho), senhas_em_andamento, senhas_rejeitadas, senhas_tempo_esgotado.
+
+O custo dos novos hashes é BCRYPT_CUSTO, calibrado uma vez no deploy
+(benchmarks/custo_bcrypt.py: maior custo dentro de BCRYPT_TEMPO_ALVO_MS) e
+igual em todos os processos; hashes com custo menor são refeitos no login.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import bcrypt
+
+from app.config import settings
+from app.utils.metricas import metricas
+
+
+class PoolSenhasSaturado(Exception):
+    """Nenhuma vaga no pool de senhas (ou sem resposta no tempo máximo)"""
+
+
+def _executar_cronometrado(funcao, *args):
+    """Executa no processo do pool; devolve (resultado, início, duração em s)"""
+    inicio = time.time()
+    resultado = funcao(*args)
+    return resultado, inicio, time.time() - inicio
+
+
+def verificar_bcrypt(senha: bytes, senha_hash: bytes) -> bool:
+    return bcrypt.checkpw(senha, senha_hash)
+
+
+def gerar_bcrypt(senha: bytes, custo: int) -> bytes:
+    return bcrypt.hashpw(senha, bcrypt.gensalt(rounds=custo))
+
+
+def custo_do_hash(senha_hash: str) -> Optional[int]:
+    """Custo gravado em um hash bcrypt ("$2b$12$..." -> 12); None se não for bcrypt"""
+    partes = senha_hash.split("$")
+    if len(partes) < 4 or not partes[2].isdigit():
+        return None
+    return int(partes[2])
+
+
+def medir_bcrypt(custo: int, repeticoes: int = 3) -> float:
+    """Mediana, em ms, de um hash bcrypt com o custo informado neste processo"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        bcrypt.hashpw(b"calibracao", bcrypt.gensalt(rounds=custo))
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tempos)[len(tempos) // 2]
+
+
+def calibrar_custo_bcrypt(tempo_alvo_ms: float, custo_minimo: int, custo_maximo: int) -> int:
+    """
+    Maior custo cujo hash leva no máximo tempo_alvo_ms neste hardware
+
+    Cada ponto de custo dobra o tempo: mede o custo mínimo, extrapola e
+    confirma o candidato com uma medição, descendo enquanto passar do alvo.
+    Nunca retorna menos que custo_minimo.
+    """
+    tempo_minimo = medir_bcrypt(custo_minimo)
+    custo = custo_minimo
+    while custo < custo_maximo and tempo_minimo * 2 ** (custo + 1 - custo_minimo) <= tempo_alvo_ms:
+        custo += 1
+    while custo > custo_minimo and medir_bcrypt(custo, repeticoes=1) > tempo_alvo_ms:
+        custo -= 1
+    return custo
+
+
+def custo_bcrypt() -> int:
+    """
+    Custo usado nos novos hashes: 4 em testes, BCRYPT_CUSTO se configurado,
+    senão BCRYPT_CUSTO_MINIMO
+
+    Não é medido em cada processo: medições ruidosas dariam custos diferentes
+    a cada worker e reinício.
+    """
+    if settings.TESTING:
+        return 4
+    if settings.BCRYPT_CUSTO is None:
+        return settings.BCRYPT_CUSTO_MINIMO
+    return settings.BCRYPT_CUSTO
+
+
+def precisa_rehash(senha_hash: str) -> bool:
+    """
+    Hash gravado com custo menor que o atual (refazer no próximo login)
+
+    Custo maior é mantido: baixar o custo enfraqueceria o hash, e um custo
+    configurado diferente entre servidores não refaz o hash a cada login.
+    """
+    custo = custo_do_hash(senha_hash)
+    return custo is None or custo < custo_bcrypt()
+
+
+class PoolSenhas:
+    """
+    Pool de processos com admissão limitada
+
+    processos=0 executa na própria thread (desenvolvimento, Windows sem
+    spawn rápido), mantendo o limite de admissão e as métricas.
+    """
+
+    def __init__(self, processos: int, fila_maxima: int, espera_maxima_segundos: float):
+        self.processos = processos
+        self.espera_maxima_segundos = espera_maxima_segundos
+        self._vagas = threading.BoundedSemaphore(max(processos, 1) + fila_maxima)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._trava = threading.Lock()
+
+    def _obter_executor(self) -> ProcessPoolExecutor:
+        with self._trava:
+            if self._executor is None:
+                # spawn: o processo da API tem threads; fork poderia herdar travas presas
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processos,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _liberar_vaga(self, _futuro=None):
+        metricas.incrementar("senhas_em_andamento", -1)
+        self._vagas.release()
+
+    def executar(self, operacao: str, funcao, *args):
+        """
+        Executa funcao(*args) no pool
+
+        Raises:
+            PoolSenhasSaturado: sem vaga, pool quebrado ou resposta além de
+            SENHAS_ESPERA_MAXIMA_SEGUNDOS
+        """
+        if not self._vagas.acquire(blocking=False):
+            metricas.incrementar("senhas_rejeitadas")
+            raise PoolSenhasSaturado()
+        metricas.incrementar("senhas_em_andamento")
+        enviado = time.time()
+
+        if self.processos == 0:
+            try:
+                resultado, inicio, duracao = _executar_cronometrado(funcao, *args)
+            finally:
+                self._liberar_vaga()
+        else:
+            try:
+                futuro = self._obter_executor().submit(_executar_cronometrado, funcao, *args)
+            except (BrokenProcessPool, RuntimeError):
+                self._liberar_vaga()
+                self.encerrar()
+                raise PoolSenhasSaturado()
+            # A vaga só volta quando o processo termina, mesmo se quem espera desistir
+            futuro.add_done_callback(self._liberar_vaga)
+            try:
+                resultado, inicio, duracao = futuro.result(timeout=self.espera_maxima_segundos)
+            except TempoEsgotado:
+                futuro.cancel()
+                metricas.incrementar("senhas_tempo_esgotado")
+                raise PoolSenhasSaturado()
+            except BrokenProcessPool:
+                self.encerrar()
+                raise PoolSenhasSaturado()
+
+        metricas.observar("senhas_espera_ms", max(inicio - enviado, 0.0) * 1000)
+        metricas.observar(f"senhas_{operacao}_ms", duracao * 1000)
+        return resultado
+
+    def encerrar(self):
+        with self._trava:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: Optional[PoolSenhas] = None
+_pool_trava = threading.Lock()
+
+
+def obter_pool_senhas() -> PoolSenhas:
+    """Pool do processo atual, criado na primeira senha processada"""
+    global _pool
+    with _pool_trava:
+        if _pool is None:
+            _pool = PoolSenhas(
+                settings.SENHAS_PROCESSOS,
+                settings.SENHAS_FILA_MAXIMA,
+                settings.SENHAS_ESPERA_MAXIMA_SEGUNDOS
+            )
+        return _pool
+
+
+def encerrar_pool_senhas():
+    """Encerra os processos do pool (desligamento da aplicação)"""
+    global _pool
+    with _pool_trava:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.encerrar()
@@ -0,0 +1,163 @@
+"""
+Verificação de tokens JWT - Clínica Saúde+
+
+- Decodificadores intercambiáveis (JWT_DECODIFICADOR): "jose" (python-jose,
+  padrão) ou "nativo" (HMAC da biblioteca padrão, só algoritmos HS*). Todos
+  recebem o token e devolvem o payload validado (assinatura e exp) ou None.
+- CacheTokens: LRU limitado de payloads já verificados, indexado pelo SHA-256
+  do token e descartado quando o token expira. Um token apresentado centenas
+  de vezes na sessão é verificado uma vez.
+
+Métricas: tokens_cache_acertos, tokens_cache_falhas, tokens_cache_taxa_acerto.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from jose import JWTError, jwt
+
+from app.config import settings
+from app.utils.metricas import metricas
+
+Decodificador = Callable[[str], Optional[dict]]
+
+_HASHES_HMAC = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+def decodificar_jose(token: str) -> Optional[dict]:
+    """Decodificação completa com python-jose"""
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+
+
+def _base64url(segmento: str) -> bytes:
+    return base64.urlsafe_b64decode(segmento + "=" * (-len(segmento) % 4))
+
+
+def decodificar_nativo(token: str) -> Optional[dict]:
+    """
+    Verificação HS256/384/512 só com hmac/hashlib/json, sem as camadas
+    genéricas do python-jose. Exige o algoritmo configurado no cabeçalho
+    e exp no futuro, como decodificar_jose.
+    """
+    funcao_hash = _HASHES_HMAC.get(settings.ALGORITHM)
+    if funcao_hash is None:
+        return decodificar_jose(token)
+    try:
+        cabecalho, corpo, assinatura = token.split(".")
+        if json.loads(_base64url(cabecalho)).get("alg") != settings.ALGORITHM:
+            return None
+        esperada = hmac.new(
+            settings.SECRET_KEY.encode("utf-8"), f"{cabecalho}.{corpo}".encode("ascii"), funcao_hash
+        ).digest()
+        if not hmac.compare_digest(esperada, _base64url(assinatura)):
+            return None
+        payload = json.loads(_base64url(corpo))
+    except (ValueError, TypeError, AttributeError, UnicodeError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    exp = payload.get("exp")
+    if exp is not None and (not isinstance(exp, (int, float)) or exp <= time.time()):
+        return None
+    return payload
+
+
+DECODIFICADORES: Dict[str, Decodificador] = {
+    "jose": decodificar_jose,
+    "nativo": decodificar_nativo,
+}
+
+
+class CacheTokens:
+    """
+    LRU de payloads verificados (thread-safe)
+
+    A chave é o SHA-256 do token (o token em si não fica em memória) e cada
+    entrada guarda o exp: uma entrada expirada nunca é devolvida e é removida
+    no primeiro acesso após expirar.
+    """
+
+    def __init__(self, capacidade: int):
+        self.capacidade = capacidade
+        self._entradas: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    @staticmethod
+    def chave(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def obter(self, chave: bytes) -> Optional[dict]:
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[1] > time.time():
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                resultado = entrada[0]
+            else:
+                if entrada is not None:
+                    del self._entradas[chave]
+                self.falhas += 1
+                resultado = None
+            acertou, taxa = resultado is not None, self.acertos / (self.acertos + self.falhas)
+        metricas.incrementar("tokens_cache_acertos" if acertou else "tokens_cache_falhas")
+        metricas.definir("tokens_cache_taxa_acerto", round(taxa, 4))
+        return resultado
+
+    def guardar(self, chave: bytes, valor: dict, expira_em: float):
+        with self._trava:
+            self._entradas[chave] = (valor, expira_em)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+            self.acertos = self.falhas = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+_decodificador: Optional[Decodificador] = None
+_cache: Optional[CacheTokens] = None
+_trava = threading.Lock()
+
+
+def obter_decodificador() -> Decodificador:
+    """Decodificador em uso (JWT_DECODIFICADOR, salvo troca por definir_decodificador)"""
+    global _decodificador
+    if _decodificador is None:
+        _decodificador = DECODIFICADORES[settings.JWT_DECODIFICADOR]
+    return _decodificador
+
+
+def definir_decodificador(decodificador: Optional[Decodificador]):
+    """
+    Troca o decodificador (ex.: outra biblioteca JWT); None volta ao
+    configurado. Limpa o cache, verificado pelo decodificador anterior.
+    """
+    global _decodificador
+    _decodificador = decodificador
+    cache = obter_cache_tokens()
+    if cache is not None:
+        cache.limpar()
+
+
+def obter_cache_tokens() -> Optional[CacheTokens]:
+    """Cache do processo; None se TOKENS_CACHE_CAPACIDADE = 0"""
+    global _cache
+    with _trava:
+        if _cache is None and settings.TOKENS_CACHE_CAPACIDADE > 0:
+            _cache = CacheTokens(settings.TOKENS_CACHE_CAPACIDADE)
+        return _cache
@@ -0,0 +1,173 @@
+"""
+Benchmark de agendamentos concorrentes (RN4 garantida pelo banco)
+
+Dispara N agendamentos simultâneos para o MESMO horário de um médico e
+verifica que exatamente um é aceito (os demais recebem 400 na validação ou
+409 pela restrição de exclusão). Em seguida dispara N agendamentos para
+horários DISTINTOS e mede a vazão, para mostrar que a garantia não
+serializa agendamentos que não competem entre si.
+
+Requer PostgreSQL (a restrição de exclusão só existe nele). Usa um schema
+próprio, recriado a cada execução.
+
+Uso:
+    python benchmarks/agendamento_concorrente.py --paralelos 64 --rodadas 5
+    DATABASE_URL=postgresql://... python benchmarks/agendamento_concorrente.py
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as hora, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from fastapi import HTTPException
+from sqlalchemy import func
+
+from app.config import settings
+from app.models.models import Consulta, Especialidade, HorarioTrabalho, Medico, Paciente
+from app.routers.pacientes import agendar_consulta
+from app.schemas.schemas import ConsultaCreate
+from benchmarks.comum import percentil, preparar_banco
+
+SCHEMA = "benchmark_agendamento"
+
+
+def popular(Sessao, medicos: int, pacientes: int):
+    """Cria médicos com expediente 08:00-18:00 de segunda a sexta e pacientes"""
+    db = Sessao()
+    especialidade = Especialidade(nome="Benchmark")
+    db.add(especialidade)
+    db.flush()
+
+    ids_medicos = []
+    for i in range(medicos):
+        medico = Medico(
+            nome=f"Medico {i}", cpf=f"m{i:010d}", email=f"medico{i}@benchmark",
+            senha_hash="-", crm=f"CRM{i}", id_especialidade_fk=especialidade.id_especialidade
+        )
+        db.add(medico)
+        db.flush()
+        db.add_all([
+            HorarioTrabalho(dia_semana=dia, hora_inicio=hora(8), hora_fim=hora(18), id_medico_fk=medico.id_medico)
+            for dia in range(5)
+        ])
+        ids_medicos.append(medico.id_medico)
+
+    ids_pacientes = []
+    for i in range(pacientes):
+        paciente = Paciente(
+            nome=f"Paciente {i}", cpf=f"p{i:010d}", email=f"paciente{i}@benchmark",
+            senha_hash="-", data_nascimento=date(1990, 1, 1)
+        )
+        db.add(paciente)
+        db.flush()
+        ids_pacientes.append(paciente.id_paciente)
+
+    db.commit()
+    db.close()
+    return ids_medicos, ids_pacientes
+
+
+def disparar(Sessao, pedidos):
+    """
+    Executa os pedidos (paciente_id, medico_id, data_hora) ao mesmo tempo,
+    chamando o mesmo código do endpoint POST /pacientes/consultas
+
+    Returns:
+        tuple: (Counter de status HTTP, latências em ms, tempo total em s)
+    """
+    barreira = threading.Barrier(len(pedidos))
+
+    def agendar(pedido):
+        paciente_id, medico_id, data_hora = pedido
+        db = Sessao()
+        try:
+            barreira.wait()
+            inicio = time.perf_counter()
+            try:
+                agendar_consulta(paciente_id, ConsultaCreate(data_hora=data_hora, id_medico=medico_id), db)
+                codigo = 201
+            except HTTPException as e:
+                codigo = e.status_code
+            return codigo, (time.perf_counter() - inicio) * 1000
+        finally:
+            db.close()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(pedidos)) as executor:
+        resultados = list(executor.map(agendar, pedidos))
+    total = time.perf_counter() - inicio
+
+    return Counter(codigo for codigo, _ in resultados), [ms for _, ms in resultados], total
+
+
+def relatar(fase, codigos, latencias, total):
+    print(
+        f"{fase:<22} 201={codigos.get(201, 0):<4} 409={codigos.get(409, 0):<4} "
+        f"400={codigos.get(400, 0):<4} outros={sum(codigos.values()) - codigos.get(201, 0) - codigos.get(409, 0) - codigos.get(400, 0):<3} "
+        f"p50={statistics.median(latencias):7.1f}ms p99={percentil(latencias, 99):7.1f}ms "
+        f"total={total * 1000:7.1f}ms vazão={len(latencias) / total:7.1f}/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paralelos", type=int, default=64, help="agendamentos simultâneos por rodada (padrão: 64)")
+    parser.add_argument("--rodadas", type=int, default=5, help="rodadas de cada fase (padrão: 5)")
+    parser.add_argument("--url", default=settings.database_url, help="URL do PostgreSQL")
+    args = parser.parse_args()
+
+    if not args.url.startswith("postgresql"):
+        print("❌ Este benchmark requer PostgreSQL (informe --url ou DATABASE_URL)")
+        return 2
+
+    engine, Sessao = preparar_banco(args.url, SCHEMA, pool_size=args.paralelos)
+    # Um paciente novo por pedido: RN2 (máx. 2 consultas futuras) não interfere
+    ids_medicos, ids_pacientes = popular(Sessao, args.paralelos, args.paralelos * args.rodadas * 2)
+    pacientes = iter(ids_pacientes)
+
+    segunda = date.today() + timedelta(days=7 - date.today().weekday() + 7)
+    falhas = 0
+
+    print(f"PostgreSQL: {engine.url.render_as_string(hide_password=True)}  paralelos={args.paralelos}\n")
+    for rodada in range(args.rodadas):
+        data_hora = datetime.combine(segunda, hora(8)) + timedelta(minutes=30 * rodada)
+        pedidos = [(next(pacientes), ids_medicos[0], data_hora) for _ in range(args.paralelos)]
+        codigos, latencias, total = disparar(Sessao, pedidos)
+        relatar(f"mesmo horário #{rodada + 1}", codigos, latencias, total)
+        if codigos.get(201, 0) != 1:
+            falhas += 1
+
+    for rodada in range(args.rodadas):
+        data_hora = datetime.combine(segunda + timedelta(days=1), hora(8)) + timedelta(minutes=30 * rodada)
+        pedidos = [(next(pacientes), id_medico, data_hora) for id_medico in ids_medicos]
+        codigos, latencias, total = disparar(Sessao, pedidos)
+        relatar(f"horários distintos #{rodada + 1}", codigos, latencias, total)
+        if codigos.get(201, 0) != len(pedidos):
+            falhas += 1
+
+    # Conferência final direto no banco: nenhum horário com mais de uma consulta ativa
+    db = Sessao()
+    ocupacao = db.query(func.count().label("consultas")).filter(
+        Consulta.status.in_(['agendada', 'confirmada'])
+    ).group_by(Consulta.id_medico_fk, Consulta.data_hora_inicio).subquery()
+    maximo = db.query(func.max(ocupacao.c.consultas)).scalar()
+    db.close()
+    engine.dispose()
+
+    print(f"\nMáximo de consultas ativas no mesmo horário: {maximo}")
+    if falhas or maximo != 1:
+        print("❌ Invariante violada")
+        return 1
+    print("✅ Exatamente um agendamento aceito por horário disputado")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
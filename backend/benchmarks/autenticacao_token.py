@@ -0,0 +1,78 @@
+"""
+Microbenchmark da autenticação por token (get_current_user)
+
+Mede o custo por requisição de validar o Bearer token, sem HTTP nem banco,
+com cada decodificador (python-jose e HMAC nativo) com e sem o cache de
+tokens verificados. Simula sessões: cada token é apresentado várias vezes.
+
+Uso:
+    python benchmarks/autenticacao_token.py --sessoes 200 --requisicoes 100
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.utils import tokens
+from app.utils.auth import create_access_token, get_current_user
+
+
+def medir(credenciais, requisicoes: int, decodificador, com_cache: bool) -> list:
+    """Latências (µs) de get_current_user, intercalando as sessões como um servidor real"""
+    tokens.definir_decodificador(decodificador)
+    cache = tokens.obter_cache_tokens()
+    capacidade_original = cache.capacidade
+    if not com_cache:
+        cache.capacidade = 0
+    latencias = []
+    try:
+        for _ in range(requisicoes):
+            for credencial in credenciais:
+                inicio = time.perf_counter()
+                get_current_user(credencial)
+                latencias.append((time.perf_counter() - inicio) * 1e6)
+    finally:
+        cache.capacidade = capacidade_original
+        tokens.definir_decodificador(None)
+    return latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessoes", type=int, default=200, help="tokens distintos (padrão: 200)")
+    parser.add_argument("--requisicoes", type=int, default=100, help="requisições por token (padrão: 100)")
+    args = parser.parse_args()
+
+    credenciais = [
+        HTTPAuthorizationCredentials(
+            scheme="Bearer",
+            credentials=create_access_token({"sub": f"usuario{i}@clinica", "tipo": "paciente", "id": i})
+        )
+        for i in range(args.sessoes)
+    ]
+
+    print(f"sessões={args.sessoes}  requisições por sessão={args.requisicoes}\n")
+    resultados = {}
+    for nome, decodificador in tokens.DECODIFICADORES.items():
+        for com_cache in (False, True):
+            rotulo = f"{nome} {'com cache' if com_cache else 'sem cache'}"
+            latencias = medir(credenciais, args.requisicoes, decodificador, com_cache)
+            resultados[rotulo] = statistics.median(latencias)
+            print(
+                f"{rotulo:<18} p50={statistics.median(latencias):7.2f}µs  "
+                f"média={statistics.fmean(latencias):7.2f}µs  "
+                f"p99={sorted(latencias)[int(len(latencias) * 0.99)]:7.2f}µs"
+            )
+
+    ganho = resultados["jose sem cache"] / resultados["jose com cache"]
+    print(f"\n✅ Cache reduz o p50 da autenticação em {ganho:.1f}x (python-jose)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Utilitários compartilhados pelos benchmarks
+"""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+
+
+def preparar_banco(url: str, schema: str, pool_size: int = 5):
+    """
+    Recria as tabelas em um banco isolado e devolve (engine, fábrica de sessões)
+    No PostgreSQL usa um schema próprio; em outros bancos recria as tabelas
+    """
+    opcoes = {}
+    if url.startswith("postgresql"):
+        with create_engine(url, isolation_level="AUTOCOMMIT").connect() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+        opcoes = {
+            "pool_size": pool_size,
+            "max_overflow": 0,
+            "connect_args": {"options": f"-csearch_path={schema},public"},
+        }
+
+    engine = create_engine(url, **opcoes)
+    if not url.startswith("postgresql"):
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) pelo método do vizinho mais próximo"""
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
@@ -0,0 +1,67 @@
+"""
+Benchmark do custo do bcrypt
+
+Para cada custo, mede hashes por segundo em um núcleo (um processo) e com
+todos os núcleos (um processo por núcleo), e mostra o custo calibrado para o
+tempo alvo. Rode uma vez no hardware de produção (deploy) e fixe o valor em
+BCRYPT_CUSTO: assim todos os processos e servidores usam o mesmo custo.
+
+Uso:
+    python benchmarks/custo_bcrypt.py --custos 8-14 --alvo-ms 250
+    python benchmarks/custo_bcrypt.py --segundos 5 --processos 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import bcrypt
+
+from app.config import settings
+from app.utils.senhas import calibrar_custo_bcrypt
+
+
+def hashes_por_segundo(custo: int, segundos: float) -> float:
+    """Hashes por segundo em um único processo, repetindo por pelo menos `segundos`"""
+    sal = bcrypt.gensalt(rounds=custo)
+    quantidade, inicio = 0, time.perf_counter()
+    while quantidade < 2 or time.perf_counter() - inicio < segundos:
+        bcrypt.hashpw(b"benchmark123", sal)
+        quantidade += 1
+    return quantidade / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--custos", default="8-14", help="faixa de custos, ex.: 8-14 (padrão)")
+    parser.add_argument("--segundos", type=float, default=2.0, help="duração por custo e fase (padrão: 2)")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="processos na fase paralela (padrão: núcleos)")
+    parser.add_argument("--alvo-ms", type=float, default=settings.BCRYPT_TEMPO_ALVO_MS, help="tempo alvo da calibração")
+    args = parser.parse_args()
+
+    primeiro, ultimo = (int(c) for c in args.custos.split("-"))
+    print(f"Núcleos: {os.cpu_count()}  processos paralelos: {args.processos}\n")
+    print(f"{'custo':>5} {'ms/hash':>9} {'hashes/s (1 núcleo)':>20} {'hashes/s (todos)':>17} {'por núcleo':>11}")
+
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.processos, mp_context=contexto) as executor:
+        for custo in range(primeiro, ultimo + 1):
+            um_nucleo = hashes_por_segundo(custo, args.segundos)
+            paralelo = sum(executor.map(hashes_por_segundo, [custo] * args.processos, [args.segundos] * args.processos))
+            print(
+                f"{custo:>5} {1000 / um_nucleo:>9.1f} {um_nucleo:>20.1f} "
+                f"{paralelo:>17.1f} {paralelo / args.processos:>11.1f}"
+            )
+
+    escolhido = calibrar_custo_bcrypt(args.alvo_ms, settings.BCRYPT_CUSTO_MINIMO, settings.BCRYPT_CUSTO_MAXIMO)
+    print(f"\n✅ Custo calibrado para alvo de {args.alvo_ms:.0f} ms: {escolhido} (BCRYPT_CUSTO={escolhido})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Benchmark da exportação de consultas
+
+Compara o pico de memória (tracemalloc) e o tempo para obter todas as
+consultas como texto:
+
+    antigo: listagem completa como era /admin/consultas (objetos do ORM com
+            paciente e médico via joinedload, ConsultaResponse por linha e um
+            único array JSON)
+    novo:   RegraExportacao.gerar em NDJSON, lido do cursor em lotes de
+            EXPORTACAO_LOTE (os pedaços são descartados, como se fossem
+            enviados ao cliente)
+
+Uso:
+    python benchmarks/exportacao.py --url postgresql://... --consultas 50000
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+
+from app.config import settings
+from app.models.models import Consulta, Especialidade, Medico, Paciente
+from app.schemas.schemas import ConsultaResponse
+from app.services.exportacao import RegraExportacao
+from benchmarks.comum import preparar_banco
+
+SCHEMA = "benchmark_exportacao"
+
+
+def popular(Sessao, consultas: int, medicos: int = 50, pacientes: int = 2000):
+    """Consultas realizadas distribuídas entre médicos e pacientes, sem sobreposição"""
+    db = Sessao()
+    especialidade = Especialidade(nome="Clinica Geral")
+    db.add(especialidade)
+    db.flush()
+    db.execute(insert(Medico), [
+        {"nome": f"Medico {i}", "cpf": f"m{i}", "email": f"medico{i}@bench", "senha_hash": "-",
+         "crm": f"CRM{i}", "id_especialidade_fk": especialidade.id_especialidade}
+        for i in range(medicos)
+    ])
+    db.execute(insert(Paciente), [
+        {"nome": f"Paciente {i}", "cpf": f"p{i}", "email": f"paciente{i}@bench", "senha_hash": "-",
+         "data_nascimento": date(1980, 1, 1)}
+        for i in range(pacientes)
+    ])
+    ids_medicos = [m for (m,) in db.query(Medico.id_medico)]
+    ids_pacientes = [p for (p,) in db.query(Paciente.id_paciente)]
+    inicio = datetime(2025, 1, 1, 8)
+    for lote in range(0, consultas, 10000):
+        db.execute(insert(Consulta), [
+            {"data_hora_inicio": inicio + timedelta(minutes=30 * (i // medicos)), "status": "realizada",
+             "id_medico_fk": ids_medicos[i % medicos], "id_paciente_fk": ids_pacientes[i % pacientes]}
+            for i in range(lote, min(lote + 10000, consultas))
+        ])
+    db.commit()
+    db.close()
+
+
+def caminho_antigo(db) -> int:
+    consultas = db.query(Consulta).options(
+        joinedload(Consulta.paciente),
+        joinedload(Consulta.medico).joinedload(Medico.especialidade)
+    ).all()
+    corpo = json.dumps([ConsultaResponse.model_validate(c).model_dump(mode="json") for c in consultas])
+    return len(corpo)
+
+
+def caminho_novo(db) -> int:
+    return sum(len(pedaco) for pedaco in RegraExportacao.gerar(db, RegraExportacao.consultas(), "ndjson"))
+
+
+def medir(Sessao, caminho):
+    db = Sessao()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    tamanho = caminho(db)
+    duracao = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+    return tamanho, duracao, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.database_url, help="URL do banco")
+    parser.add_argument("--consultas", type=int, default=50000, help="consultas na tabela (padrão: 50000)")
+    args = parser.parse_args()
+
+    engine, Sessao = preparar_banco(args.url, SCHEMA)
+    popular(Sessao, args.consultas)
+
+    print(f"Banco: {engine.url.render_as_string(hide_password=True)}  consultas={args.consultas}  "
+          f"lote={settings.EXPORTACAO_LOTE}\n")
+    for nome, caminho in (("antigo", caminho_antigo), ("novo", caminho_novo)):
+        tamanho, duracao, pico = medir(Sessao, caminho)
+        print(f"{nome:<7} pico={pico / 2**20:8.1f} MiB  tempo={duracao:6.2f}s  saída={tamanho / 2**20:6.1f} MiB")
+    engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Benchmark dos renderizadores de relatórios
+
+Tempo para renderizar uma tabela de N linhas (padrão: 10000) com as colunas
+do relatório de pacientes frequentes, em cada formato. Para o PDF também é
+medido o caminho antigo dos endpoints: folha de estilos e TableStyle
+montados a cada requisição.
+
+Uso:
+    python benchmarks/relatorios.py --linhas 10000 --repeticoes 5
+"""
+import argparse
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.relatorios import RELATORIOS
+from app.utils.relatorios import RENDERIZADORES, Tabela
+
+
+def tabela(linhas: int) -> Tabela:
+    definicao = RELATORIOS["pacientes-frequentes"]
+    return Tabela(
+        "Relatorio de Pacientes", "Periodo: Todos os registros", definicao.colunas,
+        [
+            {"posicao": i, "paciente_nome": f"Paciente {i}", "cpf": f"{i:011d}",
+             "total_consultas": 100 - i % 100, "ultima_consulta": "01/03/2026"}
+            for i in range(1, linhas + 1)
+        ],
+        fonte_cabecalho=definicao.fonte_cabecalho
+    )
+
+
+def pdf_antigo(dados: Tabela) -> bytes:
+    """Como os endpoints faziam: estilos montados a cada chamada e sem repeatRows"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    buffer = io.BytesIO()
+    styles = getSampleStyleSheet()
+    table = Table(dados.textos(), colWidths=[largura * cm for largura in dados.larguras_cm()])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    SimpleDocTemplate(buffer, pagesize=A4).build([
+        Paragraph(f"<b>{dados.titulo}</b>", styles['Title']), Spacer(1, 0.5 * cm),
+        Paragraph(dados.subtitulo, styles['Normal']), Spacer(1, 0.5 * cm), table
+    ])
+    return buffer.getvalue()
+
+
+def medir(renderizar, dados: Tabela, repeticoes: int):
+    tempos, tamanho = [], 0
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        tamanho = len(renderizar(dados))
+        tempos.append(time.perf_counter() - t0)
+    return statistics.median(tempos), tamanho
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=10000, help="linhas da tabela (padrão: 10000)")
+    parser.add_argument("--repeticoes", type=int, default=5, help="execuções por formato (padrão: 5)")
+    args = parser.parse_args()
+
+    dados = tabela(args.linhas)
+    caminhos = [("pdf (antigo)", pdf_antigo)] + [
+        (formato, renderizador.renderizar) for formato, renderizador in RENDERIZADORES.items()
+    ]
+    print(f"linhas={args.linhas}  repetições={args.repeticoes} (mediana)\n")
+    for nome, renderizar in caminhos:
+        mediana, tamanho = medir(renderizar, dados, args.repeticoes)
+        por_10k = mediana * 10000 / args.linhas
+        print(f"{nome:<13} tempo={mediana * 1000:9.1f} ms  por 10k linhas={por_10k * 1000:9.1f} ms  "
+              f"saída={tamanho / 2**10:8.1f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Benchmark da validação de agendamento
+
+Compara a latência (p50/p99) e o número de instruções SQL da validação
+feita antes de inserir uma consulta:
+
+    antigo: busca do paciente + busca do médico (router) e uma ida ao banco
+            por regra (bloqueio/faltas, limite, expediente, conflito),
+            carregando todo o histórico do paciente para contar faltas
+    novo:   ValidadorAgendamento.consultar_status_agendamento, uma única
+            instrução com CTE
+
+Os dois caminhos rodam intercalados sobre os mesmos dados.
+
+Uso:
+    python benchmarks/validacao_agendamento.py --url postgresql://... --iteracoes 2000
+    python benchmarks/validacao_agendamento.py --url sqlite:///./benchmark.db
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import date, datetime, time as hora, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.models.models import Consulta, Especialidade, HorarioTrabalho, Medico, Paciente
+from app.services.regras_negocio import RegraConsulta, RegraPaciente, ValidadorAgendamento
+from benchmarks.comum import percentil, preparar_banco
+
+SCHEMA = "benchmark_validacao"
+
+
+def popular(Sessao, medicos: int, historico: int):
+    """
+    Cria médicos com expediente e agenda cheia nas próximas semanas, e um
+    paciente com `historico` consultas passadas (realizadas e faltas)
+    """
+    db = Sessao()
+    especialidade = Especialidade(nome="Benchmark")
+    db.add(especialidade)
+    db.flush()
+
+    paciente = Paciente(
+        nome="Paciente Benchmark", cpf="p0000000000", email="paciente@benchmark",
+        senha_hash="-", data_nascimento=date(1990, 1, 1)
+    )
+    outro = Paciente(
+        nome="Outro Paciente", cpf="p0000000001", email="outro@benchmark",
+        senha_hash="-", data_nascimento=date(1990, 1, 1)
+    )
+    db.add_all([paciente, outro])
+    db.flush()
+
+    ids_medicos = []
+    hoje = date.today()
+    for i in range(medicos):
+        medico = Medico(
+            nome=f"Medico {i}", cpf=f"m{i:010d}", email=f"medico{i}@benchmark",
+            senha_hash="-", crm=f"CRM{i}", id_especialidade_fk=especialidade.id_especialidade
+        )
+        db.add(medico)
+        db.flush()
+        ids_medicos.append(medico.id_medico)
+        db.add_all([
+            HorarioTrabalho(dia_semana=dia, hora_inicio=hora(8), hora_fim=hora(18), id_medico_fk=medico.id_medico)
+            for dia in range(5)
+        ])
+        # Agenda futura ocupada pela manhã (08:00-12:00) por 4 semanas
+        db.add_all([
+            Consulta(
+                data_hora_inicio=datetime.combine(hoje + timedelta(days=dia), hora(8)) + timedelta(minutes=30 * slot),
+                data_hora_fim=datetime.combine(hoje + timedelta(days=dia), hora(8)) + timedelta(minutes=30 * slot + 30),
+                status="agendada", id_paciente_fk=outro.id_paciente, id_medico_fk=medico.id_medico
+            )
+            for dia in range(1, 29) for slot in range(8)
+        ])
+
+    inicio_historico = datetime.now() - timedelta(days=historico + 1)
+    db.add_all([
+        Consulta(
+            data_hora_inicio=inicio_historico + timedelta(days=i),
+            data_hora_fim=inicio_historico + timedelta(days=i, minutes=30),
+            status="faltou" if i % 5 == 4 else "realizada",
+            id_paciente_fk=paciente.id_paciente, id_medico_fk=ids_medicos[i % medicos]
+        )
+        for i in range(historico)
+    ])
+    db.flush()
+    RegraPaciente.recalcular_faltas_consecutivas(db, paciente.id_paciente)
+    db.commit()
+    paciente_id = paciente.id_paciente
+    db.close()
+    return paciente_id, ids_medicos
+
+
+def caminho_antigo(db, paciente_id, medico_id, inicio, fim):
+    """Validação como era feita antes: router + uma consulta por regra"""
+    db.query(Paciente).filter(Paciente.id_paciente == paciente_id).first()
+    db.query(Medico).filter(Medico.id_medico == medico_id).first()
+    bloqueado, mensagem = RegraPaciente.verificar_bloqueio_por_faltas(db, paciente_id)
+    if bloqueado:
+        return False, mensagem
+    for pode, mensagem in (
+        RegraConsulta.validar_limite_consultas_futuras(db, paciente_id),
+        RegraConsulta.validar_horario_trabalho_medico(db, medico_id, inicio),
+        RegraConsulta.validar_conflito_horario_medico(db, medico_id, inicio, fim),
+    ):
+        if not pode:
+            return False, mensagem
+    return True, "Agendamento válido"
+
+
+def caminho_novo(db, paciente_id, medico_id, inicio, fim):
+    """Validação atual: uma única instrução"""
+    situacao = ValidadorAgendamento.consultar_status_agendamento(db, paciente_id, medico_id, inicio, fim)
+    return ValidadorAgendamento.avaliar_status_agendamento(db, paciente_id, situacao, inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.database_url, help="URL do banco")
+    parser.add_argument("--iteracoes", type=int, default=2000, help="validações por caminho (padrão: 2000)")
+    parser.add_argument("--medicos", type=int, default=20, help="médicos com agenda cheia (padrão: 20)")
+    parser.add_argument("--historico", type=int, default=300, help="consultas passadas do paciente (padrão: 300)")
+    args = parser.parse_args()
+
+    engine, Sessao = preparar_banco(args.url, SCHEMA)
+    paciente_id, ids_medicos = popular(Sessao, args.medicos, args.historico)
+
+    instrucoes = []
+    event.listen(engine, "before_cursor_execute", lambda *a: instrucoes.append(1))
+
+    # Horários da tarde (livres) e da manhã (em conflito) nas próximas semanas
+    hoje = date.today()
+    horarios = [
+        datetime.combine(hoje + timedelta(days=dia), hora(hh))
+        for dia in range(1, 29) if (hoje + timedelta(days=dia)).weekday() < 5
+        for hh in (9, 14)
+    ]
+
+    caminhos = {"antigo": caminho_antigo, "novo": caminho_novo}
+    latencias = {nome: [] for nome in caminhos}
+    contagem = {nome: 0 for nome in caminhos}
+
+    db = Sessao()
+    for i in range(args.iteracoes):
+        medico_id = ids_medicos[i % len(ids_medicos)]
+        inicio = horarios[i % len(horarios)]
+        resultados = {}
+        for nome, caminho in caminhos.items():
+            instrucoes.clear()
+            t0 = time.perf_counter()
+            resultados[nome] = caminho(db, paciente_id, medico_id, inicio, inicio + timedelta(minutes=30))
+            latencias[nome].append((time.perf_counter() - t0) * 1000)
+            contagem[nome] += len(instrucoes)
+            db.rollback()
+        if resultados["antigo"] != resultados["novo"]:
+            print(f"❌ Resultados diferentes para {inicio}: {resultados}")
+            return 1
+    db.close()
+    engine.dispose()
+
+    print(f"Banco: {engine.url.render_as_string(hide_password=True)}  iterações={args.iteracoes}  "
+          f"histórico do paciente={args.historico}\n")
+    for nome in caminhos:
+        print(
+            f"{nome:<7} p50={statistics.median(latencias[nome]):7.2f}ms  "
+            f"p99={percentil(latencias[nome], 99):7.2f}ms  "
+            f"instruções/validação={contagem[nome] / args.iteracoes:.1f}"
+        )
+    ganho = statistics.median(latencias["antigo"]) / statistics.median(latencias["novo"])
+    print(f"\n✅ Mesmos resultados nos dois caminhos; p50 {ganho:.1f}x menor no caminho novo")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,7 @@ Otimizado para máxima performance com caching e paralelização
 """
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from datetime import datetime, date, time
@@ -15,6 +15,9 @@ from app.models.models import (
     Especialidade, PlanoSaude, Administrador, Medico, 
     Paciente, HorarioTrabalho, Consulta
 )
+from app.utils.limite_login import obter_limitador_login
+from app.services.estatisticas import obter_cache_dashboard
+from app.services.relatorios import obter_cache_relatorios
 from passlib.context import CryptContext
 
 # Engine SQLite em memória com StaticPool para reutilização entre testes
@@ -53,6 +56,30 @@ def db_session(db_engine):
     connection.close()
 
 
+class ContadorInstrucoes:
+    """Instruções SQL executadas no engine dentro do bloco with"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.instrucoes = []
+    
+    def _registrar(self, conexao, cursor, instrucao, *args):
+        self.instrucoes.append(instrucao)
+    
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._registrar)
+        return self.instrucoes
+    
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._registrar)
+
+
+@pytest.fixture(scope="function")
+def instrucoes_sql(db_engine):
+    """Uso: with instrucoes_sql() as instrucoes: ... (lista das instruções executadas)"""
+    return lambda: ContadorInstrucoes(db_engine)
+
+
 @pytest.fixture(scope="function")
 def client(db_session):
     """Cliente de testes com banco de dados mockado"""
@@ -68,6 +95,19 @@ def client(db_session):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(autouse=True)
+def estado_do_processo_zerado():
+    """
+    Limite de login (os fixtures de token fazem login) e caches do dashboard
+    e dos relatórios zerados a cada teste
+    """
+    obter_limitador_login().limpar()
+    for cache in (obter_cache_dashboard(), obter_cache_relatorios()):
+        if cache is not None:
+            cache.limpar()
+    yield
+
+
 # ========== FIXTURES DE DADOS (CACHED) ==========
 
 @pytest.fixture(scope="function")
@@ -0,0 +1,45 @@
+"""
+Reconciliação de estatisticas_diarias
+
+Refaz a tabela a partir de consulta e confere se os totais batem com a
+contagem direta. Com --apenas-verificar só compara, sem alterar nada.
+Termina com código 1 se houver divergência.
+
+Uso:
+    python reconciliar_estatisticas.py
+    python reconciliar_estatisticas.py --apenas-verificar
+"""
+import argparse
+import sys
+
+from app.database import SessionLocal
+from app.services.estatisticas import RegraEstatisticas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apenas-verificar", action="store_true", help="só compara, sem refazer a tabela")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if not args.apenas_verificar:
+            linhas = RegraEstatisticas.reconstruir_diarias(db)
+            print(f"Tabela refeita: {linhas} linhas (dia, médico, status)")
+        divergencias = RegraEstatisticas.divergencias_diarias(db)
+        if divergencias:
+            db.rollback()
+            print(f"❌ {len(divergencias)} divergência(s) entre estatisticas_diarias e consulta:")
+            for d in divergencias[:50]:
+                print(f"   {d['dia']} médico {d['id_medico']} '{d['status']}': "
+                      f"esperado {d['esperado']}, registrado {d['registrado']}")
+            return 1
+        db.commit()
+        print("✅ estatisticas_diarias confere com consulta")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
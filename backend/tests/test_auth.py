@@ -179,3 +179,437 @@ def test_hash_senha_diferente(db):
     # Mas ambos devem validar a senha corretamente
     assert verify_password("senha123", hash1) == True
     assert verify_password("senha123", hash2) == True
+
+
+@pytest.mark.auth
+class TestLoginUnificado:
+    """Login com uma única busca na visão credencial_usuario"""
+    
+    @staticmethod
+    def contar_verificacoes(monkeypatch):
+        from app.routers import auth
+        
+        chamadas = []
+        original = auth.verify_password
+        
+        def verificar(senha, senha_hash):
+            chamadas.append(senha_hash)
+            return original(senha, senha_hash)
+        
+        monkeypatch.setattr(auth, "verify_password", verificar)
+        return chamadas
+    
+    @pytest.mark.parametrize("email, senha, tipo", [
+        ("carlos@test.com", "paciente123", "paciente"),
+        ("joao@test.com", "medico123", "medico"),
+        ("admin@test.com", "admin123", "administrador"),
+    ])
+    def test_login_de_cada_tipo_com_uma_verificacao(
+        self, client, monkeypatch, paciente_teste, medico_cardiologista, admin_user, email, senha, tipo
+    ):
+        """Cada tipo de usuário entra com uma busca e um único bcrypt"""
+        chamadas = self.contar_verificacoes(monkeypatch)
+        
+        response = client.post("/auth/login", json={"email": email, "senha": senha})
+        
+        assert response.status_code == 200
+        assert response.json()["user_type"] == tipo
+        payload = jwt.get_unverified_claims(response.json()["access_token"])
+        assert (payload["sub"], payload["tipo"], payload["id"]) == (email, tipo, response.json()["user_id"])
+        assert len(chamadas) == 1
+    
+    def test_senha_errada_ou_email_desconhecido(
+        self, client, monkeypatch, paciente_teste, medico_cardiologista, admin_user
+    ):
+        """Senha errada custa um bcrypt; e-mail desconhecido, nenhum"""
+        chamadas = self.contar_verificacoes(monkeypatch)
+        
+        assert client.post("/auth/login", json={"email": "joao@test.com", "senha": "errada123"}).status_code == 401
+        assert len(chamadas) == 1
+        assert client.post("/auth/login", json={"email": "ninguem@test.com", "senha": "errada123"}).status_code == 401
+        assert len(chamadas) == 1
+    
+    def test_visao_acompanha_cadastro_alteracao_e_exclusao(
+        self, client, db_session, auth_headers_admin, especialidade_cardiologia
+    ):
+        """Médico cadastrado, com e-mail alterado e excluído pela API reflete no login"""
+        response = client.post("/admin/medicos", headers=auth_headers_admin, json={
+            "nome": "Dra. Paula", "cpf": "555.555.555-55", "email": "paula@test.com",
+            "senha": "medica123", "crm": "CRM-77777",
+            "id_especialidade_fk": especialidade_cardiologia.id_especialidade
+        })
+        assert response.status_code == 201
+        medico_id = response.json()["id_medico"]
+        assert client.post("/auth/login", json={"email": "paula@test.com", "senha": "medica123"}).status_code == 200
+        
+        response = client.put(f"/admin/medicos/{medico_id}", headers=auth_headers_admin, json={
+            "email": "paula.nova@test.com"
+        })
+        assert response.status_code == 200
+        assert client.post("/auth/login", json={"email": "paula@test.com", "senha": "medica123"}).status_code == 401
+        assert client.post("/auth/login", json={"email": "paula.nova@test.com", "senha": "medica123"}).status_code == 200
+        
+        assert client.delete(f"/admin/medicos/{medico_id}", headers=auth_headers_admin).status_code == 200
+        assert client.post("/auth/login", json={"email": "paula.nova@test.com", "senha": "medica123"}).status_code == 401
+    
+    def test_email_unico_entre_tipos(self, client, auth_headers_admin, paciente_teste, especialidade_cardiologia):
+        """E-mail de paciente não pode ser reutilizado por médico (e vice-versa)"""
+        response = client.post("/admin/medicos", headers=auth_headers_admin, json={
+            "nome": "Dr. Carlos", "cpf": "666.666.666-66", "email": "carlos@test.com",
+            "senha": "medico123", "crm": "CRM-88888",
+            "id_especialidade_fk": especialidade_cardiologia.id_especialidade
+        })
+        assert response.status_code == 409
+        
+        response = client.post("/pacientes/cadastro", json={
+            "nome": "Admin Paciente", "cpf": "777.777.777-77", "email": "admin@test.com",
+            "senha": "paciente123", "data_nascimento": "1990-01-01"
+        })
+        assert response.status_code == 409
+
+
+@pytest.mark.auth
+class TestPoolSenhas:
+    """bcrypt em pool de processos com admissão limitada"""
+    
+    def test_pool_de_processos_gera_e_verifica(self):
+        """Hash e verificação rodam em processo separado"""
+        from app.utils.senhas import PoolSenhas, gerar_bcrypt, verificar_bcrypt
+        
+        pool = PoolSenhas(processos=1, fila_maxima=1, espera_maxima_segundos=30)
+        try:
+            senha_hash = pool.executar("hash", gerar_bcrypt, b"segredo123", 4)
+            assert pool.executar("verificacao", verificar_bcrypt, b"segredo123", senha_hash)
+            assert not pool.executar("verificacao", verificar_bcrypt, b"outra", senha_hash)
+        finally:
+            pool.encerrar()
+    
+    def test_pool_saturado_responde_503(self, client, monkeypatch, paciente_teste):
+        """Sem vaga no pool o login é recusado na hora, com Retry-After"""
+        import threading
+        from app.utils import senhas
+        
+        pool = senhas.PoolSenhas(processos=0, fila_maxima=0, espera_maxima_segundos=1)
+        monkeypatch.setattr(senhas, "_pool", pool)
+        
+        ocupada, liberar = threading.Event(), threading.Event()
+        
+        def segurar_vaga():
+            ocupada.set()
+            liberar.wait(10)
+        
+        ocupando = threading.Thread(target=pool.executar, args=("teste", segurar_vaga))
+        ocupando.start()
+        try:
+            assert ocupada.wait(5)
+            response = client.post("/auth/login", json={"email": "carlos@test.com", "senha": "paciente123"})
+        finally:
+            liberar.set()
+            ocupando.join()
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        
+        # Com a vaga livre de novo o login volta a funcionar
+        response = client.post("/auth/login", json={"email": "carlos@test.com", "senha": "paciente123"})
+        assert response.status_code == 200
+    
+    def test_metricas_de_espera_e_duracao(self, client, paciente_teste):
+        """Login alimenta as distribuições de espera no pool e de duração do bcrypt"""
+        from app.utils.metricas import metricas
+        
+        metricas.zerar()
+        client.post("/auth/login", json={"email": "carlos@test.com", "senha": "paciente123"})
+        
+        distribuicoes = client.get("/metricas").json()["distribuicoes"]
+        assert distribuicoes["senhas_verificacao_ms"]["contagem"] == 1
+        # Espera medida em toda operação (inclusive um eventual rehash do login)
+        assert distribuicoes["senhas_espera_ms"]["contagem"] >= 1
+
+
+@pytest.mark.auth
+class TestCustoBcrypt:
+    """Calibração do custo e rehash transparente no login"""
+    
+    @pytest.fixture
+    def custo_5(self, monkeypatch):
+        """Custo fixo, independente do hardware que roda os testes"""
+        monkeypatch.setattr(settings, "APP_ENV", "production")
+        monkeypatch.setattr(settings, "BCRYPT_CUSTO", 5)
+    
+    def test_custo_do_hash(self, custo_5):
+        """O custo é lido do próprio hash"""
+        from app.utils.senhas import custo_do_hash
+        
+        assert custo_do_hash(get_password_hash("qualquer123")) == 5
+        assert custo_do_hash("$2b$12$" + "x" * 53) == 12
+        assert custo_do_hash("texto-sem-formato") is None
+    
+    def test_calibracao_escolhe_maior_custo_dentro_do_alvo(self, monkeypatch):
+        """Com tempo dobrando a cada custo, escolhe o maior que cabe no alvo"""
+        from app.utils import senhas
+        
+        monkeypatch.setattr(senhas, "medir_bcrypt", lambda custo, repeticoes=3: 2.0 ** (custo - 4))
+        assert senhas.calibrar_custo_bcrypt(100, 4, 16) == 10   # 64 ms
+        assert senhas.calibrar_custo_bcrypt(100, 4, 8) == 8     # limitado pelo máximo
+        assert senhas.calibrar_custo_bcrypt(0.5, 6, 16) == 6    # nunca abaixo do mínimo
+    
+    def test_calibracao_corrige_extrapolacao(self, monkeypatch):
+        """Se o custo extrapolado passar do alvo na medição, desce um ponto"""
+        from app.utils import senhas
+        
+        monkeypatch.setattr(senhas, "medir_bcrypt", lambda custo, repeticoes=3: 3.0 ** (custo - 4))
+        assert senhas.calibrar_custo_bcrypt(100, 4, 16) == 8    # 81 ms (9 seria 243 ms)
+    
+    def test_login_refaz_hash_de_custo_menor(self, client, db_session, paciente_teste, custo_5):
+        """Hash de custo 4 do cadastro antigo vira custo atual após o login"""
+        from app.utils.senhas import custo_do_hash, gerar_bcrypt
+        
+        paciente_teste.senha_hash = gerar_bcrypt(b"paciente123", 4).decode()
+        db_session.commit()
+        
+        dados = {"email": "carlos@test.com", "senha": "paciente123"}
+        assert client.post("/auth/login", json=dados).status_code == 200
+        db_session.refresh(paciente_teste)
+        assert custo_do_hash(paciente_teste.senha_hash) == 5
+        
+        # O novo hash continua válido e não é refeito de novo
+        hash_refeito = paciente_teste.senha_hash
+        assert client.post("/auth/login", json=dados).status_code == 200
+        db_session.refresh(paciente_teste)
+        assert paciente_teste.senha_hash == hash_refeito
+    
+    def test_custo_maior_nao_e_rebaixado(self, client, db_session, paciente_teste, custo_5):
+        """Hash de custo 12 com custo atual 5: mantido (sem vaivém entre servidores)"""
+        hash_original = paciente_teste.senha_hash
+        
+        assert client.post("/auth/login", json={"email": "carlos@test.com", "senha": "paciente123"}).status_code == 200
+        db_session.refresh(paciente_teste)
+        assert paciente_teste.senha_hash == hash_original
+    
+    def test_custo_sem_configuracao_e_o_minimo(self, monkeypatch):
+        """Sem BCRYPT_CUSTO nada é medido: todos os processos usam BCRYPT_CUSTO_MINIMO"""
+        from app.utils import senhas
+        
+        monkeypatch.setattr(settings, "APP_ENV", "production")
+        monkeypatch.setattr(settings, "BCRYPT_CUSTO", None)
+        monkeypatch.setattr(senhas, "medir_bcrypt", lambda *args, **kwargs: pytest.fail("mediu o bcrypt"))
+        
+        assert senhas.custo_bcrypt() == settings.BCRYPT_CUSTO_MINIMO == 12
+
+
+@pytest.mark.auth
+class TestCacheTokens:
+    """Cache de tokens verificados e decodificador intercambiável"""
+    
+    @pytest.fixture
+    def cache_limpo(self):
+        from app.utils.tokens import obter_cache_tokens
+        
+        cache = obter_cache_tokens()
+        cache.limpar()
+        yield cache
+        cache.limpar()
+    
+    @staticmethod
+    def credenciais(token):
+        from fastapi.security import HTTPAuthorizationCredentials
+        return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    
+    def test_token_repetido_decodificado_uma_vez(self, cache_limpo, monkeypatch):
+        """A segunda apresentação do mesmo token vem do cache"""
+        from app.utils import tokens
+        from app.utils.auth import create_access_token, get_current_user
+        
+        chamadas = []
+        
+        def decodificar(token):
+            chamadas.append(token)
+            return tokens.decodificar_jose(token)
+        
+        tokens.definir_decodificador(decodificar)
+        try:
+            token = create_access_token({"sub": "carlos@test.com", "tipo": "paciente", "id": 7})
+            primeiro = get_current_user(self.credenciais(token))
+            primeiro["tipo"] = "alterado"  # cópia: não contamina o cache
+            segundo = get_current_user(self.credenciais(token))
+            assert (cache_limpo.acertos, cache_limpo.falhas) == (1, 1)
+        finally:
+            tokens.definir_decodificador(None)
+        
+        assert segundo == {"id": 7, "email": "carlos@test.com", "tipo": "paciente"}
+        assert len(chamadas) == 1
+    
+    def test_entrada_expirada_nao_e_usada(self, cache_limpo, monkeypatch):
+        """Após o exp o token volta a ser verificado (e recusado)"""
+        from fastapi import HTTPException
+        from app.utils import tokens
+        from app.utils.auth import create_access_token, get_current_user
+        
+        token = create_access_token({"sub": "carlos@test.com", "tipo": "paciente", "id": 7})
+        get_current_user(self.credenciais(token))
+        assert len(cache_limpo) == 1
+        
+        exp = jwt.get_unverified_claims(token)["exp"]
+        monkeypatch.setattr(tokens.time, "time", lambda: exp + 1)
+        monkeypatch.setattr(tokens, "_decodificador", lambda token: None)
+        with pytest.raises(HTTPException):
+            get_current_user(self.credenciais(token))
+        assert len(cache_limpo) == 0
+    
+    def test_lru_respeita_capacidade(self):
+        from app.utils.tokens import CacheTokens
+        
+        cache = CacheTokens(capacidade=2)
+        validade = 2 ** 40
+        for nome in ("a", "b"):
+            cache.guardar(CacheTokens.chave(nome), {"id": nome}, validade)
+        assert cache.obter(CacheTokens.chave("a")) == {"id": "a"}  # "a" passa a ser o mais recente
+        cache.guardar(CacheTokens.chave("c"), {"id": "c"}, validade)
+        
+        assert cache.obter(CacheTokens.chave("b")) is None
+        assert cache.obter(CacheTokens.chave("a")) is not None
+        assert len(cache) == 2
+    
+    def test_decodificador_nativo_equivale_ao_jose(self):
+        """Mesmo payload para token válido e recusa dos mesmos tokens inválidos"""
+        from app.utils.auth import create_access_token
+        from app.utils.tokens import decodificar_jose, decodificar_nativo
+        
+        valido = create_access_token({"sub": "carlos@test.com", "tipo": "paciente", "id": 7})
+        cabecalho, corpo, assinatura = valido.split(".")
+        outra_chave = jwt.encode({"sub": "x", "id": 1}, "outra-chave", algorithm=settings.ALGORITHM)
+        expirado = create_access_token({"sub": "x", "id": 1}, expires_delta=timedelta(minutes=-1))
+        sem_assinatura = jwt.encode({"sub": "x", "id": 1}, "", algorithm="HS256").split(".")
+        alg_none = ".".join(["eyJhbGciOiJub25lIiwidHlwIjoiSldUIn0", sem_assinatura[1], ""])
+        
+        assert decodificar_nativo(valido) == decodificar_jose(valido)
+        for invalido in (
+            f"{cabecalho}.{corpo}.{assinatura[:-2]}AA", outra_chave, expirado, alg_none, "abc", "a.b.c"
+        ):
+            assert decodificar_jose(invalido) is None
+            assert decodificar_nativo(invalido) is None
+    
+    def test_taxa_de_acerto_nas_metricas(self, client, cache_limpo, token_admin):
+        """Requisições autenticadas repetidas aparecem como acertos em /metricas"""
+        from app.utils.metricas import metricas
+        
+        metricas.zerar()
+        for _ in range(4):
+            client.get("/admin/dashboard", headers={"Authorization": f"Bearer {token_admin}"})
+        
+        contadores = client.get("/metricas").json()["contadores"]
+        assert contadores["tokens_cache_falhas"] == 1
+        assert contadores["tokens_cache_acertos"] == 3
+        assert contadores["tokens_cache_taxa_acerto"] == 0.75
+
+
+@pytest.mark.auth
+class TestLimiteLogin:
+    """Baldes de fichas por IP e por conta antes de qualquer busca ou bcrypt"""
+    
+    @pytest.fixture
+    def limitador(self, monkeypatch):
+        """3 tentativas por IP e 2 por conta, uma ficha a cada 100 s (nada volta durante o teste)"""
+        from app.utils import limite_login
+        
+        limitador = limite_login.LimitadorLogin(
+            limite_login.BaldesMemoria(),
+            {"ip": limite_login.RegraLimite(3, 0.6), "conta": limite_login.RegraLimite(2, 0.6)},
+            intervalo_limpeza=60
+        )
+        monkeypatch.setattr(limite_login, "_limitador", limitador)
+        return limitador
+    
+    def test_conta_acima_do_limite_recebe_429_sem_consultar_banco(
+        self, client, db_session, monkeypatch, limitador, paciente_teste
+    ):
+        from sqlalchemy import event
+        
+        verificacoes = TestLoginUnificado.contar_verificacoes(monkeypatch)
+        for _ in range(2):
+            assert client.post(
+                "/auth/login", json={"email": "carlos@test.com", "senha": "errada123"}
+            ).status_code == 401
+        
+        instrucoes = []
+        registrar = lambda *args: instrucoes.append(args[2])
+        event.listen(db_session.bind, "before_cursor_execute", registrar)
+        try:
+            response = client.post("/auth/login", json={"email": "Carlos@test.com ", "senha": "paciente123"})
+        finally:
+            event.remove(db_session.bind, "before_cursor_execute", registrar)
+        
+        assert response.status_code == 429
+        assert 90 <= int(response.headers["Retry-After"]) <= 100
+        assert instrucoes == []
+        assert len(verificacoes) == 2
+    
+    def test_limite_por_ip_entre_contas(self, client, monkeypatch, limitador, paciente_teste, medico_cardiologista):
+        """O IP esgotado recusa qualquer conta; recusa por IP não gasta ficha da conta"""
+        for email in ("a@test.com", "b@test.com", "carlos@test.com"):
+            client.post("/auth/login", json={"email": email, "senha": "errada123"})
+        
+        assert client.post(
+            "/auth/login/crm", json={"crm": "CRM-12345", "senha": "medico123"}
+        ).status_code == 429
+        assert limitador.baldes._baldes["conta:carlos@test.com"][0] == pytest.approx(1, abs=0.1)
+        assert "conta:crm:crm-12345" not in limitador.baldes._baldes
+        
+        # Outro endereço (atrás de proxy confiável) segue com o limite da conta
+        monkeypatch.setattr(settings, "LOGIN_LIMITE_CONFIAR_PROXY", True)
+        response = client.post(
+            "/auth/login", json={"email": "carlos@test.com", "senha": "paciente123"},
+            headers={"X-Forwarded-For": "10.0.0.9, 10.0.0.2"}
+        )
+        assert response.status_code == 200
+        assert "ip:10.0.0.2" in limitador.baldes._baldes
+    
+    def test_valor_longo_vira_chave_de_tamanho_fixo(self, client, limitador):
+        """CRM ou e-mail enormes não passam do tamanho de limite_login.chave"""
+        from app.utils.limite_login import chave_balde
+        
+        crm = "CRM-" + "9" * 5000
+        for _ in range(2):
+            assert client.post("/auth/login/crm", json={"crm": crm, "senha": "errada123"}).status_code == 401
+        
+        chaves = [chave for chave in limitador.baldes._baldes if chave.startswith("conta:")]
+        assert chaves == [chave_balde("conta", f"crm:{crm}".lower())]
+        assert len(chaves[0]) <= 320 and chaves[0].startswith("conta:sha256:")
+        assert client.post("/auth/login/crm", json={"crm": crm, "senha": "errada123"}).status_code == 429
+        assert chave_balde("ip", "10.0.0.2") == "ip:10.0.0.2"
+    
+    def test_reposicao_e_remocao_de_ociosos(self):
+        from app.utils.limite_login import BaldesMemoria, LimitadorLogin, RegraLimite
+        
+        limitador = LimitadorLogin(BaldesMemoria(), {"conta": RegraLimite(2, 6)}, intervalo_limpeza=5)
+        chaves = [("conta", "carlos@test.com")]
+        
+        assert limitador.verificar(chaves, agora=100) is None
+        assert limitador.verificar(chaves, agora=100) is None
+        tipo, espera = limitador.verificar(chaves, agora=101)
+        assert tipo == "conta" and espera == pytest.approx(9)
+        assert limitador.verificar(chaves, agora=110) is None  # uma ficha a cada 10 s
+        
+        # Parado por mais de 20 s (tempo para encher): removido na limpeza seguinte
+        limitador.verificar([("conta", "outra@test.com")], agora=131)
+        assert "conta:carlos@test.com" not in limitador.baldes._baldes
+        assert len(limitador.baldes) == 1
+    
+    def test_baldes_no_banco_equivalem_aos_em_memoria(self):
+        """Mesmas decisões e esperas com a tabela limite_login"""
+        from sqlalchemy import create_engine
+        from app.models.models import LimiteLogin
+        from app.utils.limite_login import BaldesBanco, BaldesMemoria, RegraLimite
+        
+        engine = create_engine("sqlite://")
+        LimiteLogin.__table__.create(engine)
+        banco, memoria = BaldesBanco(engine), BaldesMemoria()
+        regra = RegraLimite(3, 12)
+        
+        tentativas = [("ip:1", t) for t in (0, 0, 1, 2, 3, 6, 7, 7.5, 30)] + [("ip:2", 7.5)]
+        for chave, agora in tentativas:
+            assert banco.consumir(chave, regra, agora) == pytest.approx(memoria.consumir(chave, regra, agora))
+        
+        assert banco.remover_ociosos(10) == memoria.remover_ociosos(10) == 1
+        engine.dispose()
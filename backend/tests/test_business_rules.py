@@ -284,3 +284,542 @@ class TestBusinessRules:
         )
         
         assert response.status_code == status.HTTP_200_OK
+
+
+class _ErroPostgres(Exception):
+    """Simula o erro do driver para uma violação de restrição de exclusão"""
+    pgcode = "23P01"
+
+
+@pytest.mark.business_rules
+class TestConflitoGarantidoPeloBanco:
+    """RN4 garantida pela restrição de exclusão (PostgreSQL)"""
+    
+    def test_identifica_violacao_de_exclusao(self):
+        """Apenas a restrição de exclusão de consultas é tratada como conflito"""
+        from sqlalchemy.exc import IntegrityError
+        from app.services.regras_negocio import RegraConsulta
+        
+        assert RegraConsulta.violou_conflito_horario(IntegrityError("INSERT", {}, _ErroPostgres()))
+        assert RegraConsulta.violou_conflito_horario(IntegrityError(
+            "INSERT", {}, Exception('violates exclusion constraint "ex_consulta_medico_sem_sobreposicao"')
+        ))
+        assert not RegraConsulta.violou_conflito_horario(IntegrityError(
+            "INSERT", {}, Exception("UNIQUE constraint failed: paciente.cpf")
+        ))
+    
+    def test_agendamento_concorrente_retorna_409(
+        self, client, db_session, paciente_teste, medico_cardiologista, monkeypatch
+    ):
+        """Se o banco rejeita o commit por sobreposição, a API responde 409"""
+        from sqlalchemy.exc import IntegrityError
+        from app.services.regras_negocio import ValidadorAgendamento
+        
+        # A validação passou nas duas requisições; a outra consulta foi commitada antes
+        monkeypatch.setattr(
+            ValidadorAgendamento, "avaliar_status_agendamento",
+            staticmethod(lambda *args, **kwargs: (True, "Agendamento válido"))
+        )
+        
+        def commit_rejeitado():
+            raise IntegrityError("INSERT INTO consulta", {}, _ErroPostgres())
+        monkeypatch.setattr(db_session, "commit", commit_rejeitado)
+        monkeypatch.setattr(db_session, "rollback", lambda: None)
+        
+        response = client.post(
+            "/pacientes/consultas",
+            params={"paciente_id": paciente_teste.id_paciente},
+            json={
+                "data_hora": (datetime.now() + timedelta(days=5)).strftime("%Y-%m-%dT10:00:00"),
+                "id_medico": medico_cardiologista.id_medico
+            }
+        )
+        
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert "indisponível" in response.json()["detail"]
+
+
+def _validar_pelo_caminho_antigo(db, paciente_id, medico_id, inicio, fim):
+    """Composição das regras individuais (uma ida ao banco por regra)"""
+    from app.services.regras_negocio import RegraConsulta, RegraPaciente
+    
+    bloqueado, mensagem = RegraPaciente.verificar_bloqueio_por_faltas(db, paciente_id)
+    if bloqueado:
+        return False, mensagem
+    for pode, mensagem in (
+        RegraConsulta.validar_limite_consultas_futuras(db, paciente_id),
+        RegraConsulta.validar_horario_trabalho_medico(db, medico_id, inicio),
+        RegraConsulta.validar_conflito_horario_medico(db, medico_id, inicio, fim),
+    ):
+        if not pode:
+            return False, mensagem
+    return True, "Agendamento válido"
+
+
+@pytest.fixture(scope="function")
+def expediente_cardio(db_session, medico_cardiologista):
+    """Expediente Seg-Sex 08:00-18:00 (dia_semana numérico)"""
+    from datetime import time
+    from app.models.models import HorarioTrabalho
+    
+    db_session.add_all([
+        HorarioTrabalho(
+            dia_semana=dia, hora_inicio=time(8, 0), hora_fim=time(18, 0),
+            id_medico_fk=medico_cardiologista.id_medico
+        )
+        for dia in range(5)
+    ])
+    db_session.commit()
+
+
+@pytest.mark.business_rules
+class TestValidacaoEmUmaConsulta:
+    """Validação de agendamento em uma única instrução SQL"""
+    
+    @staticmethod
+    def proxima_segunda(hora: int) -> datetime:
+        dia = datetime.now() + timedelta(days=7)
+        dia -= timedelta(days=dia.weekday())
+        return dia.replace(hour=hora, minute=0, second=0, microsecond=0)
+    
+    @staticmethod
+    def criar_consulta(db_session, paciente, medico, inicio, status_consulta):
+        from app.models.models import Consulta
+        
+        db_session.add(Consulta(
+            data_hora_inicio=inicio,
+            data_hora_fim=inicio + timedelta(minutes=30),
+            status=status_consulta,
+            id_paciente_fk=paciente.id_paciente,
+            id_medico_fk=medico.id_medico
+        ))
+        db_session.commit()
+    
+    def comparar(self, db_session, paciente, medico, inicio):
+        from app.services.regras_negocio import ValidadorAgendamento
+        
+        fim = inicio + timedelta(minutes=30)
+        novo = ValidadorAgendamento.validar_novo_agendamento(
+            db_session, paciente.id_paciente, medico.id_medico, inicio, fim
+        )
+        antigo = _validar_pelo_caminho_antigo(
+            db_session, paciente.id_paciente, medico.id_medico, inicio, fim
+        )
+        assert novo == antigo
+        return novo
+    
+    def test_mesmas_mensagens_expediente_e_conflito(
+        self, db_session, paciente_teste, paciente_sem_plano, medico_cardiologista, expediente_cardio
+    ):
+        """Válido, fora do expediente e conflito produzem o mesmo resultado"""
+        segunda = self.proxima_segunda(10)
+        
+        assert self.comparar(db_session, paciente_teste, medico_cardiologista, segunda)[0]
+        
+        pode, mensagem = self.comparar(db_session, paciente_teste, medico_cardiologista, segunda.replace(hour=19))
+        assert not pode and "Segunda" in mensagem
+        pode, mensagem = self.comparar(
+            db_session, paciente_teste, medico_cardiologista, segunda + timedelta(days=5)
+        )
+        assert not pode and "Sábado" in mensagem
+        
+        self.criar_consulta(db_session, paciente_sem_plano, medico_cardiologista, segunda, "agendada")
+        pode, mensagem = self.comparar(
+            db_session, paciente_teste, medico_cardiologista, segunda + timedelta(minutes=15)
+        )
+        assert not pode and "10:00 às 10:30" in mensagem
+    
+    def test_mesmas_mensagens_limite_e_faltas(
+        self, db_session, paciente_teste, medico_cardiologista, expediente_cardio
+    ):
+        """RN2 e RN3 (inclusive o bloqueio automático) produzem o mesmo resultado"""
+        passado = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=30)
+        for dias, status_consulta in ((0, "faltou"), (1, "realizada"), (2, "faltou"), (3, "faltou")):
+            self.criar_consulta(
+                db_session, paciente_teste, medico_cardiologista,
+                passado + timedelta(days=dias), status_consulta
+            )
+        # Histórico gravado direto no banco: recalcular o contador
+        from app.services.regras_negocio import RegraPaciente
+        RegraPaciente.recalcular_faltas_consecutivas(db_session, paciente_teste.id_paciente)
+        
+        # Duas faltas após a última consulta realizada: ainda pode agendar
+        segunda = self.proxima_segunda(10)
+        assert self.comparar(db_session, paciente_teste, medico_cardiologista, segunda)[0]
+        
+        for hora in (11, 12):
+            self.criar_consulta(
+                db_session, paciente_teste, medico_cardiologista, segunda.replace(hour=hora), "agendada"
+            )
+        pode, mensagem = self.comparar(db_session, paciente_teste, medico_cardiologista, segunda)
+        assert not pode and "Limite de consultas futuras" in mensagem
+        
+        # Terceira falta consecutiva: o novo validador bloqueia automaticamente
+        from app.services.regras_negocio import ValidadorAgendamento
+        self.criar_consulta(
+            db_session, paciente_teste, medico_cardiologista, passado + timedelta(days=4), "faltou"
+        )
+        RegraPaciente.recalcular_faltas_consecutivas(db_session, paciente_teste.id_paciente)
+        pode, mensagem = ValidadorAgendamento.validar_novo_agendamento(
+            db_session, paciente_teste.id_paciente, medico_cardiologista.id_medico,
+            segunda, segunda + timedelta(minutes=30)
+        )
+        assert not pode and "bloqueado automaticamente por 3 faltas" in mensagem
+        db_session.refresh(paciente_teste)
+        assert paciente_teste.esta_bloqueado
+        
+        pode, mensagem = self.comparar(db_session, paciente_teste, medico_cardiologista, segunda)
+        assert mensagem.startswith("Paciente bloqueado por 3 faltas")
+    
+    def test_uma_unica_ida_ao_banco(
+        self, db_engine, db_session, paciente_teste, medico_cardiologista, expediente_cardio
+    ):
+        """Todas as regras são avaliadas com uma única instrução SQL"""
+        from sqlalchemy import event
+        from app.services.regras_negocio import ValidadorAgendamento
+        
+        instrucoes = []
+        
+        def contar(conn, cursor, statement, *args):
+            instrucoes.append(statement)
+        
+        segunda = self.proxima_segunda(10)
+        paciente_id, medico_id = paciente_teste.id_paciente, medico_cardiologista.id_medico
+        event.listen(db_engine, "before_cursor_execute", contar)
+        try:
+            pode, _ = ValidadorAgendamento.validar_novo_agendamento(
+                db_session, paciente_id, medico_id, segunda, segunda + timedelta(minutes=30)
+            )
+        finally:
+            event.remove(db_engine, "before_cursor_execute", contar)
+        
+        assert pode
+        assert len(instrucoes) == 1
+        assert instrucoes[0].lstrip().upper().startswith("WITH")
+
+
+@pytest.mark.business_rules
+class TestContadorFaltasConsecutivas:
+    """RN3: contador de faltas consecutivas mantido em Paciente"""
+    
+    @staticmethod
+    def criar_consulta(db_session, paciente, medico, inicio, status_consulta="agendada"):
+        from app.models.models import Consulta
+        
+        consulta = Consulta(
+            data_hora_inicio=inicio,
+            data_hora_fim=inicio + timedelta(minutes=30),
+            status=status_consulta,
+            id_paciente_fk=paciente.id_paciente,
+            id_medico_fk=medico.id_medico
+        )
+        db_session.add(consulta)
+        db_session.commit()
+        return consulta
+    
+    @staticmethod
+    def faltas(db_session, paciente):
+        from app.services.regras_negocio import RegraPaciente
+        return RegraPaciente.contar_faltas_consecutivas(db_session, paciente.id_paciente)
+    
+    def atualizar_status(self, client, consulta, novo_status):
+        response = client.put(
+            f"/medicos/consultas/{consulta.id_consulta}/status",
+            params={"medico_id": consulta.id_medico_fk, "novo_status": novo_status}
+        )
+        assert response.status_code == status.HTTP_200_OK
+    
+    def test_falta_conta_e_correcao_desconta(
+        self, client, db_session, paciente_teste, medico_cardiologista
+    ):
+        """'faltou' conta, repetir o status não conta de novo, corrigir a falta desconta"""
+        passado = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=10)
+        consultas = [
+            self.criar_consulta(db_session, paciente_teste, medico_cardiologista, passado + timedelta(days=i))
+            for i in range(3)
+        ]
+        assert self.faltas(db_session, paciente_teste) == 0
+        
+        self.atualizar_status(client, consultas[0], "realizada")
+        self.atualizar_status(client, consultas[1], "faltou")
+        self.atualizar_status(client, consultas[2], "faltou")
+        self.atualizar_status(client, consultas[2], "faltou")
+        assert self.faltas(db_session, paciente_teste) == 2
+        
+        # Falta lançada por engano
+        self.atualizar_status(client, consultas[2], "realizada")
+        assert self.faltas(db_session, paciente_teste) == 0
+        self.atualizar_status(client, consultas[2], "faltou")
+        assert self.faltas(db_session, paciente_teste) == 2
+        self.atualizar_status(client, consultas[1], "cancelada")
+        assert self.faltas(db_session, paciente_teste) == 1
+    
+    def test_mudancas_de_status_concordam_com_o_recalculo(
+        self, client, db_session, paciente_teste, medico_cardiologista
+    ):
+        """O contador mantido pelas mudanças de status é o mesmo do recálculo pelo histórico"""
+        from app.models.models import Paciente
+        from app.services.regras_negocio import RegraPaciente
+        
+        passado = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=20)
+        consultas = [
+            self.criar_consulta(db_session, paciente_teste, medico_cardiologista, passado + timedelta(days=i))
+            for i in range(5)
+        ]
+        mudancas = [
+            (0, "faltou"), (1, "faltou"), (2, "cancelada"), (3, "faltou"), (4, "faltou"),
+            (2, "faltou"), (3, "realizada"), (3, "faltou"), (4, "confirmada"), (4, "faltou"), (0, "realizada"),
+        ]
+        for indice, novo_status in mudancas:
+            self.atualizar_status(client, consultas[indice], novo_status)
+            pelas_mudancas = self.faltas(db_session, paciente_teste)
+            
+            RegraPaciente.recalcular_faltas_consecutivas(db_session)
+            db_session.expire_all()
+            assert db_session.get(Paciente, paciente_teste.id_paciente).faltas_consecutivas == pelas_mudancas
+        assert pelas_mudancas == 4
+    
+    def test_terceira_falta_bloqueia_novo_agendamento(
+        self, client, db_session, paciente_teste, medico_cardiologista
+    ):
+        """Após três faltas marcadas pelo médico, o próximo agendamento é bloqueado"""
+        from app.services.regras_negocio import ValidadorAgendamento
+        
+        passado = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=10)
+        for i in range(3):
+            consulta = self.criar_consulta(
+                db_session, paciente_teste, medico_cardiologista, passado + timedelta(days=i)
+            )
+            self.atualizar_status(client, consulta, "faltou")
+        
+        inicio = datetime.now() + timedelta(days=7)
+        pode, mensagem = ValidadorAgendamento.validar_novo_agendamento(
+            db_session, paciente_teste.id_paciente, medico_cardiologista.id_medico,
+            inicio, inicio + timedelta(minutes=30)
+        )
+        assert not pode and "bloqueado automaticamente por 3 faltas" in mensagem
+    
+    def test_recalculo_pelo_historico(
+        self, db_session, paciente_teste, paciente_sem_plano, medico_cardiologista
+    ):
+        """O recálculo conta as faltas após a última consulta realizada (cancelada não interrompe)"""
+        from app.services.regras_negocio import RegraPaciente
+        
+        passado = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=30)
+        historico = ("faltou", "faltou", "realizada", "faltou", "cancelada", "faltou", "faltou")
+        for i, status_consulta in enumerate(historico):
+            self.criar_consulta(
+                db_session, paciente_teste, medico_cardiologista, passado + timedelta(days=i), status_consulta
+            )
+        # Consulta agendada não interrompe a sequência
+        self.criar_consulta(
+            db_session, paciente_teste, medico_cardiologista, datetime.now() + timedelta(days=3)
+        )
+        for i in range(3):
+            self.criar_consulta(
+                db_session, paciente_sem_plano, medico_cardiologista,
+                passado + timedelta(days=i, hours=1), "faltou"
+            )
+        
+        RegraPaciente.recalcular_faltas_consecutivas(db_session)
+        
+        assert self.faltas(db_session, paciente_teste) == 3
+        assert self.faltas(db_session, paciente_sem_plano) == 3
+    
+    def test_desbloqueio_sobrevive_a_correcao_de_status(
+        self, client, db_session, paciente_teste, medico_cardiologista,
+        expediente_cardio, auth_headers_admin
+    ):
+        """Desbloqueado pelo administrador, corrigir uma falta antiga não devolve o bloqueio"""
+        from app.services.regras_negocio import RegraPaciente, ValidadorAgendamento
+        
+        passado = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=10)
+        consultas = [
+            self.criar_consulta(db_session, paciente_teste, medico_cardiologista, passado + timedelta(days=i))
+            for i in range(4)
+        ]
+        for consulta in consultas:
+            self.atualizar_status(client, consulta, "faltou")
+        inicio = datetime.now() + timedelta(days=7)
+        pode, _ = ValidadorAgendamento.validar_novo_agendamento(
+            db_session, paciente_teste.id_paciente, medico_cardiologista.id_medico,
+            inicio, inicio + timedelta(minutes=30)
+        )
+        assert not pode
+        
+        response = client.post(
+            f"/admin/pacientes/{paciente_teste.id_paciente}/desbloquear", headers=auth_headers_admin
+        )
+        assert response.status_code == status.HTTP_200_OK
+        
+        # Corrigir uma falta antiga recalcula, mas respeita o desbloqueio
+        self.atualizar_status(client, consultas[0], "cancelada")
+        assert self.faltas(db_session, paciente_teste) == 0
+        
+        segunda = datetime.now() + timedelta(days=7)
+        segunda -= timedelta(days=segunda.weekday())
+        response = client.post(
+            "/pacientes/consultas",
+            params={"paciente_id": paciente_teste.id_paciente},
+            json={
+                "data_hora": segunda.replace(hour=10, minute=0, second=0, microsecond=0).isoformat(),
+                "id_medico": medico_cardiologista.id_medico
+            }
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        
+        # Falta posterior ao desbloqueio volta a contar, igual ao recálculo
+        consulta = self.criar_consulta(db_session, paciente_teste, medico_cardiologista, datetime.now())
+        self.atualizar_status(client, consulta, "faltou")
+        assert self.faltas(db_session, paciente_teste) == 1
+        RegraPaciente.recalcular_faltas_consecutivas(db_session, paciente_teste.id_paciente)
+        db_session.expire_all()
+        assert self.faltas(db_session, paciente_teste) == 1
+
+
+@pytest.mark.business_rules
+class TestAgendamentoEmLote:
+    """Agendamento de vários itens de uma vez pela recepção"""
+    
+    @staticmethod
+    def item(paciente, medico, data_hora):
+        return {
+            "id_paciente": paciente.id_paciente,
+            "id_medico": medico.id_medico,
+            "data_hora": data_hora.isoformat()
+        }
+    
+    def test_conflitos_no_lote_e_no_banco(
+        self, client, db_session, paciente_teste, paciente_sem_plano,
+        medico_cardiologista, expediente_cardio
+    ):
+        """Conflito entre itens, com o banco e fora do expediente em uma só chamada"""
+        from app.models.models import Consulta
+        
+        segunda = TestValidacaoEmUmaConsulta.proxima_segunda(10)
+        TestValidacaoEmUmaConsulta.criar_consulta(
+            db_session, paciente_sem_plano, medico_cardiologista, segunda.replace(hour=9), "agendada"
+        )
+        
+        response = client.post("/pacientes/consultas/lote", json={"consultas": [
+            self.item(paciente_teste, medico_cardiologista, segunda.replace(hour=10, minute=15)),
+            self.item(paciente_sem_plano, medico_cardiologista, segunda),
+            self.item(paciente_teste, medico_cardiologista, segunda.replace(hour=9, minute=15)),
+            self.item(paciente_teste, medico_cardiologista, segunda.replace(hour=19)),
+        ]})
+        assert response.status_code == status.HTTP_200_OK
+        corpo = response.json()
+        assert (corpo["total"], corpo["agendadas"], corpo["recusadas"]) == (4, 1, 3)
+        
+        resultados = corpo["resultados"]
+        assert resultados[1]["sucesso"] and resultados[1]["id_consulta"]
+        assert "item 2 do lote" in resultados[0]["mensagem"]
+        assert "09:00 às 09:30" in resultados[2]["mensagem"]
+        assert "Segunda" in resultados[3]["mensagem"]
+        
+        consulta = db_session.get(Consulta, resultados[1]["id_consulta"])
+        assert consulta.id_paciente_fk == paciente_sem_plano.id_paciente
+        assert consulta.data_hora_fim == segunda + timedelta(minutes=30)
+    
+    def test_limite_de_consultas_futuras_conta_o_lote(
+        self, client, db_session, paciente_teste, medico_cardiologista, medico_ortopedista, expediente_cardio
+    ):
+        """RN2 considera as consultas já existentes e as aceitas no próprio lote"""
+        segunda = TestValidacaoEmUmaConsulta.proxima_segunda(10)
+        TestValidacaoEmUmaConsulta.criar_consulta(
+            db_session, paciente_teste, medico_cardiologista, segunda + timedelta(days=1), "agendada"
+        )
+        
+        response = client.post("/pacientes/consultas/lote", json={"consultas": [
+            self.item(paciente_teste, medico_cardiologista, segunda + timedelta(days=2)),
+            self.item(paciente_teste, medico_cardiologista, segunda),
+        ]})
+        resultados = response.json()["resultados"]
+        assert resultados[1]["sucesso"]
+        assert not resultados[0]["sucesso"]
+        assert "Você já possui 2 consultas" in resultados[0]["mensagem"]
+    
+    def test_mesmas_regras_e_ordem_do_agendamento_individual(
+        self, db_session, paciente_teste, paciente_sem_plano, medico_cardiologista, expediente_cardio
+    ):
+        """Cada pedido recebe no lote a mesma mensagem que no agendamento individual"""
+        from app.models.models import BloqueioHorario
+        from app.services.regras_negocio import ValidadorAgendamento
+        
+        segunda = TestValidacaoEmUmaConsulta.proxima_segunda(10)
+        TestValidacaoEmUmaConsulta.criar_consulta(
+            db_session, paciente_sem_plano, medico_cardiologista, segunda.replace(hour=9), "agendada"
+        )
+        db_session.add(BloqueioHorario(
+            data=segunda.date(), hora_inicio=segunda.replace(hour=11).time(), hora_fim=segunda.replace(hour=12).time(),
+            id_medico_fk=medico_cardiologista.id_medico
+        ))
+        db_session.commit()
+        
+        def comparar(paciente, inicio):
+            individual = ValidadorAgendamento.validar_novo_agendamento(
+                db_session, paciente.id_paciente, medico_cardiologista.id_medico, inicio, inicio + timedelta(minutes=30)
+            )
+            mensagens, _ = ValidadorAgendamento.validar_lote(
+                db_session, [(paciente.id_paciente, medico_cardiologista.id_medico, inicio)]
+            )
+            assert (mensagens[0] or "Agendamento válido") == individual[1]
+            return mensagens[0]
+        
+        assert comparar(paciente_teste, segunda) is None
+        assert "Segunda" in comparar(paciente_teste, segunda.replace(hour=19))
+        assert "bloqueou a agenda das 11:00 às 12:00" in comparar(paciente_teste, segunda.replace(hour=11, minute=30))
+        assert "consulta agendada das 09:00 às 09:30" in comparar(paciente_teste, segunda.replace(hour=9, minute=15))
+        
+        # RN2 vem antes da agenda do médico nos dois caminhos
+        TestValidacaoEmUmaConsulta.criar_consulta(
+            db_session, paciente_sem_plano, medico_cardiologista, segunda + timedelta(days=1), "agendada"
+        )
+        assert "Limite de consultas futuras" in comparar(paciente_sem_plano, segunda.replace(hour=11))
+    
+    def test_lote_atomico_nao_agenda_nada_se_um_item_falhar(
+        self, client, db_session, paciente_teste, paciente_sem_plano, medico_cardiologista, expediente_cardio
+    ):
+        """Com atomico=True um item recusado impede todos os demais"""
+        from app.models.models import Consulta
+        
+        segunda = TestValidacaoEmUmaConsulta.proxima_segunda(10)
+        response = client.post("/pacientes/consultas/lote", json={"atomico": True, "consultas": [
+            self.item(paciente_teste, medico_cardiologista, segunda),
+            self.item(paciente_sem_plano, medico_cardiologista, segunda),
+        ]})
+        corpo = response.json()
+        assert corpo["agendadas"] == 0
+        assert "outro item do lote" in corpo["resultados"][0]["mensagem"]
+        assert db_session.query(Consulta).count() == 0
+    
+    def test_uma_unica_insercao(
+        self, client, db_engine, paciente_teste, paciente_sem_plano, medico_cardiologista, expediente_cardio
+    ):
+        """As consultas aceitas são inseridas com um único INSERT"""
+        from sqlalchemy import event
+        
+        segunda = TestValidacaoEmUmaConsulta.proxima_segunda(10)
+        itens = [
+            self.item(paciente, medico_cardiologista, segunda + timedelta(days=dia))
+            for dia in range(2) for paciente in (paciente_teste, paciente_sem_plano)
+        ]
+        insercoes = []
+        
+        def contar(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("INSERT"):
+                insercoes.append(statement)
+        
+        event.listen(db_engine, "before_cursor_execute", contar)
+        try:
+            response = client.post("/pacientes/consultas/lote", json={"consultas": itens})
+        finally:
+            event.remove(db_engine, "before_cursor_execute", contar)
+        
+        assert response.json()["agendadas"] == 2
+        assert len(insercoes) == 1
+    
+    def test_lote_vazio(self, client):
+        """O lote precisa ter ao menos um item"""
+        assert client.post("/pacientes/consultas/lote", json={"consultas": []}).status_code == \
+            status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,152 @@
+"""
+Testes do cache de arquivos de relatório e do GET condicional
+Performance: ~3 segundos total
+"""
+import pytest
+from datetime import date, datetime, time, timedelta
+
+from app.models.models import Consulta
+from app.services import relatorios
+from app.utils.cache_lru import CacheLRU
+
+URL = "/admin/relatorios/consultas-por-medico"
+
+
+@pytest.fixture(scope="function")
+def consultas_semana(db_session, medico_cardiologista, paciente_teste):
+    inicio = datetime.combine(date.today() - timedelta(days=2), time(9))
+    consultas = [
+        Consulta(
+            data_hora_inicio=inicio + timedelta(hours=i), status="realizada",
+            id_medico_fk=medico_cardiologista.id_medico, id_paciente_fk=paciente_teste.id_paciente
+        )
+        for i in range(2)
+    ]
+    db_session.add_all(consultas)
+    db_session.commit()
+    return consultas
+
+
+@pytest.fixture(scope="function")
+def renderizacoes(monkeypatch):
+    """Conta as vezes que a planilha é renderizada"""
+    xlsx = relatorios.RENDERIZADORES["xlsx"]
+    chamadas = []
+    renderizar = xlsx.renderizar
+
+    def contar(tabela):
+        chamadas.append(tabela.titulo)
+        return renderizar(tabela)
+
+    monkeypatch.setattr(xlsx, "renderizar", contar)
+    return chamadas
+
+
+def _xlsx(client, headers, **params):
+    return client.get(URL, headers=headers, params={"formato": "xlsx", **params})
+
+
+@pytest.mark.integration
+class TestCacheRelatorios:
+    """Reaproveitamento até as consultas do período mudarem"""
+
+    def test_mesmo_relatorio_nao_renderiza_de_novo(
+        self, client, auth_headers_admin, consultas_semana, renderizacoes
+    ):
+        primeira = _xlsx(client, auth_headers_admin)
+        segunda = _xlsx(client, auth_headers_admin)
+
+        assert primeira.status_code == segunda.status_code == 200
+        assert segunda.content == primeira.content
+        assert segunda.headers["etag"] == primeira.headers["etag"]
+        assert primeira.headers["cache-control"] == "private, no-cache"
+        assert len(renderizacoes) == 1
+        # Outro formato ou outros filtros são outra entrada
+        assert _xlsx(client, auth_headers_admin, data_inicio=str(date.today())).headers["etag"] != primeira.headers["etag"]
+        assert len(renderizacoes) == 2
+
+    @pytest.mark.parametrize("alteracao", ["inclusao", "alteracao", "exclusao"])
+    def test_mudanca_nas_consultas_invalida(
+        self, client, db_session, auth_headers_admin, consultas_semana, renderizacoes, alteracao
+    ):
+        antes = _xlsx(client, auth_headers_admin).headers["etag"]
+
+        consulta = consultas_semana[0]
+        if alteracao == "inclusao":
+            db_session.add(Consulta(
+                data_hora_inicio=consulta.data_hora_inicio + timedelta(days=1), status="agendada",
+                id_medico_fk=consulta.id_medico_fk, id_paciente_fk=consulta.id_paciente_fk
+            ))
+        elif alteracao == "alteracao":
+            consulta.status = "cancelada"
+        else:
+            db_session.delete(consulta)
+        db_session.commit()
+
+        depois = _xlsx(client, auth_headers_admin)
+        assert depois.headers["etag"] != antes
+        assert len(renderizacoes) == 2
+        por_medico = client.get(URL, headers=auth_headers_admin).json()
+        assert por_medico[0]["total_consultas"] == {"inclusao": 3, "alteracao": 2, "exclusao": 1}[alteracao]
+
+    def test_mudanca_fora_do_periodo_nao_invalida(
+        self, client, db_session, auth_headers_admin, consultas_semana, renderizacoes
+    ):
+        periodo = {"data_inicio": str(date.today() - timedelta(days=3)), "data_fim": str(date.today())}
+        antes = _xlsx(client, auth_headers_admin, **periodo).headers["etag"]
+
+        consulta = consultas_semana[0]
+        db_session.add(Consulta(
+            data_hora_inicio=consulta.data_hora_inicio - timedelta(days=30), status="realizada",
+            id_medico_fk=consulta.id_medico_fk, id_paciente_fk=consulta.id_paciente_fk
+        ))
+        db_session.commit()
+
+        assert _xlsx(client, auth_headers_admin, **periodo).headers["etag"] == antes
+        assert len(renderizacoes) == 1
+
+    def test_get_condicional(self, client, auth_headers_admin, consultas_semana, renderizacoes):
+        etag = _xlsx(client, auth_headers_admin).headers["etag"]
+
+        response = client.get(
+            URL, params={"formato": "xlsx"}, headers={**auth_headers_admin, "If-None-Match": f'"outro", W/{etag}'}
+        )
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert len(renderizacoes) == 1
+        assert client.get(URL, params={"formato": "xlsx"}, headers={**auth_headers_admin, "If-None-Match": '"outro"'}).status_code == 200
+
+    def test_sem_cache(self, client, auth_headers_admin, consultas_semana, renderizacoes, monkeypatch):
+        monkeypatch.setattr(relatorios, "obter_cache_relatorios", lambda: None)
+
+        etag = _xlsx(client, auth_headers_admin).headers["etag"]
+        _xlsx(client, auth_headers_admin)
+
+        assert len(renderizacoes) == 2
+        assert client.get(
+            URL, params={"formato": "xlsx"}, headers={**auth_headers_admin, "If-None-Match": etag}
+        ).status_code == 304
+
+
+@pytest.mark.unit
+class TestCacheLRU:
+    """Limite em bytes e ordem de descarte"""
+
+    def test_descarta_menos_usado(self):
+        cache = CacheLRU("teste", limite_bytes=10)
+        cache.obter("a", lambda: b"aaaa")
+        cache.obter("b", lambda: b"bbbb")
+        cache.obter("a", lambda: b"nao carrega")
+
+        cache.obter("c", lambda: b"cccc")
+
+        assert "a" in cache and "c" in cache and "b" not in cache
+        assert cache.tamanho_bytes == 8
+
+    def test_valor_maior_que_o_limite_nao_e_guardado(self):
+        cache = CacheLRU("teste", limite_bytes=4)
+
+        assert cache.obter("grande", lambda: b"0123456789") == b"0123456789"
+        assert len(cache) == 0 and cache.tamanho_bytes == 0
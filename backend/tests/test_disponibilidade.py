@@ -0,0 +1,590 @@
+"""
+Testes de Disponibilidade de Horários (agenda por período, cache compartilhado e slots materializados)
+Performance: ~1-2 segundos total
+"""
+import multiprocessing
+import pytest
+from datetime import date, datetime, time, timedelta
+from fastapi import status
+
+from app.models.models import HorarioTrabalho, BloqueioHorario, Consulta, SlotAgenda
+from app.config import settings
+from app.services import cache_disponibilidade
+from app.services.cache_disponibilidade import CacheDisponibilidade
+from app.services.regras_negocio import RegraHorarioDisponivel
+from app.services.slot_agenda import RegraSlotAgenda
+
+
+def proxima_segunda(a_partir_de: date = None) -> date:
+    """Próxima segunda-feira estritamente posterior à data informada"""
+    dia = (a_partir_de or date.today()) + timedelta(days=1)
+    while dia.weekday() != 0:
+        dia += timedelta(days=1)
+    return dia
+
+
+@pytest.fixture(scope="function")
+def expediente_manha(db_session, medico_cardiologista):
+    """Expediente Seg-Sex 09:00-12:00 (dia_semana numérico, conforme o modelo)"""
+    horarios = [
+        HorarioTrabalho(
+            dia_semana=dia,
+            hora_inicio=time(9, 0),
+            hora_fim=time(12, 0),
+            id_medico_fk=medico_cardiologista.id_medico
+        )
+        for dia in range(5)
+    ]
+    db_session.add_all(horarios)
+    db_session.commit()
+    return horarios
+
+
+@pytest.mark.unit
+class TestAgendaPeriodo:
+    """Suite da agenda de horários livres por período"""
+    
+    def test_agenda_subtrai_consultas_e_bloqueios(
+        self, db_session, medico_cardiologista, paciente_teste, expediente_manha
+    ):
+        """Consultas ativas e bloqueios removem os slots que sobrepõem"""
+        segunda = proxima_segunda()
+        terca = segunda + timedelta(days=1)
+        
+        db_session.add_all([
+            Consulta(
+                data_hora_inicio=datetime.combine(segunda, time(9, 30)),
+                data_hora_fim=datetime.combine(segunda, time(10, 0)),
+                status="agendada",
+                id_paciente_fk=paciente_teste.id_paciente,
+                id_medico_fk=medico_cardiologista.id_medico
+            ),
+            Consulta(
+                data_hora_inicio=datetime.combine(segunda, time(11, 0)),
+                data_hora_fim=datetime.combine(segunda, time(11, 30)),
+                status="cancelada",
+                id_paciente_fk=paciente_teste.id_paciente,
+                id_medico_fk=medico_cardiologista.id_medico
+            ),
+            BloqueioHorario(
+                data=terca,
+                hora_inicio=time(10, 0),
+                hora_fim=time(11, 15),
+                motivo="Reunião",
+                id_medico_fk=medico_cardiologista.id_medico
+            ),
+        ])
+        db_session.commit()
+        
+        agenda = RegraHorarioDisponivel.listar_agenda_periodo(
+            db_session, medico_cardiologista.id_medico,
+            segunda, segunda + timedelta(days=6)
+        )
+        
+        assert agenda[segunda.isoformat()] == ["09:00", "10:00", "10:30", "11:00", "11:30"]
+        assert agenda[terca.isoformat()] == ["09:00", "09:30", "11:30"]
+        # Sábado e domingo não têm expediente e ficam fora do mapa
+        assert len(agenda) == 5
+    
+    def test_agenda_igual_a_consulta_dia_a_dia(
+        self, db_session, medico_cardiologista, paciente_teste, expediente_manha
+    ):
+        """O período inteiro retorna o mesmo que consultar cada dia isoladamente"""
+        segunda = proxima_segunda()
+        for dias, hora in [(0, 9), (2, 11), (3, 9)]:
+            inicio = datetime.combine(segunda + timedelta(days=dias), time(hora, 0))
+            db_session.add(Consulta(
+                data_hora_inicio=inicio,
+                data_hora_fim=inicio + timedelta(minutes=30),
+                status="confirmada",
+                id_paciente_fk=paciente_teste.id_paciente,
+                id_medico_fk=medico_cardiologista.id_medico
+            ))
+        db_session.commit()
+        
+        fim = segunda + timedelta(days=13)
+        agenda = RegraHorarioDisponivel.listar_agenda_periodo(
+            db_session, medico_cardiologista.id_medico, segunda, fim
+        )
+        
+        dia = segunda
+        while dia <= fim:
+            por_dia = RegraHorarioDisponivel.listar_horarios_disponiveis(
+                db_session, medico_cardiologista.id_medico, dia
+            )
+            assert agenda.get(dia.isoformat(), []) == por_dia
+            dia += timedelta(days=1)
+    
+    def test_endpoint_agenda(self, client, medico_cardiologista, expediente_manha):
+        """GET /pacientes/medicos/{id}/agenda retorna o mapa por dia"""
+        segunda = proxima_segunda()
+        response = client.get(
+            f"/pacientes/medicos/{medico_cardiologista.id_medico}/agenda",
+            params={"de": segunda.isoformat(), "ate": (segunda + timedelta(days=29)).isoformat()}
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["id_medico"] == medico_cardiologista.id_medico
+        assert data["dias"][segunda.isoformat()][0] == "09:00"
+        assert len(data["dias"][segunda.isoformat()]) == 6
+    
+    def test_endpoint_agenda_periodo_invalido(self, client, medico_cardiologista):
+        """Período invertido ou longo demais é rejeitado"""
+        hoje = date.today()
+        url = f"/pacientes/medicos/{medico_cardiologista.id_medico}/agenda"
+        
+        response = client.get(url, params={"de": hoje.isoformat(), "ate": (hoje - timedelta(days=1)).isoformat()})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        response = client.get(url, params={"de": hoje.isoformat(), "ate": (hoje + timedelta(days=365)).isoformat()})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.unit
+class TestPrimeirosHorarios:
+    """Suite da busca do primeiro horário livre por especialidade"""
+    
+    @pytest.fixture
+    def segundo_cardiologista(self, db_session, especialidade_cardiologia):
+        """Segundo médico de Cardiologia, atendendo Seg-Sex 08:00-09:00"""
+        from app.models.models import Medico
+        
+        medico = Medico(
+            nome="Dr. Pedro Lima",
+            cpf="12312312399",
+            email="pedro@test.com",
+            senha_hash="x",
+            crm="CRM-55555",
+            id_especialidade_fk=especialidade_cardiologia.id_especialidade
+        )
+        db_session.add(medico)
+        db_session.commit()
+        db_session.add_all([
+            HorarioTrabalho(
+                dia_semana=dia,
+                hora_inicio=time(8, 0),
+                hora_fim=time(9, 0),
+                id_medico_fk=medico.id_medico
+            )
+            for dia in range(5)
+        ])
+        db_session.commit()
+        return medico
+    
+    def test_intercala_medicos_em_ordem_cronologica(
+        self, db_session, medico_cardiologista, segundo_cardiologista,
+        paciente_teste, expediente_manha, especialidade_cardiologia
+    ):
+        """Os horários de todos os médicos saem intercalados por data/hora"""
+        segunda = proxima_segunda()
+        inicio = datetime.combine(segunda, time(8, 0))
+        db_session.add(Consulta(
+            data_hora_inicio=inicio,
+            data_hora_fim=inicio + timedelta(minutes=30),
+            status="agendada",
+            id_paciente_fk=paciente_teste.id_paciente,
+            id_medico_fk=segundo_cardiologista.id_medico
+        ))
+        db_session.commit()
+        
+        horarios = RegraHorarioDisponivel.buscar_primeiros_horarios(
+            db_session, especialidade_cardiologia.id_especialidade,
+            segunda, segunda + timedelta(days=6), limite=3
+        )
+        
+        assert [(h["data_hora"].time(), h["id_medico"]) for h in horarios] == [
+            (time(8, 30), segundo_cardiologista.id_medico),
+            (time(9, 0), medico_cardiologista.id_medico),
+            (time(9, 30), medico_cardiologista.id_medico),
+        ]
+        assert all(h["data_hora"].date() == segunda for h in horarios)
+    
+    def test_endpoint_primeiros_horarios(
+        self, client, medico_cardiologista, expediente_manha, especialidade_cardiologia
+    ):
+        """GET /pacientes/primeiros-horarios respeita o limite"""
+        response = client.get(
+            "/pacientes/primeiros-horarios",
+            params={"especialidade_id": especialidade_cardiologia.id_especialidade, "limite": 4}
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert len(data) == 4
+        assert data == sorted(data, key=lambda h: h["data_hora"])
+        assert data[0]["medico_nome"] == "Dr. João Silva"
+    
+    def test_endpoint_especialidade_inexistente(self, client):
+        """Especialidade inexistente retorna 404"""
+        response = client.get("/pacientes/primeiros-horarios", params={"especialidade_id": 999999})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def _gravar_em_outro_processo(caminho, medico_id, data, horarios):
+    """Executado em um processo filho: grava no mesmo arquivo mapeado"""
+    cache = CacheDisponibilidade(caminho, max_medicos=16, dias=30)
+    cache.gravar(medico_id, data, horarios)
+    cache.fechar()
+
+
+@pytest.fixture(scope="function")
+def cache_compartilhado(tmp_path, monkeypatch):
+    """Ativa o cache de disponibilidade em um arquivo temporário"""
+    monkeypatch.setattr(settings, "CACHE_DISPONIBILIDADE_ARQUIVO", str(tmp_path / "disponibilidade.bin"))
+    monkeypatch.setattr(cache_disponibilidade, "_cache", None)
+    cache = cache_disponibilidade.obter_cache()
+    yield cache
+    cache.fechar()
+    cache_disponibilidade._cache = None
+
+
+@pytest.mark.unit
+class TestCacheDisponibilidade:
+    """Suite do cache de disponibilidade em memória compartilhada"""
+    
+    def test_gravar_e_consultar(self, tmp_path):
+        """Horários gravados voltam idênticos; dias não gravados são miss"""
+        cache = CacheDisponibilidade(str(tmp_path / "c.bin"), max_medicos=16, dias=30)
+        dia = date(2030, 1, 7)
+        
+        assert cache.consultar(3, dia)[0] is None
+        assert cache.gravar(3, dia, ["08:00", "09:30", "23:30"])
+        assert cache.consultar(3, dia)[0] == ["08:00", "09:30", "23:30"]
+        # Mesmo registro físico (dia + 30), mas outra data: miss
+        assert cache.consultar(3, dia + timedelta(days=30))[0] is None
+        cache.fechar()
+    
+    def test_horario_fora_da_grade_nao_e_cacheado(self, tmp_path):
+        """Horários fora da grade de 30 minutos continuam indo ao banco"""
+        cache = CacheDisponibilidade(str(tmp_path / "c.bin"), max_medicos=16, dias=30)
+        dia = date(2030, 1, 7)
+        
+        cache.gravar(1, dia, ["09:00", "09:15"])
+        assert cache.consultar(1, dia)[0] is None
+        assert cache.gravar(99, dia, ["09:00"]) is False  # fora da capacidade
+        cache.fechar()
+    
+    def test_gravacao_condicional_e_invalidacao(self, tmp_path):
+        """Preenchimento após miss não sobrescreve atualização concorrente"""
+        cache = CacheDisponibilidade(str(tmp_path / "c.bin"), max_medicos=16, dias=30)
+        dia = date(2030, 1, 7)
+        
+        _, sequencia = cache.consultar(2, dia)
+        cache.gravar(2, dia, ["10:00"])  # atualização concorrente
+        assert cache.gravar(2, dia, ["09:00", "10:00"], sequencia_esperada=sequencia) is False
+        assert cache.consultar(2, dia)[0] == ["10:00"]
+        
+        cache.invalidar(2)
+        assert cache.consultar(2, dia)[0] is None
+        cache.fechar()
+    
+    def test_visivel_entre_processos(self, tmp_path):
+        """Escrita feita por outro processo é lida sem reabrir o arquivo"""
+        caminho = str(tmp_path / "c.bin")
+        cache = CacheDisponibilidade(caminho, max_medicos=16, dias=30)
+        dia = date(2030, 1, 7)
+        
+        processo = multiprocessing.get_context("spawn").Process(
+            target=_gravar_em_outro_processo, args=(caminho, 5, dia, ["14:00", "14:30"])
+        )
+        processo.start()
+        processo.join(timeout=30)
+        
+        assert processo.exitcode == 0
+        assert cache.consultar(5, dia)[0] == ["14:00", "14:30"]
+        cache.fechar()
+    
+    def test_atualizacoes_intercaladas_nao_gravam_dia_antigo(
+        self, db_session, cache_compartilhado, medico_cardiologista, monkeypatch
+    ):
+        """A atualização que leu o banco antes da outra não sobrescreve o cálculo mais novo"""
+        segunda = proxima_segunda()
+        medico_id = medico_cardiologista.id_medico
+        leituras = iter([["08:00", "09:00"], ["08:00"]])
+        
+        def recalcular_com_a_outra_no_meio(*args, **kwargs):
+            horarios = next(leituras)
+            if horarios == ["08:00", "09:00"]:
+                # Primeiro atualizador leu o banco antigo; o segundo commita e atualiza antes dele gravar
+                cache_disponibilidade.atualizar_disponibilidade(db_session, medico_id, segunda)
+            return horarios
+        
+        monkeypatch.setattr(
+            cache_disponibilidade.RegraHorarioDisponivel, "listar_horarios_disponiveis",
+            recalcular_com_a_outra_no_meio
+        )
+        cache_disponibilidade.atualizar_disponibilidade(db_session, medico_id, segunda)
+        
+        assert cache_compartilhado.consultar(medico_id, segunda)[0] == ["08:00"]
+    
+    def test_atualizacao_usa_os_slots_no_modo_por_slots(
+        self, db_session, cache_compartilhado, agendamento_por_slots, medico_cardiologista, expediente_manha
+    ):
+        """Com AGENDAMENTO_POR_SLOTS o cache recebe os slots livres, não a agenda calculada"""
+        segunda = proxima_segunda()
+        medico_id = medico_cardiologista.id_medico
+        RegraSlotAgenda.materializar(db_session, [medico_id], segunda, segunda)
+        # Bloqueio gravado sem rematerializar: as duas fontes divergem às 09:00
+        db_session.add(BloqueioHorario(
+            data=segunda, hora_inicio=time(9, 0), hora_fim=time(9, 30), id_medico_fk=medico_id
+        ))
+        db_session.commit()
+        
+        cache_disponibilidade.atualizar_disponibilidade(db_session, medico_id, segunda)
+        
+        livres = RegraSlotAgenda.listar_livres(db_session, medico_id, segunda, segunda)[segunda.isoformat()]
+        assert "09:00" in livres
+        assert cache_compartilhado.consultar(medico_id, segunda)[0] == livres
+    
+    def test_endpoint_usa_cache_e_agendamento_atualiza(
+        self, client, cache_compartilhado, medico_cardiologista, paciente_teste, expediente_manha
+    ):
+        """Leitura preenche o cache e o agendamento recalcula o dia afetado"""
+        segunda = proxima_segunda()
+        url = f"/pacientes/medicos/{medico_cardiologista.id_medico}/horarios-disponiveis"
+        
+        response = client.get(url, params={"data": segunda.isoformat()})
+        assert response.status_code == status.HTTP_200_OK
+        assert "09:00" in response.json()["horarios_disponiveis"]
+        assert cache_compartilhado.consultar(medico_cardiologista.id_medico, segunda)[0] == \
+            response.json()["horarios_disponiveis"]
+        
+        response = client.post(
+            "/pacientes/consultas",
+            params={"paciente_id": paciente_teste.id_paciente},
+            json={
+                "data_hora": datetime.combine(segunda, time(9, 0)).isoformat(),
+                "id_medico": medico_cardiologista.id_medico
+            }
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        
+        response = client.get(url, params={"data": segunda.isoformat()})
+        assert "09:00" not in response.json()["horarios_disponiveis"]
+        assert cache_compartilhado.consultar(medico_cardiologista.id_medico, segunda)[0] == \
+            response.json()["horarios_disponiveis"]
+
+
+@pytest.fixture(scope="function")
+def agendamento_por_slots(monkeypatch):
+    """Ativa o modo de agendamento por slots materializados"""
+    monkeypatch.setattr(settings, "AGENDAMENTO_POR_SLOTS", True)
+
+
+@pytest.mark.unit
+class TestAgendamentoPorSlots:
+    """Suite da agenda materializada em slot_agenda"""
+    
+    def test_materializacao_equivale_a_agenda_calculada(
+        self, db_session, medico_cardiologista, paciente_teste, expediente_manha
+    ):
+        """Slots livres materializados coincidem com a agenda calculada"""
+        segunda = proxima_segunda()
+        consulta = Consulta(
+            data_hora_inicio=datetime.combine(segunda, time(10, 0)),
+            data_hora_fim=datetime.combine(segunda, time(10, 30)),
+            status="agendada",
+            id_paciente_fk=paciente_teste.id_paciente,
+            id_medico_fk=medico_cardiologista.id_medico
+        )
+        db_session.add_all([
+            consulta,
+            BloqueioHorario(
+                data=segunda + timedelta(days=2),
+                hora_inicio=time(9, 0),
+                hora_fim=time(10, 0),
+                id_medico_fk=medico_cardiologista.id_medico
+            ),
+        ])
+        db_session.commit()
+        
+        fim = segunda + timedelta(days=13)
+        RegraSlotAgenda.materializar(db_session, None, segunda, fim)
+        db_session.commit()
+        
+        assert RegraSlotAgenda.listar_livres(
+            db_session, medico_cardiologista.id_medico, segunda, fim
+        ) == RegraHorarioDisponivel.listar_agenda_periodo(
+            db_session, medico_cardiologista.id_medico, segunda, fim
+        )
+        slot = db_session.query(SlotAgenda).filter(
+            SlotAgenda.id_consulta_fk == consulta.id_consulta
+        ).one()
+        assert slot.status == "ocupado"
+        
+        # Rematerializar não duplica slots nem perde o vínculo com a consulta
+        total = db_session.query(SlotAgenda).count()
+        RegraSlotAgenda.materializar(db_session, None, segunda, fim)
+        db_session.commit()
+        assert db_session.query(SlotAgenda).count() == total == 10 * 6
+        assert db_session.query(SlotAgenda).filter(
+            SlotAgenda.id_consulta_fk == consulta.id_consulta
+        ).count() == 1
+    
+    def test_reserva_atomica_uma_vez(
+        self, db_session, medico_cardiologista, paciente_teste, expediente_manha
+    ):
+        """O mesmo slot só pode ser reservado uma vez"""
+        segunda = proxima_segunda()
+        RegraSlotAgenda.materializar(db_session, [medico_cardiologista.id_medico], segunda, segunda)
+        inicio = datetime.combine(segunda, time(9, 30))
+        consulta = Consulta(
+            data_hora_inicio=inicio,
+            data_hora_fim=inicio + timedelta(minutes=30),
+            status="agendada",
+            id_paciente_fk=paciente_teste.id_paciente,
+            id_medico_fk=medico_cardiologista.id_medico
+        )
+        db_session.add(consulta)
+        db_session.flush()
+        
+        assert RegraSlotAgenda.reservar(db_session, medico_cardiologista.id_medico, inicio, consulta.id_consulta)
+        assert RegraSlotAgenda.reservar(db_session, medico_cardiologista.id_medico, inicio, consulta.id_consulta) is None
+        # Fora do expediente não existe slot
+        assert RegraSlotAgenda.reservar(
+            db_session, medico_cardiologista.id_medico,
+            datetime.combine(segunda, time(14, 0)), consulta.id_consulta
+        ) is None
+        
+        RegraSlotAgenda.liberar(db_session, consulta.id_consulta)
+        assert "09:30" in RegraSlotAgenda.listar_livres(
+            db_session, medico_cardiologista.id_medico, segunda, segunda
+        )[segunda.isoformat()]
+    
+    def test_fluxo_agendar_e_cancelar_por_slots(
+        self, client, db_session, agendamento_por_slots, auth_headers_admin,
+        medico_cardiologista, paciente_teste, paciente_sem_plano, expediente_manha
+    ):
+        """Agendamento reserva o slot, segundo pedido recebe 409 e cancelamento devolve o slot"""
+        response = client.post("/admin/agenda/materializar", headers=auth_headers_admin)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["slots_criados"] > 0
+        
+        segunda = proxima_segunda() + timedelta(days=7)
+        corpo = {
+            "data_hora": datetime.combine(segunda, time(11, 0)).isoformat(),
+            "id_medico": medico_cardiologista.id_medico
+        }
+        url = f"/pacientes/medicos/{medico_cardiologista.id_medico}/horarios-disponiveis"
+        
+        response = client.post("/pacientes/consultas", params={"paciente_id": paciente_teste.id_paciente}, json=corpo)
+        assert response.status_code == status.HTTP_201_CREATED
+        consulta_id = response.json()["id_consulta"]
+        
+        response = client.post("/pacientes/consultas", params={"paciente_id": paciente_sem_plano.id_paciente}, json=corpo)
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert "indisponível" in response.json()["detail"]
+        assert db_session.query(Consulta).count() == 1
+        
+        response = client.get(url, params={"data": segunda.isoformat()})
+        assert "11:00" not in response.json()["horarios_disponiveis"]
+        
+        response = client.request(
+            "DELETE", f"/pacientes/consultas/{consulta_id}",
+            params={"paciente_id": paciente_teste.id_paciente}, json={}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        
+        response = client.get(url, params={"data": segunda.isoformat()})
+        assert "11:00" in response.json()["horarios_disponiveis"]
+    
+    def test_reativar_consulta_cancelada_retoma_o_slot(
+        self, client, db_session, agendamento_por_slots,
+        medico_cardiologista, paciente_teste, paciente_sem_plano, expediente_manha
+    ):
+        """Cancelada -> agendada reserva o slot de novo; 409 se outro paciente já o tomou"""
+        segunda = proxima_segunda()
+        RegraSlotAgenda.materializar(db_session, [medico_cardiologista.id_medico], segunda, segunda)
+        db_session.commit()
+        medico_id = medico_cardiologista.id_medico
+        corpo = {"data_hora": datetime.combine(segunda, time(10, 0)).isoformat(), "id_medico": medico_id}
+        
+        def agendar(paciente):
+            response = client.post("/pacientes/consultas", params={"paciente_id": paciente.id_paciente}, json=corpo)
+            assert response.status_code == status.HTTP_201_CREATED
+            return response.json()["id_consulta"]
+        
+        def mudar_status(consulta_id, novo_status):
+            return client.put(
+                f"/medicos/consultas/{consulta_id}/status",
+                params={"medico_id": medico_id, "novo_status": novo_status}
+            )
+        
+        primeira = agendar(paciente_teste)
+        assert mudar_status(primeira, "cancelada").status_code == status.HTTP_200_OK
+        segunda_consulta = agendar(paciente_sem_plano)
+        
+        response = mudar_status(primeira, "agendada")
+        assert response.status_code == status.HTTP_409_CONFLICT
+        db_session.expire_all()
+        assert db_session.get(Consulta, primeira).status == "cancelada"
+        
+        assert mudar_status(segunda_consulta, "cancelada").status_code == status.HTTP_200_OK
+        assert mudar_status(primeira, "confirmada").status_code == status.HTTP_200_OK
+        slot = db_session.query(SlotAgenda).filter(
+            SlotAgenda.id_medico_fk == medico_id,
+            SlotAgenda.data_hora_inicio == datetime.combine(segunda, time(10, 0))
+        ).one()
+        assert (slot.status, slot.id_consulta_fk) == ("ocupado", primeira)
+    
+    def test_cancelar_depois_de_bloqueio_nao_reabre_o_slot(
+        self, client, db_session, agendamento_por_slots,
+        medico_cardiologista, paciente_teste, paciente_sem_plano, expediente_manha
+    ):
+        """Slot ocupado que um bloqueio passou a cobrir volta como bloqueado ao cancelar"""
+        segunda = proxima_segunda() + timedelta(days=7)
+        medico_id = medico_cardiologista.id_medico
+        RegraSlotAgenda.materializar(db_session, [medico_id], segunda, segunda)
+        db_session.commit()
+        corpo = {"data_hora": datetime.combine(segunda, time(11, 0)).isoformat(), "id_medico": medico_id}
+        
+        response = client.post("/pacientes/consultas", params={"paciente_id": paciente_teste.id_paciente}, json=corpo)
+        assert response.status_code == status.HTTP_201_CREATED
+        consulta_id = response.json()["id_consulta"]
+        response = client.post("/medicos/bloqueios", params={"medico_id": medico_id}, json={
+            "data": segunda.isoformat(), "hora_inicio": "11:00:00", "hora_fim": "12:00:00"
+        })
+        assert response.status_code == status.HTTP_201_CREATED
+        
+        response = client.request(
+            "DELETE", f"/pacientes/consultas/{consulta_id}",
+            params={"paciente_id": paciente_teste.id_paciente}, json={}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        
+        slot = db_session.query(SlotAgenda).filter(
+            SlotAgenda.id_medico_fk == medico_id,
+            SlotAgenda.data_hora_inicio == datetime.combine(segunda, time(11, 0))
+        ).one()
+        assert (slot.status, slot.id_consulta_fk) == ("bloqueado", None)
+        assert "11:00" not in RegraSlotAgenda.listar_livres(db_session, medico_id, segunda, segunda)[segunda.isoformat()]
+        response = client.post("/pacientes/consultas", params={"paciente_id": paciente_sem_plano.id_paciente}, json=corpo)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_lote_reserva_slots_em_um_update(
+        self, client, db_session, agendamento_por_slots,
+        medico_cardiologista, paciente_teste, paciente_sem_plano, expediente_manha
+    ):
+        """No lote, itens aceitos reservam e vinculam seus slots; horário sem slot é recusado"""
+        segunda = proxima_segunda()
+        RegraSlotAgenda.materializar(db_session, [medico_cardiologista.id_medico], segunda, segunda)
+        db_session.commit()
+        
+        response = client.post("/pacientes/consultas/lote", json={"consultas": [
+            {"id_paciente": paciente_teste.id_paciente, "id_medico": medico_cardiologista.id_medico,
+             "data_hora": datetime.combine(segunda, time(9, 0)).isoformat()},
+            {"id_paciente": paciente_sem_plano.id_paciente, "id_medico": medico_cardiologista.id_medico,
+             "data_hora": datetime.combine(segunda, time(9, 30)).isoformat()},
+            {"id_paciente": paciente_sem_plano.id_paciente, "id_medico": medico_cardiologista.id_medico,
+             "data_hora": datetime.combine(segunda, time(14, 0)).isoformat()},
+        ]})
+        assert response.status_code == status.HTTP_200_OK
+        resultados = response.json()["resultados"]
+        assert [r["sucesso"] for r in resultados] == [True, True, False]
+        assert "indisponível" in resultados[2]["mensagem"]
+        
+        vinculados = dict(db_session.query(SlotAgenda.id_consulta_fk, SlotAgenda.status).filter(
+            SlotAgenda.id_consulta_fk.isnot(None)
+        ).all())
+        assert vinculados == {resultados[0]["id_consulta"]: "ocupado", resultados[1]["id_consulta"]: "ocupado"}
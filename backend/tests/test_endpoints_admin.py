@@ -3,8 +3,11 @@ Testes de Endpoints Admin
 Performance: ~2-3 segundos total
 """
 import pytest
+from datetime import date, datetime, time, timedelta
 from fastapi import status
 
+from app.models.models import Consulta, Paciente
+
 
 @pytest.mark.integration
 class TestAdminEndpoints:
@@ -118,3 +121,87 @@ class TestAdminEndpoints:
         headers = {"Authorization": "Bearer token_invalido"}
         response = client.get("/admin/pacientes", headers=headers)
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.integration
+@pytest.mark.performance
+class TestListagemPacientes:
+    """Listagem de pacientes: contagens agregadas, filtros e páginas"""
+    
+    @staticmethod
+    def cadastrar(db_session, quantidade, plano=None, inicio=0, prefixo="Paciente"):
+        pacientes = [
+            Paciente(
+                nome=f"{prefixo} {inicio + i:03d}", cpf=f"{inicio + i:011d}",
+                email=f"{prefixo.lower()}{inicio + i}@test.com", senha_hash="x",
+                data_nascimento=date(1980, 1, 1), esta_bloqueado=(i % 3 == 0),
+                id_plano_saude_fk=plano.id_plano_saude if plano else None
+            )
+            for i in range(quantidade)
+        ]
+        db_session.add_all(pacientes)
+        db_session.commit()
+        return pacientes
+    
+    @staticmethod
+    def consultar(client, instrucoes_sql, headers, **params):
+        with instrucoes_sql() as instrucoes:
+            response = client.get("/admin/pacientes", headers=headers, params=params)
+        assert response.status_code == status.HTTP_200_OK
+        return response, len(instrucoes)
+    
+    def test_numero_de_instrucoes_nao_cresce_com_os_pacientes(
+        self, client, db_session, instrucoes_sql, auth_headers_admin, plano_unimed, medico_cardiologista
+    ):
+        self.cadastrar(db_session, 3, plano_unimed)
+        _, poucos = self.consultar(client, instrucoes_sql, auth_headers_admin)
+        
+        pacientes = self.cadastrar(db_session, 60, plano_unimed, inicio=3)
+        inicio = datetime.combine(date.today() + timedelta(days=1), time(8))
+        db_session.add_all([
+            Consulta(
+                data_hora_inicio=inicio + timedelta(minutes=30 * i), status=status_consulta,
+                id_paciente_fk=paciente.id_paciente, id_medico_fk=medico_cardiologista.id_medico
+            )
+            for i, (paciente, status_consulta) in enumerate(
+                zip(pacientes, ["realizada", "agendada", "cancelada"] * 20)
+            )
+        ])
+        db_session.commit()
+        response, muitos = self.consultar(client, instrucoes_sql, auth_headers_admin)
+        
+        assert poucos == muitos
+        assert len(response.json()) == 63
+        por_nome = {p["nome"]: p for p in response.json()}
+        assert (por_nome["Paciente 003"]["total_consultas"], por_nome["Paciente 003"]["consultas_agendadas"]) == (1, 0)
+        assert (por_nome["Paciente 004"]["total_consultas"], por_nome["Paciente 004"]["consultas_agendadas"]) == (0, 1)
+        assert (por_nome["Paciente 005"]["total_consultas"], por_nome["Paciente 005"]["consultas_agendadas"]) == (0, 0)
+        assert por_nome["Paciente 000"]["plano_saude"]["nome"] == "Unimed"
+    
+    def test_filtros_e_paginas(
+        self, client, db_session, instrucoes_sql, auth_headers_admin, plano_unimed, plano_sulamerica
+    ):
+        self.cadastrar(db_session, 10, plano_unimed)
+        self.cadastrar(db_session, 5, plano_sulamerica, inicio=10, prefixo="Outro_nome")
+        self.cadastrar(db_session, 2, inicio=20, prefixo="Outro nome")
+        
+        response, _ = self.consultar(client, instrucoes_sql, auth_headers_admin, limite=4)
+        assert response.headers["X-Total-Count"] == "17"
+        response, _ = self.consultar(
+            client, instrucoes_sql, auth_headers_admin, limite=4, cursor=response.headers["X-Proximo-Cursor"]
+        )
+        assert "X-Total-Count" not in response.headers
+        assert [p["nome"] for p in response.json()] == [
+            "Outro_nome 012", "Outro_nome 013", "Outro_nome 014", "Paciente 000"
+        ]
+        
+        response, _ = self.consultar(
+            client, instrucoes_sql, auth_headers_admin, id_plano_saude=plano_unimed.id_plano_saude, bloqueado=True
+        )
+        assert [p["nome"] for p in response.json()] == ["Paciente 000", "Paciente 003", "Paciente 006", "Paciente 009"]
+        
+        # "_" é literal, não curinga
+        response, _ = self.consultar(client, instrucoes_sql, auth_headers_admin, nome="outro_")
+        assert response.headers["X-Total-Count"] == "5"
+        assert {p["id_plano_saude_fk"] for p in response.json()} == {plano_sulamerica.id_plano_saude}
+        
\ No newline at end of file
@@ -0,0 +1,358 @@
+"""
+Testes das estatísticas administrativas (dashboard agregado, estatisticas_diarias,
+médicos, planos de saúde e cache TTL)
+Performance: ~5 segundos total
+"""
+import threading
+import pytest
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import insert, update
+
+from app.database import Base
+from app.models.models import BloqueioHorario, Consulta, EstatisticaDiaria, Medico, Paciente
+from app.services.estatisticas import RegraEstatisticas, obter_cache_dashboard
+from app.utils import cache_ttl
+from app.utils.cache_ttl import CacheTTL
+from app.utils.periodo import filtro_dia, filtro_mes, filtro_periodo
+
+
+@pytest.fixture(scope="function")
+def consultas_variadas(db_session, medico_cardiologista, paciente_teste):
+    """Consultas de hoje, da semana, do mês, de outros meses e em vários status"""
+    hoje = date.today()
+    dias = [
+        hoje, hoje, hoje - timedelta(days=hoje.weekday()), hoje + timedelta(days=1),
+        hoje.replace(day=1), hoje - timedelta(days=40), hoje + timedelta(days=45),
+    ]
+    status = ["agendada", "realizada", "cancelada", "faltou", "confirmada"]
+    db_session.add_all([
+        Consulta(
+            data_hora_inicio=datetime.combine(dia, time(9)) + timedelta(minutes=30 * i),
+            data_hora_fim=datetime.combine(dia, time(9)) + timedelta(minutes=30 * i + 30),
+            status=status[i % len(status)],
+            id_paciente_fk=paciente_teste.id_paciente,
+            id_medico_fk=medico_cardiologista.id_medico
+        )
+        for i, dia in enumerate(dias)
+    ])
+    db_session.commit()
+    return hoje
+
+
+def dashboard_por_contagens(db_session, hoje):
+    """Dashboard calculado como antes: um COUNT(*) por número"""
+    consultas = db_session.query(Consulta)
+    inicio = Consulta.data_hora_inicio
+    return {
+        "total_pacientes": db_session.query(Paciente).count(),
+        "total_medicos": db_session.query(Medico).count(),
+        "pacientes_bloqueados": db_session.query(Paciente).filter(Paciente.esta_bloqueado.is_(True)).count(),
+        "total_consultas": consultas.count(),
+        "consultas_hoje": consultas.filter(*filtro_dia(inicio, hoje)).count(),
+        "consultas_semana": consultas.filter(
+            *filtro_periodo(inicio, hoje - timedelta(days=hoje.weekday()), hoje)
+        ).count(),
+        "consultas_mes": consultas.filter(*filtro_mes(inicio, hoje)).count(),
+        "consultas_agendadas": consultas.filter(Consulta.status == "agendada").count(),
+        "consultas_realizadas": consultas.filter(Consulta.status == "realizada").count(),
+        "consultas_canceladas": consultas.filter(Consulta.status == "cancelada").count(),
+    }
+
+
+@pytest.mark.integration
+class TestDashboardAgregado:
+    """Dashboard em uma instrução, servido pelo cache"""
+
+    def test_uma_instrucao_com_os_mesmos_numeros(self, db_session, instrucoes_sql, consultas_variadas, paciente_teste):
+        hoje = consultas_variadas
+        paciente_teste.esta_bloqueado = True
+        db_session.commit()
+        with instrucoes_sql() as instrucoes:
+            dashboard = RegraEstatisticas.calcular_dashboard(db_session, hoje)
+
+        assert len(instrucoes) == 1
+        assert "FILTER (WHERE" in instrucoes[0]
+        assert dashboard == dashboard_por_contagens(db_session, hoje)
+        assert dashboard["total_consultas"] == 7
+        assert dashboard["pacientes_bloqueados"] == 1
+
+    def test_endpoint_consulta_o_banco_uma_vez_dentro_da_validade(
+        self, client, db_session, instrucoes_sql, auth_headers_admin, consultas_variadas,
+        medico_cardiologista, paciente_teste
+    ):
+        with instrucoes_sql() as instrucoes:
+            respostas = [client.get("/admin/dashboard", headers=auth_headers_admin) for _ in range(3)]
+
+        assert len(instrucoes) == 1
+        assert all(r.status_code == 200 and r.json() == respostas[0].json() for r in respostas)
+
+        db_session.add(Consulta(
+            data_hora_inicio=datetime.combine(consultas_variadas, time(16)), status="agendada",
+            id_paciente_fk=paciente_teste.id_paciente, id_medico_fk=medico_cardiologista.id_medico
+        ))
+        db_session.commit()
+        assert client.get("/admin/dashboard", headers=auth_headers_admin).json() == respostas[0].json()
+
+        obter_cache_dashboard().limpar()
+        atualizado = client.get("/admin/dashboard", headers=auth_headers_admin).json()
+        assert atualizado["consultas_hoje"] == respostas[0].json()["consultas_hoje"] + 1
+
+
+@pytest.mark.integration
+class TestEstatisticasDiarias:
+    """estatisticas_diarias mantida pelos gatilhos em consulta"""
+
+    @staticmethod
+    def totais(db_session, medico):
+        linhas = db_session.query(EstatisticaDiaria.dia, EstatisticaDiaria.status, EstatisticaDiaria.total).filter(
+            EstatisticaDiaria.id_medico_fk == medico.id_medico, EstatisticaDiaria.total != 0
+        )
+        return {(dia, status_consulta): total for dia, status_consulta, total in linhas}
+
+    def test_acompanha_inclusao_status_remarcacao_e_exclusao(
+        self, client, db_session, medico_cardiologista, medico_ortopedista, paciente_teste
+    ):
+        amanha = datetime.combine(date.today() + timedelta(days=1), time(10))
+        depois = amanha + timedelta(days=1)
+        consulta = Consulta(
+            data_hora_inicio=amanha, status="agendada",
+            id_paciente_fk=paciente_teste.id_paciente, id_medico_fk=medico_cardiologista.id_medico
+        )
+        db_session.add(consulta)
+        db_session.commit()
+        # INSERT em lote (core), como no agendamento pela recepção
+        db_session.execute(insert(Consulta), [
+            {"data_hora_inicio": amanha + timedelta(hours=h), "status": "agendada",
+             "id_paciente_fk": paciente_teste.id_paciente, "id_medico_fk": medico_cardiologista.id_medico}
+            for h in (1, 2)
+        ])
+        db_session.commit()
+        assert self.totais(db_session, medico_cardiologista) == {(amanha.date(), "agendada"): 3}
+
+        response = client.put(
+            f"/medicos/consultas/{consulta.id_consulta}/status",
+            params={"medico_id": medico_cardiologista.id_medico, "novo_status": "confirmada"}
+        )
+        assert response.status_code == 200
+        assert self.totais(db_session, medico_cardiologista) == {
+            (amanha.date(), "agendada"): 2, (amanha.date(), "confirmada"): 1
+        }
+
+        # Remarcação para outro dia e troca de médico; mesmo dia não altera
+        db_session.execute(
+            update(Consulta).where(Consulta.id_consulta == consulta.id_consulta)
+            .values(data_hora_inicio=depois)
+        )
+        db_session.execute(
+            update(Consulta).where(Consulta.data_hora_inicio == amanha + timedelta(hours=1))
+            .values(id_medico_fk=medico_ortopedista.id_medico)
+        )
+        db_session.execute(
+            update(Consulta).where(Consulta.data_hora_inicio == amanha + timedelta(hours=2))
+            .values(data_hora_inicio=amanha + timedelta(hours=3))
+        )
+        db_session.commit()
+        assert self.totais(db_session, medico_cardiologista) == {
+            (amanha.date(), "agendada"): 1, (depois.date(), "confirmada"): 1
+        }
+        assert self.totais(db_session, medico_ortopedista) == {(amanha.date(), "agendada"): 1}
+
+        db_session.query(Consulta).filter(Consulta.id_medico_fk == medico_cardiologista.id_medico).delete()
+        db_session.commit()
+        assert self.totais(db_session, medico_cardiologista) == {}
+        assert RegraEstatisticas.divergencias_diarias(db_session) == []
+
+    def test_reconciliacao_detecta_e_corrige_divergencia(self, db_session, consultas_variadas, medico_cardiologista):
+        assert RegraEstatisticas.divergencias_diarias(db_session) == []
+
+        db_session.execute(
+            update(EstatisticaDiaria).where(EstatisticaDiaria.status == "agendada")
+            .values(total=EstatisticaDiaria.total + 5)
+        )
+        db_session.execute(EstatisticaDiaria.__table__.delete().where(EstatisticaDiaria.status == "faltou"))
+        divergencias = RegraEstatisticas.divergencias_diarias(db_session)
+        assert sorted((d["status"], d["esperado"], d["registrado"]) for d in divergencias) == [
+            ("agendada", 1, 6), ("agendada", 1, 6), ("faltou", 1, 0)
+        ]
+
+        linhas = RegraEstatisticas.reconstruir_diarias(db_session)
+        assert linhas == db_session.query(EstatisticaDiaria).count()
+        assert RegraEstatisticas.divergencias_diarias(db_session) == []
+
+    def test_tabela_criada_depois_das_consultas_ja_vem_carregada(self, db_session, consultas_variadas):
+        """create_all num banco sem estatisticas_diarias (sem a migração 010) não começa do zero"""
+        tabela = EstatisticaDiaria.__table__
+        esperado = db_session.query(EstatisticaDiaria).filter(EstatisticaDiaria.total != 0).count()
+        conexao = db_session.connection()
+        tabela.drop(conexao)
+
+        Base.metadata.create_all(conexao)
+
+        assert db_session.query(EstatisticaDiaria).count() == esperado > 0
+        assert RegraEstatisticas.divergencias_diarias(db_session) == []
+
+    def test_paineis_leem_a_tabela_diaria(
+        self, client, db_session, auth_headers_admin, consultas_variadas, medico_cardiologista
+    ):
+        """Estatísticas gerais e do médico batem com a contagem direta"""
+        gerais = client.get("/admin/relatorios/estatisticas-gerais", headers=auth_headers_admin).json()
+        consultas = db_session.query(Consulta)
+        assert gerais["total_consultas"] == consultas.count()
+        assert gerais["agendadas"] == consultas.filter(Consulta.status == "agendada").count()
+        assert gerais["canceladas"] == consultas.filter(Consulta.status == "cancelada").count()
+        assert gerais["especialidades_top"] == [{"nome": "Cardiologia", "total": consultas.count()}]
+
+        hoje = consultas_variadas
+        inicio_semana = hoje - timedelta(days=hoje.weekday())
+        do_medico = client.get(f"/medicos/estatisticas/{medico_cardiologista.id_medico}").json()
+        ativas = consultas.filter(Consulta.status.in_(["agendada", "realizada"]))
+        assert do_medico["consultas_hoje"] == ativas.filter(*filtro_dia(Consulta.data_hora_inicio, hoje)).count()
+        assert do_medico["consultas_semana"] == ativas.filter(*filtro_periodo(
+            Consulta.data_hora_inicio, inicio_semana, inicio_semana + timedelta(days=6)
+        )).count()
+
+
+@pytest.mark.integration
+class TestEstatisticasMedicos:
+    """Estatísticas de todos os médicos em uma instrução"""
+
+    def test_mesmos_numeros_do_endpoint_por_medico(
+        self, client, db_session, instrucoes_sql, auth_headers_admin, consultas_variadas,
+        medico_cardiologista, medico_ortopedista
+    ):
+        hoje = consultas_variadas
+        db_session.add_all([
+            BloqueioHorario(data=hoje + timedelta(days=d), hora_inicio=time(8), hora_fim=time(9),
+                            id_medico_fk=medico_ortopedista.id_medico)
+            for d in (-1, 0, 3)
+        ])
+        db_session.commit()
+
+        with instrucoes_sql() as instrucoes:
+            todos = RegraEstatisticas.estatisticas_medicos(db_session, hoje)
+        assert len(instrucoes) == 1
+        assert [e["id_medico"] for e in todos] == sorted([medico_cardiologista.id_medico, medico_ortopedista.id_medico])
+
+        response = client.get("/admin/medicos/estatisticas", headers=auth_headers_admin)
+        assert response.status_code == 200
+        assert response.json() == todos
+        for estatisticas in todos:
+            individual = client.get(f"/medicos/estatisticas/{estatisticas['id_medico']}").json()
+            assert individual == estatisticas
+        por_medico = {e["id_medico"]: e for e in todos}
+        assert por_medico[medico_ortopedista.id_medico] == {
+            "id_medico": medico_ortopedista.id_medico,
+            "consultas_hoje": 0, "consultas_semana": 0, "horarios_bloqueados": 2
+        }
+        assert por_medico[medico_cardiologista.id_medico]["consultas_hoje"] == 2
+
+    def test_filtros(self, client, auth_headers_admin, medico_cardiologista, medico_ortopedista):
+        response = client.get(
+            "/admin/medicos/estatisticas", headers=auth_headers_admin,
+            params={"id_especialidade": medico_ortopedista.id_especialidade_fk}
+        )
+        assert [e["id_medico"] for e in response.json()] == [medico_ortopedista.id_medico]
+
+        response = client.get(
+            "/admin/medicos/estatisticas", headers=auth_headers_admin,
+            params={"id_medico": [medico_cardiologista.id_medico, 9999]}
+        )
+        assert [e["id_medico"] for e in response.json()] == [medico_cardiologista.id_medico]
+
+        assert client.get("/medicos/estatisticas/9999").status_code == 404
+
+
+@pytest.mark.integration
+class TestEstatisticasPlanos:
+    """Estatísticas por plano de saúde em uma instrução"""
+
+    @pytest.fixture
+    def consultas_por_plano(self, db_session, medico_cardiologista, paciente_teste, paciente_sem_plano):
+        """Consultas do paciente Unimed (duas no mês, uma no mês anterior) e uma do particular"""
+        hoje = date(2026, 3, 15)
+        dias = [(paciente_teste, hoje), (paciente_teste, date(2026, 3, 31)),
+                (paciente_teste, date(2026, 2, 27)), (paciente_sem_plano, hoje)]
+        db_session.add_all([
+            Consulta(
+                data_hora_inicio=datetime.combine(dia, time(9 + i)), status="agendada",
+                id_paciente_fk=paciente.id_paciente, id_medico_fk=medico_cardiologista.id_medico
+            )
+            for i, (paciente, dia) in enumerate(dias)
+        ])
+        db_session.commit()
+        return hoje
+
+    def test_uma_instrucao_com_planos_sem_pacientes(
+        self, db_session, instrucoes_sql, consultas_por_plano, plano_unimed, plano_sulamerica
+    ):
+        with instrucoes_sql() as instrucoes:
+            planos = RegraEstatisticas.estatisticas_planos(db_session, hoje=consultas_por_plano)
+
+        assert len(instrucoes) == 1
+        assert [(p["nome"], p["qtd_pacientes"], p["percentual_pacientes"], p["consultas_mes"]) for p in planos] == [
+            ("Unimed", 1, 50.0, 2), ("SulAmérica", 0, 0.0, 0)
+        ]
+
+    def test_periodo_informado(self, client, auth_headers_admin, consultas_por_plano, plano_unimed):
+        response = client.get(
+            "/admin/planos-saude/estatisticas", headers=auth_headers_admin,
+            params={"data_inicio": "2026-02-01", "data_fim": "2026-03-15"}
+        )
+        assert response.status_code == 200
+        assert [(p["nome"], p["consultas_mes"]) for p in response.json()] == [("Unimed", 2)]
+
+        response = client.get(
+            "/admin/planos-saude/estatisticas", headers=auth_headers_admin, params={"data_inicio": "2026-03-16"}
+        )
+        assert [(p["nome"], p["consultas_mes"]) for p in response.json()] == [("Unimed", 1)]
+
+
+@pytest.mark.unit
+class TestCacheTTL:
+    """Validade curta e carga única por chave"""
+
+    def test_requisicoes_simultaneas_fazem_uma_carga(self):
+        cache = CacheTTL("teste", segundos=60)
+        liberar = threading.Event()
+        cargas, resultados = [], []
+
+        def carregar():
+            cargas.append(1)
+            liberar.wait(5)
+            return {"total": 42}
+
+        threads = [
+            threading.Thread(target=lambda: resultados.append(cache.obter("painel", carregar)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        liberar.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert len(cargas) == 1
+        assert resultados == [{"total": 42}] * 8
+
+    def test_valor_vence_apos_a_validade(self, monkeypatch):
+        agora = [1000.0]
+        monkeypatch.setattr(cache_ttl.time, "monotonic", lambda: agora[0])
+        cache = CacheTTL("teste", segundos=5)
+        valores = iter([1, 2])
+
+        assert cache.obter("painel", lambda: next(valores)) == 1
+        agora[0] += 4.9
+        assert cache.obter("painel", lambda: next(valores)) == 1
+        agora[0] += 0.2
+        assert cache.obter("painel", lambda: next(valores)) == 2
+
+    def test_falha_na_carga_nao_fica_em_cache(self):
+        cache = CacheTTL("teste", segundos=60)
+
+        def falhar():
+            raise RuntimeError("banco indisponível")
+
+        with pytest.raises(RuntimeError):
+            cache.obter("painel", falhar)
+        assert cache.obter("painel", lambda: 7) == 7
+        assert len(cache) == 1
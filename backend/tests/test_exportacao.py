@@ -0,0 +1,99 @@
+"""
+Testes das exportações em fluxo (NDJSON/CSV)
+Performance: ~4 segundos total
+"""
+import csv
+import io
+import json
+import pytest
+from datetime import date, datetime, time, timedelta
+
+from app.models.models import Consulta
+from app.services.exportacao import RegraExportacao
+
+
+@pytest.fixture(scope="function")
+def consultas_exportadas(db_session, medico_cardiologista, medico_ortopedista, paciente_teste):
+    """Cinco consultas alternando médico e status"""
+    inicio = datetime.combine(date.today() + timedelta(days=2), time(9))
+    consultas = [
+        Consulta(
+            data_hora_inicio=inicio + timedelta(hours=i), data_hora_fim=inicio + timedelta(hours=i, minutes=30),
+            status=["agendada", "realizada"][i % 2], id_paciente_fk=paciente_teste.id_paciente,
+            id_medico_fk=(medico_cardiologista, medico_ortopedista)[i % 2].id_medico
+        )
+        for i in range(5)
+    ]
+    db_session.add_all(consultas)
+    db_session.commit()
+    return consultas
+
+
+@pytest.mark.integration
+class TestExportacao:
+    """Exportações de consultas, pacientes e médicos"""
+
+    def test_consultas_ndjson(self, client, auth_headers_admin, consultas_exportadas, medico_ortopedista):
+        response = client.get("/admin/exportar/consultas", headers=auth_headers_admin)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        linhas = [json.loads(linha) for linha in response.text.splitlines()]
+        assert [l["id_consulta"] for l in linhas] == [c.id_consulta for c in consultas_exportadas]
+        assert linhas[1]["medico"] == medico_ortopedista.nome
+        assert linhas[1]["especialidade"] == "Ortopedia"
+        assert linhas[0]["paciente"] == "Carlos Teste"
+        assert linhas[0]["data_hora_inicio"] == consultas_exportadas[0].data_hora_inicio.isoformat()
+
+    def test_consultas_csv_filtradas(self, client, auth_headers_admin, consultas_exportadas):
+        response = client.get(
+            "/admin/exportar/consultas", headers=auth_headers_admin, params={"formato": "csv", "status": "realizada"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.headers["content-disposition"] == "attachment; filename=consultas.csv"
+        linhas = list(csv.DictReader(io.StringIO(response.text)))
+        assert [int(l["id_consulta"]) for l in linhas] == [
+            c.id_consulta for c in consultas_exportadas if c.status == "realizada"
+        ]
+
+    def test_pacientes_e_medicos_sem_senha(
+        self, client, auth_headers_admin, paciente_teste, paciente_sem_plano, medico_cardiologista
+    ):
+        pacientes = client.get("/admin/exportar/pacientes", headers=auth_headers_admin, params={"formato": "csv"})
+        linhas = list(csv.DictReader(io.StringIO(pacientes.text)))
+        assert [(l["nome"], l["plano_saude"]) for l in linhas] == [("Carlos Teste", "Unimed"), ("Ana Particular", "")]
+        assert "senha_hash" not in pacientes.text.splitlines()[0]
+
+        medicos = client.get("/admin/exportar/medicos", headers=auth_headers_admin)
+        linhas = [json.loads(linha) for linha in medicos.text.splitlines()]
+        assert linhas == [{
+            "id_medico": medico_cardiologista.id_medico, "nome": medico_cardiologista.nome,
+            "crm": medico_cardiologista.crm, "cpf": medico_cardiologista.cpf, "email": medico_cardiologista.email,
+            "telefone": medico_cardiologista.telefone, "id_especialidade": medico_cardiologista.id_especialidade_fk,
+            "especialidade": "Cardiologia",
+        }]
+
+    def test_csv_vazio_tem_cabecalho(self, client, auth_headers_admin):
+        response = client.get("/admin/exportar/medicos", headers=auth_headers_admin, params={"formato": "csv"})
+        assert response.text.strip() == "id_medico,nome,crm,cpf,email,telefone,id_especialidade,especialidade"
+
+    def test_formato_invalido_e_acesso(self, client, auth_headers_admin, auth_headers_paciente):
+        assert client.get(
+            "/admin/exportar/consultas", headers=auth_headers_admin, params={"formato": "xml"}
+        ).status_code == 422
+        assert client.get("/admin/exportar/consultas", headers=auth_headers_paciente).status_code == 403
+
+
+@pytest.mark.performance
+class TestExportacaoEmLotes:
+    """Um pedaço da resposta por lote lido do cursor"""
+
+    @pytest.mark.parametrize("formato", ["ndjson", "csv"])
+    def test_um_pedaco_por_lote(self, db_session, consultas_exportadas, formato):
+        pedacos = list(RegraExportacao.gerar(db_session, RegraExportacao.consultas(), formato, lote=2))
+
+        assert len(pedacos) == 3
+        linhas = "".join(pedacos).splitlines()
+        assert len(linhas) == 5 + (formato == "csv")
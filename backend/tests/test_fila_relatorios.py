@@ -0,0 +1,295 @@
+"""
+Testes da geração de relatórios em segundo plano (tabela relatorio)
+Performance: ~5 segundos total
+"""
+import threading
+import pytest
+from datetime import date, datetime, time, timedelta
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models.models import Consulta, Relatorio
+from app.services import fila_relatorios
+from app.services.fila_relatorios import FilaRelatorios
+
+
+@pytest.fixture(autouse=True)
+def diretorio_relatorios(monkeypatch, tmp_path):
+    """Arquivos gerados pelas tarefas num diretório temporário"""
+    monkeypatch.setattr(settings, "RELATORIOS_DIRETORIO", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture(scope="function")
+def fabrica_sessao(db_session):
+    """Sessões das tarefas na mesma conexão (e transação) do teste; o rollback de uma tarefa volta só ao savepoint"""
+    return sessionmaker(bind=db_session.bind, autoflush=False, join_transaction_mode="create_savepoint")
+
+
+@pytest.fixture(scope="function")
+def fila_na_thread(monkeypatch, fabrica_sessao):
+    """Fila que executa a tarefa na própria thread do pedido"""
+    fila = FilaRelatorios(trabalhadores=0, fila_maxima=4, fabrica_sessao=fabrica_sessao)
+    monkeypatch.setattr(fila_relatorios, "_fila", fila)
+    return fila
+
+
+@pytest.fixture(scope="function")
+def fila_bloqueada(monkeypatch, fabrica_sessao):
+    """Um trabalhador (thread, para ver o banco do teste) que só começa cada tarefa quando o evento é liberado"""
+    liberar = threading.Event()
+    gerar = fila_relatorios.gerar_relatorio
+
+    def gerar_quando_liberado(fabrica, id_relatorio):
+        assert liberar.wait(10)
+        return gerar(fabrica, id_relatorio)
+
+    monkeypatch.setattr(fila_relatorios, "gerar_relatorio", gerar_quando_liberado)
+    fila = FilaRelatorios(trabalhadores=1, fila_maxima=4, fabrica_sessao=fabrica_sessao, em_processos=False)
+    monkeypatch.setattr(fila_relatorios, "_fila", fila)
+    yield fila, liberar
+    liberar.set()
+    fila.encerrar()
+
+
+@pytest.fixture(scope="function")
+def consultas_do_mes(db_session, medico_cardiologista, paciente_teste):
+    inicio = datetime.combine(date.today() - timedelta(days=3), time(9))
+    db_session.add_all([
+        Consulta(
+            data_hora_inicio=inicio + timedelta(hours=i), status=["realizada", "cancelada"][i % 2],
+            id_medico_fk=medico_cardiologista.id_medico, id_paciente_fk=paciente_teste.id_paciente
+        )
+        for i in range(3)
+    ])
+    db_session.commit()
+
+
+@pytest.mark.integration
+class TestRelatoriosEmSegundoPlano:
+    """Pedido, acompanhamento e download"""
+
+    def test_pdf_concluido_e_baixado(
+        self, client, db_session, auth_headers_admin, fila_na_thread, consultas_do_mes, diretorio_relatorios, monkeypatch
+    ):
+        from app.utils.relatorios import RENDERIZADORES
+
+        renderizar_json = RENDERIZADORES["json"].renderizar
+        renderizacoes_json = []
+        monkeypatch.setattr(
+            RENDERIZADORES["json"], "renderizar",
+            lambda tabela: (renderizacoes_json.append(1), renderizar_json(tabela))[1]
+        )
+        response = client.post(
+            "/admin/relatorios/tarefas", headers=auth_headers_admin,
+            json={"tipo": "consultas-por-medico", "formato": "pdf", "data_inicio": str(date.today() - timedelta(days=30)),
+                  "especialidade_id": 1}
+        )
+
+        assert response.status_code == 202
+        tarefa = response.json()
+        assert tarefa["status"] == "concluido"
+        # Filtro que o relatório não usa não é gravado
+        assert tarefa["parametros"] == {"data_inicio": str(date.today() - timedelta(days=30))}
+        # Só o formato pedido é gerado e guardado
+        assert renderizacoes_json == []
+        assert [caminho.name for caminho in diretorio_relatorios.iterdir()] == [f"{tarefa['id_relatorio']}.pdf"]
+        assert db_session.get(Relatorio, tarefa["id_relatorio"]).dados_resultado is None
+
+        arquivo = client.get(f"/admin/relatorios/tarefas/{tarefa['id_relatorio']}/arquivo", headers=auth_headers_admin)
+        assert arquivo.status_code == 200
+        assert arquivo.headers["content-type"] == "application/pdf"
+        assert arquivo.headers["content-disposition"] == (
+            f"inline; filename=relatorio_consultas_medico_{tarefa['id_relatorio']}.pdf"
+        )
+        assert arquivo.content.startswith(b"%PDF")
+
+        dados = client.get(f"/admin/relatorios/tarefas/{tarefa['id_relatorio']}/dados", headers=auth_headers_admin)
+        assert dados.json()[0]["total_consultas"] == 3
+
+    def test_pdf_em_fluxo_ate_o_disco(
+        self, client, auth_headers_admin, fila_na_thread, diretorio_relatorios, monkeypatch
+    ):
+        """As linhas não são lidas todas antes da primeira página, e o arquivo vai para o disco"""
+        from app.services.relatorios import RELATORIOS
+        from app.utils import relatorios
+
+        canvas = relatorios._canvas_comprimido()
+        mostrar_pagina = canvas.showPage
+        lidas, lidas_por_pagina = [], []
+        monkeypatch.setattr(canvas, "showPage", lambda self: (lidas_por_pagina.append(len(lidas)), mostrar_pagina(self)))
+
+        def consultar(db, data_inicio=None, data_fim=None, limite=10):
+            for posicao in range(1, limite + 1):
+                lidas.append(posicao)
+                yield {"posicao": posicao, "paciente_nome": f"Paciente {posicao}", "cpf": "000.000.000-00",
+                       "total_consultas": 1, "ultima_consulta": "01/01/2026"}
+
+        monkeypatch.setattr(RELATORIOS["pacientes-frequentes"], "consultar", consultar)
+
+        tarefa = client.post(
+            "/admin/relatorios/tarefas", headers=auth_headers_admin,
+            json={"tipo": "pacientes-frequentes", "formato": "pdf", "limite": 2000}
+        ).json()
+
+        assert tarefa["status"] == "concluido"
+        # Linhas lidas quando a primeira página foi fechada: só as dela
+        assert len(lidas_por_pagina) > 1 and lidas_por_pagina[0] < 100
+        caminho = diretorio_relatorios / f"{tarefa['id_relatorio']}.pdf"
+        arquivo = client.get(f"/admin/relatorios/tarefas/{tarefa['id_relatorio']}/arquivo", headers=auth_headers_admin)
+        assert arquivo.content == caminho.read_bytes()
+        assert arquivo.headers["content-length"] == str(caminho.stat().st_size)
+
+        caminho.unlink()
+        arquivo = client.get(f"/admin/relatorios/tarefas/{tarefa['id_relatorio']}/arquivo", headers=auth_headers_admin)
+        assert arquivo.status_code == 410
+
+    def test_pdf_sincrono_vira_tarefa(self, client, auth_headers_admin, fila_na_thread, consultas_do_mes):
+        """?formato=pdf nos relatórios síncronos não renderiza na thread da requisição"""
+        response = client.get(
+            "/admin/relatorios/consultas-por-especialidade", headers=auth_headers_admin,
+            params={"formato": "pdf", "data_inicio": str(date.today() - timedelta(days=30))}
+        )
+
+        assert response.status_code == 202
+        tarefa = response.json()
+        assert (tarefa["tipo"], tarefa["formato"], tarefa["status"]) == ("consultas-por-especialidade", "pdf", "concluido")
+        assert tarefa["parametros"] == {"data_inicio": str(date.today() - timedelta(days=30))}
+        assert response.headers["location"] == f"/admin/relatorios/tarefas/{tarefa['id_relatorio']}"
+        arquivo = client.get(f"{response.headers['location']}/arquivo", headers=auth_headers_admin)
+        assert arquivo.headers["content-type"] == "application/pdf"
+        assert arquivo.content.startswith(b"%PDF")
+
+    def test_resumo_em_json(self, client, auth_headers_admin, fila_na_thread, consultas_do_mes):
+        tarefa = client.post(
+            "/admin/relatorios/tarefas", headers=auth_headers_admin, json={"tipo": "cancelamentos", "formato": "json"}
+        ).json()
+
+        arquivo = client.get(f"/admin/relatorios/tarefas/{tarefa['id_relatorio']}/arquivo", headers=auth_headers_admin)
+        assert arquivo.json() == {"total_consultas": 3, "total_cancelamentos": 1, "taxa_cancelamento": 33.33}
+        dados = client.get(f"/admin/relatorios/tarefas/{tarefa['id_relatorio']}/dados", headers=auth_headers_admin)
+        assert dados.content == arquivo.content
+
+    def test_falha_registrada(self, client, auth_headers_admin, fila_na_thread, monkeypatch):
+        def falhar(*args, **kwargs):
+            raise RuntimeError("banco indisponível")
+        monkeypatch.setattr(fila_relatorios.RegraRelatorios, "tabela", falhar)
+
+        tarefa = client.post(
+            "/admin/relatorios/tarefas", headers=auth_headers_admin, json={"tipo": "cancelamentos"}
+        ).json()
+
+        assert tarefa["status"] == "erro"
+        assert tarefa["mensagem_erro"] == "RuntimeError: banco indisponível"
+        arquivo = client.get(f"/admin/relatorios/tarefas/{tarefa['id_relatorio']}/arquivo", headers=auth_headers_admin)
+        assert arquivo.status_code == 409
+        assert arquivo.json()["detail"] == "A geração do relatório falhou"
+
+    def test_pedido_nao_espera_a_geracao(self, client, db_session, auth_headers_admin, fila_bloqueada):
+        fila, liberar = fila_bloqueada
+
+        tarefa = client.post(
+            "/admin/relatorios/tarefas", headers=auth_headers_admin, json={"tipo": "consultas-por-especialidade"}
+        ).json()
+        assert tarefa["status"] == "pendente"
+        url = f"/admin/relatorios/tarefas/{tarefa['id_relatorio']}"
+        assert client.get(f"{url}/arquivo", headers=auth_headers_admin).json()["detail"] == "Relatório ainda em geração"
+
+        liberar.set()
+        fila._executor.shutdown(wait=True)
+        db_session.expire_all()
+        assert client.get(url, headers=auth_headers_admin).json()["status"] == "concluido"
+        assert client.get(f"{url}/arquivo", headers=auth_headers_admin).content.startswith(b"%PDF")
+
+    def test_fila_cheia(self, client, db_session, auth_headers_admin, fila_bloqueada):
+        fila, _ = fila_bloqueada
+        while fila._vagas.acquire(blocking=False):
+            pass
+
+        response = client.post("/admin/relatorios/tarefas", headers=auth_headers_admin, json={"tipo": "cancelamentos"})
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "5"
+        assert db_session.query(Relatorio.status, Relatorio.mensagem_erro).one() == ("erro", "Fila de relatórios cheia")
+
+    def test_listagem_e_validacao(self, client, auth_headers_admin, auth_headers_paciente, fila_na_thread):
+        ids = [
+            client.post("/admin/relatorios/tarefas", headers=auth_headers_admin, json={"tipo": tipo}).json()["id_relatorio"]
+            for tipo in ("cancelamentos", "pacientes-frequentes")
+        ]
+
+        listagem = client.get("/admin/relatorios/tarefas", headers=auth_headers_admin)
+        assert [r["id_relatorio"] for r in listagem.json()] == ids[::-1]
+        assert client.get("/admin/relatorios/tarefas/999999", headers=auth_headers_admin).status_code == 404
+        assert client.post(
+            "/admin/relatorios/tarefas", headers=auth_headers_admin, json={"tipo": "inexistente"}
+        ).status_code == 422
+        assert client.get("/admin/relatorios/tarefas", headers=auth_headers_paciente).status_code == 403
+
+
+@pytest.mark.unit
+class TestFilaRelatorios:
+    """Encerramento da fila"""
+
+    def test_encerrar_marca_tarefas_nao_iniciadas(self, db_session, admin_user, fila_bloqueada):
+        fila, liberar = fila_bloqueada
+        relatorios = [
+            Relatorio(tipo="cancelamentos", formato="csv", status="pendente", id_admin_fk=admin_user.id_admin)
+            for _ in range(2)
+        ]
+        db_session.add_all(relatorios)
+        db_session.commit()
+        for relatorio in relatorios:
+            fila.enviar(relatorio.id_relatorio)
+
+        executor = fila._executor
+        fila.encerrar()
+        liberar.set()
+        executor.shutdown(wait=True)
+
+        db_session.expire_all()
+        assert [(r.status, r.mensagem_erro) for r in relatorios] == [
+            ("concluido", None), ("erro", "Geração interrompida")
+        ]
+        with open(fila_relatorios.caminho_arquivo(relatorios[0].caminho_arquivo), encoding="utf-8") as arquivo:
+            assert arquivo.read().startswith("Métrica,Valor")
+
+    def test_processo_morto_marca_erro(self, db_session, admin_user, fabrica_sessao):
+        """Tarefa perdida com o processo do pool não fica processando; o pool quebrado é descartado"""
+        from concurrent.futures import Future, ThreadPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+
+        relatorio = Relatorio(tipo="cancelamentos", formato="pdf", status="processando", id_admin_fk=admin_user.id_admin)
+        db_session.add(relatorio)
+        db_session.commit()
+        fila = FilaRelatorios(trabalhadores=1, fila_maxima=0, fabrica_sessao=fabrica_sessao)
+        executor = fila._executor = ThreadPoolExecutor(max_workers=1)
+        assert fila._vagas.acquire(blocking=False)
+        futuro = Future()
+        futuro.set_exception(BrokenProcessPool("processo encerrado"))
+
+        fila._concluir(relatorio.id_relatorio, 0.0, executor, futuro)
+
+        db_session.expire_all()
+        assert (relatorio.status, relatorio.mensagem_erro) == ("erro", "Geração interrompida (BrokenProcessPool)")
+        assert fila._executor is None
+        assert fila._vagas.acquire(blocking=False)
+
+    def test_recuperar_interrompidos_na_inicializacao(self, db_session, admin_user, fabrica_sessao):
+        """Só as tarefas pendentes/processando mais antigas que o prazo passam a erro"""
+        antigo, recente = datetime.utcnow() - timedelta(hours=2), datetime.utcnow() - timedelta(minutes=1)
+        relatorios = [
+            Relatorio(tipo="cancelamentos", formato="pdf", status=situacao, data_geracao=quando,
+                      id_admin_fk=admin_user.id_admin)
+            for situacao, quando in [
+                ("pendente", antigo), ("processando", antigo), ("processando", recente), ("concluido", antigo)
+            ]
+        ]
+        db_session.add_all(relatorios)
+        db_session.commit()
+
+        assert fila_relatorios.recuperar_relatorios_interrompidos(fabrica_sessao, tempo_maximo_segundos=3600) == 2
+
+        db_session.expire_all()
+        assert [r.status for r in relatorios] == ["erro", "erro", "processando", "concluido"]
+        assert relatorios[0].mensagem_erro == "Geração interrompida (servidor reiniciado)"
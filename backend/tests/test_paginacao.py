@@ -0,0 +1,131 @@
+"""
+Testes da paginação por cursor nas listagens
+Performance: ~5 segundos total
+"""
+import pytest
+from datetime import date, datetime, time, timedelta
+from fastapi import HTTPException
+
+from app.models.models import BloqueioHorario, Consulta, Medico, Paciente
+from app.utils.paginacao import codificar_cursor, decodificar_cursor
+
+
+def percorrer(client, url, headers=None, **params):
+    """Todas as páginas da listagem, seguindo X-Proximo-Cursor; devolve (itens, páginas)"""
+    itens, paginas = [], 0
+    while True:
+        response = client.get(url, headers=headers, params=params)
+        assert response.status_code == 200, response.text
+        itens.extend(response.json())
+        paginas += 1
+        if "X-Proximo-Cursor" not in response.headers:
+            return itens, paginas
+        params["cursor"] = response.headers["X-Proximo-Cursor"]
+
+
+@pytest.fixture(scope="function")
+def consultas_empatadas(db_session, medico_cardiologista, medico_ortopedista, paciente_teste):
+    """Dez consultas em cinco horários: cada horário com uma consulta por médico"""
+    inicio = datetime.combine(date.today() + timedelta(days=3), time(9))
+    db_session.add_all([
+        Consulta(
+            data_hora_inicio=inicio + timedelta(hours=i % 5), status=["agendada", "realizada"][i % 2],
+            id_paciente_fk=paciente_teste.id_paciente, id_medico_fk=medico.id_medico
+        )
+        for i in range(5)
+        for medico in (medico_cardiologista, medico_ortopedista)
+    ])
+    db_session.commit()
+    return db_session.query(Consulta).order_by(Consulta.data_hora_inicio, Consulta.id_consulta).all()
+
+
+@pytest.mark.unit
+class TestCursor:
+    """Cursor opaco com os valores das colunas de ordenação"""
+
+    ORDEM = [Consulta.data_hora_inicio, Consulta.id_consulta]
+
+    def test_ida_e_volta(self):
+        valores = [datetime(2026, 3, 1, 9, 30), 42]
+        cursor = codificar_cursor(self.ORDEM, valores)
+        assert "=" not in cursor
+        assert decodificar_cursor(self.ORDEM, cursor) == valores
+
+    @pytest.mark.parametrize("cursor", ["???", "bm90LWpzb24", codificar_cursor(ORDEM, ["ontem", 1])])
+    def test_cursor_invalido(self, cursor):
+        with pytest.raises(HTTPException) as erro:
+            decodificar_cursor(self.ORDEM, cursor)
+        assert erro.value.status_code == 400
+
+    def test_cursor_de_outra_listagem(self):
+        with pytest.raises(HTTPException):
+            decodificar_cursor([Paciente.nome, Paciente.id_paciente], codificar_cursor(self.ORDEM, [datetime.now(), 1]))
+        with pytest.raises(HTTPException):
+            decodificar_cursor(self.ORDEM, codificar_cursor(self.ORDEM, [datetime.now(), 1]), descendente=True)
+
+
+@pytest.mark.integration
+class TestListagensPaginadas:
+    """Percorrer as páginas devolve cada linha uma vez, na ordem estável"""
+
+    def test_consultas_admin_com_horarios_empatados(self, client, auth_headers_admin, consultas_empatadas):
+        itens, paginas = percorrer(client, "/admin/consultas", auth_headers_admin, limite=3)
+
+        assert paginas == 4
+        assert [c["id_consulta"] for c in itens] == [c.id_consulta for c in consultas_empatadas]
+
+    def test_consultas_admin_mais_recentes_primeiro(self, client, auth_headers_admin, consultas_empatadas):
+        itens, paginas = percorrer(client, "/admin/consultas", auth_headers_admin, limite=4, descendente="true")
+
+        assert paginas == 3
+        assert [c["id_consulta"] for c in itens] == [c.id_consulta for c in reversed(consultas_empatadas)]
+
+    def test_consultas_admin_filtradas(
+        self, client, auth_headers_admin, consultas_empatadas, medico_ortopedista
+    ):
+        itens, _ = percorrer(
+            client, "/admin/consultas", auth_headers_admin,
+            limite=2, status="agendada", id_medico=medico_ortopedista.id_medico
+        )
+        assert [c["id_consulta"] for c in itens] == [
+            c.id_consulta for c in consultas_empatadas
+            if c.status == "agendada" and c.id_medico_fk == medico_ortopedista.id_medico
+        ]
+
+    def test_consultas_do_paciente_mais_recentes_primeiro(self, client, consultas_empatadas, paciente_teste):
+        itens, paginas = percorrer(client, f"/pacientes/consultas/{paciente_teste.id_paciente}", limite=4)
+
+        assert paginas == 3
+        assert [c["id_consulta"] for c in itens] == [c.id_consulta for c in reversed(consultas_empatadas)]
+
+    def test_consultas_do_medico(self, client, consultas_empatadas, medico_cardiologista):
+        itens, _ = percorrer(client, f"/medicos/consultas/{medico_cardiologista.id_medico}", limite=2)
+
+        assert [c["id_consulta"] for c in itens] == [
+            c.id_consulta for c in consultas_empatadas if c.id_medico_fk == medico_cardiologista.id_medico
+        ]
+
+    def test_bloqueios_e_medicos(
+        self, client, db_session, auth_headers_admin, medico_cardiologista, medico_ortopedista
+    ):
+        amanha = date.today() + timedelta(days=1)
+        db_session.add_all([
+            BloqueioHorario(data=amanha + timedelta(days=i // 2), hora_inicio=time(8 + i % 2), hora_fim=time(9 + i % 2),
+                            id_medico_fk=medico_cardiologista.id_medico)
+            for i in range(5)
+        ])
+        db_session.commit()
+
+        itens, paginas = percorrer(client, "/medicos/bloqueios", medico_id=medico_cardiologista.id_medico, limite=2)
+        assert paginas == 3
+        assert [(b["data"], b["hora_inicio"]) for b in itens] == sorted((b["data"], b["hora_inicio"]) for b in itens)
+        assert len({b["id_bloqueio"] for b in itens}) == 5
+
+        medicos, _ = percorrer(client, "/admin/medicos", auth_headers_admin, limite=1)
+        assert [m["nome"] for m in medicos] == [m.nome for m in db_session.query(Medico).order_by(Medico.nome)]
+
+    def test_limite_maximo_e_cursor_invalido(self, client, auth_headers_admin):
+        assert client.get("/admin/consultas", headers=auth_headers_admin, params={"limite": 501}).status_code == 422
+        response = client.get("/admin/consultas", headers=auth_headers_admin, params={"cursor": "xyz"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Cursor de paginação inválido"
@@ -0,0 +1,116 @@
+"""
+Testes dos filtros de período (intervalos semiabertos sobre data_hora_inicio)
+Performance: < 1 segundo total
+"""
+import pytest
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, select
+
+from app.models.models import Consulta
+from app.utils.periodo import filtro_dia, filtro_mes, filtro_periodo, limites_mes
+
+
+def plano_de_execucao(db_session, consulta_sql) -> str:
+    """EXPLAIN QUERY PLAN do SQLite para um select (valores dos parâmetros não importam)"""
+    compilado = consulta_sql.compile(dialect=db_session.get_bind().dialect)
+    parametros = tuple(str(compilado.params[nome]) for nome in compilado.positiontup)
+    linhas = db_session.connection().exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {compilado}", parametros
+    ).fetchall()
+    return " | ".join(linha[-1] for linha in linhas)
+
+
+@pytest.fixture(scope="function")
+def consultas_nas_bordas(db_session, medico_cardiologista, paciente_teste):
+    """Consultas exatamente nas bordas de dia, mês e ano"""
+    instantes = [
+        datetime(2030, 1, 31, 23, 59, 59, 999999),
+        datetime(2030, 2, 1, 0, 0),
+        datetime(2030, 2, 1, 12, 0),
+        datetime(2030, 2, 28, 23, 59, 59),
+        datetime(2030, 3, 1, 0, 0),
+        datetime(2030, 12, 31, 23, 30),
+        datetime(2031, 1, 1, 0, 0),
+    ]
+    db_session.add_all([
+        Consulta(
+            data_hora_inicio=instante,
+            data_hora_fim=instante + timedelta(minutes=30),
+            status="agendada",
+            id_paciente_fk=paciente_teste.id_paciente,
+            id_medico_fk=medico_cardiologista.id_medico
+        )
+        for instante in instantes
+    ])
+    db_session.commit()
+    return instantes
+
+
+@pytest.mark.unit
+class TestFiltroPeriodo:
+    """Suite dos filtros de período"""
+    
+    def test_limites_mes_vira_o_ano(self):
+        """Dezembro termina em 1º de janeiro do ano seguinte"""
+        assert limites_mes(date(2030, 12, 15)) == (datetime(2030, 12, 1), datetime(2031, 1, 1))
+        assert limites_mes(date(2030, 2, 1)) == (datetime(2030, 2, 1), datetime(2030, 3, 1))
+    
+    @pytest.mark.parametrize("data_inicio,data_fim", [
+        (date(2030, 2, 1), date(2030, 2, 1)),
+        (date(2030, 1, 31), date(2030, 2, 28)),
+        (date(2030, 2, 1), None),
+        (None, date(2030, 2, 28)),
+        (date(2030, 12, 31), date(2031, 1, 1)),
+    ])
+    def test_mesmo_resultado_que_func_date(
+        self, db_session, consultas_nas_bordas, data_inicio, data_fim
+    ):
+        """filtro_periodo seleciona as mesmas consultas que func.date(coluna)"""
+        legado = db_session.query(Consulta.id_consulta)
+        if data_inicio:
+            legado = legado.filter(func.date(Consulta.data_hora_inicio) >= data_inicio)
+        if data_fim:
+            legado = legado.filter(func.date(Consulta.data_hora_inicio) <= data_fim)
+        
+        novo = db_session.query(Consulta.id_consulta).filter(
+            *filtro_periodo(Consulta.data_hora_inicio, data_inicio, data_fim)
+        )
+        
+        assert sorted(novo.all()) == sorted(legado.all())
+        assert novo.count() > 0
+    
+    @pytest.mark.parametrize("referencia", [date(2030, 1, 10), date(2030, 2, 10), date(2030, 12, 1)])
+    def test_mesmo_resultado_que_extract(self, db_session, consultas_nas_bordas, referencia):
+        """filtro_mes e filtro_dia equivalem a extract(ano/mês) e func.date(coluna) == dia"""
+        legado = db_session.query(Consulta.id_consulta).filter(
+            func.extract('year', Consulta.data_hora_inicio) == referencia.year,
+            func.extract('month', Consulta.data_hora_inicio) == referencia.month
+        ).all()
+        novo = db_session.query(Consulta.id_consulta).filter(
+            *filtro_mes(Consulta.data_hora_inicio, referencia)
+        ).all()
+        assert sorted(novo) == sorted(legado)
+        
+        dia = date(2030, 2, 1)
+        assert db_session.query(Consulta).filter(*filtro_dia(Consulta.data_hora_inicio, dia)).count() == \
+            db_session.query(Consulta).filter(func.date(Consulta.data_hora_inicio) == dia).count() == 2
+    
+    def test_filtro_usa_indice(self, db_session):
+        """O intervalo semiaberto permite busca pelo índice; func.date obriga varredura"""
+        dia = date(2030, 2, 1)
+        
+        plano = plano_de_execucao(db_session, select(Consulta.id_consulta).where(
+            *filtro_dia(Consulta.data_hora_inicio, dia)
+        ))
+        assert "SEARCH" in plano and "ix_consulta_data_hora_inicio" in plano
+        
+        plano = plano_de_execucao(db_session, select(Consulta.id_consulta).where(
+            Consulta.id_medico_fk == 1,
+            *filtro_periodo(Consulta.data_hora_inicio, dia, dia + timedelta(days=6))
+        ))
+        assert "SEARCH" in plano and "ix_consulta_medico_inicio" in plano
+        
+        plano = plano_de_execucao(db_session, select(Consulta.id_consulta).where(
+            func.date(Consulta.data_hora_inicio) == dia
+        ))
+        assert "SEARCH" not in plano
@@ -0,0 +1,139 @@
+"""
+Testes dos relatórios administrativos (JSON, PDF, CSV, XLSX)
+Performance: ~4 segundos total
+"""
+import csv
+import io
+import re
+import zipfile
+import pytest
+from datetime import date, datetime, time, timedelta
+
+from app.models.models import Consulta
+from app.utils import relatorios
+from app.utils.relatorios import RENDERIZADORES, Coluna, Tabela
+
+
+@pytest.fixture(scope="function")
+def consultas_relatorio(db_session, medico_cardiologista, medico_ortopedista, paciente_teste, paciente_sem_plano):
+    """Quatro consultas do cardiologista (uma cancelada) e uma do ortopedista"""
+    inicio = datetime.combine(date.today() - timedelta(days=5), time(9))
+    dados = [
+        (medico_cardiologista, paciente_teste, "realizada"),
+        (medico_cardiologista, paciente_teste, "realizada"),
+        (medico_cardiologista, paciente_teste, "cancelada"),
+        (medico_cardiologista, paciente_sem_plano, "realizada"),
+        (medico_ortopedista, paciente_sem_plano, "agendada"),
+    ]
+    db_session.add_all([
+        Consulta(
+            data_hora_inicio=inicio + timedelta(hours=i), status=situacao,
+            id_medico_fk=medico.id_medico, id_paciente_fk=paciente.id_paciente
+        )
+        for i, (medico, paciente, situacao) in enumerate(dados)
+    ])
+    db_session.commit()
+
+
+@pytest.mark.integration
+class TestRelatoriosAdmin:
+    """Mesmo conteúdo em todos os formatos"""
+
+    def test_json_mantem_formato(self, client, auth_headers_admin, consultas_relatorio, medico_cardiologista):
+        response = client.get("/admin/relatorios/consultas-por-medico", headers=auth_headers_admin)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        por_medico = {d["medico_nome"]: d for d in response.json()}
+        assert por_medico[medico_cardiologista.nome] == {
+            "medico_nome": medico_cardiologista.nome, "especialidade": "Cardiologia",
+            "total_consultas": 4, "consultas_realizadas": 3, "consultas_canceladas": 1
+        }
+
+    def test_cancelamentos_resumo(self, client, auth_headers_admin, consultas_relatorio):
+        response = client.get("/admin/relatorios/cancelamentos", headers=auth_headers_admin)
+        assert response.json() == {"total_consultas": 5, "total_cancelamentos": 1, "taxa_cancelamento": 20.0}
+
+        response = client.get(
+            "/admin/relatorios/cancelamentos", headers=auth_headers_admin, params={"formato": "csv"}
+        )
+        assert list(csv.reader(io.StringIO(response.text))) == [
+            ["Métrica", "Valor"], ["Total de Consultas", "5"], ["Total de Cancelamentos", "1"],
+            ["Taxa de Cancelamento", "20.0%"]
+        ]
+
+    def test_csv_pacientes_frequentes(self, client, auth_headers_admin, consultas_relatorio):
+        response = client.get(
+            "/admin/relatorios/pacientes-frequentes", headers=auth_headers_admin, params={"formato": "csv", "limite": 1}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.headers["content-disposition"] == "attachment; filename=relatorio_pacientes_frequentes.csv"
+        linhas = list(csv.reader(io.StringIO(response.text)))
+        assert linhas[0] == ["Posição", "Paciente", "CPF", "Total de Consultas", "Última Consulta"]
+        assert linhas[1][:4] == ["1", "Carlos Teste", "99988877766", "3"]
+        assert len(linhas) == 2
+
+    def test_xlsx(self, client, auth_headers_admin, consultas_relatorio):
+        response = client.get(
+            "/admin/relatorios/consultas-por-especialidade", headers=auth_headers_admin, params={"formato": "xlsx"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-disposition"] == "attachment; filename=relatorio_consultas_especialidade.xlsx"
+        with zipfile.ZipFile(io.BytesIO(response.content)) as arquivo:
+            assert arquivo.testzip() is None
+            planilha = arquivo.read("xl/worksheets/sheet1.xml").decode()
+        assert '<t xml:space="preserve">Especialidade</t>' in planilha
+        assert '<c r="B2"><v>4</v></c>' in planilha
+
+    def test_formato_invalido_e_acesso(self, client, auth_headers_admin, auth_headers_paciente):
+        assert client.get(
+            "/admin/relatorios/cancelamentos", headers=auth_headers_admin, params={"formato": "docx"}
+        ).status_code == 422
+        assert client.get("/admin/relatorios/cancelamentos", headers=auth_headers_paciente).status_code == 403
+
+
+@pytest.mark.unit
+class TestRenderizadores:
+    """Renderizadores sem banco"""
+
+    TABELA = Tabela(
+        "Teste", "Período: Todos os registros",
+        [Coluna("nome", "Nome", 5), Coluna("total", "Total", 2)],
+        [{"nome": "A & B <c>\x01", "total": 3}, {"nome": None, "total": 0}]
+    )
+
+    def test_xml_escapado(self):
+        planilha = zipfile.ZipFile(io.BytesIO(RENDERIZADORES["xlsx"].renderizar(self.TABELA)))
+        conteudo = planilha.read("xl/worksheets/sheet1.xml").decode()
+        assert "A &amp; B &lt;c&gt;</t>" in conteudo
+
+    def test_pdf_com_caracteres_especiais(self):
+        assert RENDERIZADORES["pdf"].renderizar(self.TABELA).startswith(b"%PDF")
+
+    def test_pdf_paginado_com_linhas_sob_demanda(self):
+        lidas = []
+
+        def linhas():
+            for i in range(200):
+                lidas.append(i)
+                yield {"nome": f"Paciente {i}", "total": i}
+
+        pdf = RENDERIZADORES["pdf"].renderizar(Tabela("Teste", "", self.TABELA.colunas, linhas()))
+
+        assert len(re.findall(rb"/Type /Page\b", pdf)) == 6
+        assert len(lidas) == 200
+
+    def test_pdf_sem_linhas(self):
+        pdf = RENDERIZADORES["pdf"].renderizar(Tabela("Teste", "", self.TABELA.colunas, []))
+        assert len(re.findall(rb"/Type /Page\b", pdf)) == 1
+
+    def test_estilos_pdf_montados_uma_vez(self):
+        relatorios._estilos_pdf.cache_clear()
+        relatorios._estilo_tabela.cache_clear()
+        for _ in range(3):
+            RENDERIZADORES["pdf"].renderizar(self.TABELA)
+        assert relatorios._estilos_pdf.cache_info().misses == 1
+        assert relatorios._estilo_tabela.cache_info().misses == 1
@@ -23,7 +23,7 @@ async function carregarDadosDashboard() {
         await carregarConsultasRecentes();
         
         // Carregar alertas
-        await carregarAlertas();
+        carregarAlertas(stats);
         
     } catch (error) {
         console.error('❌ Erro ao carregar dashboard:', error);
@@ -52,10 +52,7 @@ function atualizarEstatisticas(stats) {
     if (cards[0]) cards[0].textContent = stats.total_pacientes || 0;
     if (cards[1]) cards[1].textContent = stats.total_medicos || 0;
     if (cards[2]) cards[2].textContent = stats.consultas_mes || 0;
-    if (cards[3]) {
-        // Calcular cancelamentos (consultas com status Cancelada)
-        cards[3].textContent = '...'; // Será atualizado em carregarConsultasRecentes
-    }
+    if (cards[3]) cards[3].textContent = stats.consultas_canceladas || 0;
     
     console.log('📈 Estatísticas atualizadas:', stats);
 }
@@ -63,23 +60,8 @@ function atualizarEstatisticas(stats) {
 async function carregarConsultasRecentes() {
     try {
         console.log('📅 Carregando consultas recentes...');
-        const consultas = await api.get(API_CONFIG.ENDPOINTS.ADMIN_CONSULTAS);
-        
-        // Ordenar por data (mais recentes primeiro)
-        const consultasOrdenadas = consultas.sort((a, b) => {
-            return new Date(b.data_hora_inicio) - new Date(a.data_hora_inicio);
-        });
-        
-        // Pegar apenas as 10 mais recentes
-        const consultasRecentes = consultasOrdenadas.slice(0, 10);
-        
-        // Contar cancelamentos
-        const cancelamentos = consultas.filter(c => c.status.toLowerCase() === 'cancelada').length;
-        const cards = document.querySelectorAll('.grid-2 .card:first-child h4');
-        if (cards[3]) {
-            cards[3].textContent = cancelamentos;
-        }
-        console.log(`📊 Cancelamentos encontrados: ${cancelamentos}`);
+        // Só a primeira página: as 10 mais recentes, já ordenadas pelo servidor
+        const consultasRecentes = await api.get(API_CONFIG.ENDPOINTS.ADMIN_CONSULTAS, { descendente: true, limite: 10 });
         
         // Renderizar tabela
         const tbody = document.querySelector('.card.mt-20 tbody');
@@ -128,15 +110,12 @@ async function carregarConsultasRecentes() {
     }
 }
 
-async function carregarAlertas() {
+function carregarAlertas(stats) {
     try {
         console.log('⚠️ Carregando alertas...');
         
-        // Carregar pacientes
-        const pacientes = await api.get(API_CONFIG.ENDPOINTS.ADMIN_PACIENTES);
-        
-        // Contar pacientes bloqueados
-        const pacientesBloqueados = pacientes.filter(p => p.esta_bloqueado).length;
+        // Pacientes bloqueados, contados pelo dashboard
+        const pacientesBloqueados = stats.pacientes_bloqueados || 0;
         
         // Atualizar alertas
         const alertContainer = document.querySelector('.card.mt-20:last-of-type');
@@ -1,6 +1,7 @@
 // Gerenciar Médicos - Admin - Integrado com API
 let medicos = [];
 let especialidades = [];
+let estatisticasMedicos = {}; // Estatísticas por id_medico (uma requisição para todos)
 let conveniosMedicos = {}; // Armazena convênios por médico (temporário até backend implementar)
 
 // Carregar convênios do localStorage
@@ -75,7 +76,13 @@ async function carregarEspecialidades() {
 async function carregarMedicos() {
     try {
         showLoading();
-        medicos = await api.get(API_CONFIG.ENDPOINTS.ADMIN_MEDICOS_LISTAR);
+        const [lista, estatisticas] = await Promise.all([
+            api.getTodos(API_CONFIG.ENDPOINTS.ADMIN_MEDICOS_LISTAR),
+            api.get(API_CONFIG.ENDPOINTS.ADMIN_MEDICOS_ESTATISTICAS)
+        ]);
+        medicos = lista;
+        estatisticasMedicos = {};
+        estatisticas.forEach(e => { estatisticasMedicos[e.id_medico] = e; });
         renderizarMedicos();
         hideLoading();
     } catch (error) {
@@ -92,7 +99,7 @@ function renderizarMedicos() {
     if (!tbody) return;
     
     if (medicos.length === 0) {
-        tbody.innerHTML = '<tr><td colspan="6" style="text-align: center; padding: 30px;">Nenhum médico cadastrado</td></tr>';
+        tbody.innerHTML = '<tr><td colspan="7" style="text-align: center; padding: 30px;">Nenhum médico cadastrado</td></tr>';
         return;
     }
     
@@ -100,6 +107,7 @@ function renderizarMedicos() {
         const especialidade = medico.especialidade || {};
         const convenios = conveniosMedicos[medico.id_medico] || [];
         const conveniosTexto = convenios.length > 0 ? convenios.join(', ') : 'Não informado';
+        const estatisticas = estatisticasMedicos[medico.id_medico] || {};
         
         return `
             <tr>
@@ -107,6 +115,7 @@ function renderizarMedicos() {
                 <td>${medico.crm || 'N/A'}</td>
                 <td>${especialidade.nome || 'N/A'}</td>
                 <td>${conveniosTexto}</td>
+                <td style="text-align: center;" title="${estatisticas.horarios_bloqueados || 0} bloqueio(s) a partir de hoje">${estatisticas.consultas_hoje || 0} / ${estatisticas.consultas_semana || 0}</td>
                 <td><span style="color: var(--tertiary-color);"><i class="fas fa-check-circle"></i> Ativo</span></td>
                 <td>
                     <button class="btn btn-secondary" style="padding: 5px 10px; margin-right: 5px;" onclick="verDetalhesMedico(${medico.id_medico})" title="Ver detalhes">
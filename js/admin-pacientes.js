@@ -14,7 +14,8 @@ document.addEventListener('DOMContentLoaded', async function() {
 async function carregarPacientes() {
     try {
         showLoading();
-        pacientes = await api.get(API_CONFIG.ENDPOINTS.ADMIN_PACIENTES_LISTAR);
+        // A API devolve os pacientes em páginas; a busca da tela filtra a lista completa
+        pacientes = await api.getTodos(API_CONFIG.ENDPOINTS.ADMIN_PACIENTES_LISTAR);
         pacientesFiltrados = [...pacientes];
         renderizarPacientes();
         hideLoading();
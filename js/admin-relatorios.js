@@ -17,7 +17,7 @@ document.addEventListener('DOMContentLoaded', async function() {
 // Carregar lista de médicos
 async function carregarMedicos() {
     try {
-        const medicos = await api.get(API_CONFIG.ENDPOINTS.ADMIN_MEDICOS_LISTAR);
+        const medicos = await api.getTodos(API_CONFIG.ENDPOINTS.ADMIN_MEDICOS_LISTAR);
         const select = document.getElementById('medico');
         
         if (select && medicos && medicos.length > 0) {
@@ -181,6 +181,7 @@ function configurarFormularios() {
 }
 
 // Função para gerar PDF e abrir em nova aba
+// O PDF é gerado em segundo plano: pede a tarefa, acompanha o status e baixa o arquivo
 async function gerarPDF(endpoint, params = {}) {
     console.log('=== GERANDO PDF ===');
     console.log('Endpoint:', endpoint);
@@ -189,23 +190,32 @@ async function gerarPDF(endpoint, params = {}) {
     try {
         showLoading();
         
-        // Adicionar formato PDF aos parâmetros
-        params.formato = 'pdf';
-        
-        // Construir URL com query params
-        const queryParams = new URLSearchParams();
+        // Tipo do relatório = último trecho do endpoint (ex.: consultas-por-medico)
+        const pedido = { tipo: endpoint.split('/').pop(), formato: 'pdf' };
         for (const [key, value] of Object.entries(params)) {
             if (value) {
-                queryParams.append(key, value);
+                pedido[key] = value;
             }
         }
         
-        const url = `${API_CONFIG.BASE_URL}${endpoint}?${queryParams.toString()}`;
+        let tarefa = await api.post(API_CONFIG.ENDPOINTS.ADMIN_RELATORIO_TAREFAS, pedido);
+        const limite = Date.now() + 5 * 60 * 1000;
+        while (tarefa.status === 'pendente' || tarefa.status === 'processando') {
+            if (Date.now() > limite) {
+                throw new Error('O relatório está demorando; consulte a lista de relatórios mais tarde');
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            tarefa = await api.get(API_CONFIG.ENDPOINTS.ADMIN_RELATORIO_TAREFA(tarefa.id_relatorio));
+        }
+        if (tarefa.status !== 'concluido') {
+            throw new Error(tarefa.mensagem_erro || 'Erro ao gerar PDF');
+        }
+        
+        const url = `${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.ADMIN_RELATORIO_TAREFA_ARQUIVO(tarefa.id_relatorio)}`;
         const token = localStorage.getItem('token');
         
-        console.log('Fazendo requisição PDF:', url);
+        console.log('Baixando PDF:', url);
         
-        // Fazer requisição para obter PDF
         const response = await fetch(url, {
             method: 'GET',
             headers: {
@@ -19,6 +19,8 @@ const API_CONFIG = {
         PACIENTE_CONSULTA_REAGENDAR: (id) => `/pacientes/consultas/${id}/reagendar`,
         PACIENTE_MEDICOS: '/pacientes/medicos',
         PACIENTE_HORARIOS_DISPONIVEIS: (id) => `/pacientes/medicos/${id}/horarios-disponiveis`,
+        PACIENTE_AGENDA_MEDICO: (id) => `/pacientes/medicos/${id}/agenda`,
+        PACIENTE_PRIMEIROS_HORARIOS: '/pacientes/primeiros-horarios',
         PACIENTE_ESPECIALIDADES: '/pacientes/especialidades',
         PACIENTE_PLANOS_SAUDE: '/pacientes/planos-saude',
         
@@ -39,6 +41,7 @@ const API_CONFIG = {
         ADMIN_CONSULTAS: '/admin/consultas',
         ADMIN_MEDICOS: '/admin/medicos',
         ADMIN_MEDICOS_LISTAR: '/admin/medicos',
+        ADMIN_MEDICOS_ESTATISTICAS: '/admin/medicos/estatisticas',
         ADMIN_MEDICO: (id) => `/admin/medicos/${id}`,
         ADMIN_MEDICO_CRIAR: '/admin/medicos',
         ADMIN_MEDICO_ATUALIZAR: (id) => `/admin/medicos/${id}`,
@@ -57,7 +60,10 @@ const API_CONFIG = {
         ADMIN_RELATORIO_CONSULTAS_ESPECIALIDADE: '/admin/relatorios/consultas-por-especialidade',
         ADMIN_RELATORIO_CANCELAMENTOS: '/admin/relatorios/cancelamentos',
         ADMIN_RELATORIO_PACIENTES_FREQUENTES: '/admin/relatorios/pacientes-frequentes',
-        ADMIN_RELATORIO_ESTATISTICAS_GERAIS: '/admin/relatorios/estatisticas-gerais'
+        ADMIN_RELATORIO_ESTATISTICAS_GERAIS: '/admin/relatorios/estatisticas-gerais',
+        ADMIN_RELATORIO_TAREFAS: '/admin/relatorios/tarefas',
+        ADMIN_RELATORIO_TAREFA: (id) => `/admin/relatorios/tarefas/${id}`,
+        ADMIN_RELATORIO_TAREFA_ARQUIVO: (id) => `/admin/relatorios/tarefas/${id}/arquivo`
     }
 };
 
@@ -136,6 +142,32 @@ class APIClient {
         }
     }
 
+    // GET de listagem paginada: segue X-Proximo-Cursor e devolve todos os itens
+    async getTodos(endpoint, params = {}) {
+        const itens = [];
+        let cursor = null;
+        try {
+            do {
+                const query = new URLSearchParams({ limite: 500, ...params });
+                if (cursor) query.set('cursor', cursor);
+                const separador = endpoint.includes('?') ? '&' : '?';
+
+                const response = await fetch(`${this.baseURL}${endpoint}${separador}${query.toString()}`, {
+                    method: 'GET',
+                    headers: this.getHeaders()
+                });
+
+                itens.push(...await this.handleResponse(response));
+                cursor = response.headers.get('X-Proximo-Cursor');
+            } while (cursor);
+
+            return itens;
+        } catch (error) {
+            console.error('GET Error:', error);
+            throw error;
+        }
+    }
+
     // POST request
     async post(endpoint, data = {}, includeAuth = true) {
         try {
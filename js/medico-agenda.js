@@ -64,7 +64,7 @@ async function carregarAgenda(data) {
         
         // Usar endpoint com filtro de data
         const url = `/medicos/consultas/${medicoId}?data_inicio=${data}&data_fim=${data}`;
-        consultasAgenda = await api.get(url);
+        consultasAgenda = await api.getTodos(url);
         
         renderizarAgenda();
         hideLoading();
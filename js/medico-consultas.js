@@ -74,7 +74,7 @@ async function carregarConsultas() {
             url += `?data_fim=${dataFim}`;
         }
         
-        todasConsultas = await api.get(url);
+        todasConsultas = await api.getTodos(url);
         renderizarConsultas(todasConsultas);
         hideLoading();
     } catch (error) {
@@ -33,7 +33,7 @@ async function carregarDadosMedico() {
 
 async function carregarConsultasHoje() {
     try {
-        const consultasHoje = await api.get(`/medicos/consultas/hoje/${medicoId}`);
+        const consultasHoje = await api.getTodos(`/medicos/consultas/hoje/${medicoId}`);
         
         const tbody = document.querySelector('tbody');
         if (!tbody) return;
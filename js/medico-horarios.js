@@ -271,7 +271,7 @@ function showMessage(message, type = 'info') {
 async function carregarBloqueios() {
     try {
         const hoje = new Date().toISOString().split('T')[0];
-        const bloqueios = await api.get(`/medicos/bloqueios?medico_id=${medicoId}&data_inicio=${hoje}`);
+        const bloqueios = await api.getTodos(`/medicos/bloqueios?medico_id=${medicoId}&data_inicio=${hoje}`);
         bloqueiosAtuais = bloqueios;
         
         renderizarBloqueios(bloqueios);
@@ -16,7 +16,7 @@ async function carregarConsultas() {
         const pacienteId = api.getUserId();
         console.log('🔄 Carregando consultas do paciente:', pacienteId);
         
-        const response = await api.get(API_CONFIG.ENDPOINTS.PACIENTE_CONSULTAS_LISTAR(pacienteId));
+        const response = await api.getTodos(API_CONFIG.ENDPOINTS.PACIENTE_CONSULTAS_LISTAR(pacienteId));
         consultas = response;
         
         console.log('✅ Consultas carregadas:', consultas);